@@ -1,6 +1,18 @@
 from flask import Flask, request, jsonify, url_for, send_from_directory
 from models import db
 from routes import main  # Importar el blueprint principal de la nueva estructura
+from services.resumen_diario import registrar_eventos, reconstruir_resumen_diario
+from services.migraciones import aplicar_migraciones
+from services.trabajos import iniciar_trabajos, detener_trabajos
+from services.sqlite_rendimiento import (preparar_opciones_motor, configurar_sqlite,
+                                         iniciar_checkpoint_periodico)
+from services.almacen_respaldos import almacen_de
+from services.servidor import servir, detener_servidor, ErrorServidor
+from services.instrumentacion import iniciar_instrumentacion
+from services.metricas import iniciar_metricas
+from services.cache_kpi import iniciar_cache_kpi
+from services.consultas import tablas, columnas
+import config
 import webbrowser
 import os
 import sys
@@ -67,46 +79,31 @@ def crear_respaldo_automatico():
     """
     Crea un respaldo automático de la base de datos
     """
-    # Importar la función para obtener la fecha con zona horaria de Colombia
-    from models import datetime_colombia
-    
     # Determinar la ruta de la base de datos según el modo de ejecución
     if getattr(sys, 'frozen', False):
         # Modo ejecutable
         base_dir = os.path.expanduser('~')
         app_data_dir = os.path.join(base_dir, 'GimnasioDB_Data')
         db_path = os.path.join(app_data_dir, 'database.db')
-        backup_dir = os.path.join(app_data_dir, 'backups')
     else:
         # Modo desarrollo
         db_path = 'database.db'
-        backup_dir = 'backups'
     
     # Si no existe el archivo de base de datos, no hay nada que respaldar
     if not os.path.exists(db_path):
         print(f"No se encontró la base de datos en {db_path}, no se creará respaldo.")
         return
         
-    # Crear directorio de respaldos si no existe
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    # Generar nombre de archivo con fecha
-    fecha = datetime_colombia().strftime('%Y%m%d_%H%M%S')
-    archivo_respaldo = os.path.join(backup_dir, f'database_{fecha}.db')
-    
-    # Copiar la base de datos
+    # Instantánea deduplicada en backups/almacen: solo se guardan los trozos que cambiaron desde la anterior
     try:
-        shutil.copy2(db_path, archivo_respaldo)
-        print(f"Respaldo creado: {archivo_respaldo}")
+        almacen = almacen_de(db_path)
+        manifiesto = almacen.crear_instantanea(db_path, origen='automatico')
+        print(f"Respaldo creado: {manifiesto['nombre']} ({manifiesto['bytes_nuevos'] / 1024:.0f} KB nuevos)")
         
-        # Limpiar respaldos antiguos (mantener solo los últimos 7)
-        respaldos = sorted([f for f in os.listdir(backup_dir) if f.startswith('database_')])
-        if len(respaldos) > 7:
-            for archivo in respaldos[:-7]:
-                ruta_completa = os.path.join(backup_dir, archivo)
-                os.remove(ruta_completa)
-                print(f"Respaldo antiguo eliminado: {archivo}")
+        # Limpiar respaldos antiguos (mantener solo los últimos 7 automáticos)
+        liberados = almacen.podar(7, origen='automatico')
+        if liberados:
+            print(f"Respaldos antiguos eliminados ({liberados / 1024:.0f} KB liberados)")
     except Exception as e:
         print(f"Error al crear respaldo: {str(e)}")
 
@@ -234,8 +231,21 @@ class CustomStaticFlask(Flask):
             return 0  # No usar caché en modo empaquetado
         return super(CustomStaticFlask, self).get_send_file_max_age(name)
 
-def create_app(test_config=None):
-    """Crea y configura la aplicación Flask"""
+def _iniciar_trabajos_seguro(app):
+    try:
+        iniciar_trabajos(app)
+    except Exception as e:
+        print(f"ERROR al iniciar los trabajos en segundo plano: {str(e)}")
+
+
+def create_app(test_config=None, trabajos=True):
+    """
+    Crea y configura la aplicación Flask.
+
+    Con ``trabajos=False`` no se crea el grupo de hilos ni se retoma la cola
+    guardada; quien crea la aplicación llama a ``iniciar_trabajos`` cuando
+    corresponda.
+    """
     # Usar nuestra clase personalizada en lugar de Flask directamente
     app = CustomStaticFlask(__name__, instance_relative_config=True)
     
@@ -274,13 +284,35 @@ def create_app(test_config=None):
         SQLALCHEMY_DATABASE_URI=db_uri,
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         DEBUG=True,  # Configurar modo debug
-        SEND_FILE_MAX_AGE_DEFAULT=0  # Evitar caché de archivos estáticos
+        SEND_FILE_MAX_AGE_DEFAULT=0,  # Evitar caché de archivos estáticos
+        SQLITE_PERFIL=config.SQLITE_PERFIL,
+        SQLITE_POOL_SIZE=config.SQLITE_POOL_SIZE,
+        SQLITE_CHECKPOINT_SEGUNDOS=config.SQLITE_CHECKPOINT_SEGUNDOS,
+        TRABAJOS_MAX_HILOS=config.TRABAJOS_MAX_HILOS
     )
     
+    # Permitir sobrescribir la configuración (p. ej. base de datos en memoria para pruebas)
+    if isinstance(test_config, dict):
+        app.config.update(test_config)
+    
     print(f"Configurando conexión a la base de datos: {app.config['SQLALCHEMY_DATABASE_URI']}")
     
-    # Inicializar la base de datos
+    # Inicializar la base de datos con el perfil de PRAGMA de config.py
+    preparar_opciones_motor(app)
     db.init_app(app)
+    configurar_sqlite(app)
+    
+    # Contar consultas por petición y registrar las sentencias lentas
+    iniciar_instrumentacion(app)
+    
+    # Peticiones, latencias y errores por ruta en /metrics
+    iniciar_metricas(app)
+    
+    # Mantener actualizado el resumen diario al guardar pagos, ventas y asistencias
+    registrar_eventos()
+    
+    # Indicadores de finanzas en caché, invalidados al confirmar pagos y ventas
+    iniciar_cache_kpi(app)
     
     # Registrar el blueprint principal
     app.register_blueprint(main)
@@ -315,11 +347,19 @@ def create_app(test_config=None):
         try:
             db.create_all()
             # Verificar la conexión a la base de datos
-            resultado = db.session.execute('SELECT name FROM sqlite_master WHERE type="table";').fetchall()
-            print(f"Tablas en la base de datos: {[r[0] for r in resultado]}")
+            print(f"Tablas en la base de datos: {tablas()}")
         except Exception as e:
             print(f"ERROR al conectar con la base de datos: {str(e)}")
     
+    # Migrar antes de retomar trabajos o reconstruir el resumen: ambos esperan el
+    # esquema actual. Las pruebas aplican las migraciones de forma explícita.
+    if app.config.get('MIGRAR_AL_INICIAR', not app.config.get('TESTING')):
+        actualizar_estructura_db(app)
+    
+    # Hilos para reportes en segundo plano (retoma los trabajos pendientes)
+    if trabajos:
+        _iniciar_trabajos_seguro(app)
+    
     # Inyectar variables de autenticación en todas las plantillas
     @app.context_processor
     def inject_auth_variables():
@@ -364,6 +404,11 @@ def shutdown_app(app):
     """Función para apagar el servidor desde un endpoint"""
     print("Cerrando aplicación por solicitud del usuario...")
     time.sleep(1)  # Esperar para que la respuesta se envíe
+    
+    # Con waitress, cierre ordenado: se terminan las peticiones en curso y app.run() retorna
+    if detener_servidor(app):
+        return
+    
     try:
         # En Windows, usar un método diferente para terminar el proceso
         if platform.system() == 'Windows':
@@ -408,10 +453,10 @@ def verificar_tablas_medidas(app):
     with app.app_context():
         try:
             # Verificar tabla medidas_corporales
-            estructura = db.session.execute('PRAGMA table_info(medidas_corporales);').fetchall()
+            estructura = columnas('medidas_corporales')
             print(f"Estructura de la tabla medidas_corporales:")
             for columna in estructura:
-                print(f"  {columna[1]} ({columna[2]})")
+                print(f"  {columna['nombre']} ({columna['tipo']})")
             
             # Contar registros en la tabla
             count = db.session.execute('SELECT COUNT(*) FROM medidas_corporales;').scalar()
@@ -541,47 +586,13 @@ def verificar_base_datos():
 
 def actualizar_estructura_db(app):
     """
-    Verificar y actualizar la estructura de la base de datos si es necesario
+    Aplicar las migraciones de esquema pendientes (ver services/migraciones.py)
     """
-    print("Verificando estructura de la base de datos...")
     with app.app_context():
         try:
-            # Verificar si la tabla objetivo_personal tiene la columna estado
-            has_estado = False
-            try:
-                # Verificar existencia de la columna estado
-                result = db.session.execute('PRAGMA table_info(objetivo_personal);').fetchall()
-                for column in result:
-                    if column[1] == 'estado':
-                        has_estado = True
-                        break
-                
-                if not has_estado:
-                    print("Añadiendo columna 'estado' a tabla objetivo_personal...")
-                    db.session.execute('ALTER TABLE objetivo_personal ADD COLUMN estado VARCHAR(20) DEFAULT "En progreso";')
-                    db.session.commit()
-                    print("Columna 'estado' añadida correctamente")
-            except Exception as e:
-                print(f"Error al verificar/añadir columna 'estado': {str(e)}")
-                
-            # Verificar si la tabla objetivo_personal tiene la columna fecha_completado
-            has_fecha_completado = False
-            try:
-                # Verificar existencia de la columna fecha_completado
-                result = db.session.execute('PRAGMA table_info(objetivo_personal);').fetchall()
-                for column in result:
-                    if column[1] == 'fecha_completado':
-                        has_fecha_completado = True
-                        break
-                
-                if not has_fecha_completado:
-                    print("Añadiendo columna 'fecha_completado' a tabla objetivo_personal...")
-                    db.session.execute('ALTER TABLE objetivo_personal ADD COLUMN fecha_completado DATE;')
-                    db.session.commit()
-                    print("Columna 'fecha_completado' añadida correctamente")
-            except Exception as e:
-                print(f"Error al verificar/añadir columna 'fecha_completado': {str(e)}")
-                
+            aplicadas = aplicar_migraciones()
+            for version, descripcion in aplicadas:
+                print(f"Migración {version} aplicada: {descripcion}")
         except Exception as e:
             print(f"Error al actualizar estructura de la base de datos: {str(e)}")
 
@@ -605,9 +616,39 @@ if __name__ == '__main__':
                         help='Recrear la base de datos desde cero')
     parser.add_argument('--verify-db', action='store_true',
                         help='Verificar estado de la base de datos')
+    parser.add_argument('--rebuild-resumen', action='store_true',
+                        help='Reconstruir el resumen diario de ingresos y asistencias y salir')
+    parser.add_argument('--server', action='store_true',
+                        help='Servir con waitress (servidor de producción con grupo de hilos)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help=f'Hilos que atienden peticiones con --server (por defecto {config.SERVIDOR_HILOS})')
+    parser.add_argument('--backlog', type=int, default=None,
+                        help=f'Conexiones en espera de ser aceptadas con --server (por defecto {config.SERVIDOR_BACKLOG})')
+    parser.add_argument('--timeout', type=int, default=None,
+                        help=f'Segundos antes de cerrar una conexión inactiva con --server (por defecto {config.SERVIDOR_TIMEOUT_SEGUNDOS})')
+    parser.add_argument('--generar-datos', metavar='ARCHIVO',
+                        help='Crear ARCHIVO (SQLite) con la historia sintética de un gimnasio grande y salir')
+    parser.add_argument('--socios', type=int, default=50000,
+                        help='Socios inscritos con --generar-datos')
+    parser.add_argument('--años', type=float, default=5,
+                        help='Años de historia con --generar-datos')
+    parser.add_argument('--semilla', type=int, default=42,
+                        help='Semilla de --generar-datos (la misma semilla genera los mismos datos)')
     
     args = parser.parse_args()
     
+    # Generar una base de datos sintética para pruebas de rendimiento
+    if args.generar_datos:
+        from services.datos_sinteticos import generar_archivo, ErrorDatosSinteticos
+        try:
+            resultado = generar_archivo(args.generar_datos, socios=args.socios, años=args.años,
+                                        semilla=args.semilla)
+        except ErrorDatosSinteticos as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+        print(f"Datos generados en {resultado.pop('segundos')} s: {resultado}")
+        sys.exit(0)
+    
     # Verificar la base de datos si se solicita
     if args.verify_db:
         verificar_base_datos()
@@ -623,8 +664,12 @@ if __name__ == '__main__':
             sys.stdout = NullIO()
             sys.stderr = NullIO()
     
-    # Crear app
-    app = create_app(args.mode)
+    # Con el recargador, create_app se ejecuta en el proceso vigilante y en el hijo
+    # que atiende las peticiones (WERKZEUG_RUN_MAIN); solo el hijo procesa trabajos
+    usar_recargador = args.debug and args.mode == 'development'
+    
+    # Crear app (los trabajos se inician más abajo, solo si se va a servir)
+    app = create_app(args.mode, trabajos=False)
     
     # Si se solicita, recrear la base de datos
     if args.fresh_db:
@@ -632,29 +677,54 @@ if __name__ == '__main__':
         confirmacion = input("¿Está seguro que desea continuar? (s/n): ")
         if confirmacion.lower() == "s":
             init_database(app, fresh=True)
+            actualizar_estructura_db(app)
             print("Base de datos recreada correctamente.")
         else:
             print("Operación de recreación de base de datos cancelada.")
             args.fresh_db = False
     
-    # Verificar tablas de medidas
-    verificar_tablas_medidas(app)
+    # Reconstruir el resumen diario si se solicita
+    if args.rebuild_resumen:
+        with app.app_context():
+            dias = reconstruir_resumen_diario()
+        print(f"Resumen diario reconstruido: {dias} días")
+        sys.exit(0)
     
-    # Verificar y actualizar estructura de la base de datos
-    actualizar_estructura_db(app)
+    # Verificar tablas de medidas (diagnóstico, solo en desarrollo para no retrasar el arranque)
+    if args.mode == 'development':
+        verificar_tablas_medidas(app)
     
     # Configuración para producción
     if args.mode == 'production' or getattr(sys, 'frozen', False):
         configure_for_production(app)
     
+    # Volcar periódicamente el WAL de SQLite al archivo principal
+    iniciar_checkpoint_periodico(app)
+    
+    # Retomar la cola de trabajos en el proceso que atiende las peticiones
+    if not usar_recargador or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        _iniciar_trabajos_seguro(app)
+    
     # Abrir navegador
     if not args.no_browser:
         threading.Thread(target=lambda: open_browser(quiet=args.mode == 'production')).start()
     
     # Ejecutar aplicación
+    if args.server:
+        try:
+            if args.mode == 'development':
+                print(f"Sirviendo con waitress en http://{args.host}:{args.port}")
+            servir(app, host=args.host, port=args.port,
+                   hilos=args.threads, backlog=args.backlog, timeout=args.timeout)
+            # Cierre ordenado: esperar a que terminen los trabajos en segundo plano
+            detener_trabajos(app, esperar=True)
+            sys.exit(0)
+        except ErrorServidor as e:
+            print(f"{str(e)}. Se usará el servidor de desarrollo.")
+    
     app.run(
         debug=args.debug and args.mode == 'development',
-        use_reloader=args.debug and args.mode == 'development',
+        use_reloader=usar_recargador,
         host=args.host,
         port=args.port
     ) 
\ No newline at end of file
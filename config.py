@@ -39,6 +39,83 @@ else:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'database.db')
     SESSION_COOKIE_SECURE = True
 
+# Perfiles de PRAGMA para SQLite. Se aplican a cada conexión nueva.
+# - rendimiento: WAL permite leer reportes mientras recepción registra asistencias
+# - seguro: igual que rendimiento pero sincronizando en cada commit
+# - compatible: modo clásico para bases de datos en carpetas de red (WAL no funciona ahí)
+SQLITE_PERFILES = {
+    'rendimiento': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,      # Negativo = KiB (32 MB)
+        'mmap_size': 268435456,    # 256 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,      # Milisegundos esperando un bloqueo antes de fallar
+    },
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+    'compatible': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+    },
+}
+SQLITE_PERFIL = os.environ.get('SQLITE_PERFIL', 'rendimiento')
+
+# Conexiones reutilizadas para no perder la caché de páginas entre peticiones
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '5'))
+
+# Cada cuántos segundos se vuelca el WAL a la base de datos (0 para desactivar)
+SQLITE_CHECKPOINT_SEGUNDOS = int(os.environ.get('SQLITE_CHECKPOINT_SEGUNDOS', '300'))
+
+# Hilos que generan reportes en segundo plano (los demás trabajos esperan en cola)
+TRABAJOS_MAX_HILOS = int(os.environ.get('TRABAJOS_MAX_HILOS', '2'))
+
+# Servidor de producción (app_launcher.py --server): hilos que atienden peticiones,
+# conexiones en espera de ser aceptadas, conexiones abiertas a la vez y segundos
+# antes de cerrar una conexión inactiva
+SERVIDOR_HILOS = int(os.environ.get('SERVIDOR_HILOS', '8'))
+SERVIDOR_BACKLOG = int(os.environ.get('SERVIDOR_BACKLOG', '1024'))
+SERVIDOR_MAX_CONEXIONES = int(os.environ.get('SERVIDOR_MAX_CONEXIONES', '100'))
+SERVIDOR_TIMEOUT_SEGUNDOS = int(os.environ.get('SERVIDOR_TIMEOUT_SEGUNDOS', '60'))
+
+# Asistencias enviadas en lote por los kioscos: eventos por envío y antigüedad máxima
+# de un escaneo guardado sin conexión
+ASISTENCIA_LOTE_MAX_EVENTOS = int(os.environ.get('ASISTENCIA_LOTE_MAX_EVENTOS', '1000'))
+ASISTENCIA_LOTE_MAX_DIAS = int(os.environ.get('ASISTENCIA_LOTE_MAX_DIAS', '7'))
+
+# Instrumentación SQL: cabeceras con las consultas de cada petición, barra de depuración
+# y log rotativo de las sentencias que tardan más de SQL_UMBRAL_LENTA_MS milisegundos
+# (SQL_LOG_LENTAS vacío: logs/consultas_lentas.log junto a la base de datos)
+SQL_INSTRUMENTACION = os.environ.get('SQL_INSTRUMENTACION', '1') == '1'
+SQL_UMBRAL_LENTA_MS = float(os.environ.get('SQL_UMBRAL_LENTA_MS', '100'))
+SQL_CONSULTAS_MAS_LENTAS = int(os.environ.get('SQL_CONSULTAS_MAS_LENTAS', '5'))
+SQL_LOG_LENTAS = os.environ.get('SQL_LOG_LENTAS', '')
+SQL_LOG_LENTAS_BYTES = int(os.environ.get('SQL_LOG_LENTAS_BYTES', str(1024 * 1024)))
+SQL_LOG_LENTAS_COPIAS = int(os.environ.get('SQL_LOG_LENTAS_COPIAS', '5'))
+
+# Métricas en /metrics (formato Prometheus). Sin token solo se atienden peticiones
+# del propio equipo; con token se exige la cabecera "Authorization: Bearer <token>"
+METRICAS = os.environ.get('METRICAS', '1') == '1'
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Caché de indicadores de finanzas: los meses cerrados se guardan sin vencimiento y
+# los períodos en curso KPI_CACHE_TTL_SEGUNDOS (se invalidan al registrar pagos o ventas)
+KPI_CACHE = os.environ.get('KPI_CACHE', '1') == '1'
+KPI_CACHE_TTL_SEGUNDOS = float(os.environ.get('KPI_CACHE_TTL_SEGUNDOS', '60'))
+KPI_CACHE_MAX_ENTRADAS = int(os.environ.get('KPI_CACHE_MAX_ENTRADAS', '256'))
+
+# Respaldos en caliente: páginas copiadas por paso y pausa entre pasos para no frenar a recepción
+RESPALDO_PAGINAS_POR_PASO = int(os.environ.get('RESPALDO_PAGINAS_POR_PASO', '256'))
+RESPALDO_PAUSA_SEGUNDOS = float(os.environ.get('RESPALDO_PAUSA_SEGUNDOS', '0.01'))
+# Veces que se tolera que una escritura reinicie la copia antes de copiar en un solo paso
+RESPALDO_MAX_REINICIOS = int(os.environ.get('RESPALDO_MAX_REINICIOS', '3'))
+
 # Silenciar advertencias de incompatibilidad con SQLAlchemy 2.0
 SQLALCHEMY_SILENCE_UBER_WARNING = os.environ.get("SQLALCHEMY_SILENCE_UBER_WARNING", "1") == "1"
 # Si deseamos ver todas las advertencias de deprecación para compatibilidad futura
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 import pytz
 
 db = SQLAlchemy()
@@ -12,6 +13,35 @@ def datetime_colombia():
 def date_colombia():
     return datetime_colombia().date()
 
+CENTAVO = Decimal('0.01')
+
+# Convierte un valor en pesos (int, float, Decimal o texto) a centavos enteros
+def a_centavos(valor):
+    if isinstance(valor, int):
+        return valor * 100
+    # str() evita arrastrar el error binario del float (p. ej. 0.1 -> 0.1000000000000000055)
+    valor = Decimal(str(valor)) if isinstance(valor, float) else Decimal(valor)
+    return int(valor.quantize(CENTAVO, rounding=ROUND_HALF_UP).scaleb(2))
+
+# Convierte centavos enteros a pesos con dos decimales
+def desde_centavos(centavos):
+    return Decimal(int(round(centavos))).scaleb(-2)
+
+class Dinero(db.TypeDecorator):
+    """
+    Valor monetario guardado como número entero de centavos. En Python se
+    asigna en pesos (int, float o Decimal) y se lee como Decimal con dos
+    decimales; ``SUM`` sobre la columna suma enteros en la base de datos.
+    """
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return a_centavos(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return desde_centavos(value) if value is not None else None
+
 # Importar todos los modelos para que estén disponibles cuando se importe el paquete modelos
 from .usuario import Usuario
 from .medidas import MedidasCorporales
@@ -22,4 +52,8 @@ from .clase import Clase
 from .producto import Producto
 from .ventas import VentaProducto
 from .pagos import PagoMensualidad
-from .admin import Admin 
\ No newline at end of file
+from .admin import Admin 
+from .resumen_diario import ResumenDiario, ResumenDiarioMetodo
+from .version_esquema import VersionEsquema
+from .trabajo import Trabajo
+from .evento_kiosco import EventoKiosco
\ No newline at end of file
@@ -1,6 +1,8 @@
 from . import db, datetime_colombia
 
 class Asistencia(db.Model):
+    # El índice compuesto también sirve para filtrar solo por usuario_id
+    __table_args__ = (db.Index('ix_asistencia_usuario_id_fecha', 'usuario_id', 'fecha'),)
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'))
-    fecha = db.Column(db.DateTime, default=datetime_colombia) 
\ No newline at end of file
+    fecha = db.Column(db.DateTime, default=datetime_colombia, index=True) 
\ No newline at end of file
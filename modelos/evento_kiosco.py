@@ -0,0 +1,11 @@
+from . import db, datetime_colombia
+
+class EventoKiosco(db.Model):
+    """Asistencia enviada en lote por un kiosco; la clave hace idempotente el reenvío"""
+    __tablename__ = 'evento_kiosco'
+    clave = db.Column(db.String(64), primary_key=True)  # Clave de idempotencia generada por el kiosco
+    usuario_id = db.Column(db.Integer, nullable=True)
+    fecha = db.Column(db.DateTime, nullable=False)  # Fecha y hora del escaneo según el kiosco
+    resultado = db.Column(db.String(20), nullable=False)  # registrada, duplicada
+    terminal = db.Column(db.String(50), nullable=True)
+    fecha_recepcion = db.Column(db.DateTime, default=datetime_colombia, index=True)
\ No newline at end of file
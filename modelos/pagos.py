@@ -1,10 +1,12 @@
-from . import db, datetime_colombia
+from . import db, datetime_colombia, Dinero
 
 class PagoMensualidad(db.Model):
+    # Historial de pagos de un socio (ficha del socio y vencimiento del plan)
+    __table_args__ = (db.Index('ix_pago_mensualidad_usuario_id_fecha_pago', 'usuario_id', 'fecha_pago'),)
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'))
-    fecha_pago = db.Column(db.DateTime, default=datetime_colombia)
-    monto = db.Column(db.Float, nullable=False)
+    fecha_pago = db.Column(db.DateTime, default=datetime_colombia, index=True)
+    monto = db.Column(Dinero, nullable=False)
     metodo_pago = db.Column(db.String(50))
     plan = db.Column(db.String(50))
     fecha_inicio = db.Column(db.Date, nullable=False)
@@ -1,10 +1,10 @@
-from . import db, datetime_colombia
+from . import db, datetime_colombia, Dinero
 
 class Producto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     descripcion = db.Column(db.Text)
-    precio = db.Column(db.Float, nullable=False)
+    precio = db.Column(Dinero, nullable=False)
     stock = db.Column(db.Integer, default=0)
     categoria = db.Column(db.String(50))
     fecha_creacion = db.Column(db.DateTime, default=datetime_colombia) 
\ No newline at end of file
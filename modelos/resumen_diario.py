@@ -0,0 +1,20 @@
+from . import db, Dinero
+
+class ResumenDiario(db.Model):
+    """Totales precalculados por día; se actualizan al guardar pagos, ventas y asistencias"""
+    __tablename__ = 'resumen_diario'
+    fecha = db.Column(db.Date, primary_key=True)
+    total_membresias = db.Column(Dinero, nullable=False, default=0)
+    total_productos = db.Column(Dinero, nullable=False, default=0)
+    cantidad_pagos = db.Column(db.Integer, nullable=False, default=0)
+    cantidad_ventas = db.Column(db.Integer, nullable=False, default=0)
+    cantidad_asistencias = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenDiarioMetodo(db.Model):
+    """Totales diarios desglosados por método de pago"""
+    __tablename__ = 'resumen_diario_metodo'
+    fecha = db.Column(db.Date, primary_key=True)
+    metodo_pago = db.Column(db.String(50), primary_key=True)
+    total_membresias = db.Column(Dinero, nullable=False, default=0)
+    total_productos = db.Column(Dinero, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,17 @@
+from . import db, datetime_colombia
+
+class Trabajo(db.Model):
+    """Trabajo en segundo plano (reportes y exportaciones pesadas)"""
+    __tablename__ = 'trabajo'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)  # pendiente, en_proceso, completado, error
+    parametros = db.Column(db.Text, nullable=True)  # JSON con los argumentos del trabajo
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # Porcentaje 0-100
+    mensaje = db.Column(db.String(500), nullable=True)
+    archivo = db.Column(db.String(500), nullable=True)  # Ruta del archivo generado
+    nombre_archivo = db.Column(db.String(255), nullable=True)  # Nombre para la descarga
+    admin_id = db.Column(db.Integer, nullable=True)  # Administrador que lo solicitó
+    fecha_creacion = db.Column(db.DateTime, default=datetime_colombia)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
\ No newline at end of file
@@ -1,14 +1,14 @@
-from . import db, date_colombia
+from . import db, date_colombia, Dinero
 
 class Usuario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(100))
+    nombre = db.Column(db.String(100), index=True)
     telefono = db.Column(db.String(20), unique=True)
     plan = db.Column(db.String(50))
     fecha_ingreso = db.Column(db.Date, default=date_colombia)
     metodo_pago = db.Column(db.String(50))
-    fecha_vencimiento_plan = db.Column(db.Date, nullable=True)
-    precio_plan = db.Column(db.Float, nullable=True)
+    fecha_vencimiento_plan = db.Column(db.Date, nullable=True, index=True)
+    precio_plan = db.Column(Dinero, nullable=True)
     
     # Relaciones con cascade delete
     medidas = db.relationship('MedidasCorporales', backref='usuario', cascade='all, delete-orphan')
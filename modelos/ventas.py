@@ -1,13 +1,15 @@
-from . import db, datetime_colombia
+from . import db, datetime_colombia, Dinero
 
 class VentaProducto(db.Model):
+    # Compras de un socio en orden cronológico (ficha del socio)
+    __table_args__ = (db.Index('ix_venta_producto_usuario_id_fecha', 'usuario_id', 'fecha'),)
     id = db.Column(db.Integer, primary_key=True)
-    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'))
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), index=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='SET NULL'), nullable=True)
     cantidad = db.Column(db.Integer, default=1)
-    precio_unitario = db.Column(db.Float, nullable=False)
-    total = db.Column(db.Float, nullable=False)
+    precio_unitario = db.Column(Dinero, nullable=False)
+    total = db.Column(Dinero, nullable=False)
     metodo_pago = db.Column(db.String(50))
-    fecha = db.Column(db.DateTime, default=datetime_colombia)
+    fecha = db.Column(db.DateTime, default=datetime_colombia, index=True)
     
     producto = db.relationship('Producto', backref='ventas') 
\ No newline at end of file
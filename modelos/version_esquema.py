@@ -0,0 +1,8 @@
+from . import db, datetime_colombia
+
+class VersionEsquema(db.Model):
+    """Migraciones de esquema ya aplicadas a esta base de datos"""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.String(200))
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime_colombia)
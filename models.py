@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from werkzeug.security import generate_password_hash, check_password_hash
 import pytz
 
@@ -13,15 +14,44 @@ def datetime_colombia():
 def date_colombia():
     return datetime_colombia().date()
 
+CENTAVO = Decimal('0.01')
+
+# Convierte un valor en pesos (int, float, Decimal o texto) a centavos enteros
+def a_centavos(valor):
+    if isinstance(valor, int):
+        return valor * 100
+    # str() evita arrastrar el error binario del float (p. ej. 0.1 -> 0.1000000000000000055)
+    valor = Decimal(str(valor)) if isinstance(valor, float) else Decimal(valor)
+    return int(valor.quantize(CENTAVO, rounding=ROUND_HALF_UP).scaleb(2))
+
+# Convierte centavos enteros a pesos con dos decimales
+def desde_centavos(centavos):
+    return Decimal(int(round(centavos))).scaleb(-2)
+
+class Dinero(db.TypeDecorator):
+    """
+    Valor monetario guardado como número entero de centavos. En Python se
+    asigna en pesos (int, float o Decimal) y se lee como Decimal con dos
+    decimales; ``SUM`` sobre la columna suma enteros en la base de datos.
+    """
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return a_centavos(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return desde_centavos(value) if value is not None else None
+
 class Usuario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(100))
+    nombre = db.Column(db.String(100), index=True)
     telefono = db.Column(db.String(20), unique=True)
     plan = db.Column(db.String(50))
     fecha_ingreso = db.Column(db.Date, default=date_colombia)
     metodo_pago = db.Column(db.String(50))
-    fecha_vencimiento_plan = db.Column(db.Date, nullable=True)
-    precio_plan = db.Column(db.Float, nullable=True)
+    fecha_vencimiento_plan = db.Column(db.Date, nullable=True, index=True)
+    precio_plan = db.Column(Dinero, nullable=True)
     
     # Relaciones con cascade delete
     medidas = db.relationship('MedidasCorporales', backref='usuario', cascade='all, delete-orphan')
@@ -66,9 +96,11 @@ class ObjetivoPersonal(db.Model):
     estado = db.Column(db.String(20), default='En progreso')  # Nueva columna: En progreso, Completado, Cancelado
 
 class Asistencia(db.Model):
+    # El índice compuesto también sirve para filtrar solo por usuario_id
+    __table_args__ = (db.Index('ix_asistencia_usuario_id_fecha', 'usuario_id', 'fecha'),)
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'))
-    fecha = db.Column(db.DateTime, default=datetime_colombia)
+    fecha = db.Column(db.DateTime, default=datetime_colombia, index=True)
 
 class Instructor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -92,33 +124,89 @@ class Producto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     descripcion = db.Column(db.Text)
-    precio = db.Column(db.Float, nullable=False)
+    precio = db.Column(Dinero, nullable=False)
     stock = db.Column(db.Integer, default=0)
     categoria = db.Column(db.String(50))
     fecha_creacion = db.Column(db.DateTime, default=datetime_colombia)
 
 class VentaProducto(db.Model):
+    # Compras de un socio en orden cronológico (ficha del socio)
+    __table_args__ = (db.Index('ix_venta_producto_usuario_id_fecha', 'usuario_id', 'fecha'),)
     id = db.Column(db.Integer, primary_key=True)
-    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'))
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), index=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='SET NULL'), nullable=True)
     cantidad = db.Column(db.Integer, default=1)
-    precio_unitario = db.Column(db.Float, nullable=False)
-    total = db.Column(db.Float, nullable=False)
+    precio_unitario = db.Column(Dinero, nullable=False)
+    total = db.Column(Dinero, nullable=False)
     metodo_pago = db.Column(db.String(50))
-    fecha = db.Column(db.DateTime, default=datetime_colombia)
+    fecha = db.Column(db.DateTime, default=datetime_colombia, index=True)
     
     producto = db.relationship('Producto', backref='ventas')
 
 class PagoMensualidad(db.Model):
+    # Historial de pagos de un socio (ficha del socio y vencimiento del plan)
+    __table_args__ = (db.Index('ix_pago_mensualidad_usuario_id_fecha_pago', 'usuario_id', 'fecha_pago'),)
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'))
-    fecha_pago = db.Column(db.DateTime, default=datetime_colombia)
-    monto = db.Column(db.Float, nullable=False)
+    fecha_pago = db.Column(db.DateTime, default=datetime_colombia, index=True)
+    monto = db.Column(Dinero, nullable=False)
     metodo_pago = db.Column(db.String(50))
     plan = db.Column(db.String(50))
     fecha_inicio = db.Column(db.Date, nullable=False)
     fecha_fin = db.Column(db.Date, nullable=False)
 
+class ResumenDiario(db.Model):
+    """Totales precalculados por día; se actualizan al guardar pagos, ventas y asistencias"""
+    __tablename__ = 'resumen_diario'
+    fecha = db.Column(db.Date, primary_key=True)
+    total_membresias = db.Column(Dinero, nullable=False, default=0)
+    total_productos = db.Column(Dinero, nullable=False, default=0)
+    cantidad_pagos = db.Column(db.Integer, nullable=False, default=0)
+    cantidad_ventas = db.Column(db.Integer, nullable=False, default=0)
+    cantidad_asistencias = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenDiarioMetodo(db.Model):
+    """Totales diarios desglosados por método de pago"""
+    __tablename__ = 'resumen_diario_metodo'
+    fecha = db.Column(db.Date, primary_key=True)
+    metodo_pago = db.Column(db.String(50), primary_key=True)
+    total_membresias = db.Column(Dinero, nullable=False, default=0)
+    total_productos = db.Column(Dinero, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+class VersionEsquema(db.Model):
+    """Migraciones de esquema ya aplicadas a esta base de datos"""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.String(200))
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime_colombia)
+
+class Trabajo(db.Model):
+    """Trabajo en segundo plano (reportes y exportaciones pesadas)"""
+    __tablename__ = 'trabajo'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)  # pendiente, en_proceso, completado, error
+    parametros = db.Column(db.Text, nullable=True)  # JSON con los argumentos del trabajo
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # Porcentaje 0-100
+    mensaje = db.Column(db.String(500), nullable=True)
+    archivo = db.Column(db.String(500), nullable=True)  # Ruta del archivo generado
+    nombre_archivo = db.Column(db.String(255), nullable=True)  # Nombre para la descarga
+    admin_id = db.Column(db.Integer, nullable=True)  # Administrador que lo solicitó
+    fecha_creacion = db.Column(db.DateTime, default=datetime_colombia)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+
+class EventoKiosco(db.Model):
+    """Asistencia enviada en lote por un kiosco; la clave hace idempotente el reenvío"""
+    __tablename__ = 'evento_kiosco'
+    clave = db.Column(db.String(64), primary_key=True)  # Clave de idempotencia generada por el kiosco
+    usuario_id = db.Column(db.Integer, nullable=True)
+    fecha = db.Column(db.DateTime, nullable=False)  # Fecha y hora del escaneo según el kiosco
+    resultado = db.Column(db.String(20), nullable=False)  # registrada, duplicada
+    terminal = db.Column(db.String(50), nullable=True)
+    fecha_recepcion = db.Column(db.DateTime, default=datetime_colombia, index=True)
+
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
@@ -11,6 +11,7 @@ from routes.productos.routes import bp as productos_bp
 from routes.ventas.routes import bp as ventas_bp
 from routes.admin.routes import bp as admin_bp
 from routes.auth.routes import bp as auth_bp
+from routes.trabajos.routes import bp as trabajos_bp
 
 # Asegurar que los controladores se importan después de registrar blueprints
 import routes.usuarios
@@ -23,6 +24,7 @@ main.register_blueprint(productos_bp)
 main.register_blueprint(ventas_bp)
 main.register_blueprint(admin_bp)
 main.register_blueprint(auth_bp)
+main.register_blueprint(trabajos_bp)
 
 # Crear rutas con nombres específicos para solucionar problemas de navegación
 @main.route('/usuarios/ver_usuario/<int:usuario_id>')
@@ -52,21 +54,17 @@ def index():
 def actualizar_bd():
     print("Actualizando estructura de la base de datos...")
     try:
-        # Añadir la columna fecha_completado si no existe
-        db.engine.execute('ALTER TABLE objetivo_personal ADD COLUMN fecha_completado DATE;')
-        print("Columna fecha_completado añadida correctamente")
+        from services.migraciones import aplicar_migraciones, VERSION_ACTUAL
         
-        # Añadir la columna estado si no existe
-        try:
-            db.engine.execute('ALTER TABLE objetivo_personal ADD COLUMN estado VARCHAR(20) DEFAULT "En progreso";')
-            print("Columna estado añadida correctamente")
-        except Exception as e:
-            if 'duplicate column name' in str(e).lower():
-                print("La columna estado ya existe")
-            else:
-                raise e
-                
-        return "Base de datos actualizada correctamente. <a href='/'>Volver al inicio</a>"
+        aplicadas = aplicar_migraciones()
+        for version, descripcion in aplicadas:
+            print(f"Migración {version} aplicada: {descripcion}")
+        
+        if aplicadas:
+            mensaje = f"Base de datos actualizada correctamente a la versión {VERSION_ACTUAL}."
+        else:
+            mensaje = f"La base de datos ya está actualizada (versión {VERSION_ACTUAL})."
+        return f"{mensaje} <a href='/'>Volver al inicio</a>"
     except Exception as e:
         print(f"Error al actualizar la base de datos: {str(e)}")
         return f"Error al actualizar la base de datos: {str(e)}. <a href='/'>Volver al inicio</a>"
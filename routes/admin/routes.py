@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, jsonify
-from flask import current_app
+from flask import current_app, Response, stream_with_context
 from models import db, Admin, Usuario, Asistencia, Producto, VentaProducto, PagoMensualidad, MedidasCorporales, ObjetivoPersonal
 from models import datetime_colombia, date_colombia  # Importar las funciones de zona horaria
 from datetime import datetime, timedelta
@@ -10,6 +10,17 @@ import glob
 import json
 import requests
 from sqlalchemy import func
+from services.resumen_diario import reconstruir_resumen_diario, sql_afecta_resumen
+from services.migraciones import aplicar_migraciones
+from services.cache_kpi import invalidar_cache_kpi
+from services.sqlite_rendimiento import volcar_wal
+from services.exportacion import TABLAS_EXPORTACION, filas_exportacion, generar_csv, escribir_excel
+from services.trabajos import tarea, encolar, ErrorTrabajo
+from services.registro_asistencia import reiniciar_registro_del_dia
+from services.consultas import rango_dia, tablas as tablas_existentes, citar, reiniciar_secuencias, claves_foraneas_desactivadas
+from services.respaldos import ErrorRespaldo
+from services.almacen_respaldos import almacen_de, carpeta_respaldos, importar_copias_completas
+from routes.trabajos.routes import responder_trabajo
 
 # Crear blueprint
 bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -117,29 +128,36 @@ def configuracion():
             if accion == 'backup_db':
                 try:
                     import os
-                    import shutil
-                    
-                    # Crear copia de seguridad de la base de datos
-                    fecha_actual = datetime_colombia().strftime('%Y%m%d_%H%M%S')
-                    
-                    # Crear carpeta de backups si no existe
-                    backup_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
-                    os.makedirs(backup_folder, exist_ok=True)
-                    
-                    # Nombre del archivo de backup con fecha y hora
-                    backup_filename = f'backup_db_{fecha_actual}.db'
-                    backup_path = os.path.join(backup_folder, backup_filename)
                     
                     # Verificar si existe el archivo de base de datos
-                    if os.path.exists('database.db'):
-                        # Copiar el archivo de base de datos
-                        shutil.copy2('database.db', backup_path)
-                        flash(f'Copia de seguridad creada exitosamente: {backup_filename}', 'success')
+                    db_path = db.engine.url.database
+                    if db_path and os.path.exists(db_path):
+                        # Instantánea en segundo plano: solo se guardan los trozos que cambiaron
+                        trabajo = encolar('instantanea_db', admin_id=session.get('admin_id'),
+                                          origen=os.path.abspath(db_path))
+                        return responder_trabajo(trabajo)
                     else:
                         flash('No se encontró el archivo database.db para crear copia de seguridad', 'warning')
                 except Exception as e:
                     flash(f'Error al crear copia de seguridad: {str(e)}', 'danger')
             
+            elif accion == 'importar_respaldos':
+                try:
+                    import os
+                    
+                    db_path = db.engine.url.database
+                    if db_path and os.path.exists(db_path):
+                        # Las copias completas antiguas pasan al almacén y se eliminan
+                        trabajo = encolar('importar_respaldos', admin_id=session.get('admin_id'),
+                                          origen=os.path.abspath(db_path),
+                                          carpetas=[_carpeta_backups_antiguos(),
+                                                    carpeta_respaldos(db_path)])
+                        return responder_trabajo(trabajo)
+                    else:
+                        flash('No se encontró el archivo database.db', 'warning')
+                except Exception as e:
+                    flash(f'Error al importar copias de seguridad: {str(e)}', 'danger')
+            
             elif accion == 'restore_db':
                 backup_file = request.files.get('backup_file')
                 if backup_file:
@@ -173,9 +191,13 @@ def configuracion():
                             flash('El archivo subido no es una base de datos SQLite válida', 'danger')
                             return redirect(url_for('main.admin.configuracion'))
                         
+                        # Cerrar las conexiones abiertas y vaciar el WAL antes de reemplazar el archivo
+                        _cerrar_conexiones(db_path)
+                        
                         # Restaurar el archivo
                         shutil.copy2(temp_backup_path, db_path)
                         os.remove(temp_backup_path)
+                        _migrar_base_restaurada()
                         
                         flash('Base de datos restaurada exitosamente', 'success')
                     except Exception as e:
@@ -262,6 +284,10 @@ def configuracion():
                     
                     db.session.commit()
                     
+                    # Los borrados directos no pasan por el ORM: recalcular el resumen diario
+                    if registros_eliminados:
+                        reconstruir_resumen_diario()
+                    
                     # Optimizar la base de datos después de la limpieza
                     db.session.execute(text('VACUUM;'))
                     db.session.commit()
@@ -272,60 +298,19 @@ def configuracion():
                     flash(f'Error al limpiar datos: {str(e)}', 'danger')
             
             elif accion == 'export_csv':
-                try:
-                    import csv
-                    import os
-                    
-                    tabla = request.form.get('tabla_exportar')
-                    export_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports')
-                    os.makedirs(export_folder, exist_ok=True)
-                    
+                tabla = request.form.get('tabla_exportar')
+                if tabla not in TABLAS_EXPORTACION:
+                    flash('Tabla no válida para exportación', 'danger')
+                else:
                     fecha_actual = datetime_colombia().strftime('%Y%m%d_%H%M%S')
                     filename = f'export_{tabla}_{fecha_actual}.csv'
-                    filepath = os.path.join(export_folder, filename)
-                    
-                    # Seleccionar los datos apropiados según la tabla elegida
-                    if tabla == 'usuarios':
-                        data = Usuario.query.all()
-                        headers = ['ID', 'Nombre', 'Teléfono', 'Plan', 'Fecha Ingreso', 'Método Pago', 'Fecha Vencimiento']
-                        rows = [[u.id, u.nombre, u.telefono, u.plan, u.fecha_ingreso, u.metodo_pago, u.fecha_vencimiento_plan] for u in data]
-                    
-                    elif tabla == 'asistencias':
-                        # Consulta con JOIN para incluir nombre de usuario
-                        data = db.session.query(Asistencia, Usuario).join(Usuario).all()
-                        headers = ['ID', 'Usuario ID', 'Nombre Usuario', 'Fecha']
-                        rows = [[a.id, a.usuario_id, u.nombre, a.fecha] for a, u in data]
-                    
-                    elif tabla == 'pagos':
-                        # Consulta con JOIN para incluir nombre de usuario
-                        data = db.session.query(PagoMensualidad, Usuario).join(Usuario).all()
-                        headers = ['ID', 'Usuario', 'Fecha Pago', 'Monto', 'Método Pago', 'Plan', 'Fecha Inicio', 'Fecha Fin']
-                        rows = [[p.id, u.nombre, p.fecha_pago, p.monto, p.metodo_pago, p.plan, p.fecha_inicio, p.fecha_fin] for p, u in data]
-                    
-                    elif tabla == 'productos':
-                        data = Producto.query.all()
-                        headers = ['ID', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Fecha Creación']
-                        rows = [[p.id, p.nombre, p.descripcion, p.precio, p.stock, p.categoria, p.fecha_creacion] for p in data]
                     
-                    elif tabla == 'ventas':
-                        # Consulta con JOIN para incluir información de producto y usuario
-                        data = db.session.query(VentaProducto, Producto, Usuario).\
-                            join(Producto).\
-                            outerjoin(Usuario).all()
-                        headers = ['ID', 'Producto', 'Usuario', 'Cantidad', 'Precio Unitario', 'Total', 'Método Pago', 'Fecha']
-                        rows = [[v.id, p.nombre, u.nombre if u else 'Sin usuario', v.cantidad, v.precio_unitario, v.total, v.metodo_pago, v.fecha] for v, p, u in data]
-                    
-                    # Escribir al archivo CSV
-                    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow(headers)
-                        writer.writerows(rows)
-                    
-                    # Preparar para descarga
-                    return send_file(filepath, as_attachment=True, download_name=filename)
-                
-                except Exception as e:
-                    flash(f'Error al exportar datos: {str(e)}', 'danger')
+                    # Enviar el CSV por trozos a medida que se leen las filas
+                    return Response(
+                        stream_with_context(generar_csv(tabla)),
+                        mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'}
+                    )
             
             elif accion == 'run_sql':
                 try:
@@ -347,6 +332,11 @@ def configuracion():
                     # Si es una operación de escritura, hacer commit
                     if is_write_operation:
                         db.session.commit()
+                        reiniciar_registro_del_dia()
+                        invalidar_cache_kpi()
+                        # La escritura no pasó por el ORM: recalcular el resumen diario
+                        if sql_afecta_resumen(sql_query):
+                            reconstruir_resumen_diario()
                         flash(f'Consulta ejecutada correctamente. Filas afectadas: {result.rowcount}', 'success')
                     else:
                         # Si es SELECT, mostrar resultados
@@ -371,22 +361,13 @@ def configuracion():
                     # Crear backup si se solicitó
                     if request.form.get('create_backup') == 'on':
                         import os
-                        import shutil
-                        
-                        # Crear carpeta de backups si no existe
-                        backup_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
-                        os.makedirs(backup_folder, exist_ok=True)
-                        
-                        # Nombre del archivo de backup con fecha y hora
-                        fecha_actual = datetime_colombia().strftime('%Y%m%d_%H%M%S')
-                        backup_filename = f'backup_db_before_reset_{fecha_actual}.db'
-                        backup_path = os.path.join(backup_folder, backup_filename)
                         
                         # Verificar si existe el archivo de base de datos
-                        if os.path.exists('database.db'):
-                            # Copiar el archivo de base de datos
-                            shutil.copy2('database.db', backup_path)
-                            flash(f'Copia de seguridad creada antes del borrado: {backup_filename}', 'info')
+                        db_path = db.engine.url.database
+                        if db_path and os.path.exists(db_path):
+                            # El borrado espera a que la instantánea esté completa y verificada
+                            manifiesto = almacen_de(db_path).crear_instantanea(db_path, origen='antes_de_borrar')
+                            flash(f"Copia de seguridad creada antes del borrado: {manifiesto['nombre']}", 'info')
                         else:
                             flash('No se encontró el archivo database.db para crear copia de seguridad', 'warning')
                     
@@ -409,6 +390,8 @@ def configuracion():
                     
                     # Lista de todas las tablas en orden para evitar problemas de restricciones de clave foránea
                     tablas = [
+                        'resumen_diario_metodo',
+                        'resumen_diario',
                         'asistencia', 
                         'venta_producto', 
                         'pago_mensualidad', 
@@ -419,51 +402,39 @@ def configuracion():
                         'admin'
                     ]
                     
-                    # Desactivar restricciones de clave foránea temporalmente
-                    db.session.execute(text('PRAGMA foreign_keys = OFF;'))
-                    
-                    # Borrar datos de cada tabla
+                    # Borrar datos de cada tabla (con las claves foráneas desactivadas en SQLite)
                     registros_eliminados = 0
                     errores = []
-                    for tabla in tablas:
-                        try:
-                            # Verificar primero si la tabla existe
-                            result = db.session.execute(text(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{tabla}';"))
-                            if result.scalar():
-                                result = db.session.execute(text(f"DELETE FROM {tabla};"))
-                                registros_eliminados += result.rowcount
-                            else:
-                                errores.append(f"La tabla '{tabla}' no existe en la base de datos")
-                        except Exception as e:
-                            errores.append(f"Error al limpiar tabla '{tabla}': {str(e)}")
-                            continue
-                    
-                    # Reactivar restricciones de clave foránea
-                    db.session.execute(text('PRAGMA foreign_keys = ON;'))
+                    existentes = set(tablas_existentes())
+                    with claves_foraneas_desactivadas():
+                        for tabla in tablas:
+                            try:
+                                # Verificar primero si la tabla existe
+                                if tabla in existentes:
+                                    result = db.session.execute(text(f"DELETE FROM {citar(tabla)};"))
+                                    registros_eliminados += result.rowcount
+                                else:
+                                    errores.append(f"La tabla '{tabla}' no existe en la base de datos")
+                            except Exception as e:
+                                errores.append(f"Error al limpiar tabla '{tabla}': {str(e)}")
+                                continue
                     
                     # Mostrar errores si hubo alguno
                     if errores:
                         for error in errores:
                             flash(f'Advertencia: {error}', 'warning')
                     
-                    # Resetear secuencias de autoincremento
+                    # Resetear secuencias de autoincremento (sqlite_sequence o las secuencias de PostgreSQL)
                     try:
-                        # Primero verificar si la tabla sqlite_sequence existe
-                        result = db.session.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='sqlite_sequence';"))
-                        if result.scalar():
-                            # La tabla existe, resetear cada secuencia
-                            for tabla in tablas:
-                                try:
-                                    db.session.execute(text(f"DELETE FROM sqlite_sequence WHERE name='{tabla}';"))
-                                except Exception as e:
-                                    # Ignorar errores individuales al resetear secuencias
-                                    flash(f'Advertencia: No se pudo resetear la secuencia para {tabla}: {str(e)}', 'warning')
+                        reiniciar_secuencias([tabla for tabla in tablas if tabla in existentes])
                     except Exception as e:
-                        # Si hay algún error al verificar o manipular sqlite_sequence, solo lo registramos y continuamos
+                        # Si hay algún error al manipular las secuencias, solo lo registramos y continuamos
                         flash(f'Advertencia: Error al manipular secuencias de autoincremento: {str(e)}', 'warning')
                     
                     try:
                         db.session.commit()
+                        reiniciar_registro_del_dia()
+                        invalidar_cache_kpi()
                     except Exception as e:
                         db.session.rollback()
                         flash(f'Error al confirmar los cambios: {str(e)}. Se realizó un rollback.', 'danger')
@@ -522,12 +493,21 @@ def configuracion():
         flash(f'Error en la configuración: {str(e)}', 'danger')
         return redirect(url_for('main.index'))
     
-    # Obtener lista de archivos de backup
+    # Obtener lista de archivos de backup (copias completas anteriores al almacén)
     import os
-    backup_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
+    backup_folder = _carpeta_backups_antiguos()
     backups = []
     if os.path.exists(backup_folder):
-        backups = sorted([f for f in os.listdir(backup_folder) if f.startswith('backup_db_')], reverse=True)
+        backups = sorted([f for f in os.listdir(backup_folder)
+                          if f.startswith('backup_db_') and f.endswith('.db')], reverse=True)
+    
+    # Instantáneas del almacén de respaldos
+    instantaneas, uso_respaldos = [], None
+    db_path = db.engine.url.database
+    if db_path and os.path.exists(db_path):
+        almacen = almacen_de(db_path)
+        instantaneas = almacen.listar()
+        uso_respaldos = almacen.uso()
     
     # Obtener resultados de SQL si existen
     sql_results = session.pop('sql_results', None)
@@ -542,7 +522,58 @@ def configuracion():
         except Exception:
             daily_report_config = None
     
-    return render_template('admin/configuracion.html', backups=backups, sql_results=sql_results, daily_report_config=daily_report_config)
+    return render_template('admin/configuracion.html', backups=backups, sql_results=sql_results, daily_report_config=daily_report_config,
+                           instantaneas=instantaneas, uso_respaldos=uso_respaldos)
+
+def _carpeta_backups_antiguos():
+    """Carpeta donde la configuración guardaba las copias completas (backup_db_*.db)"""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
+
+def _cerrar_conexiones(db_path):
+    """Cierra las conexiones abiertas y vacía el WAL antes de reemplazar el archivo de la base de datos"""
+    db.session.remove()
+    db.engine.dispose()
+    volcar_wal(db_path)
+    # Las asistencias de hoy y los indicadores en caché corresponden a la base anterior
+    reiniciar_registro_del_dia()
+    invalidar_cache_kpi()
+
+def _migrar_base_restaurada():
+    """
+    Lleva la base de datos recién restaurada al esquema actual: una copia
+    antigua puede no tener las tablas nuevas ni los montos en centavos.
+    """
+    db.engine.dispose()
+    db.create_all()
+    aplicadas = aplicar_migraciones(db.engine)
+    # Una petición entre el cierre y el reemplazo pudo volver a llenar la caché
+    invalidar_cache_kpi()
+    return aplicadas
+
+@tarea('instantanea_db')
+def crear_instantanea_db(progreso, origen):
+    """Instantánea deduplicada de la base de datos (se ejecuta en un hilo de trabajos)"""
+    # Sin avances intermedios: escribir el progreso en la base de datos reiniciaría la copia
+    progreso(5, 'Copiando la base de datos')
+    manifiesto = almacen_de(origen).crear_instantanea(origen, origen='manual')
+    return {
+        'mensaje': (f"Copia de seguridad creada exitosamente: {manifiesto['nombre']} "
+                    f"({manifiesto['tamaño'] / 1024:.0f} KB, {manifiesto['bytes_nuevos'] / 1024:.0f} KB nuevos "
+                    f"en disco, integridad verificada)")
+    }
+
+@tarea('importar_respaldos')
+def importar_respaldos(progreso, origen, carpetas):
+    """Pasa las copias completas antiguas al almacén de instantáneas"""
+    almacen = almacen_de(origen)
+    progreso(10, 'Importando copias completas')
+    resultados = importar_copias_completas(almacen, carpetas)
+    importadas = [nombre for nombre, resultado in resultados if isinstance(resultado, dict)]
+    errores = [f'{nombre}: {resultado}' for nombre, resultado in resultados if not isinstance(resultado, dict)]
+    mensaje = f'{len(importadas)} copias importadas al almacén de respaldos'
+    if errores:
+        mensaje += '. ' + '; '.join(errores)
+    return {'mensaje': mensaje}
 
 @bp.route('/download_backup/<filename>')
 @admin_required
@@ -553,6 +584,68 @@ def download_backup(filename):
     backup_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
     return send_from_directory(directory=backup_folder, path=filename, as_attachment=True)
 
+@bp.route('/descargar_instantanea/<nombre>')
+@admin_required
+def descargar_instantanea(nombre):
+    db_path = db.engine.url.database
+    almacen = almacen_de(db_path)
+    destino = almacen.archivo_temporal()
+    try:
+        almacen.restaurar(nombre, destino)
+    except ErrorRespaldo as e:
+        os.remove(destino)
+        flash(str(e), 'danger')
+        return redirect(url_for('main.admin.configuracion'))
+    except BaseException:
+        # Cualquier otro fallo (disco, descompresión) tampoco deja la copia en la carpeta
+        os.remove(destino)
+        raise
+    return Response(_leer_y_borrar(destino),
+                    mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename=backup_db_{nombre}.db',
+                             'Content-Length': str(os.path.getsize(destino))})
+
+def _leer_y_borrar(ruta, tamaño_bloque=1024 * 1024):
+    """Envía un archivo temporal por bloques y lo borra al terminar (o si se corta la descarga)"""
+    try:
+        with open(ruta, 'rb') as archivo:
+            while True:
+                bloque = archivo.read(tamaño_bloque)
+                if not bloque:
+                    break
+                yield bloque
+    finally:
+        os.remove(ruta)
+
+@bp.route('/restaurar_instantanea/<nombre>', methods=['POST'])
+@admin_required
+def restaurar_instantanea(nombre):
+    db_path = db.engine.url.database
+    almacen = almacen_de(db_path)
+    try:
+        almacen.obtener(nombre)
+        # Instantánea del estado actual por si hay que deshacer la restauración
+        actual = almacen.crear_instantanea(db_path, origen='antes_de_restaurar')
+        _cerrar_conexiones(db_path)
+        almacen.restaurar(nombre, db_path)
+        _migrar_base_restaurada()
+        flash(f"Base de datos restaurada a la copia {nombre}. El estado anterior quedó guardado como {actual['nombre']}", 'success')
+    except Exception as e:
+        flash(f'Error al restaurar base de datos: {str(e)}', 'danger')
+    return redirect(url_for('main.admin.configuracion'))
+
+@bp.route('/eliminar_instantanea/<nombre>')
+@admin_required
+def eliminar_instantanea(nombre):
+    try:
+        almacen = almacen_de(db.engine.url.database)
+        almacen.obtener(nombre)
+        liberados = almacen.eliminar(nombre)
+        flash(f'Copia {nombre} eliminada ({liberados / 1024:.0f} KB liberados)', 'success')
+    except Exception as e:
+        flash(f'Error al eliminar backup: {str(e)}', 'danger')
+    return redirect(url_for('main.admin.configuracion'))
+
 @bp.route('/delete_backup/<filename>')
 @admin_required
 def delete_backup(filename):
@@ -624,41 +717,10 @@ def export_data(format, table):
         # Fecha para el nombre del archivo
         fecha_actual = datetime_colombia().strftime('%Y%m%d_%H%M%S')
         
-        # Obtener datos según la tabla seleccionada
-        if table == 'usuarios':
-            data = Usuario.query.all()
-            headers = ['ID', 'Nombre', 'Teléfono', 'Plan', 'Fecha Ingreso', 'Método Pago', 'Fecha Vencimiento']
-            rows = [[u.id, u.nombre, u.telefono, u.plan, u.fecha_ingreso, u.metodo_pago, u.fecha_vencimiento_plan] for u in data]
-            title = "Usuarios Registrados"
-        
-        elif table == 'asistencias':
-            data = db.session.query(Asistencia, Usuario).join(Usuario).all()
-            headers = ['ID', 'Usuario ID', 'Nombre Usuario', 'Fecha']
-            rows = [[a.id, a.usuario_id, u.nombre, a.fecha] for a, u in data]
-            title = "Registro de Asistencias"
-        
-        elif table == 'pagos':
-            data = db.session.query(PagoMensualidad, Usuario).join(Usuario).all()
-            headers = ['ID', 'Usuario', 'Fecha Pago', 'Monto', 'Método Pago', 'Plan', 'Fecha Inicio', 'Fecha Fin']
-            rows = [[p.id, u.nombre, p.fecha_pago, p.monto, p.metodo_pago, p.plan, p.fecha_inicio, p.fecha_fin] for p, u in data]
-            title = "Registro de Pagos"
-        
-        elif table == 'productos':
-            data = Producto.query.all()
-            headers = ['ID', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Fecha Creación']
-            rows = [[p.id, p.nombre, p.descripcion, p.precio, p.stock, p.categoria, p.fecha_creacion] for p in data]
-            title = "Inventario de Productos"
-        
-        elif table == 'ventas':
-            data = db.session.query(VentaProducto, Producto, Usuario).\
-                join(Producto).\
-                outerjoin(Usuario).all()
-            headers = ['ID', 'Producto', 'Usuario', 'Cantidad', 'Precio Unitario', 'Total', 'Método Pago', 'Fecha']
-            rows = [[v.id, p.nombre, u.nombre if u else 'Sin usuario', v.cantidad, v.precio_unitario, v.total, v.metodo_pago, v.fecha] for v, p, u in data]
-            title = "Registro de Ventas"
-        else:
+        if table not in TABLAS_EXPORTACION:
             flash('Tabla no válida para exportación', 'danger')
             return redirect(url_for('main.admin.configuracion'))
+        title, headers, _ = TABLAS_EXPORTACION[table]
         
         # Exportar según el formato
         if format == 'pdf':
@@ -692,7 +754,7 @@ def export_data(format, table):
             elements.append(Spacer(1, 20))
             
             # Preparar datos para la tabla (incluyendo encabezados)
-            data_with_headers = [headers] + rows
+            data_with_headers = [headers] + list(filas_exportacion(table))
             
             # Crear tabla
             table = Table(data_with_headers)
@@ -720,52 +782,19 @@ def export_data(format, table):
             return send_file(filepath, as_attachment=True, download_name=filename)
             
         elif format == 'excel':
-            # Verificar si pandas y openpyxl están instalados
+            # Verificar si XlsxWriter está instalado
             try:
-                import pandas as pd
                 import xlsxwriter
             except ImportError:
-                flash('Para exportar a Excel se requiere instalar las bibliotecas pandas, openpyxl y xlsxwriter. Por favor, ejecute: pip install pandas openpyxl xlsxwriter', 'warning')
+                flash('Para exportar a Excel se requiere instalar la biblioteca xlsxwriter. Por favor, ejecute: pip install xlsxwriter', 'warning')
                 return redirect(url_for('main.admin.configuracion'))
             
             # Nombre del archivo
             filename = f'export_{table}_{fecha_actual}.xlsx'
             filepath = os.path.join(export_folder, filename)
             
-            # Crear DataFrame y exportar a Excel
-            df = pd.DataFrame(rows, columns=headers)
-            
-            # Crear Excel writer con XlsxWriter como motor
-            writer = pd.ExcelWriter(filepath, engine='xlsxwriter')
-            df.to_excel(writer, sheet_name=title, index=False)
-            
-            # Obtener objeto workbook y worksheet
-            workbook = writer.book
-            worksheet = writer.sheets[title]
-            
-            # Añadir formato a los encabezados
-            header_format = workbook.add_format({
-                'bold': True,
-                'text_wrap': True,
-                'valign': 'top',
-                'fg_color': '#D7E4BC',
-                'border': 1
-            })
-            
-            # Formato para las celdas
-            cell_format = workbook.add_format({'border': 1})
-            
-            # Aplicar formato a los encabezados
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-            
-            # Ajustar ancho de columnas
-            for i, col in enumerate(df.columns):
-                column_width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                worksheet.set_column(i, i, column_width)
-            
-            # Guardar el archivo
-            writer.close()
+            # Escribir fila a fila con memoria constante
+            escribir_excel(table, filepath)
             
             return send_file(filepath, as_attachment=True, download_name=filename)
             
@@ -936,7 +965,7 @@ def process_daily_report_config(form_data):
 @bp.route('/send_daily_report', methods=['POST'])
 @admin_required
 def send_daily_report():
-    """Envía el reporte diario al servidor configurado"""
+    """Envía el reporte diario al servidor configurado (en segundo plano)"""
     try:
         # Cargar configuración
         config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'daily_report.json')
@@ -947,130 +976,139 @@ def send_daily_report():
             
         with open(config_path, 'r') as f:
             config = json.load(f)
-            
-        url = config.get('url')
-        apikey = config.get('apikey')
         
-        if not url:
+        if not config.get('url'):
             flash("URL del servicio no configurada", "warning")
             return redirect(url_for('main.admin.configuracion'))
-            
-        # Fecha actual para filtrar registros
-        from datetime import datetime, timedelta
-        today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
-        
-        # Preparar datos del reporte
-        report_data = {
-            'timestamp': datetime.now().isoformat(),
-            'date': today.isoformat(),
-            'source': 'Reto Fit - Carlenis Ortiz',
-            'apikey': apikey,
-            'data': {}
-        }
-        
-        # Recopilar datos según la configuración
-        if config.get('include_users'):
-            # Nuevos usuarios registrados hoy
-            nuevos_usuarios = Usuario.query.filter(
-                func.date(Usuario.fecha_ingreso) == today
-            ).all()
-            
-            report_data['data']['new_users'] = [{
-                'id': u.id,
-                'nombre': u.nombre,
-                'telefono': u.telefono,
-                'plan': u.plan,
-                'fecha_ingreso': u.fecha_ingreso.isoformat() if u.fecha_ingreso else None
-            } for u in nuevos_usuarios]
-        
-        if config.get('include_attendance'):
-            # Asistencias de hoy
-            asistencias = db.session.query(
-                Asistencia, Usuario.nombre.label('usuario_nombre')
-            ).join(Usuario).filter(
-                func.date(Asistencia.fecha) == today
-            ).all()
-            
-            report_data['data']['attendance'] = [{
-                'id': a.id,
-                'usuario_id': a.usuario_id,
-                'usuario_nombre': usuario_nombre,
-                'fecha': a.fecha.isoformat() if a.fecha else None
-            } for a, usuario_nombre in asistencias]
-        
-        if config.get('include_payments'):
-            # Pagos registrados hoy
-            pagos = db.session.query(
-                PagoMensualidad, Usuario.nombre.label('usuario_nombre')
-            ).join(Usuario).filter(
-                func.date(PagoMensualidad.fecha_pago) == today
-            ).all()
-            
-            report_data['data']['payments'] = [{
-                'id': p.id,
-                'usuario_id': p.usuario_id,
-                'usuario_nombre': usuario_nombre,
-                'fecha_pago': p.fecha_pago.isoformat() if p.fecha_pago else None,
-                'monto': float(p.monto) if p.monto else 0,
-                'plan': p.plan,
-                'metodo_pago': p.metodo_pago
-            } for p, usuario_nombre in pagos]
-        
-        if config.get('include_sales'):
-            # Ventas realizadas hoy
-            ventas = db.session.query(
-                VentaProducto, 
-                Producto.nombre.label('producto_nombre'),
-                Usuario.nombre.label('usuario_nombre')
-            ).join(Producto).outerjoin(Usuario).filter(
-                func.date(VentaProducto.fecha) == today
-            ).all()
-            
-            report_data['data']['sales'] = [{
-                'id': v.id,
-                'producto_id': v.producto_id,
-                'producto_nombre': producto_nombre,
-                'usuario_id': v.usuario_id,
-                'usuario_nombre': usuario_nombre if v.usuario_id else None,
-                'cantidad': v.cantidad,
-                'precio_unitario': float(v.precio_unitario) if v.precio_unitario else 0,
-                'total': float(v.total) if v.total else 0,
-                'fecha': v.fecha.isoformat() if v.fecha else None,
-                'metodo_pago': v.metodo_pago
-            } for v, producto_nombre, usuario_nombre in ventas]
         
-        # Agregar resumen
-        report_data['summary'] = {
-            'total_nuevos_usuarios': len(report_data['data'].get('new_users', [])),
-            'total_asistencias': len(report_data['data'].get('attendance', [])),
-            'total_pagos': len(report_data['data'].get('payments', [])),
-            'total_ventas': len(report_data['data'].get('sales', [])),
-            'total_ingresos_pagos': sum(p.get('monto', 0) for p in report_data['data'].get('payments', [])),
-            'total_ingresos_ventas': sum(v.get('total', 0) for v in report_data['data'].get('sales', []))
-        }
-        
-        # Enviar datos al servidor
-        import requests
-        response = requests.post(url, json=report_data, timeout=10)
-        
-        # Verificar respuesta
-        if response.status_code == 200:
-            # Guardar registro del envío
-            log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-            os.makedirs(log_path, exist_ok=True)
-            
-            with open(os.path.join(log_path, f'daily_report_{today.strftime("%Y%m%d")}.json'), 'w') as f:
-                json.dump(report_data, f, indent=4)
-                
-            flash("Reporte diario enviado correctamente", "success")
-        else:
-            flash(f"Error al enviar reporte: Código {response.status_code}", "danger")
-            
-        return redirect(url_for('main.admin.configuracion'))
+        # La recopilación y el envío (con su timeout) no ocupan la petición
+        trabajo = encolar('reporte_diario', admin_id=session.get('admin_id'), config=config)
+        return responder_trabajo(trabajo)
         
     except Exception as e:
         import traceback
         traceback.print_exc()
         flash(f"Error al enviar reporte diario: {str(e)}", "danger")
-        return redirect(url_for('main.admin.configuracion')) 
\ No newline at end of file
+        return redirect(url_for('main.admin.configuracion'))
+
+@tarea('reporte_diario')
+def enviar_reporte_diario(progreso, config):
+    """Recopila los datos del día y los envía al servidor configurado"""
+    url = config.get('url')
+    apikey = config.get('apikey')
+    
+    # Día actual en Colombia; los registros se filtran por rango para usar los índices de fecha
+    today = date_colombia()
+    inicio_dia, fin_dia = rango_dia(today)
+    
+    # Preparar datos del reporte
+    report_data = {
+        'timestamp': datetime.now().isoformat(),
+        'date': today.isoformat(),
+        'source': 'Reto Fit - Carlenis Ortiz',
+        'apikey': apikey,
+        'data': {}
+    }
+    
+    # Recopilar datos según la configuración
+    progreso(10, 'Recopilando datos del día')
+    if config.get('include_users'):
+        # Nuevos usuarios registrados hoy
+        nuevos_usuarios = Usuario.query.filter(
+            Usuario.fecha_ingreso == today
+        ).all()
+        
+        report_data['data']['new_users'] = [{
+            'id': u.id,
+            'nombre': u.nombre,
+            'telefono': u.telefono,
+            'plan': u.plan,
+            'fecha_ingreso': u.fecha_ingreso.isoformat() if u.fecha_ingreso else None
+        } for u in nuevos_usuarios]
+    
+    if config.get('include_attendance'):
+        # Asistencias de hoy
+        asistencias = db.session.query(
+            Asistencia, Usuario.nombre.label('usuario_nombre')
+        ).join(Usuario).filter(
+            Asistencia.fecha >= inicio_dia,
+            Asistencia.fecha < fin_dia
+        ).all()
+        
+        report_data['data']['attendance'] = [{
+            'id': a.id,
+            'usuario_id': a.usuario_id,
+            'usuario_nombre': usuario_nombre,
+            'fecha': a.fecha.isoformat() if a.fecha else None
+        } for a, usuario_nombre in asistencias]
+    
+    if config.get('include_payments'):
+        # Pagos registrados hoy
+        pagos = db.session.query(
+            PagoMensualidad, Usuario.nombre.label('usuario_nombre')
+        ).join(Usuario).filter(
+            PagoMensualidad.fecha_pago >= inicio_dia,
+            PagoMensualidad.fecha_pago < fin_dia
+        ).all()
+        
+        report_data['data']['payments'] = [{
+            'id': p.id,
+            'usuario_id': p.usuario_id,
+            'usuario_nombre': usuario_nombre,
+            'fecha_pago': p.fecha_pago.isoformat() if p.fecha_pago else None,
+            'monto': float(p.monto) if p.monto else 0,
+            'plan': p.plan,
+            'metodo_pago': p.metodo_pago
+        } for p, usuario_nombre in pagos]
+    
+    if config.get('include_sales'):
+        # Ventas realizadas hoy
+        ventas = db.session.query(
+            VentaProducto, 
+            Producto.nombre.label('producto_nombre'),
+            Usuario.nombre.label('usuario_nombre')
+        ).join(Producto).outerjoin(Usuario).filter(
+            VentaProducto.fecha >= inicio_dia,
+            VentaProducto.fecha < fin_dia
+        ).all()
+        
+        report_data['data']['sales'] = [{
+            'id': v.id,
+            'producto_id': v.producto_id,
+            'producto_nombre': producto_nombre,
+            'usuario_id': v.usuario_id,
+            'usuario_nombre': usuario_nombre if v.usuario_id else None,
+            'cantidad': v.cantidad,
+            'precio_unitario': float(v.precio_unitario) if v.precio_unitario else 0,
+            'total': float(v.total) if v.total else 0,
+            'fecha': v.fecha.isoformat() if v.fecha else None,
+            'metodo_pago': v.metodo_pago
+        } for v, producto_nombre, usuario_nombre in ventas]
+    
+    # Agregar resumen
+    report_data['summary'] = {
+        'total_nuevos_usuarios': len(report_data['data'].get('new_users', [])),
+        'total_asistencias': len(report_data['data'].get('attendance', [])),
+        'total_pagos': len(report_data['data'].get('payments', [])),
+        'total_ventas': len(report_data['data'].get('sales', [])),
+        'total_ingresos_pagos': sum(p.get('monto', 0) for p in report_data['data'].get('payments', [])),
+        'total_ingresos_ventas': sum(v.get('total', 0) for v in report_data['data'].get('sales', []))
+    }
+    
+    # Enviar datos al servidor
+    progreso(70, 'Enviando reporte al servidor')
+    import requests
+    response = requests.post(url, json=report_data, timeout=10)
+    
+    # Verificar respuesta
+    if response.status_code != 200:
+        raise ErrorTrabajo(f"Error al enviar reporte: Código {response.status_code}")
+    
+    # Guardar registro del envío
+    log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+    os.makedirs(log_path, exist_ok=True)
+    
+    with open(os.path.join(log_path, f'daily_report_{today.strftime("%Y%m%d")}.json'), 'w') as f:
+        json.dump(report_data, f, indent=4)
+    
+    return {'mensaje': "Reporte diario enviado correctamente"}
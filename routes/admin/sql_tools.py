@@ -4,6 +4,9 @@ Herramientas SQL para administradores
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask import current_app as app
 from models import db
+from services.consultas import tablas as tablas_existentes, columnas as columnas_tabla, citar
+from services.cache_kpi import invalidar_cache_kpi
+from services.resumen_diario import reconstruir_resumen_diario, sql_afecta_resumen
 import sqlite3
 import pandas as pd
 import datetime
@@ -55,6 +58,11 @@ def sql_console():
                     # Para INSERT, UPDATE, DELETE, etc. ejecutar con session y commit
                     db.session.execute(codigo_sql)
                     db.session.commit()
+                    # La escritura no pasa por el ORM: los indicadores en caché pueden haber cambiado
+                    invalidar_cache_kpi()
+                    # ni el resumen diario, que se recalcula si la sentencia toca sus tablas
+                    if sql_afecta_resumen(codigo_sql):
+                        reconstruir_resumen_diario()
                     flash('Consulta ejecutada con éxito. Base de datos actualizada.', 'success')
             except Exception as e:
                 error = f"Error al ejecutar la consulta: {str(e)}"
@@ -64,8 +72,7 @@ def sql_console():
     # Obtener lista de tablas para referencia
     tablas = []
     try:
-        result = db.session.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-        tablas = [row[0] for row in result]
+        tablas = tablas_existentes()
     except:
         pass
         
@@ -83,14 +90,15 @@ def ejemplo_sql(tipo):
     """Devuelve ejemplos de consultas SQL"""
     ejemplos = {
         'select_usuarios': "SELECT * FROM usuario ORDER BY fecha_ingreso DESC LIMIT 10;",
-        'select_pagos': "SELECT p.id, u.nombre, p.monto, p.fecha_pago, p.metodo_pago FROM pago_mensualidad p JOIN usuario u ON p.usuario_id = u.id ORDER BY p.fecha_pago DESC LIMIT 10;",
+        # Los montos se guardan en centavos enteros (ver models.Dinero)
+        'select_pagos': "SELECT p.id, u.nombre, p.monto / 100.0 AS monto, p.fecha_pago, p.metodo_pago FROM pago_mensualidad p JOIN usuario u ON p.usuario_id = u.id ORDER BY p.fecha_pago DESC LIMIT 10;",
         'insert_usuario': """INSERT INTO usuario 
 (nombre, telefono, plan, fecha_ingreso, metodo_pago, fecha_vencimiento_plan, precio_plan)
 VALUES 
-('Nuevo Usuario', '3001234567', 'mensual', '2024-05-01', 'efectivo', '2024-06-01', 70000);""",
-        'update_usuario': "UPDATE usuario SET plan = 'mensual', precio_plan = 70000 WHERE id = 1;",
+('Nuevo Usuario', '3001234567', 'mensual', '2024-05-01', 'efectivo', '2024-06-01', 7000000); -- precio_plan en centavos ($70.000)""",
+        'update_usuario': "UPDATE usuario SET plan = 'mensual', precio_plan = 7000000 WHERE id = 1; -- precio_plan en centavos ($70.000)",
         'delete_registro': "DELETE FROM pago_mensualidad WHERE id = 999 AND usuario_id = 999;",
-        'estadisticas': """SELECT plan, COUNT(*) as total_usuarios, AVG(precio_plan) as promedio_precio
+        'estadisticas': """SELECT plan, COUNT(*) as total_usuarios, AVG(precio_plan) / 100.0 as promedio_precio
 FROM usuario
 GROUP BY plan
 ORDER BY total_usuarios DESC;"""
@@ -103,11 +111,12 @@ def info_tabla(nombre_tabla):
     """Devuelve información sobre la estructura de una tabla"""
     try:
         # Obtener estructura de la tabla
-        result = db.session.execute(f"PRAGMA table_info({nombre_tabla});")
-        columnas = [{'nombre': row[1], 'tipo': row[2], 'nullable': not row[3], 'pk': row[5]} for row in result]
+        if nombre_tabla not in tablas_existentes():
+            return jsonify({'error': f"La tabla '{nombre_tabla}' no existe"}), 404
+        columnas = columnas_tabla(nombre_tabla)
         
         # Obtener conteo de registros
-        result = db.session.execute(f"SELECT COUNT(*) FROM {nombre_tabla};")
+        result = db.session.execute(f"SELECT COUNT(*) FROM {citar(nombre_tabla)};")
         conteo = result.scalar()
         
         return jsonify({
@@ -0,0 +1,400 @@
+"""
+Módulo de Finanzas - Motor de Agregados
+=======================================
+
+Calcula los totales que necesita el dashboard de finanzas agrupando cada tabla
+en una sola consulta. En lugar de lanzar un ``SUM`` por cada período (día,
+semana, mes y cada uno de los meses históricos), se construye una única
+consulta con una columna ``SUM(CASE ...)`` por período, acotada por el inicio
+del período más antiguo para que la base de datos solo lea el rango necesario.
+
+Los ingresos y asistencias por período se leen de la tabla ``resumen_diario``
+(una fila por día, mantenida por ``services.resumen_diario``), así que el costo
+no crece con el número de transacciones registradas.
+
+Los meses cerrados y los períodos en curso se guardan en la caché de
+indicadores (``services.cache_kpi``): una recarga del dashboard solo consulta
+lo que no está en caché.
+
+El resultado es un objeto ``ResumenDashboard`` que la vista solo debe renderizar.
+"""
+
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, case, and_, desc
+from sqlalchemy.orm import joinedload
+
+from models import db, Usuario, PagoMensualidad, VentaProducto, Producto, ResumenDiario
+from models import date_colombia
+from services.cache_kpi import cache_kpi
+from .utils import (sanitizar_valor_numerico, obtener_periodo_actual,
+                    obtener_periodos_anteriores,
+                    IMPUESTO_IVA, COSTO_OPERATIVO_PORCENTAJE, MARGEN_BRUTO_OBJETIVO)
+
+# Planes estándar y su tarifa, en el orden en que se muestran en los gráficos
+PLANES_ESTANDAR = {
+    'Diario': Usuario.PRECIO_DIARIO,
+    'Quincenal': Usuario.PRECIO_QUINCENAL,
+    'Mensual': Usuario.PRECIO_MENSUAL,
+    'Estudiantil': Usuario.PRECIO_ESTUDIANTIL,
+    'Dirigido': Usuario.PRECIO_DIRIGIDO,
+    'Personalizado': Usuario.PRECIO_PERSONALIZADO
+}
+
+# Pagos por mes estimados para calcular el ingreso potencial de cada plan
+PAGOS_MENSUALES_POR_PLAN = {'Diario': 20, 'Quincenal': 2}
+
+# Socio de una transacción: solo los datos que muestra el dashboard, para que el
+# resumen pueda guardarse en caché sin objetos ligados a una sesión
+SocioTransaccion = namedtuple('SocioTransaccion', ['id', 'nombre'])
+
+# Fila del historial de transacciones recientes (membresías y productos)
+Transaccion = namedtuple('Transaccion', [
+    'usuario', 'monto', 'fecha', 'tipo', 'metodo_pago', 'detalle', 'categoria'
+])
+
+
+@dataclass
+class TotalesPeriodo:
+    """Ingresos de un período separados por categoría"""
+    membresias: Decimal = Decimal('0.00')
+    productos: Decimal = Decimal('0.00')
+
+    @property
+    def total(self):
+        return self.membresias + self.productos
+
+    @property
+    def iva(self):
+        """IVA incluido en el total (los precios ya incluyen impuestos)"""
+        if self.total <= Decimal('0.00'):
+            return Decimal('0.00')
+        return self.total * IMPUESTO_IVA / (Decimal('1.00') + IMPUESTO_IVA)
+
+    @property
+    def ingresos_netos(self):
+        return self.total - self.iva
+
+    @property
+    def margen_bruto(self):
+        return self.total * MARGEN_BRUTO_OBJETIVO
+
+
+@dataclass
+class ProductoVendido:
+    """Resumen de ventas de un producto en el mes"""
+    nombre: str
+    cantidad: int
+    ingresos: Decimal
+
+    @property
+    def margen(self):
+        return self.ingresos - self.ingresos * COSTO_OPERATIVO_PORCENTAJE
+
+
+@dataclass
+class ResumenDashboard:
+    """Todos los datos del dashboard de finanzas ya agregados"""
+    periodo_actual: dict
+    dia: TotalesPeriodo
+    semana: TotalesPeriodo
+    mes: TotalesPeriodo
+    historico: list = field(default_factory=list)  # [(etiqueta, TotalesPeriodo)]
+    usuarios_activos: int = 0
+    usuarios_con_plan_vigente: int = 0
+    asistencias_mes: int = 0
+    planes: dict = field(default_factory=dict)  # plan -> cantidad de usuarios
+    productos_top: list = field(default_factory=list)
+    transacciones: list = field(default_factory=list)
+
+    @property
+    def costos_operativos_mensuales(self):
+        return self.mes.total * COSTO_OPERATIVO_PORCENTAJE
+
+    @property
+    def margen_neto_mensual(self):
+        return self.mes.ingresos_netos - self.costos_operativos_mensuales
+
+    @property
+    def valor_promedio_transaccion(self):
+        if not self.transacciones:
+            return sanitizar_valor_numerico(0.00)
+        total = sum(t.monto for t in self.transacciones)
+        return sanitizar_valor_numerico(total / len(self.transacciones))
+
+    @property
+    def ingresos_por_usuario(self):
+        if self.usuarios_activos <= 0:
+            return sanitizar_valor_numerico(0.00)
+        return sanitizar_valor_numerico(self.mes.total / self.usuarios_activos)
+
+    @property
+    def ratio_conversion(self):
+        if self.usuarios_activos <= 0:
+            return sanitizar_valor_numerico(0.00)
+        return sanitizar_valor_numerico(self.usuarios_con_plan_vigente / self.usuarios_activos * 100)
+
+    @property
+    def asistencias_promedio(self):
+        if self.usuarios_activos <= 0:
+            return sanitizar_valor_numerico(0.00)
+        return sanitizar_valor_numerico(self.asistencias_mes / self.usuarios_activos)
+
+    @property
+    def ingresos_potenciales_por_plan(self):
+        return ingresos_potenciales(self.planes)
+
+
+def ingresos_potenciales(planes):
+    """Ingreso mensual potencial de cada plan estándar según sus usuarios"""
+    potenciales = []
+    for plan, tarifa in PLANES_ESTANDAR.items():
+        pagos_mes = PAGOS_MENSUALES_POR_PLAN.get(plan, 1)
+        potenciales.append(tarifa * pagos_mes * planes.get(plan, 0))
+    return potenciales
+
+
+def sumas_por_periodo(columna_fecha, columna_monto, periodos):
+    """
+    Suma ``columna_monto`` para varios períodos en una sola consulta.
+
+    Args:
+        columna_fecha: Columna de fecha por la que se agrupa
+        columna_monto: Columna a sumar
+        periodos: Diccionario nombre -> (inicio, fin). ``fin`` es exclusivo y
+            puede ser None para un período abierto.
+
+    Returns:
+        Diccionario nombre -> Decimal con la suma de cada período
+    """
+    if not periodos:
+        return {}
+
+    columnas = []
+    for nombre, (inicio, fin) in periodos.items():
+        condicion = columna_fecha >= inicio
+        if fin is not None:
+            condicion = and_(condicion, columna_fecha < fin)
+        columnas.append(func.sum(case((condicion, columna_monto), else_=0)).label(nombre))
+
+    # Solo leer desde el inicio del período más antiguo
+    inicio_minimo = min(inicio for inicio, _ in periodos.values())
+    fila = db.session.query(*columnas).filter(columna_fecha >= inicio_minimo).one()
+
+    return {nombre: sanitizar_valor_numerico(getattr(fila, nombre)) for nombre in periodos}
+
+
+def obtener_transacciones_recientes(limite=10):
+    """Últimos pagos de membresías y ventas de productos, ordenados por fecha"""
+    pagos = PagoMensualidad.query.options(joinedload(PagoMensualidad.usuario)).\
+        order_by(PagoMensualidad.fecha_pago.desc()).limit(limite).all()
+
+    ventas = db.session.query(VentaProducto, Producto, Usuario).\
+        join(Producto).\
+        outerjoin(Usuario).\
+        order_by(VentaProducto.fecha.desc()).limit(limite).all()
+
+    def socio(usuario):
+        return SocioTransaccion(usuario.id, usuario.nombre) if usuario is not None else None
+
+    transacciones = [Transaccion(
+        usuario=socio(pago.usuario),
+        monto=pago.monto,
+        fecha=pago.fecha_pago,
+        tipo='Membresía',
+        metodo_pago=pago.metodo_pago,
+        detalle=pago.plan,
+        categoria='Mensualidad'
+    ) for pago in pagos]
+
+    transacciones += [Transaccion(
+        usuario=socio(usuario),
+        monto=venta.total,
+        fecha=venta.fecha,
+        tipo='Producto',
+        metodo_pago=venta.metodo_pago,
+        detalle=producto.nombre,
+        categoria=producto.categoria or 'General'
+    ) for venta, producto, usuario in ventas]
+
+    transacciones.sort(key=lambda t: t.fecha, reverse=True)
+    return transacciones
+
+
+def _totales_meses(inicios):
+    """Ingresos de varios meses completos, dos consultas en total"""
+    periodos = {}
+    for i, inicio in enumerate(inicios):
+        fin = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+        periodos[f'm{i}'] = (inicio, fin)
+    pagos = sumas_por_periodo(ResumenDiario.fecha, ResumenDiario.total_membresias, periodos)
+    ventas = sumas_por_periodo(ResumenDiario.fecha, ResumenDiario.total_productos, periodos)
+    return {inicio: TotalesPeriodo(membresias=pagos[f'm{i}'], productos=ventas[f'm{i}'])
+            for i, inicio in enumerate(inicios)}
+
+
+def _indicadores_actuales(hoy, inicio_mes):
+    """Totales del día, la semana y el mes en curso, contadores de usuarios y ventas recientes"""
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    periodos = {
+        'dia': (hoy, None),
+        'semana': (inicio_semana, None),
+        'mes': (inicio_mes, None),
+    }
+    pagos = sumas_por_periodo(ResumenDiario.fecha, ResumenDiario.total_membresias, periodos)
+    ventas = sumas_por_periodo(ResumenDiario.fecha, ResumenDiario.total_productos, periodos)
+
+    # Contadores de usuarios en una sola consulta
+    usuarios_activos, usuarios_con_plan_vigente = db.session.query(
+        func.count(Usuario.id),
+        func.sum(case((Usuario.fecha_vencimiento_plan >= hoy, 1), else_=0))
+    ).one()
+
+    asistencias_mes = int(sumas_por_periodo(ResumenDiario.fecha, ResumenDiario.cantidad_asistencias,
+                                            {'mes': (inicio_mes, None)})['mes'])
+
+    return dict(
+        dia=TotalesPeriodo(membresias=pagos['dia'], productos=ventas['dia']),
+        semana=TotalesPeriodo(membresias=pagos['semana'], productos=ventas['semana']),
+        mes=TotalesPeriodo(membresias=pagos['mes'], productos=ventas['mes']),
+        usuarios_activos=usuarios_activos or 0,
+        usuarios_con_plan_vigente=int(usuarios_con_plan_vigente or 0),
+        asistencias_mes=asistencias_mes,
+        transacciones=obtener_transacciones_recientes(10)
+    )
+
+
+def _usuarios_por_plan():
+    return dict(db.session.query(Usuario.plan, func.count(Usuario.id)).
+                group_by(Usuario.plan).all())
+
+
+def _productos_mas_vendidos(inicio_mes, limite=5):
+    return [
+        ProductoVendido(nombre=str(nombre),
+                        cantidad=int(sanitizar_valor_numerico(cantidad)),
+                        ingresos=sanitizar_valor_numerico(total))
+        for nombre, cantidad, total in db.session.query(
+            Producto.nombre,
+            func.sum(VentaProducto.cantidad).label('cantidad_vendida'),
+            func.sum(VentaProducto.total).label('total_vendido')
+        ).join(VentaProducto).
+        filter(VentaProducto.fecha >= datetime.combine(inicio_mes, datetime.min.time())).
+        group_by(Producto.id).
+        order_by(desc('cantidad_vendida')).
+        limit(limite).all()
+    ]
+
+
+def _en_cache(nombre, hoy, calcular):
+    """Indicador del período en curso a través de la caché, si está activa"""
+    cache = cache_kpi()
+    return calcular() if cache is None else cache.actual(nombre, hoy, calcular)
+
+
+def calcular_indicadores_actuales():
+    """Indicadores del período en curso que muestra la página (sin las series de los gráficos)"""
+    hoy = date_colombia()
+    inicio_mes = obtener_periodo_actual()['inicio_mes']
+    return _en_cache('indicadores', hoy, lambda: _indicadores_actuales(hoy, inicio_mes))
+
+
+def calcular_historico(meses_historicos=6):
+    """
+    Ingresos de los últimos ``meses_historicos`` meses, el actual incluido.
+
+    Returns:
+        Lista de (etiqueta, TotalesPeriodo) en orden cronológico
+    """
+    periodos_historicos = obtener_periodos_anteriores(meses_historicos)
+    inicio_mes = obtener_periodo_actual()['inicio_mes']
+
+    # El último período histórico es el mes en curso: sus totales son los de 'mes'
+    cerrados = [periodo['inicio_mes'] for periodo in periodos_historicos if periodo['inicio_mes'] < inicio_mes]
+    cache = cache_kpi()
+    meses = _totales_meses(cerrados) if cache is None else cache.meses_cerrados(cerrados, _totales_meses)
+
+    historico = []
+    for periodo in periodos_historicos:
+        etiqueta = f"{periodo['nombre_mes'][:3]} {periodo['año']}"
+        totales = meses.get(periodo['inicio_mes'])
+        historico.append((etiqueta, totales if totales is not None else calcular_indicadores_actuales()['mes']))
+    return historico
+
+
+def calcular_planes():
+    """Cantidad de usuarios por plan"""
+    return _en_cache('planes', date_colombia(), _usuarios_por_plan)
+
+
+def calcular_productos_top():
+    """Productos más vendidos del mes en curso"""
+    inicio_mes = obtener_periodo_actual()['inicio_mes']
+    return _en_cache('productos', date_colombia(), lambda: _productos_mas_vendidos(inicio_mes))
+
+
+def calcular_resumen_dashboard(meses_historicos=6, incluir_series=True):
+    """
+    Calcula todos los agregados del dashboard de finanzas.
+
+    Los totales por período salen del resumen diario (unas pocas filas por
+    período); los contadores de usuarios se obtienen en una sola consulta.
+    Con la caché de indicadores activa, los meses cerrados se calculan una
+    sola vez y los períodos en curso una vez por vencimiento o por cambio.
+
+    Args:
+        incluir_series: Con False no se calculan el histórico, los planes ni
+            los productos, que la página carga aparte desde ``/finanzas/api/series``
+    """
+    resumen = ResumenDashboard(periodo_actual=obtener_periodo_actual(), **calcular_indicadores_actuales())
+    if incluir_series:
+        resumen.historico = calcular_historico(meses_historicos)
+        resumen.planes = calcular_planes()
+        resumen.productos_top = calcular_productos_top()
+    return resumen
+
+
+def series_ingresos(meses_historicos=6):
+    """Serie del gráfico de ingresos mensuales y márgenes"""
+    historico = calcular_historico(meses_historicos)
+    return {
+        'meses': [etiqueta for etiqueta, _ in historico],
+        'membresias': [float(t.membresias) for _, t in historico],
+        'productos': [float(t.productos) for _, t in historico],
+        'ingresos_netos': [float(t.ingresos_netos) for _, t in historico],
+        'margenes': [float(t.ingresos_netos * MARGEN_BRUTO_OBJETIVO) for _, t in historico],
+    }
+
+
+def series_planes():
+    """Serie del gráfico de distribución de usuarios por plan"""
+    planes = calcular_planes()
+    return {
+        'nombres': list(PLANES_ESTANDAR),
+        'usuarios': [planes.get(plan, 0) for plan in PLANES_ESTANDAR],
+        'ingresos_potenciales': ingresos_potenciales(planes),
+    }
+
+
+def series_productos():
+    """Series de los gráficos de productos más vendidos y de sus márgenes"""
+    productos = calcular_productos_top()
+    if not productos:
+        return {'nombres': ["Sin ventas en este período"], 'cantidades': [0], 'ingresos': [0.0], 'margenes': [0.0]}
+    return {
+        'nombres': [p.nombre for p in productos],
+        'cantidades': [p.cantidad for p in productos],
+        'ingresos': [float(p.ingresos) for p in productos],
+        'margenes': [float(p.margen) for p in productos],
+    }
+
+
+# Series que publica /finanzas/api/series/<nombre>
+SERIES = {
+    'ingresos': series_ingresos,
+    'planes': series_planes,
+    'productos': series_productos,
+}
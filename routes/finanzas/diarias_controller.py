@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from datetime import datetime
 from sqlalchemy import and_
+from sqlalchemy.orm import joinedload
 
 from models import Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto
 from models import datetime_colombia, date_colombia
+from services.resumen_diario import totales_rango, totales_por_metodo
 from .utils import sanitizar_valor_numerico
 
 # Importar el blueprint directamente desde el paquete finanzas
@@ -39,7 +41,9 @@ def finanzas_diarias():
             PagoMensualidad.fecha_pago <= fin_dia
         ).all()
         
-        total_membresias = sum(pago.monto for pago in pagos_membresia)
+        # Totales, métodos de pago y asistencias del día desde el resumen diario
+        resumen = totales_rango(fecha, fecha)
+        total_membresias = resumen['total_membresias']
         
         # Agrupar por tipo de plan
         ingresos_por_plan = {}
@@ -50,12 +54,12 @@ def finanzas_diarias():
                 ingresos_por_plan[pago.plan] = pago.monto
         
         # 2. Obtener ingresos por ventas de productos del día
-        ventas_productos = VentaProducto.query.filter(
+        ventas_productos = VentaProducto.query.options(joinedload(VentaProducto.producto)).filter(
             VentaProducto.fecha >= inicio_dia,
             VentaProducto.fecha <= fin_dia
         ).all()
         
-        total_productos = sum(venta.total for venta in ventas_productos)
+        total_productos = resumen['total_productos']
         
         # Agrupar por categoría
         productos_por_categoria = {}
@@ -84,27 +88,10 @@ def finanzas_diarias():
         total_ingresos = total_membresias + total_productos
         
         # 4. Método de pago
-        ingresos_por_metodo = {}
+        ingresos_por_metodo = totales_por_metodo(fecha, fecha)
         
-        # Métodos de pago de membresías
-        for pago in pagos_membresia:
-            if pago.metodo_pago in ingresos_por_metodo:
-                ingresos_por_metodo[pago.metodo_pago] += pago.monto
-            else:
-                ingresos_por_metodo[pago.metodo_pago] = pago.monto
-        
-        # Métodos de pago de productos
-        for venta in ventas_productos:
-            if venta.metodo_pago in ingresos_por_metodo:
-                ingresos_por_metodo[venta.metodo_pago] += venta.total
-            else:
-                ingresos_por_metodo[venta.metodo_pago] = venta.total
-        
-        # 5. Obtener asistencias del día
-        asistencias = Asistencia.query.filter(
-            Asistencia.fecha >= inicio_dia,
-            Asistencia.fecha <= fin_dia
-        ).count()
+        # 5. Asistencias del día
+        asistencias = resumen['cantidad_asistencias']
         
         return render_template('finanzas/finanzas_diarias.html',
                               fecha=fecha,
@@ -7,6 +7,7 @@ y mantiene el blueprint unificado para el módulo de finanzas.
 
 Estructura modular:
 - dashboard_controller.py: Dashboard principal y análisis financiero
+- agregados.py: Cálculo de totales por período en consultas agrupadas
 - diarias_controller.py: Análisis de finanzas diarias
 - reportes_controller.py: Exportación de informes y vista de pagos
 - utils.py: Funciones utilitarias comunes y constantes financieras
@@ -1,13 +1,16 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session
 from models import db, Producto, VentaProducto, Usuario
 from models import datetime_colombia, date_colombia
 from sqlalchemy import func, desc
 from routes.auth.routes import admin_required
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import csv
 import io
 import os
 from routes.productos.routes import bp
+from routes.trabajos.routes import responder_trabajo
+from services.trabajos import tarea, encolar
+from services.consultas import rango_fechas
 
 @bp.route('/registrar_venta', methods=['GET', 'POST'])
 def registrar_venta():
@@ -77,10 +80,11 @@ def ventas():
             else:
                 fecha_fin = date_colombia()
         
-        # Consultar ventas
+        # Consultar ventas (por rango de fechas para usar el índice de fecha)
+        desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
         ventas = VentaProducto.query.filter(
-            func.date(VentaProducto.fecha) >= fecha_inicio,
-            func.date(VentaProducto.fecha) <= fecha_fin
+            VentaProducto.fecha >= desde,
+            VentaProducto.fecha < hasta
         ).order_by(VentaProducto.fecha.desc()).all()
         
         # Calcular totales
@@ -210,81 +214,102 @@ def generar_reporte_ventas():
             else:
                 fecha_fin = date_colombia()
         
-        # Consultar ventas
-        ventas = VentaProducto.query.filter(
-            func.date(VentaProducto.fecha) >= fecha_inicio,
-            func.date(VentaProducto.fecha) <= fecha_fin
-        ).order_by(VentaProducto.fecha.desc()).all()
-        
-        # Crear directorio para reportes si no existe
-        reportes_dir = os.path.join('routes', 'exports')
-        if not os.path.exists(reportes_dir):
-            os.makedirs(reportes_dir)
-        
-        # Generar nombre de archivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nombre_archivo = f"reporte_ventas_{tipo_reporte}_{timestamp}.csv"
-        ruta_archivo = os.path.join(reportes_dir, nombre_archivo)
+        # El archivo se genera en segundo plano
+        trabajo = encolar(
+            'reporte_ventas',
+            admin_id=session.get('admin_id'),
+            fecha_inicio=fecha_inicio.isoformat(),
+            fecha_fin=fecha_fin.isoformat(),
+            tipo_reporte=tipo_reporte
+        )
+        return responder_trabajo(trabajo)
+    except Exception as e:
+        flash(f"Error al generar reporte: {str(e)}", "danger")
+        return redirect(url_for('main.productos.ventas'))
+
+@tarea('reporte_ventas')
+def generar_archivo_ventas(progreso, fecha_inicio, fecha_fin, tipo_reporte='detallado'):
+    """Escribe el CSV del reporte de ventas (se ejecuta en un hilo de trabajos)"""
+    fecha_inicio = date.fromisoformat(fecha_inicio)
+    fecha_fin = date.fromisoformat(fecha_fin)
+    
+    # Consultar ventas
+    progreso(10, 'Consultando ventas del período')
+    desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
+    ventas = VentaProducto.query.filter(
+        VentaProducto.fecha >= desde,
+        VentaProducto.fecha < hasta
+    ).order_by(VentaProducto.fecha.desc()).all()
+    
+    # Crear directorio para reportes si no existe
+    progreso(40, 'Escribiendo archivo CSV')
+    reportes_dir = os.path.join('routes', 'exports')
+    if not os.path.exists(reportes_dir):
+        os.makedirs(reportes_dir)
+    
+    # Generar nombre de archivo
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    nombre_archivo = f"reporte_ventas_{tipo_reporte}_{timestamp}.csv"
+    ruta_archivo = os.path.join(reportes_dir, nombre_archivo)
+    
+    # Crear archivo CSV
+    with open(ruta_archivo, 'w', newline='', encoding='utf-8') as csvfile:
+        csvwriter = csv.writer(csvfile)
         
-        # Crear archivo CSV
-        with open(ruta_archivo, 'w', newline='', encoding='utf-8') as csvfile:
-            csvwriter = csv.writer(csvfile)
+        if tipo_reporte == 'detallado':
+            # Reporte detallado
+            csvwriter.writerow(['ID', 'Fecha', 'Producto', 'Cantidad', 'Precio Unitario', 'Total', 'Método de Pago', 'Cliente'])
             
-            if tipo_reporte == 'detallado':
-                # Reporte detallado
-                csvwriter.writerow(['ID', 'Fecha', 'Producto', 'Cantidad', 'Precio Unitario', 'Total', 'Método de Pago', 'Cliente'])
+            for venta in ventas:
+                nombre_cliente = venta.usuario.nombre if venta.usuario else 'Sin cliente'
+                csvwriter.writerow([
+                    venta.id,
+                    venta.fecha.strftime('%Y-%m-%d %H:%M'),
+                    venta.producto.nombre if venta.producto else 'Producto eliminado',
+                    venta.cantidad,
+                    venta.precio_unitario,
+                    venta.total,
+                    venta.metodo_pago,
+                    nombre_cliente
+                ])
+        elif tipo_reporte == 'resumen_diario':
+            # Resumen diario
+            ventas_por_dia = {}
+            for venta in ventas:
+                fecha = venta.fecha.strftime('%Y-%m-%d')
+                if fecha not in ventas_por_dia:
+                    ventas_por_dia[fecha] = {
+                        'cantidad': 0,
+                        'total': 0,
+                        'metodos': {}
+                    }
                 
-                for venta in ventas:
-                    nombre_cliente = venta.usuario.nombre if venta.usuario else 'Sin cliente'
-                    csvwriter.writerow([
-                        venta.id,
-                        venta.fecha.strftime('%Y-%m-%d %H:%M'),
-                        venta.producto.nombre if venta.producto else 'Producto eliminado',
-                        venta.cantidad,
-                        venta.precio_unitario,
-                        venta.total,
-                        venta.metodo_pago,
-                        nombre_cliente
-                    ])
-            elif tipo_reporte == 'resumen_diario':
-                # Resumen diario
-                ventas_por_dia = {}
-                for venta in ventas:
-                    fecha = venta.fecha.strftime('%Y-%m-%d')
-                    if fecha not in ventas_por_dia:
-                        ventas_por_dia[fecha] = {
-                            'cantidad': 0,
-                            'total': 0,
-                            'metodos': {}
-                        }
-                    
-                    ventas_por_dia[fecha]['cantidad'] += 1
-                    ventas_por_dia[fecha]['total'] += venta.total
-                    
-                    # Contabilizar por método de pago
-                    if venta.metodo_pago not in ventas_por_dia[fecha]['metodos']:
-                        ventas_por_dia[fecha]['metodos'][venta.metodo_pago] = 0
-                    ventas_por_dia[fecha]['metodos'][venta.metodo_pago] += venta.total
-                
-                # Escribir encabezados
-                csvwriter.writerow(['Fecha', 'Cantidad de Ventas', 'Total', 'Métodos de Pago'])
+                ventas_por_dia[fecha]['cantidad'] += 1
+                ventas_por_dia[fecha]['total'] += venta.total
                 
-                # Escribir datos por día
-                for fecha, datos in sorted(ventas_por_dia.items(), reverse=True):
-                    metodos_texto = ', '.join([f"{metodo}: ${total:.2f}" for metodo, total in datos['metodos'].items()])
-                    csvwriter.writerow([
-                        fecha, 
-                        datos['cantidad'], 
-                        f"${datos['total']:.2f}", 
-                        metodos_texto
-                    ])
-        
-        # Devolver nombre del archivo para descarga
-        flash(f"Reporte generado correctamente: {nombre_archivo}", "success")
-        return redirect(url_for('main.productos.descargar_reporte', nombre_archivo=nombre_archivo))
-    except Exception as e:
-        flash(f"Error al generar reporte: {str(e)}", "danger")
-        return redirect(url_for('main.productos.ventas'))
+                # Contabilizar por método de pago
+                if venta.metodo_pago not in ventas_por_dia[fecha]['metodos']:
+                    ventas_por_dia[fecha]['metodos'][venta.metodo_pago] = 0
+                ventas_por_dia[fecha]['metodos'][venta.metodo_pago] += venta.total
+            
+            # Escribir encabezados
+            csvwriter.writerow(['Fecha', 'Cantidad de Ventas', 'Total', 'Métodos de Pago'])
+            
+            # Escribir datos por día
+            for fecha, datos in sorted(ventas_por_dia.items(), reverse=True):
+                metodos_texto = ', '.join([f"{metodo}: ${total:.2f}" for metodo, total in datos['metodos'].items()])
+                csvwriter.writerow([
+                    fecha, 
+                    datos['cantidad'], 
+                    f"${datos['total']:.2f}", 
+                    metodos_texto
+                ])
+    
+    return {
+        'archivo': os.path.abspath(ruta_archivo),
+        'nombre_archivo': nombre_archivo,
+        'mensaje': f"Reporte generado correctamente: {nombre_archivo}"
+    }
 
 @bp.route('/descargar_reporte/<nombre_archivo>')
 @admin_required
@@ -0,0 +1,5 @@
+# Inicializar paquete para rutas de trabajos en segundo plano
+from routes.trabajos.routes import bp
+
+# Para facilitar la importación desde otros módulos
+__all__ = ['bp']
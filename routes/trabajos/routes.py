@@ -0,0 +1,67 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+import os
+
+from models import Trabajo
+from services.trabajos import describir_trabajo
+
+# Crear blueprint para trabajos en segundo plano
+bp = Blueprint('trabajos', __name__, url_prefix='/trabajos')
+
+
+def responder_trabajo(trabajo):
+    """
+    Respuesta al encolar un trabajo: JSON para peticiones AJAX, o redirección
+    a la página de progreso para formularios normales.
+    """
+    if request.accept_mimetypes.best == 'application/json' or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        datos = describir_trabajo(trabajo)
+        datos['estado_url'] = url_for('main.trabajos.estado', trabajo_id=trabajo.id)
+        return jsonify(datos), 202
+    return redirect(url_for('main.trabajos.ver', trabajo_id=trabajo.id))
+
+
+def _obtener_trabajo(trabajo_id):
+    """Devuelve el trabajo si existe y la sesión actual puede verlo"""
+    trabajo = Trabajo.query.get(trabajo_id)
+    if trabajo is None:
+        return None
+    # Los trabajos solicitados por un administrador solo los ve ese administrador
+    if trabajo.admin_id is not None and session.get('admin_id') != trabajo.admin_id:
+        return None
+    return trabajo
+
+
+@bp.route('/<int:trabajo_id>')
+def ver(trabajo_id):
+    """Página que muestra el progreso del trabajo y ofrece la descarga"""
+    trabajo = _obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        flash('Trabajo no encontrado', 'danger')
+        return redirect(url_for('main.index'))
+    return render_template('trabajos/estado.html', trabajo=trabajo, volver=request.referrer)
+
+
+@bp.route('/<int:trabajo_id>/estado')
+def estado(trabajo_id):
+    """Estado y progreso del trabajo en JSON (consultado periódicamente por la página)"""
+    trabajo = _obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    datos = describir_trabajo(trabajo)
+    if datos['descargable']:
+        datos['descarga_url'] = url_for('main.trabajos.descargar', trabajo_id=trabajo.id)
+    return jsonify(datos)
+
+
+@bp.route('/<int:trabajo_id>/descargar')
+def descargar(trabajo_id):
+    """Descarga el archivo generado por el trabajo"""
+    trabajo = _obtener_trabajo(trabajo_id)
+    if trabajo is None or trabajo.estado != 'completado' or not trabajo.archivo:
+        flash('El archivo de este trabajo no está disponible', 'warning')
+        return redirect(url_for('main.trabajos.ver', trabajo_id=trabajo_id))
+    if not os.path.exists(trabajo.archivo):
+        flash('El archivo generado ya no existe en el servidor', 'danger')
+        return redirect(url_for('main.trabajos.ver', trabajo_id=trabajo_id))
+    return send_file(trabajo.archivo, as_attachment=True,
+                     download_name=trabajo.nombre_archivo or os.path.basename(trabajo.archivo))
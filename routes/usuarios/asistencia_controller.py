@@ -1,128 +1,38 @@
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort
 from models import db, Usuario, Asistencia
 from models import datetime_colombia, date_colombia
-from datetime import datetime, timedelta
+from datetime import date, datetime
 from sqlalchemy import func
-import calendar
 from routes.usuarios.routes import bp
+from routes.usuarios.listado import buscar_usuarios
+from services.analitica_asistencia import (calendario_mes, contar_asistencias, proximos_vencimientos,
+                                           pagina_detalle, asistencias_por_dia, vencimientos_por_dia,
+                                           POR_PAGINA_DETALLE)
+from services.consultas import rango_mes, DIAS_AVISO_VENCIMIENTO
+from services.registro_asistencia import registrar_asistencia, registrar_lote, UsuarioNoEncontrado, ErrorLote
 
 @bp.route('/asistencia')
 def asistencia():
+    """
+    Control de asistencia. Los datos salen de ``services.analitica_asistencia``
+    con un número fijo de consultas: el selector de socios busca en el servidor
+    (``api_buscar_socios``), el detalle se pagina (``api_detalle_asistencia``) y
+    el calendario pide solo el rango visible (``api_calendario_asistencia``).
+    """
     try:
         # Obtener parámetros de filtro
-        mes_str = request.args.get('mes')
-        ano_str = request.args.get('ano')
-        usuario_id = request.args.get('usuario_id')
-        
-        # Obtener fecha actual en Colombia
         fecha_actual = date_colombia()
+        mes, ano, usuario_id = _filtros_mes(fecha_actual)
+        primer_dia, ultimo_dia = rango_mes(ano, mes)
         
-        # Si no se especifica mes o año, usar el actual
-        mes = int(mes_str) if mes_str else fecha_actual.month
-        ano = int(ano_str) if ano_str else fecha_actual.year
-        
-        # Construir filtro de fecha
-        primer_dia = datetime(ano, mes, 1)
-        
-        # Último día del mes
-        if mes == 12:
-            ultimo_dia = datetime(ano + 1, 1, 1)
-        else:
-            ultimo_dia = datetime(ano, mes + 1, 1)
-        
-        # Consulta base de asistencias - IMPORTANTE: Hacer join con Usuario
-        query = db.session.query(Asistencia, Usuario).join(
-            Usuario, Asistencia.usuario_id == Usuario.id
-        ).filter(
-            Asistencia.fecha >= primer_dia,
-            Asistencia.fecha < ultimo_dia
-        )
-        
-        # Filtrar por usuario si se especifica
-        if usuario_id:
-            query = query.filter(Asistencia.usuario_id == int(usuario_id))
-        
-        # Obtener estadísticas por día
-        stats_query = db.session.query(
-            func.strftime('%d', Asistencia.fecha).label('dia'),
-            func.count().label('cantidad')
-        ).filter(
-            Asistencia.fecha >= primer_dia,
-            Asistencia.fecha < ultimo_dia
-        )
-        
-        if usuario_id:
-            stats_query = stats_query.filter(Asistencia.usuario_id == int(usuario_id))
-            
-        # Agrupar por día
-        stats_query = stats_query.group_by(func.strftime('%d', Asistencia.fecha))
-        
-        # Estadísticas de asistencia por día
-        asistencias_por_dia = stats_query.all()
-        
-        # Estadísticas para gráfico
-        datos_grafico = {int(item.dia): item.cantidad for item in asistencias_por_dia}
+        # Asistencias por día del mes para el calendario
+        calendario = calendario_mes(ano, mes, usuario_id)
         
-        # Días del mes para el calendario
-        dias_mes = calendar.monthrange(ano, mes)[1]
+        # Primera página del detalle del período filtrado
+        detalle = pagina_detalle(primer_dia.date(), ultimo_dia.date(), usuario_id)
         
-        # Generar calendario con datos de asistencia
-        calendario = []
-        for dia in range(1, dias_mes + 1):
-            asistencias = datos_grafico.get(dia, 0)
-            calendario.append({'dia': dia, 'asistencias': asistencias})
-        
-        # Obtener todos los usuarios con información de días restantes para el filtro
-        usuarios_query = Usuario.query.all()
-        usuarios_con_info = []
-        for usuario in usuarios_query:
-            # Calcular días restantes del plan
-            dias_restantes = None
-            if usuario.fecha_vencimiento_plan:
-                dias_restantes = (usuario.fecha_vencimiento_plan - fecha_actual).days
-                
-            estado = 'vencido' if dias_restantes is not None and dias_restantes < 0 else \
-                    'proximo' if dias_restantes is not None and dias_restantes <= 3 else \
-                    'activo' if dias_restantes is not None else 'sin_fecha'
-                    
-            usuarios_con_info.append({
-                'usuario': usuario,
-                'dias_restantes': dias_restantes,
-                'estado': estado
-            })
-        
-        # Obtener todas las asistencias del período filtrado
-        asistencias_result = query.order_by(Asistencia.fecha.desc()).all()
-        
-        # Formatear asistencias con usuario incluido
-        asistencias_formateadas = []
-        for asistencia, usuario in asistencias_result:
-            asistencias_formateadas.append({
-                'id': asistencia.id,
-                'fecha': asistencia.fecha,
-                'usuario': usuario  # Objeto usuario completo
-            })
-        
-        # Contar asistencias de hoy
-        hoy = fecha_actual
-        inicio_hoy = datetime.combine(hoy, datetime.min.time())
-        fin_hoy = datetime.combine(hoy, datetime.max.time())
-        asistencias_hoy = Asistencia.query.filter(
-            Asistencia.fecha >= inicio_hoy,
-            Asistencia.fecha <= fin_hoy
-        ).count()
-        
-        # Contar asistencias del mes actual
-        primer_dia_mes = datetime(fecha_actual.year, fecha_actual.month, 1)
-        if fecha_actual.month == 12:
-            primer_dia_sig_mes = datetime(fecha_actual.year + 1, 1, 1)
-        else:
-            primer_dia_sig_mes = datetime(fecha_actual.year, fecha_actual.month + 1, 1)
-            
-        asistencias_mes = Asistencia.query.filter(
-            Asistencia.fecha >= primer_dia_mes,
-            Asistencia.fecha < primer_dia_sig_mes
-        ).count()
+        asistencias_hoy, asistencias_mes = contar_asistencias(fecha_actual)
+        total_usuarios = db.session.query(func.count(Usuario.id)).scalar()
         
         # Nombres de los meses para el selector
         nombres_meses = [
@@ -130,80 +40,170 @@ def asistencia():
             'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
         ]
         
-        # Obtener próximos vencimientos (usuarios con planes que vencen en los próximos 3 días)
-        proximos_vencimientos = []
-        for usuario in Usuario.query.filter(
-            Usuario.fecha_vencimiento_plan.isnot(None)
-        ).all():
-            if usuario.fecha_vencimiento_plan:
-                dias = (usuario.fecha_vencimiento_plan - fecha_actual).days
-                if 0 <= dias <= 3:
-                    proximos_vencimientos.append({
-                        'id': usuario.id,
-                        'nombre': usuario.nombre,
-                        'plan': usuario.plan,
-                        'fecha_vencimiento': usuario.fecha_vencimiento_plan.strftime('%d/%m/%Y'),
-                        'dias': dias
-                    })
-        
         # Añadir fecha actual para la plantilla
         today = datetime.now()
         
         return render_template('asistencia/asistencia.html', 
-                              asistencias=asistencias_formateadas,
+                              asistencias=detalle.filas,
+                              siguiente=detalle.siguiente,
                               calendario=calendario,
-                              usuarios=usuarios_con_info,
-                              usuario_seleccionado=int(usuario_id) if usuario_id else None,
+                              total_usuarios=total_usuarios,
+                              usuario_seleccionado=usuario_id,
                               mes_actual=mes,
                               ano_actual=ano,
                               mes_nombre=nombres_meses[mes-1],
                               meses=[(i+1, nombre) for i, nombre in enumerate(nombres_meses)],
                               asistencias_hoy=asistencias_hoy,
                               asistencias_mes=asistencias_mes,
-                              proximos_vencimientos=proximos_vencimientos,
-                              limite_asistencias=len(asistencias_formateadas),
+                              proximos_vencimientos=proximos_vencimientos(fecha_actual),
+                              limite_asistencias=len(detalle.filas),
                               today=today)
     except Exception as e:
         print(f"Error en la página de asistencia: {str(e)}")
         flash(f"Error al mostrar la página de asistencia: {str(e)}", "danger")
         return redirect(url_for('main.index'))
 
+def _filtros_mes(fecha_actual):
+    """Mes, año y socio de los parámetros; sin mes o año se usa el actual"""
+    mes = request.args.get('mes', type=int) or fecha_actual.month
+    ano = request.args.get('ano', type=int) or fecha_actual.year
+    if not 1 <= mes <= 12:
+        raise ValueError(f"Mes no válido: {mes}")
+    return mes, ano, request.args.get('usuario_id', type=int)
+
+@bp.route('/api/asistencia/buscar')
+def api_buscar_socios():
+    """Sugerencias del selector de socios: filas HTML de los que coinciden con ``q``"""
+    filas = buscar_usuarios(request.args.get('q', ''))
+    return jsonify({
+        'html': render_template('asistencia/_filas_usuarios.html', usuarios=filas),
+        'cantidad': len(filas),
+    })
+
+@bp.route('/api/asistencia/detalle')
+def api_detalle_asistencia():
+    """Página siguiente del detalle de asistencias del mes: filas HTML y cursor"""
+    try:
+        mes, ano, usuario_id = _filtros_mes(date_colombia())
+        primer_dia, ultimo_dia = rango_mes(ano, mes)
+        pagina = pagina_detalle(primer_dia.date(), ultimo_dia.date(), usuario_id,
+                                request.args.get('cursor'),
+                                request.args.get('por_pagina', POR_PAGINA_DETALLE, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    html = render_template('asistencia/_filas_historial.html', asistencias=pagina.filas)
+    return jsonify({'html': html, 'siguiente': pagina.siguiente})
+
+@bp.route('/api/asistencia/calendario')
+def api_calendario_asistencia():
+    """
+    Asistencias y vencimientos por día entre ``start`` y ``end`` en el formato de
+    eventos de FullCalendar. Con ``usuario_id`` solo cuenta las de ese socio.
+    """
+    try:
+        desde = date.fromisoformat(request.args['start'][:10])
+        hasta = date.fromisoformat(request.args['end'][:10])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Se esperaban las fechas start y end (AAAA-MM-DD)'}), 400
+    if (hasta - desde).days > 400:
+        return jsonify({'error': 'El rango máximo es de un año'}), 400
+    
+    hoy = date_colombia()
+    eventos = [{
+        'title': f'{cantidad} asistencia(s)',
+        'start': dia.isoformat(),
+        'backgroundColor': '#28a745',
+        'borderColor': '#28a745',
+    } for dia, cantidad in sorted(asistencias_por_dia(desde, hasta, request.args.get('usuario_id', type=int)).items())]
+    for dia, cantidad in vencimientos_por_dia(desde, hasta):
+        dias = (dia - hoy).days
+        color = '#dc3545' if dias < 0 else '#ffc107' if dias <= DIAS_AVISO_VENCIMIENTO else '#17a2b8'
+        eventos.append({
+            'title': f'Vencen: {cantidad} plan(es)',
+            'start': dia.isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#fff' if dias < 0 else '#000',
+        })
+    return jsonify(eventos)
+
 @bp.route('/marcar_asistencia/<int:usuario_id>')
 def marcar_asistencia(usuario_id):
     try:
-        # Verificar si el usuario existe
-        usuario = Usuario.query.get_or_404(usuario_id)
-        
-        # Verificar si ya tiene una asistencia hoy
-        hoy = date_colombia()
-        inicio_hoy = datetime.combine(hoy, datetime.min.time())
-        fin_hoy = datetime.combine(hoy, datetime.max.time()) 
-        
-        asistencia_existente = Asistencia.query.filter(
-            Asistencia.usuario_id == usuario_id,
-            Asistencia.fecha >= inicio_hoy,
-            Asistencia.fecha <= fin_hoy
-        ).first()
+        resultado = registrar_asistencia(usuario_id=usuario_id)
+        nombre = resultado['usuario']['nombre']
         
         # Si ya existe una asistencia hoy, mostrar mensaje
-        if asistencia_existente:
-            flash(f"{usuario.nombre} ya tiene registrada su asistencia hoy ({asistencia_existente.fecha.strftime('%Y-%m-%d %H:%M')})", "info")
-            return redirect(request.referrer or url_for('main.usuarios.ver_usuario', usuario_id=usuario_id))
-        
-        # Registrar nueva asistencia
-        asistencia = Asistencia(
-            usuario_id=usuario_id,
-            fecha=datetime_colombia()
-        )
-        
-        db.session.add(asistencia)
-        db.session.commit()
-        
-        flash(f"Asistencia registrada para {usuario.nombre}", "success")
+        if not resultado['registrada']:
+            flash(f"{nombre} ya tiene registrada su asistencia hoy ({resultado['fecha'].strftime('%Y-%m-%d %H:%M')})", "info")
+        else:
+            flash(f"Asistencia registrada para {nombre}", "success")
         
         # Redireccionar a la página anterior o a la ficha del usuario
         return redirect(request.referrer or url_for('main.usuarios.ver_usuario', usuario_id=usuario_id))
+    except UsuarioNoEncontrado:
+        abort(404)
     except Exception as e:
         db.session.rollback()
         flash(f"Error al registrar asistencia: {str(e)}", "danger")
-        return redirect(url_for('main.usuarios.index')) 
\ No newline at end of file
+        return redirect(url_for('main.usuarios.index'))
+
+@bp.route('/api/asistencia', methods=['POST'])
+def api_marcar_asistencia():
+    """
+    Registro rápido de asistencia en JSON para recepción y la pantalla del celular.
+
+    Recibe ``usuario_id`` o ``telefono`` (JSON o formulario). Responde 201 si
+    se registró, 200 si el socio ya tenía asistencia hoy y 404 si no existe.
+    """
+    datos = request.get_json(silent=True) or request.form
+    usuario_id = datos.get('usuario_id')
+    try:
+        usuario_id = int(usuario_id) if usuario_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'usuario_id debe ser un número'}), 400
+    
+    try:
+        resultado = registrar_asistencia(usuario_id=usuario_id, telefono=datos.get('telefono'))
+    except UsuarioNoEncontrado as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al registrar asistencia: {str(e)}'}), 500
+    
+    resultado['fecha'] = resultado['fecha'].isoformat(timespec='seconds')
+    return jsonify(resultado), 201 if resultado['registrada'] else 200
+
+@bp.route('/api/asistencia/lote', methods=['POST'])
+def api_asistencia_lote():
+    """
+    Recibe los escaneos que un kiosco guardó mientras el servidor no respondía.
+
+    Espera JSON ``{"terminal": "...", "eventos": [{"clave", "usuario_id" o
+    "telefono", "fecha"}, ...]}`` y responde el resultado de cada evento.
+    Reenviar el mismo lote es seguro: los eventos ya recibidos no se repiten.
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON con la lista de eventos'}), 400
+    
+    try:
+        resultados = registrar_lote(datos.get('eventos'), terminal=datos.get('terminal'))
+    except ErrorLote as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al registrar el lote: {str(e)}'}), 500
+    
+    # Una clave repetida dentro del envío comparte el resultado: contarla una vez
+    totales = {'registrada': 0, 'duplicada': 0, 'rechazada': 0}
+    for resultado in {id(r): r for r in resultados}.values():
+        totales[resultado['estado']] += 1
+        if isinstance(resultado.get('fecha'), datetime):
+            resultado['fecha'] = resultado['fecha'].isoformat(timespec='seconds')
+    return jsonify({
+        'registradas': totales['registrada'],
+        'duplicadas': totales['duplicada'],
+        'rechazadas': totales['rechazada'],
+        'resultados': resultados,
+    })
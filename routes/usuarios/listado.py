@@ -0,0 +1,225 @@
+"""
+Módulo de Usuarios - Listado paginado
+=====================================
+
+Consulta del listado de usuarios con filtros, orden y paginación por clave
+(keyset). Los días restantes y el estado del plan se calculan en SQL, y cada
+página continúa desde la última fila de la anterior (``WHERE clave > ...``)
+en lugar de usar ``OFFSET``, así que la página N cuesta lo mismo que la 1.
+
+Los cursores de paginación son cadenas opacas que codifican la clave de
+orden y el id de la última (o primera) fila mostrada.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlalchemy import and_, or_, case, func
+
+from models import db, Usuario, date_colombia
+from services.consultas import dias_hasta, DIAS_AVISO_VENCIMIENTO
+
+ESTADOS = ('vencido', 'proximo', 'activo', 'sin_fecha')
+
+PLANES = ('Diario', 'Quincenal', 'Mensual', 'Estudiantil', 'Dirigido', 'Personalizado')
+
+# Orden -> (columna clave, nulos primero, descendente). Sin columna se ordena solo por id.
+ORDENES = {
+    'nombre': (Usuario.nombre, True, False),
+    'vencimiento': (Usuario.fecha_vencimiento_plan, False, False),
+    'recientes': (None, False, True),
+}
+
+POR_PAGINA = 50
+POR_PAGINA_MAXIMO = 200
+
+# Sugerencias que devuelve el buscador con autocompletado
+BUSQUEDA_LIMITE = 10
+
+
+@dataclass
+class PaginaUsuarios:
+    """Una página del listado de usuarios"""
+    filas: list = field(default_factory=list)  # dicts con usuario, dias_restantes y estado
+    siguiente: str = None
+    anterior: str = None
+    conteo_estados: dict = field(default_factory=dict)
+    total: int = 0
+
+
+def expresion_dias_restantes(hoy):
+    """Días entre hoy y el vencimiento del plan (negativo si ya venció)"""
+    return dias_hasta(Usuario.fecha_vencimiento_plan, hoy)
+
+
+def expresion_estado(hoy):
+    """Estado del plan usando solo comparaciones de fecha (aprovechan el índice)"""
+    columna = Usuario.fecha_vencimiento_plan
+    return case(
+        (columna.is_(None), 'sin_fecha'),
+        (columna < hoy, 'vencido'),
+        (columna <= hoy + timedelta(days=DIAS_AVISO_VENCIMIENTO), 'proximo'),
+        else_='activo'
+    )
+
+
+def condicion_estado(estado, hoy):
+    columna = Usuario.fecha_vencimiento_plan
+    limite_aviso = hoy + timedelta(days=DIAS_AVISO_VENCIMIENTO)
+    return {
+        'vencido': columna < hoy,
+        'proximo': and_(columna >= hoy, columna <= limite_aviso),
+        'activo': columna > limite_aviso,
+        'sin_fecha': columna.is_(None),
+    }[estado]
+
+
+def cursor_listado(orden, usuario):
+    """Cursor opaco con la clave de ``orden`` y el id del socio (distinto de los de ``consultas``)"""
+    clave = ORDENES[orden][0]
+    valor = getattr(usuario, clave.key) if clave is not None else None
+    if isinstance(valor, date):
+        valor = valor.isoformat()
+    datos = json.dumps([valor, usuario.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii')
+
+
+def leer_cursor_listado(orden, cursor):
+    """Devuelve (valor de la clave, id) o None si el cursor no es válido"""
+    try:
+        valor, ident = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if valor is not None and orden == 'vencimiento':
+            valor = date.fromisoformat(valor)
+        return valor, int(ident)
+    except (ValueError, TypeError):
+        return None
+
+
+def _condicion_keyset(orden, valor, ident, adelante):
+    """Filas que van después (o antes) de (valor, ident) en el orden indicado"""
+    clave, nulos_primero, descendente = ORDENES[orden]
+    hacia_mayores = adelante != descendente
+    mayor = (lambda a, b: a > b) if hacia_mayores else (lambda a, b: a < b)
+    despues_del_id = mayor(Usuario.id, ident)
+    if clave is None:
+        return despues_del_id
+
+    # Los nulos forman un bloque al principio o al final del recorrido
+    nulos_al_inicio = nulos_primero == hacia_mayores
+    if valor is None:
+        condicion = and_(clave.is_(None), despues_del_id)
+        return or_(condicion, clave.isnot(None)) if nulos_al_inicio else condicion
+
+    condicion = or_(mayor(clave, valor), and_(clave == valor, despues_del_id))
+    return condicion if nulos_al_inicio else or_(condicion, clave.is_(None))
+
+
+def _orden_sql(orden, adelante):
+    clave, nulos_primero, descendente = ORDENES[orden]
+    hacia_mayores = adelante != descendente
+    criterios = []
+    if clave is not None:
+        criterio = clave.asc() if hacia_mayores else clave.desc()
+        nulos_al_inicio = nulos_primero == hacia_mayores
+        criterios.append(criterio.nullsfirst() if nulos_al_inicio else criterio.nullslast())
+    criterios.append(Usuario.id.asc() if hacia_mayores else Usuario.id.desc())
+    return criterios
+
+
+def listar_usuarios(busqueda=None, estado=None, plan=None, orden='nombre',
+                    despues=None, antes=None, por_pagina=POR_PAGINA):
+    """
+    Obtiene una página del listado de usuarios.
+
+    Args:
+        busqueda: Texto a buscar en nombre o teléfono
+        estado: Uno de ESTADOS para filtrar por estado del plan
+        plan: Nombre del plan para filtrar
+        orden: Una de las claves de ORDENES
+        despues: Cursor de la última fila de la página anterior
+        antes: Cursor de la primera fila de la página siguiente
+        por_pagina: Número de filas por página
+
+    Returns:
+        PaginaUsuarios
+    """
+    hoy = date_colombia()
+    orden = orden if orden in ORDENES else 'nombre'
+    por_pagina = max(1, min(por_pagina or POR_PAGINA, POR_PAGINA_MAXIMO))
+
+    filtros = []
+    if busqueda:
+        patron = f'%{busqueda.strip()}%'
+        filtros.append(or_(Usuario.nombre.ilike(patron), Usuario.telefono.like(patron)))
+    if plan:
+        filtros.append(Usuario.plan == plan)
+
+    # Conteo por estado con los mismos filtros de búsqueda y plan. Cada estado es
+    # un rango sobre fecha_vencimiento_plan, así que se cuenta sobre el índice.
+    conteos = [
+        db.session.query(func.count(Usuario.id)).
+        filter(condicion_estado(nombre, hoy), *filtros).scalar_subquery()
+        for nombre in ESTADOS
+    ]
+    conteo_estados = dict(zip(ESTADOS, (int(c or 0) for c in db.session.query(*conteos).one())))
+    total = sum(conteo_estados.values())
+
+    if estado in ESTADOS:
+        filtros.append(condicion_estado(estado, hoy))
+
+    cursor = antes or despues
+    adelante = not antes
+    posicion = leer_cursor_listado(orden, cursor) if cursor else None
+    if posicion is not None:
+        filtros.append(_condicion_keyset(orden, posicion[0], posicion[1], adelante))
+
+    resultados = db.session.query(
+        Usuario,
+        expresion_dias_restantes(hoy).label('dias_restantes'),
+        expresion_estado(hoy).label('estado')
+    ).filter(*filtros).order_by(*_orden_sql(orden, adelante)).limit(por_pagina + 1).all()
+
+    hay_mas = len(resultados) > por_pagina
+    resultados = resultados[:por_pagina]
+    if not adelante:
+        resultados.reverse()
+
+    pagina = PaginaUsuarios(
+        filas=[{'usuario': usuario, 'dias_restantes': dias, 'estado': estado_fila}
+               for usuario, dias, estado_fila in resultados],
+        conteo_estados=conteo_estados,
+        total=total
+    )
+    if resultados:
+        primero, ultimo = resultados[0][0], resultados[-1][0]
+        # Hacia adelante: hay anterior si se llegó con cursor; hacia atrás, siempre hay siguiente
+        if hay_mas or not adelante:
+            pagina.siguiente = cursor_listado(orden, ultimo)
+        if (hay_mas and not adelante) or (adelante and posicion is not None):
+            pagina.anterior = cursor_listado(orden, primero)
+    return pagina
+
+
+def buscar_usuarios(texto, limite=BUSQUEDA_LIMITE):
+    """
+    Socios cuyo nombre o teléfono contiene ``texto``, para los selectores con
+    autocompletado. Solo lee ``limite`` filas y no calcula los conteos del listado.
+
+    Returns:
+        Lista de dicts con usuario, dias_restantes y estado (como ``PaginaUsuarios.filas``)
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    hoy = date_colombia()
+    patron = f'%{texto}%'
+    resultados = db.session.query(
+        Usuario,
+        expresion_dias_restantes(hoy).label('dias_restantes'),
+        expresion_estado(hoy).label('estado')
+    ).filter(or_(Usuario.nombre.ilike(patron), Usuario.telefono.like(patron))).\
+        order_by(Usuario.nombre, Usuario.id).limit(max(1, min(limite, POR_PAGINA_MAXIMO))).all()
+    return [{'usuario': usuario, 'dias_restantes': dias, 'estado': estado}
+            for usuario, dias, estado in resultados]
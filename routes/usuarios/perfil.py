@@ -0,0 +1,169 @@
+"""
+Módulo de Usuarios - Ficha del socio
+====================================
+
+Carga los datos de la ficha de un socio con un número fijo de consultas,
+sin importar cuántos años lleve en el gimnasio:
+
+- Los contadores (asistencias totales y del mes, última asistencia, total
+  pagado en mensualidades y en compras) salen de una sola consulta con una
+  subconsulta agregada por tabla, que usa los índices ``(usuario_id, fecha)``.
+- De cada historial (asistencias, pagos, compras) se carga solo la página
+  más reciente; el resto se pide por partes a ``/usuarios/api/<id>/historial``
+  con un cursor (paginación por clave, como en ``listado``).
+- Las compras se cargan con su producto (``joinedload``) y los objetivos
+  junto con el socio (``selectinload``), en lugar de una consulta por fila.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, or_, case, func, select, true
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import db, Usuario, Asistencia, PagoMensualidad, VentaProducto, MedidasCorporales
+from models import date_colombia
+from services.consultas import dia_de, a_fecha, PaginaHistorial, codificar_cursor, decodificar_cursor
+
+# Filas de cada historial que se muestran al abrir la ficha y en cada "Cargar más"
+POR_PAGINA_HISTORIAL = 20
+POR_PAGINA_HISTORIAL_MAXIMO = 200
+
+# Historial -> (modelo, columna de fecha, opciones de carga)
+HISTORIALES = {
+    'asistencias': (Asistencia, Asistencia.fecha, ()),
+    'pagos': (PagoMensualidad, PagoMensualidad.fecha_pago, ()),
+    'compras': (VentaProducto, VentaProducto.fecha, (joinedload(VentaProducto.producto),)),
+}
+
+
+@dataclass
+class EstadisticasSocio:
+    total_asistencias: int = 0
+    asistencias_mes: int = 0
+    ultima_asistencia: datetime = None
+    cantidad_pagos: int = 0
+    total_mensualidades: Decimal = Decimal('0.00')
+    cantidad_compras: int = 0
+    total_compras: Decimal = Decimal('0.00')
+
+    @property
+    def total_gastado(self):
+        return self.total_mensualidades + self.total_compras
+
+
+@dataclass
+class PerfilSocio:
+    usuario: Usuario
+    estadisticas: EstadisticasSocio
+    asistencias: PaginaHistorial
+    pagos: PaginaHistorial
+    compras: PaginaHistorial
+    ultima_medida: MedidasCorporales = None
+    objetivos: list = field(default_factory=list)
+
+
+def estadisticas_socio(usuario_id, hoy=None):
+    """Contadores de la ficha en una sola consulta"""
+    hoy = hoy or date_colombia()
+    inicio_mes = datetime.combine(hoy.replace(day=1), datetime.min.time())
+
+    asistencias = select(
+        func.count(Asistencia.id).label('total'),
+        func.coalesce(func.sum(case((Asistencia.fecha >= inicio_mes, 1), else_=0)), 0).label('mes'),
+        func.max(Asistencia.fecha).label('ultima'),
+    ).where(Asistencia.usuario_id == usuario_id).subquery()
+    pagos = select(
+        func.count(PagoMensualidad.id).label('cantidad'),
+        func.coalesce(func.sum(PagoMensualidad.monto), 0).label('total'),
+    ).where(PagoMensualidad.usuario_id == usuario_id).subquery()
+    compras = select(
+        func.count(VentaProducto.id).label('cantidad'),
+        func.coalesce(func.sum(VentaProducto.total), 0).label('total'),
+    ).where(VentaProducto.usuario_id == usuario_id).subquery()
+
+    fila = db.session.execute(select(
+        asistencias.c.total, asistencias.c.mes, asistencias.c.ultima,
+        pagos.c.cantidad, pagos.c.total, compras.c.cantidad, compras.c.total,
+    ).select_from(asistencias).join(pagos, true()).join(compras, true())).one()
+
+    ultima = fila[2]
+    if isinstance(ultima, str):
+        # SQLite devuelve MAX() de un DATETIME como texto
+        ultima = datetime.fromisoformat(ultima)
+    return EstadisticasSocio(
+        total_asistencias=fila[0], asistencias_mes=fila[1], ultima_asistencia=ultima,
+        cantidad_pagos=fila[3], total_mensualidades=fila[4],
+        cantidad_compras=fila[5], total_compras=fila[6],
+    )
+
+
+def pagina_historial(usuario_id, historial, cursor=None, por_pagina=POR_PAGINA_HISTORIAL):
+    """
+    Filas de un historial del socio, de la más reciente a la más antigua.
+
+    Args:
+        historial: 'asistencias', 'pagos' o 'compras'
+        cursor: ``PaginaHistorial.siguiente`` de la página anterior
+
+    Raises:
+        ValueError: Si el historial o el cursor no son válidos
+    """
+    if historial not in HISTORIALES:
+        raise ValueError(f"Historial desconocido: {historial}")
+    modelo, columna_fecha, opciones = HISTORIALES[historial]
+    por_pagina = max(1, min(por_pagina, POR_PAGINA_HISTORIAL_MAXIMO))
+
+    consulta = modelo.query.options(*opciones).filter(modelo.usuario_id == usuario_id)
+    if cursor:
+        posicion = decodificar_cursor(cursor)
+        if posicion is None:
+            raise ValueError("Cursor no válido")
+        fecha, ident = posicion
+        if fecha is None:
+            consulta = consulta.filter(columna_fecha.is_(None), modelo.id < ident)
+        else:
+            consulta = consulta.filter(or_(columna_fecha < fecha, columna_fecha.is_(None),
+                                           and_(columna_fecha == fecha, modelo.id < ident)))
+
+    # Una fila de más indica si hay otra página. Las filas sin fecha van al final.
+    filas = consulta.order_by(columna_fecha.desc().nullslast(), modelo.id.desc()).limit(por_pagina + 1).all()
+    siguiente = codificar_cursor(filas[por_pagina - 1], columna_fecha) if len(filas) > por_pagina else None
+    return PaginaHistorial(filas=filas[:por_pagina], siguiente=siguiente)
+
+
+def dias_con_asistencia(usuario_id, desde, hasta):
+    """Días (date) con al menos una asistencia en [desde, hasta), para el calendario"""
+    dia = dia_de(Asistencia.fecha)
+    return [a_fecha(valor) for (valor,) in db.session.query(dia).filter(
+        Asistencia.usuario_id == usuario_id,
+        Asistencia.fecha >= datetime.combine(desde, datetime.min.time()),
+        Asistencia.fecha < datetime.combine(hasta, datetime.min.time()),
+    ).group_by(dia).order_by(dia)]
+
+
+def cargar_perfil(usuario_id, por_pagina=POR_PAGINA_HISTORIAL):
+    """
+    Datos de la ficha del socio.
+
+    Returns:
+        ``PerfilSocio``, o None si el socio no existe
+    """
+    usuario = Usuario.query.options(selectinload(Usuario.objetivos)).get(usuario_id)
+    if usuario is None:
+        return None
+
+    ultima_medida = MedidasCorporales.query.filter_by(usuario_id=usuario_id).\
+        order_by(MedidasCorporales.fecha.desc()).first()
+    objetivos = [objetivo for objetivo in usuario.objetivos if objetivo.estado == 'En progreso']
+
+    return PerfilSocio(
+        usuario=usuario,
+        estadisticas=estadisticas_socio(usuario_id),
+        asistencias=pagina_historial(usuario_id, 'asistencias', por_pagina=por_pagina),
+        pagos=pagina_historial(usuario_id, 'pagos', por_pagina=por_pagina),
+        compras=pagina_historial(usuario_id, 'compras', por_pagina=por_pagina),
+        ultima_medida=ultima_medida,
+        objetivos=objetivos,
+    )
@@ -1,9 +1,11 @@
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort
 from models import db, Usuario, Asistencia, MedidasCorporales, ObjetivoPersonal, PagoMensualidad, VentaProducto
 from models import datetime_colombia, date_colombia
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from routes.auth.routes import admin_required
 from routes.usuarios.routes import bp
+from routes.usuarios.listado import listar_usuarios, PLANES, ORDENES, POR_PAGINA
+from routes.usuarios.perfil import cargar_perfil, pagina_historial, dias_con_asistencia, POR_PAGINA_HISTORIAL
 
 # Función para calcular días restantes de un plan
 def calcular_dias_restantes(usuario):
@@ -44,7 +46,6 @@ def calcular_fecha_vencimiento(fecha_inicio, tipo_plan):
 
 @bp.route('/')
 def index():
-    usuarios = Usuario.query.all()
     success = request.args.get('success')
     error = request.args.get('error')
     
@@ -54,20 +55,29 @@ def index():
     if error:
         flash(error, "danger")
     
-    # Calcular días restantes para cada usuario
-    usuarios_con_info = []
-    for usuario in usuarios:
-        dias_restantes = calcular_dias_restantes(usuario)
-        usuarios_con_info.append({
-            'usuario': usuario,
-            'dias_restantes': dias_restantes,
-            'estado': 'vencido' if dias_restantes is not None and dias_restantes < 0 else
-                     'proximo' if dias_restantes is not None and dias_restantes <= 3 else
-                     'activo' if dias_restantes is not None else 'sin_fecha'
-        })
+    # Filtros, orden y cursor de paginación (días restantes y estado se calculan en SQL)
+    filtros = {
+        'q': request.args.get('q', '').strip(),
+        'estado': request.args.get('estado', ''),
+        'plan': request.args.get('plan', ''),
+        'orden': request.args.get('orden', 'nombre'),
+    }
+    pagina = listar_usuarios(
+        busqueda=filtros['q'] or None,
+        estado=filtros['estado'] or None,
+        plan=filtros['plan'] or None,
+        orden=filtros['orden'],
+        despues=request.args.get('despues'),
+        antes=request.args.get('antes'),
+        por_pagina=request.args.get('por_pagina', POR_PAGINA, type=int)
+    )
     
     return render_template('usuarios/usuarios.html', 
-                          users=usuarios_con_info,
+                          users=pagina.filas,
+                          pagina=pagina,
+                          filtros=filtros,
+                          planes=PLANES,
+                          ordenes=ORDENES,
                           now=datetime_colombia())
 
 @bp.route('/registrar_usuario', methods=['POST'])
@@ -156,16 +166,16 @@ def registrar_usuario():
 
 @bp.route('/ver_usuario/<int:usuario_id>')
 def ver_usuario(usuario_id):
+    """
+    Ficha del socio. Los contadores salen de una consulta agregada y de cada
+    historial solo se carga la página más reciente (ver ``perfil.cargar_perfil``);
+    el resto se pide a ``api_historial`` con el botón "Cargar más".
+    """
     try:
-        # Obtener el usuario con manejo de errores
-        usuario = Usuario.query.get_or_404(usuario_id)
-        
-        # Obtener asistencias con manejo de errores
-        try:
-            asistencias = Asistencia.query.filter_by(usuario_id=usuario_id).order_by(Asistencia.fecha.desc()).all()
-        except Exception as e:
-            print(f"Error al obtener asistencias: {str(e)}")
-            asistencias = []
+        perfil = cargar_perfil(usuario_id)
+        if perfil is None:
+            abort(404)
+        usuario = perfil.usuario
         
         # Calcular días restantes y estado del plan
         try:
@@ -178,62 +188,54 @@ def ver_usuario(usuario_id):
             dias_restantes = None
             estado_plan = 'sin_fecha'
         
-        # Obtener medidas corporales con manejo de errores
-        try:
-            ultima_medida = MedidasCorporales.query.filter_by(usuario_id=usuario_id).order_by(MedidasCorporales.fecha.desc()).first()
-        except Exception as e:
-            print(f"Error al obtener medidas: {str(e)}")
-            ultima_medida = None
-        
-        # Obtener objetivos activos con manejo de errores
-        try:
-            objetivos_activos = ObjetivoPersonal.query.filter_by(
-                usuario_id=usuario_id, 
-                estado='En progreso'
-            ).all()
-        except Exception as e:
-            print(f"Error al obtener objetivos: {str(e)}")
-            # Verificar si la columna 'estado' existe, caso contrario usar filtro por completado
-            try:
-                objetivos_activos = ObjetivoPersonal.query.filter_by(
-                    usuario_id=usuario_id, 
-                    completado=False
-                ).all()
-            except:
-                objetivos_activos = []
-        
-        # Obtener pagos de mensualidad con manejo de errores
-        try:
-            pagos = PagoMensualidad.query.filter_by(usuario_id=usuario_id).order_by(PagoMensualidad.fecha_pago.desc()).all()
-        except Exception as e:
-            print(f"Error al obtener pagos: {str(e)}")
-            pagos = []
-            
-        # Obtener las ventas asociadas al usuario con manejo de errores
-        try:
-            ventas = VentaProducto.query.filter_by(usuario_id=usuario_id).order_by(VentaProducto.fecha.desc()).all()
-        except Exception as e:
-            print(f"Error al obtener ventas: {str(e)}")
-            ventas = []
-        
         # Añadir la fecha actual para las comparaciones en la plantilla
         today = datetime.now()
         
         return render_template('usuarios/ver_usuario.html', 
                               usuario=usuario, 
-                              asistencias=asistencias,
+                              estadisticas=perfil.estadisticas,
+                              asistencias=perfil.asistencias,
                               dias_restantes=dias_restantes,
                               estado_plan=estado_plan,
-                              ultima_medida=ultima_medida,
-                              objetivos=objetivos_activos,
-                              pagos=pagos,
-                              ventas=ventas,
+                              ultima_medida=perfil.ultima_medida,
+                              objetivos=perfil.objetivos,
+                              objetivos_activos=perfil.objetivos,
+                              pagos=perfil.pagos,
+                              compras=perfil.compras,
                               today=today)
     except Exception as e:
         print(f"Error al ver usuario: {str(e)}")
         flash(f"Error al cargar datos del usuario: {str(e)}", "danger")
         return redirect(url_for('main.usuarios.index'))
 
+@bp.route('/api/<int:usuario_id>/historial/<historial>')
+def api_historial(usuario_id, historial):
+    """Página siguiente de un historial de la ficha: filas HTML y cursor de la siguiente"""
+    try:
+        pagina = pagina_historial(usuario_id, historial, request.args.get('cursor'),
+                                  request.args.get('por_pagina', POR_PAGINA_HISTORIAL, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    html = render_template('usuarios/_historial_filas.html', filas=pagina.filas, historial=historial)
+    return jsonify({'html': html, 'siguiente': pagina.siguiente})
+
+@bp.route('/api/<int:usuario_id>/calendario')
+def api_calendario(usuario_id):
+    """Días con asistencia entre ``start`` y ``end`` en el formato de eventos de FullCalendar"""
+    try:
+        desde = date.fromisoformat(request.args['start'][:10])
+        hasta = date.fromisoformat(request.args['end'][:10])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Se esperaban las fechas start y end (AAAA-MM-DD)'}), 400
+    if (hasta - desde).days > 400:
+        return jsonify({'error': 'El rango máximo es de un año'}), 400
+    return jsonify([{
+        'title': 'Asistencia',
+        'start': dia.isoformat(),
+        'backgroundColor': '#28a745',
+        'borderColor': '#28a745',
+    } for dia in dias_con_asistencia(usuario_id, desde, hasta)])
+
 @bp.route('/editar_usuario/<int:usuario_id>', methods=['GET', 'POST'])
 def editar_usuario(usuario_id):
     try:
@@ -0,0 +1,7 @@
+"""
+Servicios de la aplicación
+==========================
+
+Lógica compartida entre varios módulos (resúmenes precalculados, tareas de
+mantenimiento, etc.) que no pertenece a un blueprint concreto.
+"""
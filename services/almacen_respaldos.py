@@ -0,0 +1,294 @@
+"""
+Servicio de Almacén de Respaldos
+================================
+
+Guarda las copias de seguridad como instantáneas deduplicadas. El archivo de
+la base de datos se divide en trozos de tamaño fijo (múltiplo del tamaño de
+página de SQLite, así que las páginas nunca se desplazan entre copias) y cada
+trozo se guarda una sola vez, comprimido, con su SHA-256 como nombre. Cada
+instantánea es un manifiesto JSON con la lista de trozos que la forman.
+
+Entre dos respaldos del mismo día solo cambian las páginas tocadas por las
+asistencias, pagos y ventas nuevas, de modo que cada instantánea ocupa apenas
+los trozos modificados.
+
+Estructura de la carpeta::
+
+    almacen/
+        objetos/ab/ab12...ef.zlib     trozos comprimidos (zstd si está instalado)
+        instantaneas/<nombre>.json    manifiestos
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+
+from models import datetime_colombia
+from .respaldos import respaldar_base_datos, verificar_integridad, ErrorRespaldo
+
+# zstd comprime mejor y más rápido que zlib, pero es una dependencia opcional
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 64 KiB = 16 páginas de 4 KiB
+TAMAÑO_TROZO = 64 * 1024
+
+# Evita que la limpieza de objetos borre trozos de una instantánea a medio guardar
+_bloqueo = threading.Lock()
+
+
+def carpeta_respaldos(ruta_db):
+    """Carpeta ``backups`` junto al archivo de la base de datos"""
+    return os.path.join(os.path.dirname(os.path.abspath(ruta_db)), 'backups')
+
+
+def _comprimir(datos):
+    if zstandard is not None:
+        return 'zst', zstandard.ZstdCompressor(level=10).compress(datos)
+    return 'zlib', zlib.compress(datos, 6)
+
+
+def _descomprimir(formato, datos):
+    if formato == 'zlib':
+        return zlib.decompress(datos)
+    if zstandard is None:
+        raise ErrorRespaldo("Esta instantánea usa zstd. Por favor, ejecute: pip install zstandard")
+    return zstandard.ZstdDecompressor().decompress(datos)
+
+
+class AlmacenRespaldos:
+    """Instantáneas de la base de datos con trozos deduplicados y comprimidos"""
+
+    def __init__(self, carpeta, tamaño_trozo=TAMAÑO_TROZO):
+        self.carpeta = carpeta
+        self.tamaño_trozo = tamaño_trozo
+        self.objetos = os.path.join(carpeta, 'objetos')
+        self.instantaneas = os.path.join(carpeta, 'instantaneas')
+
+    def _ruta_objeto(self, huella, formato):
+        return os.path.join(self.objetos, huella[:2], f'{huella}.{formato}')
+
+    def _buscar_objeto(self, huella):
+        for formato in ('zst', 'zlib'):
+            ruta = self._ruta_objeto(huella, formato)
+            if os.path.exists(ruta):
+                return formato, ruta
+        return None, None
+
+    def _escribir_atomico(self, ruta, datos):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+
+    def _nombre_libre(self, fecha):
+        base = fecha.strftime('%Y%m%d_%H%M%S')
+        nombre, n = base, 1
+        while os.path.exists(os.path.join(self.instantaneas, f'{nombre}.json')):
+            n += 1
+            nombre = f'{base}_{n}'
+        return nombre
+
+    def guardar_archivo(self, ruta_db, origen='manual', fecha=None):
+        """
+        Guarda un archivo de base de datos (que no esté en uso) como instantánea.
+
+        Args:
+            ruta_db: Archivo a guardar
+            origen: Motivo del respaldo (manual, automatico, antes_de_borrar, importado)
+            fecha: Fecha de la instantánea (por defecto, ahora)
+
+        Returns:
+            Manifiesto de la instantánea creada
+        """
+        fecha = fecha or datetime_colombia()
+        total = hashlib.sha256()
+        trozos = []
+        nuevos = bytes_nuevos = 0
+
+        with _bloqueo:
+            with open(ruta_db, 'rb') as archivo:
+                while True:
+                    datos = archivo.read(self.tamaño_trozo)
+                    if not datos:
+                        break
+                    total.update(datos)
+                    huella = hashlib.sha256(datos).hexdigest()
+                    trozos.append(huella)
+                    if self._buscar_objeto(huella)[0] is None:
+                        formato, comprimido = _comprimir(datos)
+                        self._escribir_atomico(self._ruta_objeto(huella, formato), comprimido)
+                        nuevos += 1
+                        bytes_nuevos += len(comprimido)
+
+            # El manifiesto se escribe al final: una instantánea a medias nunca aparece
+            manifiesto = {
+                'nombre': self._nombre_libre(fecha),
+                'fecha': fecha.isoformat(timespec='seconds'),
+                'origen': origen,
+                'tamaño': os.path.getsize(ruta_db),
+                'sha256': total.hexdigest(),
+                'tamaño_trozo': self.tamaño_trozo,
+                'trozos': trozos,
+                'trozos_nuevos': nuevos,
+                'bytes_nuevos': bytes_nuevos,
+            }
+            self._escribir_atomico(os.path.join(self.instantaneas, f"{manifiesto['nombre']}.json"),
+                                   json.dumps(manifiesto).encode('utf-8'))
+        return manifiesto
+
+    def crear_instantanea(self, ruta_db, origen='manual'):
+        """Respalda en caliente la base de datos en uso y la guarda como instantánea"""
+        temporal = self.archivo_temporal()
+        try:
+            respaldar_base_datos(ruta_db, temporal)
+            return self.guardar_archivo(temporal, origen=origen)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    def archivo_temporal(self):
+        """Ruta de un archivo .db vacío y único en la carpeta (dos copias simultáneas no chocan)"""
+        os.makedirs(self.carpeta, exist_ok=True)
+        descriptor, ruta = tempfile.mkstemp(dir=self.carpeta, suffix='.db')
+        os.close(descriptor)
+        return ruta
+
+    def listar(self):
+        """Manifiestos de todas las instantáneas, de la más reciente a la más antigua"""
+        if not os.path.isdir(self.instantaneas):
+            return []
+        manifiestos = []
+        for nombre in os.listdir(self.instantaneas):
+            if nombre.endswith('.json'):
+                with open(os.path.join(self.instantaneas, nombre), encoding='utf-8') as archivo:
+                    manifiestos.append(json.load(archivo))
+        return sorted(manifiestos, key=lambda m: (m['fecha'], m['nombre']), reverse=True)
+
+    def obtener(self, nombre):
+        ruta = os.path.join(self.instantaneas, f'{os.path.basename(nombre)}.json')
+        if not os.path.exists(ruta):
+            raise ErrorRespaldo(f"No existe la instantánea {nombre}")
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+
+    def restaurar(self, nombre, destino):
+        """
+        Reconstruye una instantánea en ``destino`` y verifica que esté completa.
+
+        Raises:
+            ErrorRespaldo: Si falta algún trozo o la copia no coincide con el original
+        """
+        manifiesto = self.obtener(nombre)
+        total = hashlib.sha256()
+        temporal = f'{destino}.parcial'
+        try:
+            with open(temporal, 'wb') as archivo:
+                for huella in manifiesto['trozos']:
+                    formato, ruta = self._buscar_objeto(huella)
+                    if ruta is None:
+                        raise ErrorRespaldo(f"Falta el trozo {huella[:12]} de la instantánea {nombre}")
+                    with open(ruta, 'rb') as objeto:
+                        datos = _descomprimir(formato, objeto.read())
+                    total.update(datos)
+                    archivo.write(datos)
+
+            if total.hexdigest() != manifiesto['sha256']:
+                raise ErrorRespaldo(f"La instantánea {nombre} está dañada (la suma de verificación no coincide)")
+            problemas = verificar_integridad(temporal)
+            if problemas:
+                raise ErrorRespaldo(f"La instantánea {nombre} no pasó la verificación de integridad: {problemas[0]}")
+            os.replace(temporal, destino)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        return manifiesto
+
+    def eliminar(self, nombre):
+        """Elimina el manifiesto de una instantánea y los trozos que ya nadie usa"""
+        os.remove(os.path.join(self.instantaneas, f'{os.path.basename(nombre)}.json'))
+        return self.recolectar()
+
+    def podar(self, conservar, origen=None):
+        """Deja solo las ``conservar`` instantáneas más recientes (de un origen, si se indica)"""
+        candidatas = [m for m in self.listar() if origen is None or m['origen'] == origen]
+        for manifiesto in candidatas[conservar:]:
+            os.remove(os.path.join(self.instantaneas, f"{manifiesto['nombre']}.json"))
+        return self.recolectar()
+
+    def recolectar(self):
+        """
+        Borra los trozos que no pertenecen a ninguna instantánea.
+
+        Returns:
+            Bytes liberados
+        """
+        with _bloqueo:
+            en_uso = {huella for manifiesto in self.listar() for huella in manifiesto['trozos']}
+            liberados = 0
+            if not os.path.isdir(self.objetos):
+                return 0
+            for subcarpeta in os.listdir(self.objetos):
+                ruta_sub = os.path.join(self.objetos, subcarpeta)
+                for nombre in os.listdir(ruta_sub):
+                    if nombre.split('.')[0] not in en_uso:
+                        ruta = os.path.join(ruta_sub, nombre)
+                        liberados += os.path.getsize(ruta)
+                        os.remove(ruta)
+        return liberados
+
+    def uso(self):
+        """Espacio en disco de los trozos frente a lo que ocuparían las copias completas"""
+        en_disco = 0
+        if os.path.isdir(self.objetos):
+            for raiz, _, archivos in os.walk(self.objetos):
+                en_disco += sum(os.path.getsize(os.path.join(raiz, nombre)) for nombre in archivos)
+        instantaneas = self.listar()
+        return {
+            'instantaneas': len(instantaneas),
+            'bytes_en_disco': en_disco,
+            'bytes_sin_deduplicar': sum(m['tamaño'] for m in instantaneas),
+        }
+
+
+def almacen_de(ruta_db):
+    """Almacén de instantáneas de la base de datos indicada"""
+    return AlmacenRespaldos(os.path.join(carpeta_respaldos(ruta_db), 'almacen'))
+
+
+def importar_copias_completas(almacen, carpetas, prefijos=('backup_db_', 'database_')):
+    """
+    Mueve al almacén las copias completas antiguas (``backup_db_*.db``, ``database_*.db``).
+
+    Cada archivo se verifica antes de importarlo y se elimina después.
+
+    Returns:
+        Lista de (archivo, manifiesto o mensaje de error)
+    """
+    resultados = []
+    for carpeta in carpetas:
+        if not os.path.isdir(carpeta):
+            continue
+        for nombre in sorted(os.listdir(carpeta)):
+            if not (nombre.startswith(prefijos) and nombre.endswith('.db')):
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            try:
+                problemas = verificar_integridad(ruta)
+            except sqlite3.DatabaseError as e:
+                problemas = [str(e)]
+            if problemas:
+                resultados.append((nombre, f"No se importó: {problemas[0]}"))
+                continue
+            fecha = datetime.fromtimestamp(os.path.getmtime(ruta))
+            resultados.append((nombre, almacen.guardar_archivo(ruta, origen='importado', fecha=fecha)))
+            os.remove(ruta)
+    return resultados
@@ -0,0 +1,131 @@
+"""
+Servicio de Analítica de Asistencia
+===================================
+
+Datos de la página de control de asistencia con un número fijo de consultas,
+sin importar cuántos socios o asistencias tenga el gimnasio:
+
+- Las asistencias por día del mes se agrupan en SQL con ``consultas.dia_de``
+  y se filtran por rango de fechas, que usa el índice de ``asistencia.fecha``.
+- Las asistencias de hoy y del mes salen de una sola consulta.
+- Los planes próximos a vencer se filtran en SQL por rango de fechas sobre
+  ``fecha_vencimiento_plan`` en lugar de recorrer todos los socios.
+- El detalle se pagina por clave ``(fecha, id)`` como los historiales de la
+  ficha del socio, y el calendario pide solo el rango visible.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, case, func
+from sqlalchemy.orm import contains_eager
+
+from models import db, Usuario, Asistencia
+from .consultas import dia_de, a_fecha, rango_mes, PaginaHistorial, codificar_cursor, decodificar_cursor
+from .consultas import DIAS_AVISO_VENCIMIENTO
+
+# Filas del detalle de asistencias por página
+POR_PAGINA_DETALLE = 50
+POR_PAGINA_DETALLE_MAXIMO = 200
+
+
+def _inicio(dia):
+    return datetime.combine(dia, datetime.min.time())
+
+
+def asistencias_por_dia(desde, hasta, usuario_id=None):
+    """
+    Número de asistencias de cada día en [desde, hasta).
+
+    Returns:
+        Diccionario date -> cantidad (solo los días con asistencias)
+    """
+    dia = dia_de(Asistencia.fecha)
+    consulta = db.session.query(dia, func.count(Asistencia.id)).filter(
+        Asistencia.fecha >= _inicio(desde),
+        Asistencia.fecha < _inicio(hasta),
+    )
+    if usuario_id:
+        consulta = consulta.filter(Asistencia.usuario_id == usuario_id)
+    return {a_fecha(valor): cantidad for valor, cantidad in consulta.group_by(dia)}
+
+
+def calendario_mes(ano, mes, usuario_id=None):
+    """Lista de {'dia', 'asistencias'} con todos los días del mes"""
+    inicio, fin = rango_mes(ano, mes)
+    por_dia = asistencias_por_dia(inicio.date(), fin.date(), usuario_id)
+    return [{'dia': dia, 'asistencias': por_dia.get(inicio.date().replace(day=dia), 0)}
+            for dia in range(1, calendar.monthrange(ano, mes)[1] + 1)]
+
+
+def contar_asistencias(hoy):
+    """Asistencias de hoy y del mes de ``hoy`` en una sola consulta"""
+    inicio_mes, fin_mes = rango_mes(hoy.year, hoy.month)
+    inicio_hoy = _inicio(hoy)
+    total_mes, total_hoy = db.session.query(
+        func.count(Asistencia.id),
+        func.coalesce(func.sum(case((and_(Asistencia.fecha >= inicio_hoy,
+                                          Asistencia.fecha < inicio_hoy + timedelta(days=1)), 1),
+                                    else_=0)), 0),
+    ).filter(Asistencia.fecha >= inicio_mes, Asistencia.fecha < fin_mes).one()
+    return int(total_hoy), int(total_mes)
+
+
+def proximos_vencimientos(hoy, dias=DIAS_AVISO_VENCIMIENTO):
+    """Socios cuyo plan vence entre hoy y dentro de ``dias`` días, del más próximo al más lejano"""
+    filas = db.session.query(
+        Usuario.id, Usuario.nombre, Usuario.plan, Usuario.fecha_vencimiento_plan
+    ).filter(
+        Usuario.fecha_vencimiento_plan >= hoy,
+        Usuario.fecha_vencimiento_plan <= hoy + timedelta(days=dias),
+    ).order_by(Usuario.fecha_vencimiento_plan, Usuario.nombre).all()
+    return [{
+        'id': ident,
+        'nombre': nombre,
+        'plan': plan,
+        'fecha_vencimiento': vencimiento.strftime('%d/%m/%Y'),
+        'dias': (vencimiento - hoy).days,
+    } for ident, nombre, plan, vencimiento in filas]
+
+
+def vencimientos_por_dia(desde, hasta):
+    """
+    Número de planes que vencen cada día en [desde, hasta), para el calendario.
+
+    Returns:
+        Lista de (date, cantidad) ordenada por fecha
+    """
+    columna = Usuario.fecha_vencimiento_plan
+    return [(a_fecha(dia), cantidad) for dia, cantidad in db.session.query(
+        columna, func.count(Usuario.id)
+    ).filter(columna >= desde, columna < hasta).group_by(columna).order_by(columna)]
+
+
+def pagina_detalle(desde, hasta, usuario_id=None, cursor=None, por_pagina=POR_PAGINA_DETALLE):
+    """
+    Asistencias de [desde, hasta) con su socio, de la más reciente a la más antigua.
+
+    Args:
+        cursor: ``PaginaHistorial.siguiente`` de la página anterior
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    por_pagina = max(1, min(por_pagina, POR_PAGINA_DETALLE_MAXIMO))
+    consulta = Asistencia.query.join(Asistencia.usuario).options(contains_eager(Asistencia.usuario)).filter(
+        Asistencia.fecha >= _inicio(desde),
+        Asistencia.fecha < _inicio(hasta),
+    )
+    if usuario_id:
+        consulta = consulta.filter(Asistencia.usuario_id == usuario_id)
+    if cursor:
+        posicion = decodificar_cursor(cursor)
+        if posicion is None or posicion[0] is None:
+            raise ValueError("Cursor no válido")
+        fecha, ident = posicion
+        consulta = consulta.filter(or_(Asistencia.fecha < fecha,
+                                       and_(Asistencia.fecha == fecha, Asistencia.id < ident)))
+
+    filas = consulta.order_by(Asistencia.fecha.desc(), Asistencia.id.desc()).limit(por_pagina + 1).all()
+    siguiente = codificar_cursor(filas[por_pagina - 1], Asistencia.fecha) if len(filas) > por_pagina else None
+    return PaginaHistorial(filas=filas[:por_pagina], siguiente=siguiente)
@@ -0,0 +1,209 @@
+"""
+Servicio de Caché de Indicadores
+================================
+
+Guarda los indicadores del dashboard de finanzas por período para que una
+ráfaga de recargas no vuelva a consultar la base de datos:
+
+- Los meses cerrados no cambian: se guardan sin vencimiento (``mes:AAAA-MM``).
+- El día, la semana y el mes en curso se guardan con un vencimiento corto
+  (``KPI_CACHE_TTL_SEGUNDOS``) y la clave incluye la fecha, así que el cambio
+  de día los descarta solos.
+
+Al confirmar una transacción que crea, modifica o elimina pagos o ventas se
+invalidan los períodos en curso y los meses cerrados afectados (p. ej. un pago
+corregido con fecha de un mes anterior). Los días modificados los anota
+``services.resumen_diario`` al actualizar el resumen. Los cambios que no pasan
+por la sesión (restaurar una copia, reconstruir el resumen, la consola SQL)
+vacían la caché completa con ``invalidar_cache_kpi``.
+
+El almacenamiento es intercambiable: por defecto ``CacheLRU`` en la memoria del
+proceso; cualquier objeto que implemente ``BackendCache`` (p. ej. uno sobre
+Redis para varios procesos) se puede pasar a ``iniciar_cache_kpi``.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+import config
+from models import db
+from .resumen_diario import tomar_dias_modificados
+
+# Prefijo de las entradas de los períodos en curso
+PREFIJO_ACTUAL = 'actual:'
+
+
+class BackendCache:
+    """
+    Almacenamiento de la caché. Los valores deben poder copiarse con ``pickle``
+    para que un backend compartido entre procesos pueda guardarlos.
+    """
+
+    def obtener(self, clave):
+        """Valor guardado, o None si no existe o ya venció"""
+        raise NotImplementedError
+
+    def guardar(self, clave, valor, ttl=None):
+        """Guarda ``valor``; con ``ttl`` (segundos) vence pasado ese tiempo"""
+        raise NotImplementedError
+
+    def borrar(self, clave):
+        raise NotImplementedError
+
+    def borrar_prefijo(self, prefijo):
+        """Elimina todas las entradas cuya clave empieza por ``prefijo``"""
+        raise NotImplementedError
+
+    def limpiar(self):
+        raise NotImplementedError
+
+
+class CacheLRU(BackendCache):
+    """Caché en memoria con vencimiento por entrada; descarta la menos usada al llenarse"""
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # clave -> (vence, valor)
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, clave):
+        with self._cerrojo:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence is not None and vence <= time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        vence = time.monotonic() + ttl if ttl is not None else None
+        with self._cerrojo:
+            self._entradas[clave] = (vence, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def borrar(self, clave):
+        with self._cerrojo:
+            self._entradas.pop(clave, None)
+
+    def borrar_prefijo(self, prefijo):
+        with self._cerrojo:
+            for clave in [clave for clave in self._entradas if clave.startswith(prefijo)]:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._cerrojo:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class CacheKPI:
+    """Caché de indicadores por período sobre un ``BackendCache``"""
+
+    def __init__(self, backend, ttl_actual=60):
+        self.backend = backend
+        self.ttl_actual = ttl_actual
+        # Cambia con cada invalidación: un valor calculado mientras se invalidaba no se guarda
+        self._generacion = 0
+
+    def meses_cerrados(self, inicios, calcular_varios):
+        """
+        Indicadores de varios meses cerrados calculando juntos solo los que faltan.
+
+        Args:
+            inicios: Primer día de cada mes
+            calcular_varios: Función que recibe la lista de meses sin caché y
+                devuelve un diccionario inicio -> valor
+
+        Returns:
+            Diccionario inicio -> valor
+        """
+        generacion = self._generacion
+        valores = {inicio: self.backend.obtener(f'mes:{inicio:%Y-%m}') for inicio in inicios}
+        faltantes = [inicio for inicio, valor in valores.items() if valor is None]
+        if faltantes:
+            calculados = calcular_varios(faltantes)
+            for inicio in faltantes:
+                valores[inicio] = calculados[inicio]
+                if generacion == self._generacion:
+                    self.backend.guardar(f'mes:{inicio:%Y-%m}', calculados[inicio])
+        return valores
+
+    def actual(self, nombre, hoy, calcular):
+        """Indicadores de los períodos en curso, con vencimiento corto"""
+        clave = f'{PREFIJO_ACTUAL}{nombre}:{hoy.isoformat()}'
+        valor = self.backend.obtener(clave)
+        if valor is None:
+            generacion = self._generacion
+            valor = calcular()
+            if generacion == self._generacion:
+                self.backend.guardar(clave, valor, self.ttl_actual)
+        return valor
+
+    def invalidar_dias(self, dias):
+        """Descarta los períodos en curso y los meses cerrados que contienen ``dias``"""
+        if not dias:
+            return
+        self._generacion += 1
+        self.backend.borrar_prefijo(PREFIJO_ACTUAL)
+        for mes in {(dia.year, dia.month) for dia in dias}:
+            self.backend.borrar('mes:%04d-%02d' % mes)
+
+    def invalidar_todo(self):
+        self._generacion += 1
+        self.backend.limpiar()
+
+
+def cache_kpi():
+    """Caché de la aplicación actual, o None si está desactivada"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('cache_kpi')
+
+
+def invalidar_cache_kpi():
+    """Vacía la caché de la aplicación actual (si está activa)"""
+    cache = cache_kpi()
+    if cache is not None:
+        cache.invalidar_todo()
+
+
+def _al_confirmar(session):
+    dias = tomar_dias_modificados(session)
+    cache = cache_kpi()
+    if dias and cache is not None:
+        cache.invalidar_dias(dias)
+
+
+def _al_revertir(session):
+    tomar_dias_modificados(session)
+
+
+def iniciar_cache_kpi(app, backend=None):
+    """
+    Activa la caché de indicadores de ``app``.
+
+    Args:
+        backend: ``BackendCache`` a usar; por defecto ``CacheLRU`` en memoria
+    """
+    if not app.config.get('KPI_CACHE', config.KPI_CACHE):
+        return None
+    if backend is None:
+        backend = CacheLRU(app.config.get('KPI_CACHE_MAX_ENTRADAS', config.KPI_CACHE_MAX_ENTRADAS))
+    cache = app.extensions['cache_kpi'] = CacheKPI(
+        backend, app.config.get('KPI_CACHE_TTL_SEGUNDOS', config.KPI_CACHE_TTL_SEGUNDOS))
+
+    if not event.contains(db.session, 'after_commit', _al_confirmar):
+        event.listen(db.session, 'after_commit', _al_confirmar)
+        event.listen(db.session, 'after_rollback', _al_revertir)
+    return cache
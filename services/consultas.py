@@ -0,0 +1,288 @@
+"""
+Consultas portables
+===================
+
+Expresiones SQL que cada motor escribe distinto. ``config.py`` usa PostgreSQL
+cuando existe ``DATABASE_URL`` y SQLite en los demás casos; funciones como
+``strftime``, ``julianday`` o las tablas ``sqlite_master``/``sqlite_sequence``
+solo existen en SQLite. Este módulo reúne:
+
+- Agrupación por día, semana (desde el lunes) o mes: ``dia_de``, ``semana_de``
+  y ``mes_de``. Son construcciones de SQLAlchemy que se compilan a la forma
+  nativa del motor que ejecuta la consulta (``date(...)`` en SQLite,
+  ``date_trunc`` en PostgreSQL), así que sirven igual con la sesión o con
+  cualquier otra conexión. Devuelven valores ``date`` en ambos motores.
+- Límites del día, la semana y el mes en la hora de Colombia
+  (``rango_dia``, ``rango_semana``, ``rango_mes``). Las fechas se guardan sin
+  zona horaria en hora de ``America/Bogota`` (ver ``models.datetime_colombia``).
+- Inspección de tablas y reinicio de secuencias de autoincremento.
+- Cursores de la paginación por clave ``(fecha, id)`` de los historiales
+  (``PaginaHistorial``, ``codificar_cursor``, ``decodificar_cursor``), que
+  comparten la ficha del socio y el control de asistencia.
+
+Para filtrar se compara la columna contra uno de esos rangos
+(``fecha >= inicio AND fecha < fin``), que usa el índice de la columna. Las
+expresiones de agrupación son para el ``SELECT``/``GROUP BY``: en un ``WHERE``
+obligarían a recorrer la tabla completa.
+"""
+
+import base64
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, Integer, inspect, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from models import db, date_colombia
+
+# Días antes del vencimiento en los que el plan se marca como próximo a vencer
+DIAS_AVISO_VENCIMIENTO = 3
+
+
+def dialecto(conexion=None):
+    """Nombre del motor de la base de datos ('sqlite', 'postgresql', ...)"""
+    return (conexion if conexion is not None else db.engine).dialect.name
+
+
+# ---------------------------------------------------------------------------
+# Agrupación por período
+# ---------------------------------------------------------------------------
+
+class _Truncar(FunctionElement):
+    type = Date()
+    inherit_cache = True
+
+
+class _Dia(_Truncar):
+    name = 'dia_de'
+    inherit_cache = True
+
+
+class _Semana(_Truncar):
+    name = 'semana_de'
+    inherit_cache = True
+
+
+class _Mes(_Truncar):
+    name = 'mes_de'
+    inherit_cache = True
+
+
+class _DiasHasta(FunctionElement):
+    type = Integer()
+    name = 'dias_hasta'
+    inherit_cache = True
+
+
+def dia_de(columna):
+    """Día (``date``, sin la hora) de una columna de fecha y hora"""
+    return _Dia(columna)
+
+
+def semana_de(columna):
+    """Lunes de la semana de una columna de fecha"""
+    return _Semana(columna)
+
+
+def mes_de(columna):
+    """Primer día del mes de una columna de fecha"""
+    return _Mes(columna)
+
+
+def dias_hasta(columna, dia):
+    """Días enteros desde ``dia`` hasta la fecha de ``columna`` (negativo si ya pasó)"""
+    return _DiasHasta(columna, dia)
+
+
+def _argumento(compilador, elemento, **kw):
+    return compilador.process(list(elemento.clauses)[0], **kw)
+
+
+@compiles(_Dia, 'sqlite')
+def _dia_sqlite(elemento, compilador, **kw):
+    return 'date(%s)' % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_Semana, 'sqlite')
+def _semana_sqlite(elemento, compilador, **kw):
+    # 'weekday 0' avanza al domingo (o lo deja si ya lo es); seis días antes es el lunes
+    return "date(%s, 'weekday 0', '-6 days')" % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_Mes, 'sqlite')
+def _mes_sqlite(elemento, compilador, **kw):
+    return "date(%s, 'start of month')" % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_DiasHasta, 'sqlite')
+def _dias_hasta_sqlite(elemento, compilador, **kw):
+    columna, dia = (compilador.process(clausula, **kw) for clausula in elemento.clauses)
+    return 'CAST(julianday(%s) - julianday(%s) AS INTEGER)' % (columna, dia)
+
+
+@compiles(_Dia)
+def _dia(elemento, compilador, **kw):
+    return 'CAST(%s AS DATE)' % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_Semana)
+def _semana(elemento, compilador, **kw):
+    return "CAST(date_trunc('week', %s) AS DATE)" % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_Mes)
+def _mes(elemento, compilador, **kw):
+    return "CAST(date_trunc('month', %s) AS DATE)" % _argumento(compilador, elemento, **kw)
+
+
+@compiles(_DiasHasta)
+def _dias_hasta(elemento, compilador, **kw):
+    # En PostgreSQL la resta de dos DATE ya es un número entero de días
+    columna, dia = (compilador.process(clausula, **kw) for clausula in elemento.clauses)
+    return '(CAST(%s AS DATE) - CAST(%s AS DATE))' % (columna, dia)
+
+
+def a_fecha(valor):
+    """Convierte un valor de fecha leído de la base de datos (``date``, ``datetime`` o texto) en ``date``"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+# ---------------------------------------------------------------------------
+# Límites de períodos en la hora de Colombia
+# ---------------------------------------------------------------------------
+
+def rango_dia(dia=None):
+    """Primer instante del día y del día siguiente (por defecto, hoy en Colombia)"""
+    dia = dia or date_colombia()
+    inicio = datetime.combine(dia, datetime.min.time())
+    return inicio, inicio + timedelta(days=1)
+
+
+def rango_semana(dia=None):
+    """Primer instante del lunes de la semana de ``dia`` y del lunes siguiente"""
+    dia = dia or date_colombia()
+    inicio = datetime.combine(dia - timedelta(days=dia.weekday()), datetime.min.time())
+    return inicio, inicio + timedelta(days=7)
+
+
+def rango_mes(ano, mes):
+    """Primer instante del mes y del mes siguiente, para filtrar ``inicio <= fecha < fin``"""
+    inicio = datetime(ano, mes, 1)
+    fin = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    return inicio, fin
+
+
+def rango_fechas(desde, hasta):
+    """Límites para filtrar de ``desde`` a ``hasta`` (ambos días incluidos)"""
+    return datetime.combine(desde, datetime.min.time()), rango_dia(hasta)[1]
+
+
+# ---------------------------------------------------------------------------
+# Paginación por clave (fecha, id)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PaginaHistorial:
+    filas: list = field(default_factory=list)
+    siguiente: str = None  # Cursor de la página siguiente, o None si no hay más
+
+
+def codificar_cursor(fila, columna_fecha):
+    valor = getattr(fila, columna_fecha.key)
+    datos = json.dumps([valor.isoformat() if valor is not None else None, fila.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor no es válido"""
+    try:
+        valor, ident = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (datetime.fromisoformat(valor) if valor is not None else None), int(ident)
+    except (ValueError, TypeError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Inspección de tablas
+# ---------------------------------------------------------------------------
+
+def _conexion(conexion):
+    return conexion if conexion is not None else db.session.connection()
+
+
+def tablas(conexion=None):
+    """Nombres de las tablas de la aplicación, ordenados (sin las internas del motor)"""
+    return sorted(inspect(_conexion(conexion)).get_table_names())
+
+
+def existe_tabla(nombre, conexion=None):
+    return inspect(_conexion(conexion)).has_table(nombre)
+
+
+def columnas(tabla, conexion=None):
+    """
+    Estructura de una tabla.
+
+    Returns:
+        Lista de dicts con nombre, tipo, nullable y pk
+
+    Raises:
+        sqlalchemy.exc.NoSuchTableError: Si la tabla no existe
+    """
+    inspector = inspect(_conexion(conexion))
+    clave = set(inspector.get_pk_constraint(tabla).get('constrained_columns') or ())
+    return [{
+        'nombre': columna['name'],
+        'tipo': str(columna['type']),
+        'nullable': columna['nullable'],
+        'pk': columna['name'] in clave,
+    } for columna in inspector.get_columns(tabla)]
+
+
+def citar(nombre, conexion=None):
+    """Nombre de tabla o columna entre comillas si el motor lo requiere"""
+    return _conexion(conexion).dialect.identifier_preparer.quote(nombre)
+
+
+def reiniciar_secuencias(nombres, conexion=None):
+    """
+    Reinicia el autoincremento de las tablas indicadas para que el próximo id sea 1.
+    Usar solo con las tablas vacías.
+    """
+    conexion = _conexion(conexion)
+    if dialecto(conexion) == 'sqlite':
+        # sqlite_sequence solo existe si alguna tabla usa AUTOINCREMENT
+        if conexion.execute(text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_sequence'")).scalar():
+            for nombre in nombres:
+                conexion.execute(text('DELETE FROM sqlite_sequence WHERE name = :nombre'), {'nombre': nombre})
+    elif dialecto(conexion) == 'postgresql':
+        for nombre in nombres:
+            # pg_get_serial_sequence devuelve NULL si la tabla no tiene columna id autoincremental
+            conexion.execute(text("SELECT setval(pg_get_serial_sequence(:tabla, 'id'), 1, false) "
+                                  "WHERE pg_get_serial_sequence(:tabla, 'id') IS NOT NULL"), {'tabla': nombre})
+
+
+@contextmanager
+def claves_foraneas_desactivadas(conexion=None):
+    """
+    Desactiva la verificación de claves foráneas de SQLite durante el bloque.
+    En PostgreSQL no hace nada: las tablas se deben vaciar en orden (hijas primero).
+    """
+    conexion = _conexion(conexion)
+    sqlite = dialecto(conexion) == 'sqlite'
+    if sqlite:
+        conexion.execute(text('PRAGMA foreign_keys = OFF'))
+    try:
+        yield
+    finally:
+        if sqlite:
+            conexion.execute(text('PRAGMA foreign_keys = ON'))
@@ -0,0 +1,313 @@
+"""
+Generador de Datos Sintéticos
+=============================
+
+Llena una base de datos con la historia de un gimnasio grande para
+reproducir en local la lentitud que se ve con datos de producción:
+
+- Socios de los seis planes de ``PLANES``, con más inscripciones en enero y
+  tras las vacaciones, y una permanencia media de ocho meses.
+- Asistencias con estacionalidad (más en enero, menos en diciembre y los
+  domingos) según la frecuencia semanal de cada socio.
+- Renovaciones en ``PagoMensualidad`` cuando el socio llega con el plan
+  vencido (los socios del plan Diario pagan cada visita).
+- Ventas de productos en las visitas y de clientes sin registrar; el stock
+  final refleja las ventas y las reposiciones.
+
+La simulación avanza día a día, así que los ID quedan en orden cronológico
+como en una base de datos real. Las filas se insertan con ``executemany``
+sobre la sentencia ``INSERT`` de cada tabla, en una sola transacción, y al
+final se reconstruye el resumen diario (las inserciones masivas no pasan por
+los eventos del ORM). Por la misma razón los montos se escriben ya en
+centavos (ver ``models.Dinero``). Con la misma semilla, tamaño y fecha final los datos
+son idénticos.
+
+Uso:
+    python app_launcher.py --generar-datos gimnasio_grande.db --socios 50000 --años 5
+"""
+
+import os
+import random
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, inspect
+
+from models import db, Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto, date_colombia
+from models import a_centavos
+from routes.usuarios.listado import PLANES
+from services.resumen_diario import reconstruir_en_conexion
+
+# Plan -> (precio, días de vigencia, proporción de socios)
+PLANES_SINTETICOS = {
+    'Diario': (5000, 0, 0.10),
+    'Quincenal': (40000, 15, 0.10),
+    'Mensual': (70000, 30, 0.45),
+    'Estudiantil': (55000, 30, 0.15),
+    'Dirigido': (90000, 30, 0.10),
+    'Personalizado': (150000, 30, 0.10),
+}
+METODOS_PAGO = ('Efectivo', 'Efectivo', 'Nequi', 'Daviplata', 'Transferencia', 'Tarjeta')
+
+# Afluencia relativa por mes (enero: propósitos de año nuevo) y por día de la semana (lunes = 0)
+FACTOR_MES = (1.35, 1.2, 1.1, 1.0, 1.0, 0.9, 0.85, 0.95, 1.0, 1.0, 0.9, 0.7)
+FACTOR_SEMANA = (1.2, 1.1, 1.1, 1.0, 0.95, 0.7, 0.35)
+# Inscripciones relativas por mes
+FACTOR_INSCRIPCION = (2.2, 1.4, 1.1, 1.0, 0.9, 0.9, 1.2, 1.0, 0.9, 0.8, 0.7, 0.6)
+
+PERMANENCIA_MEDIA_DIAS = 240
+PROBABILIDAD_COMPRA = 0.06
+VENTAS_SIN_SOCIO_POR_DIA = 2
+STOCK_INICIAL, STOCK_MINIMO, LOTE_REPOSICION = 150, 15, 200
+
+# (nombre, precio, popularidad)
+PRODUCTOS = [
+    ('Agua 600 ml', 2000, 10), ('Bebida hidratante', 4500, 8), ('Bebida energética', 6000, 5),
+    ('Barra de proteína', 7000, 6), ('Batido de proteína', 9000, 5), ('Café', 2500, 4),
+    ('Proteína whey 2 lb', 120000, 1), ('Creatina 300 g', 95000, 1), ('Pre-entreno', 110000, 1),
+    ('Guantes', 45000, 1), ('Toalla', 25000, 1), ('Candado', 15000, 1),
+    ('Shaker', 20000, 1), ('Banda elástica', 30000, 1), ('Camiseta del gimnasio', 40000, 1),
+]
+CATEGORIAS = {'Agua': 'Bebidas', 'Bebida': 'Bebidas', 'Café': 'Bebidas', 'Barra': 'Snacks', 'Batido': 'Bebidas',
+              'Proteína': 'Suplementos', 'Creatina': 'Suplementos', 'Pre-entreno': 'Suplementos'}
+
+NOMBRES = ('Ana', 'Andrés', 'Camila', 'Carlos', 'Daniela', 'David', 'Diana', 'Felipe', 'Juan', 'Juliana',
+           'Laura', 'Luis', 'María', 'Mateo', 'Natalia', 'Santiago', 'Sofía', 'Valentina', 'Jorge', 'Paula')
+APELLIDOS = ('Gómez', 'Rodríguez', 'Martínez', 'López', 'García', 'Hernández', 'Pérez', 'Sánchez', 'Ramírez',
+             'Torres', 'Díaz', 'Vargas', 'Moreno', 'Castro', 'Rojas', 'Ortiz', 'Jiménez', 'Muñoz', 'Suárez', 'Mejía')
+
+# Filas que se acumulan antes de cada executemany
+FILAS_POR_LOTE = 50000
+
+
+class ErrorDatosSinteticos(Exception):
+    """La base de datos de destino no está vacía"""
+
+
+def _sentencia(tabla, columnas):
+    """INSERT compilado una vez para pasar las filas como tuplas al driver"""
+    return str(tabla.insert().compile(dialect=db.engine.dialect, column_keys=list(columnas)))
+
+
+def _quitar_indices(conexion, modelos):
+    """
+    Elimina los índices secundarios de las tablas y devuelve el DDL para recrearlos.
+
+    Crear un índice al final (ordenando una vez) es mucho más rápido que
+    mantenerlo durante millones de inserciones en orden aleatorio.
+    """
+    # No se usan objetos Index: quedarían ligados a las tablas del modelo y create_all los repetiría
+    citar = conexion.dialect.identifier_preparer.quote
+    indices = []
+    inspector = inspect(conexion)
+    for modelo in modelos:
+        tabla = modelo.__table__.name
+        for indice in inspector.get_indexes(tabla):
+            if indice['unique']:
+                continue
+            columnas = ', '.join(citar(columna) for columna in indice['column_names'])
+            indices.append(f"CREATE INDEX {citar(indice['name'])} ON {citar(tabla)} ({columnas})")
+            conexion.exec_driver_sql(f"DROP INDEX {citar(indice['name'])}")
+    return indices
+
+
+class _Insertador:
+    """Acumula filas de una tabla y las envía en bloques con ``executemany``"""
+
+    def __init__(self, conexion, modelo, columnas):
+        self.conexion = conexion
+        self.sql = _sentencia(modelo.__table__, columnas)
+        self.filas = []
+        self.total = 0
+
+    def agregar(self, fila):
+        self.filas.append(fila)
+        if len(self.filas) >= FILAS_POR_LOTE:
+            self.vaciar()
+
+    def vaciar(self):
+        if self.filas:
+            self.conexion.exec_driver_sql(self.sql, self.filas)
+            self.total += len(self.filas)
+            self.filas = []
+
+
+def generar_gimnasio(socios=5000, años=2, semilla=42, hasta=None, progreso=None):
+    """
+    Simula la historia del gimnasio en la base de datos de la aplicación actual.
+
+    Args:
+        socios: Socios inscritos durante todo el período
+        años: Años de historia hasta ``hasta``
+        semilla: Semilla del generador aleatorio
+        hasta: Último día simulado (hoy por defecto)
+        progreso: Función opcional que recibe un mensaje de avance
+
+    Returns:
+        dict con las filas insertadas en cada tabla y los segundos empleados
+
+    Raises:
+        ErrorDatosSinteticos: Si ya hay socios en la base de datos
+    """
+    inicio_reloj = time.perf_counter()
+    aviso = progreso or (lambda mensaje: None)
+    if db.session.query(func.count(Usuario.id)).scalar():
+        raise ErrorDatosSinteticos("La base de datos ya tiene socios; use un archivo nuevo")
+    db.session.remove()
+
+    azar = random.Random(semilla)
+    hasta = hasta or date_colombia()
+    total_dias = int(años * 365)
+    primer_dia = hasta - timedelta(days=total_dias - 1)
+
+    # Textos de fechas en el formato que guarda SQLAlchemy en SQLite, calculados una sola vez
+    # (con un mes de margen para el vencimiento de los últimos pagos)
+    dias = [primer_dia + timedelta(days=d) for d in range(total_dias + 31)]
+    textos_dia = [dia.isoformat() for dia in dias]
+    horas = [f' {minuto // 60:02d}:{minuto % 60:02d}:{segundo:02d}.000000'
+             for minuto in range(5 * 60, 21 * 60) for segundo in range(0, 60, 5)]
+    factor_dia = [FACTOR_MES[dia.month - 1] * FACTOR_SEMANA[dia.weekday()] for dia in dias]
+
+    # Socios: día de inscripción (ordenados para que los ID sigan la cronología) y permanencia
+    pesos = [FACTOR_INSCRIPCION[dia.month - 1] for dia in dias[:total_dias]]
+    ingresos = sorted(azar.choices(range(total_dias), weights=pesos, k=socios))
+    nombres_plan = list(PLANES)
+    pesos_plan = [PLANES_SINTETICOS[plan][2] for plan in nombres_plan]
+
+    # (id, plan, frecuencia diaria, método, día de salida) y salidas agrupadas por día
+    fichas = []
+    altas_por_dia = [[] for _ in range(total_dias)]
+    for numero, ingreso in enumerate(ingresos, start=1):
+        plan = azar.choices(nombres_plan, weights=pesos_plan)[0]
+        salida = ingreso + int(azar.expovariate(1 / PERMANENCIA_MEDIA_DIAS)) + 7
+        frecuencia = azar.choice((1, 2, 2, 3, 3, 3, 4, 5)) / 7
+        fichas.append([numero, plan, frecuencia, azar.choice(METODOS_PAGO), salida, -1])
+        altas_por_dia[ingreso].append(numero - 1)
+
+    with db.engine.connect() as conexion:
+        # Carga masiva: no hace falta sincronizar el disco en cada página de una base nueva.
+        # La conexión vuelve al pool, así que al terminar se restauran los valores del perfil.
+        previos = {pragma: conexion.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+                   for pragma in ('synchronous', 'cache_size')}
+        conexion.exec_driver_sql('PRAGMA synchronous=OFF')
+        conexion.exec_driver_sql('PRAGMA cache_size=-200000')
+        try:
+            with conexion.begin():
+                resultado = _simular(conexion, azar, socios, total_dias, textos_dia, horas,
+                                     factor_dia, ingresos, fichas, altas_por_dia, aviso)
+        finally:
+            for pragma, valor in previos.items():
+                conexion.exec_driver_sql(f'PRAGMA {pragma}={valor}')
+
+    resultado['segundos'] = round(time.perf_counter() - inicio_reloj, 2)
+    return resultado
+
+
+def _simular(conexion, azar, socios, total_dias, textos_dia, horas, factor_dia, ingresos, fichas,
+             altas_por_dia, aviso):
+    """Avanza día a día insertando asistencias, renovaciones y ventas"""
+    aleatorio = azar.random
+    conexion.exec_driver_sql(
+        _sentencia(Producto.__table__, ('nombre', 'precio', 'stock', 'categoria', 'fecha_creacion')),
+        [(nombre, a_centavos(precio), STOCK_INICIAL, CATEGORIAS.get(nombre.split()[0], 'Accesorios'),
+          textos_dia[0] + ' 08:00:00.000000') for nombre, precio, _ in PRODUCTOS])
+    productos = list(range(len(PRODUCTOS)))
+    popularidad = [peso for _, _, peso in PRODUCTOS]
+    stock = [STOCK_INICIAL] * len(PRODUCTOS)
+
+    indices = _quitar_indices(conexion, (Asistencia, PagoMensualidad, VentaProducto))
+
+    aviso(f"Insertando {socios} socios")
+    conexion.exec_driver_sql(
+        _sentencia(Usuario.__table__, ('nombre', 'telefono', 'plan', 'fecha_ingreso', 'metodo_pago', 'precio_plan')),
+        [(f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}', f'3{numero:09d}',
+          plan, textos_dia[ingresos[numero - 1]], metodo, a_centavos(PLANES_SINTETICOS[plan][0]))
+         for numero, plan, _, metodo, _, _ in fichas])
+
+    asistencias = _Insertador(conexion, Asistencia, ('usuario_id', 'fecha'))
+    pagos = _Insertador(conexion, PagoMensualidad, ('usuario_id', 'fecha_pago', 'monto', 'metodo_pago',
+                                                    'plan', 'fecha_inicio', 'fecha_fin'))
+    ventas = _Insertador(conexion, VentaProducto, ('producto_id', 'usuario_id', 'cantidad', 'precio_unitario',
+                                                   'total', 'metodo_pago', 'fecha'))
+
+    def vender(usuario_id, texto_fecha, metodo):
+        indice = azar.choices(productos, weights=popularidad)[0]
+        cantidad = 1 if aleatorio() < 0.85 else 2
+        precio = a_centavos(PRODUCTOS[indice][1])
+        stock[indice] -= cantidad
+        if stock[indice] < STOCK_MINIMO:
+            stock[indice] += LOTE_REPOSICION
+        ventas.agregar((indice + 1, usuario_id, cantidad, precio, precio * cantidad, metodo, texto_fecha))
+
+    activos = []
+    cantidad_horas = len(horas)
+    for d in range(total_dias):
+        activos.extend(fichas[i] for i in altas_por_dia[d])
+        activos = [ficha for ficha in activos if ficha[4] >= d]
+        factor = factor_dia[d]
+        texto_dia = textos_dia[d]
+        visitas = []
+        for ficha in activos:
+            # El día de la inscripción siempre viene (y paga)
+            if ficha[5] < 0 or aleatorio() < ficha[2] * factor:
+                visitas.append((int(aleatorio() * cantidad_horas), ficha))
+        visitas.sort(key=lambda visita: visita[0])
+
+        for minuto, ficha in visitas:
+            numero, plan, _, metodo, _, vence = ficha
+            texto_fecha = texto_dia + horas[minuto]
+            # Renueva al llegar con el plan vencido (el plan Diario paga cada visita)
+            if vence < d:
+                precio, vigencia, _ = PLANES_SINTETICOS[plan]
+                ficha[5] = d + vigencia
+                pagos.agregar((numero, texto_fecha, a_centavos(precio), metodo, plan, texto_dia, textos_dia[d + vigencia]))
+            asistencias.agregar((numero, texto_fecha))
+            if aleatorio() < PROBABILIDAD_COMPRA:
+                vender(numero, texto_fecha, metodo)
+
+        for _ in range(int(aleatorio() * 2 * VENTAS_SIN_SOCIO_POR_DIA * factor + 0.5)):
+            vender(None, texto_dia + horas[int(aleatorio() * cantidad_horas)], 'Efectivo')
+
+        if d % 182 == 0:
+            aviso(f"{texto_dia}: {asistencias.total + len(asistencias.filas)} asistencias")
+
+    for insertador in (asistencias, pagos, ventas):
+        insertador.vaciar()
+    aviso("Creando índices")
+    for indice in indices:
+        conexion.exec_driver_sql(indice)
+
+    # Vencimiento del plan de cada socio según su último pago
+    conexion.exec_driver_sql('UPDATE usuario SET fecha_vencimiento_plan = ? WHERE id = ?',
+                             [(textos_dia[ficha[5]], ficha[0]) for ficha in fichas])
+    conexion.exec_driver_sql('UPDATE producto SET stock = ? WHERE id = ?',
+                             [(valor, indice + 1) for indice, valor in enumerate(stock)])
+
+    aviso("Reconstruyendo el resumen diario")
+    reconstruir_en_conexion(conexion)
+
+    return {'usuarios': socios, 'asistencias': asistencias.total, 'pagos': pagos.total,
+            'ventas': ventas.total, 'productos': len(PRODUCTOS)}
+
+
+def generar_archivo(ruta, socios=50000, años=5, semilla=42, hasta=None, progreso=print):
+    """
+    Crea ``ruta`` con el esquema de la aplicación y la llena con datos sintéticos.
+
+    Raises:
+        ErrorDatosSinteticos: Si el archivo ya existe
+    """
+    from app_launcher import create_app
+
+    ruta = os.path.abspath(ruta)
+    if os.path.exists(ruta):
+        raise ErrorDatosSinteticos(f"{ruta} ya existe; indique un archivo nuevo")
+
+    # Comando de un solo uso: sin grupo de hilos ni cola de trabajos que retomar
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta}', 'SQL_INSTRUMENTACION': False,
+                      'SQLITE_CHECKPOINT_SEGUNDOS': 0}, trabajos=False)
+    with app.app_context():
+        resultado = generar_gimnasio(socios, años, semilla, hasta, progreso)
+        db.session.remove()
+        db.engine.dispose()
+    return resultado
@@ -0,0 +1,195 @@
+"""
+Servicio de Exportación
+=======================
+
+Exporta las tablas principales a CSV y Excel sin cargarlas completas en
+memoria. Las filas se leen por lotes (``yield_per``) seleccionando solo las
+columnas necesarias, de modo que la sesión no acumula objetos en su mapa de
+identidad.
+
+El CSV se genera por trozos para enviarlo con una respuesta en streaming: el
+navegador recibe los primeros bytes de inmediato. El Excel se escribe con
+XlsxWriter en modo ``constant_memory``, que vuelca cada fila a disco en cuanto
+se termina.
+"""
+
+import csv
+import io
+from datetime import date, datetime
+
+from sqlalchemy import case
+
+from models import db, Usuario, Asistencia, PagoMensualidad, Producto, VentaProducto
+
+# Filas leídas de la base de datos por lote
+FILAS_POR_LOTE = 1000
+
+# Filas escritas en el búfer de CSV antes de enviarlo al cliente
+FILAS_POR_TROZO = 500
+
+# Ancho máximo de columna en Excel (en caracteres)
+ANCHO_MAXIMO_COLUMNA = 60
+
+
+def _columnas_usuarios():
+    return [Usuario.id, Usuario.nombre, Usuario.telefono, Usuario.plan,
+            Usuario.fecha_ingreso, Usuario.metodo_pago, Usuario.fecha_vencimiento_plan]
+
+
+def _columnas_asistencias():
+    return [Asistencia.id, Asistencia.usuario_id, Usuario.nombre, Asistencia.fecha]
+
+
+def _columnas_pagos():
+    return [PagoMensualidad.id, Usuario.nombre, PagoMensualidad.fecha_pago, PagoMensualidad.monto,
+            PagoMensualidad.metodo_pago, PagoMensualidad.plan, PagoMensualidad.fecha_inicio,
+            PagoMensualidad.fecha_fin]
+
+
+def _columnas_productos():
+    return [Producto.id, Producto.nombre, Producto.descripcion, Producto.precio, Producto.stock,
+            Producto.categoria, Producto.fecha_creacion]
+
+
+def _columnas_ventas():
+    nombre_usuario = case((Usuario.id.is_(None), 'Sin usuario'), else_=Usuario.nombre)
+    return [VentaProducto.id, Producto.nombre, nombre_usuario, VentaProducto.cantidad,
+            VentaProducto.precio_unitario, VentaProducto.total, VentaProducto.metodo_pago,
+            VentaProducto.fecha]
+
+
+def _consulta_usuarios():
+    return db.session.query(*_columnas_usuarios()).order_by(Usuario.id)
+
+
+def _consulta_asistencias():
+    return db.session.query(*_columnas_asistencias()).join(
+        Usuario, Asistencia.usuario_id == Usuario.id).order_by(Asistencia.id)
+
+
+def _consulta_pagos():
+    return db.session.query(*_columnas_pagos()).join(
+        Usuario, PagoMensualidad.usuario_id == Usuario.id).order_by(PagoMensualidad.id)
+
+
+def _consulta_productos():
+    return db.session.query(*_columnas_productos()).order_by(Producto.id)
+
+
+def _consulta_ventas():
+    return db.session.query(*_columnas_ventas()).select_from(VentaProducto).\
+        join(Producto, VentaProducto.producto_id == Producto.id).\
+        outerjoin(Usuario, VentaProducto.usuario_id == Usuario.id).\
+        order_by(VentaProducto.id)
+
+
+# Tabla -> (título, encabezados, consulta)
+TABLAS_EXPORTACION = {
+    'usuarios': ("Usuarios Registrados",
+                 ['ID', 'Nombre', 'Teléfono', 'Plan', 'Fecha Ingreso', 'Método Pago', 'Fecha Vencimiento'],
+                 _consulta_usuarios),
+    'asistencias': ("Registro de Asistencias",
+                    ['ID', 'Usuario ID', 'Nombre Usuario', 'Fecha'],
+                    _consulta_asistencias),
+    'pagos': ("Registro de Pagos",
+              ['ID', 'Usuario', 'Fecha Pago', 'Monto', 'Método Pago', 'Plan', 'Fecha Inicio', 'Fecha Fin'],
+              _consulta_pagos),
+    'productos': ("Inventario de Productos",
+                  ['ID', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Fecha Creación'],
+                  _consulta_productos),
+    'ventas': ("Registro de Ventas",
+               ['ID', 'Producto', 'Usuario', 'Cantidad', 'Precio Unitario', 'Total', 'Método Pago', 'Fecha'],
+               _consulta_ventas),
+}
+
+
+def filas_exportacion(tabla, por_lote=FILAS_POR_LOTE):
+    """
+    Recorre las filas de una tabla exportable por lotes.
+
+    Args:
+        tabla: Una de las claves de TABLAS_EXPORTACION
+        por_lote: Filas que se traen de la base de datos en cada lote
+
+    Returns:
+        Generador de tuplas con los valores de cada fila
+    """
+    _, _, consulta = TABLAS_EXPORTACION[tabla]
+    for fila in consulta().execution_options(stream_results=True).yield_per(por_lote):
+        yield tuple(fila)
+
+
+def generar_csv(tabla, filas_por_trozo=FILAS_POR_TROZO):
+    """
+    Genera el CSV de una tabla en trozos de texto.
+
+    Pensado para ``Response(stream_with_context(generar_csv(tabla)))``: cada
+    trozo se envía al cliente en cuanto está listo.
+    """
+    _, encabezados, _ = TABLAS_EXPORTACION[tabla]
+    bufer = io.StringIO()
+    escritor = csv.writer(bufer)
+    escritor.writerow(encabezados)
+
+    pendientes = 0
+    for fila in filas_exportacion(tabla):
+        escritor.writerow(fila)
+        pendientes += 1
+        if pendientes >= filas_por_trozo:
+            yield bufer.getvalue()
+            bufer.seek(0)
+            bufer.truncate(0)
+            pendientes = 0
+    yield bufer.getvalue()
+
+
+def escribir_excel(tabla, destino):
+    """
+    Escribe una tabla en un archivo Excel con memoria constante.
+
+    Args:
+        tabla: Una de las claves de TABLAS_EXPORTACION
+        destino: Ruta del archivo .xlsx a crear
+
+    Returns:
+        Número de filas escritas (sin contar los encabezados)
+    """
+    import xlsxwriter
+
+    titulo, encabezados, _ = TABLAS_EXPORTACION[tabla]
+    libro = xlsxwriter.Workbook(destino, {'constant_memory': True})
+    try:
+        hoja = libro.add_worksheet(titulo[:31])
+        formato_encabezado = libro.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'fg_color': '#D7E4BC',
+            'border': 1
+        })
+        formato_fecha = libro.add_format({'num_format': 'yyyy-mm-dd'})
+        formato_fecha_hora = libro.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+
+        anchos = [len(encabezado) for encabezado in encabezados]
+        hoja.write_row(0, 0, encabezados, formato_encabezado)
+
+        # En modo constant_memory las filas deben escribirse en orden
+        numero = 0
+        for numero, fila in enumerate(filas_exportacion(tabla), start=1):
+            for columna, valor in enumerate(fila):
+                if valor is None:
+                    continue
+                if isinstance(valor, datetime):
+                    hoja.write_datetime(numero, columna, valor, formato_fecha_hora)
+                elif isinstance(valor, date):
+                    hoja.write_datetime(numero, columna, valor, formato_fecha)
+                else:
+                    hoja.write(numero, columna, valor)
+                anchos[columna] = max(anchos[columna], len(str(valor)))
+
+        # El ancho de columna se guarda aparte y puede fijarse al final
+        for columna, ancho in enumerate(anchos):
+            hoja.set_column(columna, columna, min(ancho, ANCHO_MAXIMO_COLUMNA) + 2)
+    finally:
+        libro.close()
+    return numero
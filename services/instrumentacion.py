@@ -0,0 +1,159 @@
+"""
+Servicio de Instrumentación SQL
+===============================
+
+Cuenta las consultas que ejecuta cada petición y el tiempo que pasan en la
+base de datos, usando los eventos ``before_cursor_execute`` y
+``after_cursor_execute`` del motor de SQLAlchemy (incluye las cargas
+perezosas que se disparan desde las plantillas).
+
+- Cada respuesta lleva las cabeceras ``X-SQL-Consultas``, ``X-SQL-Tiempo-Ms``
+  y ``Server-Timing`` (visible en la pestaña Red del navegador).
+- En modo debug, ``layouts/_consultas_sql.html`` muestra una barra con el
+  total y las sentencias más lentas de la página.
+- Las sentencias que superan ``SQL_UMBRAL_LENTA_MS`` se escriben en un log
+  rotativo (``logs/consultas_lentas.log`` junto a la base de datos). Solo se
+  guarda la sentencia, no sus parámetros, para no dejar datos de los socios
+  ni contraseñas en el log.
+"""
+
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+import config
+from models import db
+
+# Longitud máxima de una sentencia en la barra de depuración y en el log
+_LARGO_SENTENCIA = 500
+
+
+def _opcion(app, clave):
+    return app.config.get(clave, getattr(config, clave))
+
+
+def ruta_log_lentas(app):
+    """Ruta del log de consultas lentas (por defecto junto a la base de datos)"""
+    ruta = _opcion(app, 'SQL_LOG_LENTAS')
+    if ruta:
+        return ruta
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:':
+        carpeta = os.path.dirname(os.path.abspath(uri[len('sqlite:///'):]))
+    else:
+        carpeta = config.BASE_DIR
+    return os.path.join(carpeta, 'logs', 'consultas_lentas.log')
+
+
+def _crear_log_lentas(app):
+    """Logger propio de la aplicación: no depende de ``app.logger`` (desactivado en producción)"""
+    ruta = ruta_log_lentas(app)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    manejador = RotatingFileHandler(ruta, maxBytes=_opcion(app, 'SQL_LOG_LENTAS_BYTES'),
+                                    backupCount=_opcion(app, 'SQL_LOG_LENTAS_COPIAS'),
+                                    encoding='utf-8', delay=True)
+    manejador.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    registro = logging.Logger('consultas_lentas')
+    registro.addHandler(manejador)
+    return registro
+
+
+def _sentencia_corta(sentencia):
+    sentencia = ' '.join(sentencia.split())
+    if len(sentencia) > _LARGO_SENTENCIA:
+        return sentencia[:_LARGO_SENTENCIA] + '…'
+    return sentencia
+
+
+def estadisticas_consultas():
+    """
+    Consultas de la petición actual.
+
+    Returns:
+        dict con ``cantidad``, ``tiempo_ms`` y ``lentas`` (lista de
+        ``(milisegundos, sentencia)`` de mayor a menor), o None fuera de una petición
+    """
+    if not has_request_context():
+        return None
+    return g.get('_consultas_sql')
+
+
+def _anotar(app, sentencia, milisegundos):
+    """Suma la sentencia a las estadísticas de la petición y al log si es lenta"""
+    estado = app.extensions['instrumentacion_sql']
+    if milisegundos >= estado['umbral_ms']:
+        if estado['log'] is None:
+            estado['log'] = _crear_log_lentas(app)
+        origen = f'{request.method} {request.path}' if has_request_context() else 'segundo plano'
+        estado['log'].warning('%.1f ms [%s] %s', milisegundos, origen, _sentencia_corta(sentencia))
+
+    if not has_request_context():
+        return
+    datos = g.get('_consultas_sql')
+    if datos is None:
+        datos = g._consultas_sql = {'cantidad': 0, 'tiempo_ms': 0.0, 'lentas': []}
+    datos['cantidad'] += 1
+    datos['tiempo_ms'] += milisegundos
+    lentas = datos['lentas']
+    if len(lentas) < estado['mas_lentas'] or milisegundos > lentas[-1][0]:
+        lentas.append((milisegundos, sentencia))
+        lentas.sort(key=lambda lenta: lenta[0], reverse=True)
+        del lentas[estado['mas_lentas']:]
+
+
+def registrar_eventos_sql(app, engine):
+    """Mide cada sentencia que ejecuta el motor"""
+
+    def antes(conexion, cursor, sentencia, parametros, contexto, executemany):
+        conexion.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+    def despues(conexion, cursor, sentencia, parametros, contexto, executemany):
+        inicios = conexion.info.get('inicio_consultas')
+        if inicios:
+            _anotar(app, sentencia, (time.perf_counter() - inicios.pop()) * 1000)
+
+    def error(contexto):
+        # Una sentencia fallida no llega a after_cursor_execute
+        inicios = contexto.connection.info.get('inicio_consultas') if contexto.connection else None
+        if inicios:
+            inicios.pop()
+
+    event.listen(engine, 'before_cursor_execute', antes)
+    event.listen(engine, 'after_cursor_execute', despues)
+    event.listen(engine, 'handle_error', error)
+
+
+def iniciar_instrumentacion(app):
+    """Registra los eventos del motor, las cabeceras de respuesta y la barra de depuración"""
+    if not _opcion(app, 'SQL_INSTRUMENTACION'):
+        return
+    app.extensions['instrumentacion_sql'] = {
+        'umbral_ms': _opcion(app, 'SQL_UMBRAL_LENTA_MS'),
+        'mas_lentas': _opcion(app, 'SQL_CONSULTAS_MAS_LENTAS'),
+        'log': None,
+    }
+    with app.app_context():
+        registrar_eventos_sql(app, db.engine)
+
+    # ``g`` pertenece al contexto de la aplicación, que puede durar más que una petición
+    @app.before_request
+    def reiniciar_consultas():
+        g._consultas_sql = {'cantidad': 0, 'tiempo_ms': 0.0, 'lentas': []}
+
+    @app.after_request
+    def cabeceras_consultas(respuesta):
+        datos = estadisticas_consultas() or {'cantidad': 0, 'tiempo_ms': 0.0}
+        respuesta.headers['X-SQL-Consultas'] = str(datos['cantidad'])
+        respuesta.headers['X-SQL-Tiempo-Ms'] = f"{datos['tiempo_ms']:.1f}"
+        respuesta.headers.add('Server-Timing', f"db;dur={datos['tiempo_ms']:.1f};desc=\"{datos['cantidad']} consultas\"")
+        return respuesta
+
+    # Es una función para que la barra muestre lo ejecutado hasta el final de la página,
+    # no solo lo consultado antes de empezar a renderizarla
+    @app.context_processor
+    def inyectar_consultas_sql():
+        return dict(consultas_sql=estadisticas_consultas)
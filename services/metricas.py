@@ -0,0 +1,254 @@
+"""
+Servicio de Métricas
+====================
+
+Publica en ``/metrics`` (formato de texto de Prometheus) las peticiones de
+cada blueprint y ruta: cantidad por método y código, histograma de latencia,
+errores, tiempo y consultas en la base de datos (de ``services.instrumentacion``)
+y peticiones en curso. Con ellas se ve qué rutas de ``main.*`` se degradan a
+medida que crecen los datos.
+
+Para no convertir la medición en un cuello de botella cada hilo anota en su
+propio acumulador, sin cerrojos; solo la creación del acumulador de un hilo
+nuevo y la lectura de ``/metrics`` toman un cerrojo. Los acumuladores de los
+hilos que terminaron (el servidor de desarrollo crea uno por petición) se
+suman a un acumulador común al leer las métricas.
+
+Acceso: peticiones desde el propio equipo, o con ``METRICAS_TOKEN`` en la
+cabecera ``Authorization: Bearer <token>``.
+"""
+
+import bisect
+import hmac
+import threading
+import time
+
+from flask import Response, abort, g, request
+
+import config
+from services.instrumentacion import estadisticas_consultas
+
+# Límites de los histogramas de latencia, en segundos
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_DIRECCIONES_LOCALES = ('127.0.0.1', '::1', 'localhost')
+
+
+class Acumulador:
+    """Contadores de un hilo (o la suma de los hilos que ya terminaron)"""
+
+    __slots__ = ('peticiones', 'latencias', 'errores', 'db', 'activas')
+
+    def __init__(self):
+        # (blueprint, endpoint, metodo, codigo) -> cantidad
+        self.peticiones = {}
+        # (blueprint, endpoint) -> [cantidad por límite..., +Inf, suma de segundos]
+        self.latencias = {}
+        # (blueprint, endpoint) -> cantidad
+        self.errores = {}
+        # (blueprint, endpoint) -> [consultas, segundos]
+        self.db = {}
+        # blueprint -> peticiones en curso (iniciadas menos terminadas en este hilo)
+        self.activas = {}
+
+    def sumar(self, otro):
+        for clave, valor in otro.peticiones.items():
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + valor
+        for clave, valores in otro.latencias.items():
+            propios = self.latencias.setdefault(clave, [0] * (len(LIMITES_LATENCIA) + 1) + [0.0])
+            for i, valor in enumerate(valores):
+                propios[i] += valor
+        for clave, valor in otro.errores.items():
+            self.errores[clave] = self.errores.get(clave, 0) + valor
+        for clave, (consultas, segundos) in otro.db.items():
+            propios = self.db.setdefault(clave, [0, 0.0])
+            propios[0] += consultas
+            propios[1] += segundos
+        for clave, valor in otro.activas.items():
+            self.activas[clave] = self.activas.get(clave, 0) + valor
+
+
+class Metricas:
+    """Acumuladores por hilo de una aplicación"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cerrojo = threading.Lock()
+        self._hilos = []            # [(hilo, acumulador)] de los hilos vivos
+        self._terminados = Acumulador()
+
+    def acumulador(self):
+        """Acumulador del hilo actual (lo crea la primera vez)"""
+        propio = getattr(self._local, 'acumulador', None)
+        if propio is None:
+            propio = self._local.acumulador = Acumulador()
+            with self._cerrojo:
+                self._hilos.append((threading.current_thread(), propio))
+        return propio
+
+    def inicio(self, blueprint):
+        activas = self.acumulador().activas
+        activas[blueprint] = activas.get(blueprint, 0) + 1
+
+    def fin(self, blueprint, endpoint, metodo, codigo, segundos, consultas=None):
+        propio = self.acumulador()
+        propio.activas[blueprint] = propio.activas.get(blueprint, 0) - 1
+
+        clave = (blueprint, endpoint, metodo, str(codigo))
+        propio.peticiones[clave] = propio.peticiones.get(clave, 0) + 1
+
+        ruta = (blueprint, endpoint)
+        latencias = propio.latencias.get(ruta)
+        if latencias is None:
+            latencias = propio.latencias[ruta] = [0] * (len(LIMITES_LATENCIA) + 1) + [0.0]
+        latencias[bisect.bisect_left(LIMITES_LATENCIA, segundos)] += 1
+        latencias[-1] += segundos
+
+        if codigo >= 500:
+            propio.errores[ruta] = propio.errores.get(ruta, 0) + 1
+        if consultas:
+            db = propio.db.setdefault(ruta, [0, 0.0])
+            db[0] += consultas['cantidad']
+            db[1] += consultas['tiempo_ms'] / 1000
+
+    def total(self):
+        """Suma de todos los hilos; pasa al acumulador común los hilos que terminaron"""
+        with self._cerrojo:
+            vivos = []
+            for hilo, propio in self._hilos:
+                if hilo.is_alive():
+                    vivos.append((hilo, propio))
+                else:
+                    self._terminados.sumar(propio)
+            self._hilos = vivos
+            suma = Acumulador()
+            suma.sumar(self._terminados)
+            for _, propio in vivos:
+                # Copia de los diccionarios: el hilo puede estar anotando ahora mismo
+                copia = Acumulador()
+                copia.peticiones = dict(propio.peticiones)
+                copia.latencias = {clave: list(valores) for clave, valores in list(propio.latencias.items())}
+                copia.errores = dict(propio.errores)
+                copia.db = {clave: list(valores) for clave, valores in list(propio.db.items())}
+                copia.activas = dict(propio.activas)
+                suma.sumar(copia)
+        return suma
+
+
+def _etiquetas(**valores):
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def formato_prometheus(suma):
+    """Texto de las métricas en el formato de exposición de Prometheus"""
+    lineas = [
+        '# HELP gimnasio_peticiones_total Peticiones atendidas por ruta, método y código de respuesta',
+        '# TYPE gimnasio_peticiones_total counter',
+    ]
+    for (blueprint, endpoint, metodo, codigo), valor in sorted(suma.peticiones.items()):
+        lineas.append('gimnasio_peticiones_total' + _etiquetas(
+            blueprint=blueprint, endpoint=endpoint, metodo=metodo, codigo=codigo) + f' {valor}')
+
+    lineas += [
+        '# HELP gimnasio_peticion_duracion_segundos Tiempo de respuesta por ruta',
+        '# TYPE gimnasio_peticion_duracion_segundos histogram',
+    ]
+    for (blueprint, endpoint), valores in sorted(suma.latencias.items()):
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_LATENCIA + ('+Inf',), valores):
+            acumulado += cantidad
+            lineas.append('gimnasio_peticion_duracion_segundos_bucket' + _etiquetas(
+                blueprint=blueprint, endpoint=endpoint, le=limite) + f' {acumulado}')
+        etiquetas = _etiquetas(blueprint=blueprint, endpoint=endpoint)
+        lineas.append(f'gimnasio_peticion_duracion_segundos_sum{etiquetas} {_numero(valores[-1])}')
+        lineas.append(f'gimnasio_peticion_duracion_segundos_count{etiquetas} {acumulado}')
+
+    lineas += [
+        '# HELP gimnasio_peticiones_error_total Respuestas con error del servidor (5xx) por ruta',
+        '# TYPE gimnasio_peticiones_error_total counter',
+    ]
+    for (blueprint, endpoint), valor in sorted(suma.errores.items()):
+        lineas.append('gimnasio_peticiones_error_total' + _etiquetas(
+            blueprint=blueprint, endpoint=endpoint) + f' {valor}')
+
+    lineas += [
+        '# HELP gimnasio_db_consultas_total Consultas SQL ejecutadas por ruta',
+        '# TYPE gimnasio_db_consultas_total counter',
+    ]
+    for (blueprint, endpoint), (consultas, _) in sorted(suma.db.items()):
+        lineas.append('gimnasio_db_consultas_total' + _etiquetas(
+            blueprint=blueprint, endpoint=endpoint) + f' {consultas}')
+
+    lineas += [
+        '# HELP gimnasio_db_duracion_segundos_total Tiempo en la base de datos por ruta',
+        '# TYPE gimnasio_db_duracion_segundos_total counter',
+    ]
+    for (blueprint, endpoint), (_, segundos) in sorted(suma.db.items()):
+        lineas.append('gimnasio_db_duracion_segundos_total' + _etiquetas(
+            blueprint=blueprint, endpoint=endpoint) + f' {_numero(segundos)}')
+
+    lineas += [
+        '# HELP gimnasio_peticiones_activas Peticiones en curso por blueprint',
+        '# TYPE gimnasio_peticiones_activas gauge',
+    ]
+    for blueprint, valor in sorted(suma.activas.items()):
+        lineas.append('gimnasio_peticiones_activas' + _etiquetas(blueprint=blueprint) + f' {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _blueprint_actual():
+    """Blueprint más interno de la petición (``usuarios`` para ``main.usuarios.*``)"""
+    blueprint = request.blueprint
+    return blueprint.rsplit('.', 1)[-1] if blueprint else 'app'
+
+
+def _autorizado(app):
+    token = app.config.get('METRICAS_TOKEN', config.METRICAS_TOKEN)
+    if token:
+        recibido = request.headers.get('Authorization', '')
+        return hmac.compare_digest(recibido.encode(), f'Bearer {token}'.encode())
+    return request.remote_addr in _DIRECCIONES_LOCALES
+
+
+def iniciar_metricas(app):
+    """Registra la medición de cada petición y la ruta ``/metrics``"""
+    if not app.config.get('METRICAS', config.METRICAS):
+        return
+    metricas = app.extensions['metricas'] = Metricas()
+
+    @app.before_request
+    def iniciar_medicion():
+        g._metricas_inicio = time.perf_counter()
+        g._metricas_blueprint = _blueprint_actual()
+        g._metricas_codigo = 500
+        metricas.inicio(g._metricas_blueprint)
+
+    @app.after_request
+    def anotar_codigo(respuesta):
+        g._metricas_codigo = respuesta.status_code
+        return respuesta
+
+    @app.teardown_request
+    def terminar_medicion(error=None):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is None:
+            return
+        codigo = 500 if error is not None else g.pop('_metricas_codigo', 500)
+        metricas.fin(g.pop('_metricas_blueprint'), request.endpoint or 'sin_ruta', request.method,
+                     codigo, time.perf_counter() - inicio, estadisticas_consultas())
+
+    def exportar_metricas():
+        if not _autorizado(app):
+            abort(403)
+        return Response(formato_prometheus(metricas.total()),
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metricas', exportar_metricas)
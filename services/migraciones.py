@@ -0,0 +1,141 @@
+"""
+Servicio de Migraciones
+=======================
+
+Aplica cambios de esquema numerados a bases de datos existentes. La versión
+actual se guarda en la tabla ``schema_version``; al iniciar solo se lee la
+versión máxima (una lectura por clave primaria) y, si hay migraciones
+pendientes, se aplican todas en una única transacción: si alguna falla, la
+base de datos queda como estaba.
+
+Para añadir un cambio de esquema basta con escribir una función que reciba la
+conexión y registrarla al final de ``MIGRACIONES`` con el siguiente número.
+Las tablas nuevas las crea ``db.create_all()``; las migraciones solo deben
+modificar tablas existentes o transformar datos.
+"""
+
+from sqlalchemy import inspect, select, func, text
+
+from models import db, VersionEsquema, datetime_colombia
+from .resumen_diario import reconstruir_en_conexion
+from .consultas import dialecto, citar
+
+# Columnas monetarias que pasan de pesos (REAL/FLOAT) a centavos enteros
+_COLUMNAS_DINERO = (
+    ('usuario', 'precio_plan'),
+    ('producto', 'precio'),
+    ('pago_mensualidad', 'monto'),
+    ('venta_producto', 'precio_unitario'),
+    ('venta_producto', 'total'),
+)
+_COLUMNAS_RESUMEN = (
+    ('resumen_diario', 'total_membresias'),
+    ('resumen_diario', 'total_productos'),
+    ('resumen_diario_metodo', 'total_membresias'),
+    ('resumen_diario_metodo', 'total_productos'),
+)
+
+
+def _columnas(conexion, tabla):
+    return {columna['name'] for columna in inspect(conexion).get_columns(tabla)}
+
+
+def _estado_objetivos(conexion):
+    if 'estado' not in _columnas(conexion, 'objetivo_personal'):
+        conexion.execute(text(
+            "ALTER TABLE objetivo_personal ADD COLUMN estado VARCHAR(20) DEFAULT 'En progreso'"
+        ))
+
+
+def _fecha_completado_objetivos(conexion):
+    if 'fecha_completado' not in _columnas(conexion, 'objetivo_personal'):
+        conexion.execute(text("ALTER TABLE objetivo_personal ADD COLUMN fecha_completado DATE"))
+
+
+def _indices_secundarios(conexion):
+    inspector = inspect(conexion)
+    for tabla in db.metadata.sorted_tables:
+        existentes = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name not in existentes:
+                indice.create(bind=conexion)
+    # Actualizar estadísticas para que el planificador use los nuevos índices
+    conexion.execute(text('ANALYZE'))
+
+
+def _resumen_diario(conexion):
+    reconstruir_en_conexion(conexion)
+
+
+def _montos_en_centavos(conexion):
+    if dialecto(conexion) == 'postgresql':
+        for tabla, columna in _COLUMNAS_DINERO:
+            conexion.execute(text(
+                f"ALTER TABLE {citar(tabla, conexion)} ALTER COLUMN {citar(columna, conexion)} "
+                f"TYPE BIGINT USING ROUND({citar(columna, conexion)} * 100)"
+            ))
+        for tabla, columna in _COLUMNAS_RESUMEN:
+            conexion.execute(text(
+                f"ALTER TABLE {citar(tabla, conexion)} ALTER COLUMN {citar(columna, conexion)} TYPE BIGINT"
+            ))
+    else:
+        # SQLite no cambia el tipo declarado de una columna; los valores quedan enteros
+        for tabla, columna in _COLUMNAS_DINERO:
+            columna = citar(columna, conexion)
+            conexion.execute(text(
+                f"UPDATE {citar(tabla, conexion)} SET {columna} = CAST(ROUND({columna} * 100) AS INTEGER) "
+                f"WHERE {columna} IS NOT NULL"
+            ))
+    # El resumen se recalcula desde los montos ya convertidos
+    reconstruir_en_conexion(conexion)
+
+
+# (versión, descripción, función). Nunca renumerar ni eliminar entradas.
+MIGRACIONES = [
+    (1, "Columna estado en objetivo_personal", _estado_objetivos),
+    (2, "Columna fecha_completado en objetivo_personal", _fecha_completado_objetivos),
+    (3, "Índices en columnas de fecha y claves foráneas", _indices_secundarios),
+    (4, "Resumen diario a partir del historial", _resumen_diario),
+    (5, "Índice en usuario.nombre para el listado paginado", _indices_secundarios),
+    (6, "Índices de pagos y compras por socio para la ficha del socio", _indices_secundarios),
+    (7, "Montos en centavos enteros", _montos_en_centavos),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def version_esquema(conexion):
+    """Versión aplicada a la base de datos (0 si nunca se migró)"""
+    return conexion.execute(select(func.max(VersionEsquema.version))).scalar() or 0
+
+
+def aplicar_migraciones(engine=None):
+    """
+    Aplica las migraciones pendientes en una sola transacción.
+
+    La tabla ``schema_version`` la crea ``db.create_all()`` al iniciar la
+    aplicación, junto con el resto de tablas.
+
+    Returns:
+        Lista de (versión, descripción) de las migraciones aplicadas
+    """
+    engine = engine or db.engine
+    with engine.connect() as conexion:
+        version = version_esquema(conexion)
+        pendientes = [m for m in MIGRACIONES if m[0] > version]
+        if not pendientes:
+            return []
+
+        # pysqlite no abre transacción antes de DDL: emitir BEGIN explícito para
+        # que los ALTER TABLE y CREATE INDEX también se reviertan si algo falla.
+        conexion = conexion.execution_options(isolation_level='AUTOCOMMIT')
+        with conexion.begin():
+            conexion.exec_driver_sql('BEGIN')
+            for numero, descripcion, migracion in pendientes:
+                migracion(conexion)
+                conexion.execute(VersionEsquema.__table__.insert().values(
+                    version=numero, descripcion=descripcion,
+                    fecha_aplicacion=datetime_colombia()
+                ))
+
+    return [(numero, descripcion) for numero, descripcion, _ in pendientes]
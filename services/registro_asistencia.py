@@ -0,0 +1,421 @@
+"""
+Servicio de Registro de Asistencia
+==================================
+
+Registro rápido de asistencias para las horas pico de recepción.
+
+Cada proceso guarda en memoria quién ya registró asistencia hoy (se
+reconstruye con una sola consulta al cambiar el día), así que repetir el
+registro de un socio no toca la base de datos. Para los demás, la asistencia
+se inserta con una única sentencia ``INSERT ... SELECT ... WHERE NOT EXISTS``:
+la comprobación de "una asistencia por día" y la inserción ocurren dentro de
+la misma escritura. En SQLite las escrituras se serializan, así que dos
+terminales que registran al mismo socio a la vez nunca crean dos filas. En
+PostgreSQL (READ COMMITTED) dos transacciones podrían no ver la fila de la
+otra, por lo que antes de insertar se toma un bloqueo consultivo por socio
+(``pg_advisory_xact_lock``, liberado al terminar la transacción): la segunda
+espera a que la primera confirme y su ``NOT EXISTS`` ya ve la asistencia.
+No se usa un índice único porque las bases de datos antiguas pueden tener
+asistencias repetidas del mismo día.
+
+Los kioscos que guardan escaneos sin conexión los envían después con
+``registrar_lote``: cada evento trae la hora del escaneo y una clave de
+idempotencia (guardada en ``evento_kiosco``), y todo el lote se inserta en
+una transacción con inserciones en bloque.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from flask import current_app
+from sqlalchemy import select, exists, bindparam, func
+from sqlalchemy.exc import OperationalError, IntegrityError
+
+import config
+from models import db, Usuario, Asistencia, EventoKiosco, datetime_colombia
+from .consultas import dialecto
+from .resumen_diario import sumar_asistencias
+
+# Reintentos si otra conexión escribió entre la lectura y la escritura de SQLite
+_REINTENTOS = 3
+
+# Primera clave de los bloqueos consultivos de PostgreSQL (la segunda es el socio)
+_ESPACIO_BLOQUEO = 0x41534953
+
+
+class UsuarioNoEncontrado(LookupError):
+    """No existe un socio con el id o teléfono indicado"""
+
+
+def limites_dia(dia):
+    """Inicio del día y del día siguiente, para filtrar ``Asistencia.fecha`` por rango"""
+    inicio = datetime.combine(dia, datetime.min.time())
+    return inicio, inicio + timedelta(days=1)
+
+
+class RegistroDelDia:
+    """Socios con asistencia registrada hoy: usuario_id -> fecha y hora de la asistencia"""
+
+    def __init__(self):
+        self.dia = None
+        self.registrados = {}
+        self.bloqueo = threading.Lock()
+
+    def _cargar(self, dia):
+        inicio, fin = limites_dia(dia)
+        filas = db.session.execute(
+            select(Asistencia.usuario_id, func.min(Asistencia.fecha))
+            .where(Asistencia.fecha >= inicio, Asistencia.fecha < fin)
+            .group_by(Asistencia.usuario_id)
+        )
+        self.registrados = {usuario_id: fecha for usuario_id, fecha in filas}
+        self.dia = dia
+
+    def consultar(self, usuario_id, dia):
+        """Fecha y hora de la asistencia de hoy del socio, o None"""
+        with self.bloqueo:
+            if self.dia != dia:
+                self._cargar(dia)
+            return self.registrados.get(usuario_id)
+
+    def anotar(self, usuario_id, fecha):
+        with self.bloqueo:
+            if self.dia == fecha.date():
+                self.registrados.setdefault(usuario_id, fecha)
+
+    def reiniciar(self):
+        """Obliga a releer la base de datos (tras restaurarla o borrar asistencias)"""
+        with self.bloqueo:
+            self.dia = None
+            self.registrados = {}
+
+
+def registro_del_dia(app=None):
+    app = app or current_app._get_current_object()
+    return app.extensions.setdefault('registro_asistencia', RegistroDelDia())
+
+
+def reiniciar_registro_del_dia(app=None):
+    registro_del_dia(app).reiniciar()
+
+
+def buscar_socio(usuario_id=None, telefono=None):
+    """
+    Busca un socio por id o por teléfono con una sola consulta indexada.
+
+    Raises:
+        UsuarioNoEncontrado: Si no existe
+    """
+    consulta = select(Usuario.id, Usuario.nombre, Usuario.plan, Usuario.fecha_vencimiento_plan)
+    if usuario_id is not None:
+        consulta = consulta.where(Usuario.id == usuario_id)
+    elif telefono:
+        consulta = consulta.where(Usuario.telefono == telefono.strip())
+    else:
+        raise UsuarioNoEncontrado("Indique el id o el teléfono del socio")
+    socio = db.session.execute(consulta).first()
+    if socio is None:
+        raise UsuarioNoEncontrado(f"No se encontró el socio {usuario_id or telefono}")
+    return socio
+
+
+def _sentencia_insertar():
+    """``INSERT ... SELECT`` que solo inserta si el socio no tiene asistencia ese día"""
+    usuario_id = bindparam('usuario_id', type_=db.Integer)
+    ya_registrado = exists().where(
+        Asistencia.usuario_id == usuario_id,
+        Asistencia.fecha >= bindparam('inicio', type_=db.DateTime),
+        Asistencia.fecha < bindparam('fin', type_=db.DateTime),
+    )
+    return Asistencia.__table__.insert().from_select(
+        ['usuario_id', 'fecha'],
+        select(usuario_id, bindparam('fecha', type_=db.DateTime)).where(~ya_registrado)
+    )
+
+
+def _sentencia_bloqueo():
+    """Bloqueo consultivo de PostgreSQL de un socio hasta el fin de la transacción"""
+    return select(func.pg_advisory_xact_lock(bindparam('espacio', type_=db.Integer),
+                                             bindparam('usuario_id', type_=db.Integer)))
+
+
+def bloquear_socios(usuario_ids):
+    """
+    En PostgreSQL, serializa el registro de los socios indicados hasta que
+    termine la transacción. En SQLite no hace nada: la escritura ya es exclusiva.
+    """
+    conexion = db.session.connection()
+    if dialecto(conexion) != 'postgresql':
+        return
+    # Siempre en el mismo orden, para que dos lotes no se bloqueen mutuamente
+    for usuario_id in sorted(set(usuario_ids)):
+        conexion.execute(_sentencia_bloqueo(), {'espacio': _ESPACIO_BLOQUEO, 'usuario_id': usuario_id})
+
+
+def _parametros_insertar(usuario_id, fecha):
+    inicio, fin = limites_dia(fecha.date())
+    return {'usuario_id': usuario_id, 'fecha': fecha, 'inicio': inicio, 'fin': fin}
+
+
+def insertar_si_no_registrado(usuario_id, fecha):
+    """
+    Inserta la asistencia si el socio no tiene otra ese día, en una sola sentencia.
+
+    Returns:
+        True si se insertó la fila
+    """
+    bloquear_socios([usuario_id])
+    return db.session.execute(_sentencia_insertar(), _parametros_insertar(usuario_id, fecha)).rowcount == 1
+
+
+def registrar_asistencia(usuario_id=None, telefono=None):
+    """
+    Registra la asistencia de hoy de un socio, una sola vez por día.
+
+    Returns:
+        Diccionario con ``registrada`` (False si ya tenía asistencia hoy),
+        ``fecha`` de la asistencia y los datos del socio
+
+    Raises:
+        UsuarioNoEncontrado: Si el socio no existe
+    """
+    socio = buscar_socio(usuario_id, telefono)
+    registro = registro_del_dia()
+    ahora = datetime_colombia()
+
+    fecha = registro.consultar(socio.id, ahora.date())
+    registrada = False
+    if fecha is None:
+        for intento in range(_REINTENTOS):
+            try:
+                registrada = insertar_si_no_registrado(socio.id, ahora)
+                if registrada:
+                    sumar_asistencias(db.session.connection(), {ahora.date(): 1})
+                db.session.commit()
+                break
+            except OperationalError:
+                # SQLite en WAL rechaza la escritura si otra conexión escribió primero
+                db.session.rollback()
+                if intento == _REINTENTOS - 1:
+                    raise
+                time.sleep(0.005 * (intento + 1))
+
+        if registrada:
+            fecha = ahora
+        else:
+            # Otra terminal (u otro proceso) lo registró antes
+            inicio, fin = limites_dia(ahora.date())
+            fecha = db.session.execute(
+                select(func.min(Asistencia.fecha))
+                .where(Asistencia.usuario_id == socio.id, Asistencia.fecha >= inicio, Asistencia.fecha < fin)
+            ).scalar()
+        registro.anotar(socio.id, fecha)
+
+    dias_restantes = None
+    if socio.fecha_vencimiento_plan:
+        dias_restantes = (socio.fecha_vencimiento_plan - ahora.date()).days
+    return {
+        'registrada': registrada,
+        'fecha': fecha,
+        'usuario': {
+            'id': socio.id,
+            'nombre': socio.nombre,
+            'plan': socio.plan,
+            'dias_restantes': dias_restantes,
+            'vencido': dias_restantes is not None and dias_restantes < 0,
+        },
+    }
+
+
+class ErrorLote(ValueError):
+    """El envío del kiosco no tiene el formato esperado"""
+
+
+class _CarreraLote(Exception):
+    """Otra conexión registró asistencias del lote entre la comprobación y la inserción"""
+
+
+# Valores por consulta ``IN`` (las versiones antiguas de SQLite admiten 999 parámetros)
+_TAMAÑO_BLOQUE = 500
+
+# Diferencia de reloj tolerada entre el kiosco y el servidor
+_TOLERANCIA_FUTURO = timedelta(minutes=5)
+
+# Largo máximo del nombre de la terminal (columna ``evento_kiosco.terminal``)
+_LARGO_TERMINAL = EventoKiosco.__table__.c.terminal.type.length
+
+
+def _bloques(valores, tamaño=_TAMAÑO_BLOQUE):
+    valores = list(valores)
+    for i in range(0, len(valores), tamaño):
+        yield valores[i:i + tamaño]
+
+
+def _fecha_kiosco(valor):
+    """Fecha ISO 8601 del kiosco en hora de Colombia (con o sin zona horaria)"""
+    fecha = datetime.fromisoformat(str(valor).strip().replace('Z', '+00:00'))
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(pytz.timezone('America/Bogota')).replace(tzinfo=None)
+    return fecha
+
+
+def _leer_eventos(eventos, ahora, max_dias):
+    """
+    Valida los eventos del envío.
+
+    Returns:
+        (resultados en el orden recibido, clave -> evento válido). Una clave
+        repetida dentro del envío comparte el resultado de su primera aparición.
+    """
+    resultados, validos, por_clave = [], {}, {}
+    antiguedad_maxima = ahora - timedelta(days=max_dias)
+    for evento in eventos:
+        evento = evento if isinstance(evento, dict) else {}
+        clave = str(evento.get('clave') or '').strip()
+        if clave in por_clave:
+            resultados.append(por_clave[clave])
+            continue
+
+        resultado = {'clave': clave or None, 'estado': 'rechazada', 'usuario_id': None}
+        resultados.append(resultado)
+        if not clave or len(clave) > 64:
+            resultado['mensaje'] = 'Falta la clave del evento (máximo 64 caracteres)'
+            continue
+        por_clave[clave] = resultado
+
+        try:
+            usuario_id = int(evento['usuario_id']) if evento.get('usuario_id') not in (None, '') else None
+            fecha = _fecha_kiosco(evento['fecha']) if evento.get('fecha') else ahora
+        except (TypeError, ValueError):
+            resultado['mensaje'] = 'usuario_id o fecha con formato inválido'
+            continue
+        telefono = str(evento.get('telefono') or '').strip() or None
+        if usuario_id is None and telefono is None:
+            resultado['mensaje'] = 'Indique el id o el teléfono del socio'
+        elif fecha > ahora + _TOLERANCIA_FUTURO:
+            resultado['mensaje'] = 'La fecha del escaneo está en el futuro'
+        elif fecha < antiguedad_maxima:
+            resultado['mensaje'] = f'El escaneo tiene más de {max_dias} días'
+        else:
+            resultado['fecha'] = fecha
+            validos[clave] = {'usuario_id': usuario_id, 'telefono': telefono, 'fecha': fecha}
+    return resultados, validos, por_clave
+
+
+def _procesar_lote(eventos, terminal, ahora, max_dias):
+    """Una pasada completa del lote dentro de la transacción de la sesión"""
+    resultados, validos, por_clave = _leer_eventos(eventos, ahora, max_dias)
+
+    # 1. Eventos ya recibidos en un envío anterior: mismo resultado, sin registrar de nuevo
+    for bloque in _bloques(validos):
+        for clave, resultado, usuario_id in db.session.execute(
+                select(EventoKiosco.clave, EventoKiosco.resultado, EventoKiosco.usuario_id)
+                .where(EventoKiosco.clave.in_(bloque))):
+            por_clave[clave].update(estado=resultado, usuario_id=usuario_id, repetido=True)
+            del validos[clave]
+
+    # 2. Socios por id y por teléfono, con una consulta por bloque
+    ids = {e['usuario_id'] for e in validos.values() if e['usuario_id'] is not None}
+    telefonos = {e['telefono'] for e in validos.values() if e['usuario_id'] is None}
+    existentes, por_telefono = set(), {}
+    for bloque in _bloques(ids):
+        existentes.update(db.session.execute(select(Usuario.id).where(Usuario.id.in_(bloque))).scalars())
+    for bloque in _bloques(telefonos):
+        por_telefono.update(db.session.execute(
+            select(Usuario.telefono, Usuario.id).where(Usuario.telefono.in_(bloque))).all())
+
+    candidatos = []
+    for clave, evento in validos.items():
+        usuario_id = evento['usuario_id'] if evento['usuario_id'] in existentes else por_telefono.get(evento['telefono'])
+        if usuario_id is None:
+            por_clave[clave]['mensaje'] = f"No se encontró el socio {evento['usuario_id'] or evento['telefono']}"
+            continue
+        por_clave[clave]['usuario_id'] = usuario_id
+        candidatos.append((evento['fecha'], clave, usuario_id))
+    candidatos.sort()
+
+    # 3. Regla de una asistencia por día: contra la base de datos y dentro del propio lote
+    vistos = set()
+    if candidatos:
+        inicio = limites_dia(candidatos[0][0].date())[0]
+        fin = limites_dia(candidatos[-1][0].date())[1]
+        for bloque in _bloques({usuario_id for _, _, usuario_id in candidatos}):
+            vistos.update((usuario_id, fecha.date()) for usuario_id, fecha in db.session.execute(
+                select(Asistencia.usuario_id, Asistencia.fecha).where(
+                    Asistencia.usuario_id.in_(bloque), Asistencia.fecha >= inicio, Asistencia.fecha < fin)))
+
+    nuevas = []
+    for fecha, clave, usuario_id in candidatos:
+        dia = (usuario_id, fecha.date())
+        por_clave[clave]['estado'] = 'duplicada' if dia in vistos else 'registrada'
+        if dia not in vistos:
+            vistos.add(dia)
+            nuevas.append((usuario_id, fecha))
+
+    # 4. Inserción en bloque; la sentencia condicionada cubre a otra terminal que
+    #    haya registrado al mismo socio después de la comprobación anterior
+    if nuevas:
+        bloquear_socios(usuario_id for usuario_id, _ in nuevas)
+        insertadas = db.session.execute(
+            _sentencia_insertar(), [_parametros_insertar(u, f) for u, f in nuevas]).rowcount
+        if insertadas != len(nuevas):
+            raise _CarreraLote()
+        conteos = {}
+        for _, fecha in nuevas:
+            conteos[fecha.date()] = conteos.get(fecha.date(), 0) + 1
+        sumar_asistencias(db.session.connection(), conteos)
+
+    recibidos = [{'clave': clave, 'usuario_id': por_clave[clave]['usuario_id'], 'fecha': fecha,
+                  'resultado': por_clave[clave]['estado'], 'terminal': terminal, 'fecha_recepcion': ahora}
+                 for fecha, clave, _ in candidatos]
+    if recibidos:
+        db.session.execute(EventoKiosco.__table__.insert(), recibidos)
+    return resultados, nuevas
+
+
+def registrar_lote(eventos, terminal=None):
+    """
+    Registra en una sola transacción las asistencias que un kiosco guardó sin conexión.
+
+    Cada evento trae ``clave`` (de idempotencia), ``usuario_id`` o ``telefono``
+    y ``fecha`` (hora del escaneo en el kiosco). Reenviar un evento ya recibido
+    devuelve el mismo resultado sin registrarlo otra vez.
+
+    Returns:
+        Resultados en el orden de los eventos, con ``clave``, ``estado``
+        (registrada, duplicada o rechazada), ``usuario_id`` y, según el caso,
+        ``fecha``, ``repetido`` o ``mensaje``
+
+    Raises:
+        ErrorLote: Si el envío no es una lista, supera el máximo de eventos o
+            la terminal no es un texto de hasta 50 caracteres
+    """
+    max_eventos = current_app.config.get('ASISTENCIA_LOTE_MAX_EVENTOS', config.ASISTENCIA_LOTE_MAX_EVENTOS)
+    max_dias = current_app.config.get('ASISTENCIA_LOTE_MAX_DIAS', config.ASISTENCIA_LOTE_MAX_DIAS)
+    if not isinstance(eventos, list):
+        raise ErrorLote("Se esperaba una lista de eventos")
+    if len(eventos) > max_eventos:
+        raise ErrorLote(f"El envío tiene {len(eventos)} eventos; el máximo es {max_eventos}")
+    if terminal is not None and (not isinstance(terminal, str) or len(terminal) > _LARGO_TERMINAL):
+        raise ErrorLote(f"La terminal debe ser un texto de máximo {_LARGO_TERMINAL} caracteres")
+
+    ahora = datetime_colombia()
+    for intento in range(_REINTENTOS):
+        try:
+            resultados, nuevas = _procesar_lote(eventos, terminal, ahora, max_dias)
+            db.session.commit()
+            break
+        except (OperationalError, IntegrityError, _CarreraLote):
+            # Escritura concurrente (o el mismo lote reenviado a la vez): repetir
+            # desde el principio, ahora viendo lo que la otra conexión guardó
+            db.session.rollback()
+            if intento == _REINTENTOS - 1:
+                raise
+            time.sleep(0.005 * (intento + 1))
+
+    registro = registro_del_dia()
+    for usuario_id, fecha in nuevas:
+        registro.anotar(usuario_id, fecha)
+    return resultados
@@ -0,0 +1,184 @@
+"""
+Servicio de Reporte Financiero
+==============================
+
+Calcula los totales y desgloses del informe financiero (``/finanzas/exportar``)
+sin cargar objetos del ORM, para que un informe anual o de varios años tarde
+lo mismo que uno mensual:
+
+- De cada pago y cada venta del período se leen solo las columnas necesarias
+  como tuplas: el día (como número de días desde el inicio del período,
+  calculado en SQL con ``consultas.dias_hasta``), el monto en centavos enteros
+  (sin pasar por ``models.Dinero``), el método de pago y el plan o la
+  categoría del producto.
+- Con NumPy las columnas se agrupan con ``unique`` y ``bincount``; la serie
+  diaria es un ``bincount`` sobre el número de día. Sin NumPy se usa un
+  diccionario por grupo con el mismo resultado.
+- Los montos se convierten a ``Decimal`` una sola vez por grupo al final.
+
+El detalle fila por fila del informe también se lee como tuplas
+(``detalle_pagos`` y ``detalle_ventas``).
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, type_coerce
+
+from models import db, Usuario, PagoMensualidad, VentaProducto, Producto, desde_centavos
+from .consultas import dias_hasta, rango_fechas
+from .resumen_diario import METODO_SIN_ESPECIFICAR
+
+# NumPy acelera la agrupación de periodos largos, pero es una dependencia opcional
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PLAN_SIN_ESPECIFICAR = 'Sin plan'
+CATEGORIA_SIN_ESPECIFICAR = 'General'
+CLIENTE_NO_REGISTRADO = 'Cliente no registrado'
+
+
+@dataclass
+class ReporteFinanciero:
+    """Totales y desgloses de un período (montos en Decimal)"""
+    desde: object
+    hasta: object
+    total_membresias: Decimal = Decimal('0.00')
+    total_productos: Decimal = Decimal('0.00')
+    cantidad_pagos: int = 0
+    cantidad_ventas: int = 0
+    por_metodo: dict = field(default_factory=dict)     # método -> ingresos
+    por_plan: dict = field(default_factory=dict)       # plan -> ingresos por membresías
+    por_categoria: dict = field(default_factory=dict)  # categoría -> ingresos por productos
+    serie_diaria: list = field(default_factory=list)   # [(date, membresías, productos)]
+
+    @property
+    def total_ingresos(self):
+        return self.total_membresias + self.total_productos
+
+
+def _columnas(consulta, cantidad):
+    """Filas de la consulta traspuestas a ``cantidad`` columnas (tuplas)"""
+    filas = consulta.all()
+    return list(zip(*filas)) if filas else [()] * cantidad
+
+
+def _columnas_pagos(desde, hasta):
+    inicio, fin = rango_fechas(desde, hasta)
+    return _columnas(db.session.query(
+        dias_hasta(PagoMensualidad.fecha_pago, desde),
+        type_coerce(PagoMensualidad.monto, BigInteger),
+        PagoMensualidad.metodo_pago,
+        PagoMensualidad.plan,
+    ).filter(PagoMensualidad.fecha_pago >= inicio, PagoMensualidad.fecha_pago < fin), 4)
+
+
+def _columnas_ventas(desde, hasta):
+    inicio, fin = rango_fechas(desde, hasta)
+    return _columnas(db.session.query(
+        dias_hasta(VentaProducto.fecha, desde),
+        type_coerce(VentaProducto.total, BigInteger),
+        VentaProducto.metodo_pago,
+        Producto.categoria,
+    ).outerjoin(Producto, VentaProducto.producto_id == Producto.id).
+        filter(VentaProducto.fecha >= inicio, VentaProducto.fecha < fin), 4)
+
+
+def _sin_nulos(valores, sustituto):
+    return [valor or sustituto for valor in valores]
+
+
+def sumar_por_clave(claves, centavos):
+    """
+    Suma los centavos de cada clave.
+
+    Returns:
+        Diccionario clave -> Decimal, ordenado de mayor a menor ingreso
+    """
+    if not claves:
+        return {}
+    if np is not None:
+        etiquetas, posiciones = np.unique(np.asarray(claves, dtype=object), return_inverse=True)
+        sumas = np.bincount(posiciones.ravel(), weights=np.asarray(centavos, dtype=np.float64),
+                            minlength=len(etiquetas))
+        totales = zip(etiquetas.tolist(), sumas.tolist())
+    else:
+        acumulado = defaultdict(int)
+        for clave, valor in zip(claves, centavos):
+            acumulado[clave] += valor
+        totales = acumulado.items()
+    return {clave: desde_centavos(total)
+            for clave, total in sorted(totales, key=lambda par: (-par[1], par[0]))}
+
+
+def sumar_por_dia(dias, centavos, cantidad_dias):
+    """Suma de centavos de cada día ``0 .. cantidad_dias - 1`` (lista de enteros)"""
+    if np is not None:
+        if not dias:
+            return [0] * cantidad_dias
+        sumas = np.bincount(np.asarray(dias, dtype=np.int64), weights=np.asarray(centavos, dtype=np.float64),
+                            minlength=cantidad_dias)
+        return np.rint(sumas[:cantidad_dias]).astype(np.int64).tolist()
+    sumas = [0] * cantidad_dias
+    for dia, valor in zip(dias, centavos):
+        if 0 <= dia < cantidad_dias:
+            sumas[dia] += valor
+    return [int(round(valor)) for valor in sumas]
+
+
+def calcular_reporte(desde, hasta):
+    """
+    Totales, desgloses por método, plan y categoría y serie diaria de
+    ``desde`` a ``hasta`` (ambos días incluidos).
+    """
+    dias_pagos, montos_pagos, metodos_pagos, planes = _columnas_pagos(desde, hasta)
+    dias_ventas, montos_ventas, metodos_ventas, categorias = _columnas_ventas(desde, hasta)
+    cantidad_dias = (hasta - desde).days + 1
+
+    membresias = sumar_por_dia(dias_pagos, montos_pagos, cantidad_dias)
+    productos = sumar_por_dia(dias_ventas, montos_ventas, cantidad_dias)
+    metodos = _sin_nulos(metodos_pagos, METODO_SIN_ESPECIFICAR) + _sin_nulos(metodos_ventas, METODO_SIN_ESPECIFICAR)
+
+    return ReporteFinanciero(
+        desde=desde,
+        hasta=hasta,
+        total_membresias=desde_centavos(sum(membresias)),
+        total_productos=desde_centavos(sum(productos)),
+        cantidad_pagos=len(montos_pagos),
+        cantidad_ventas=len(montos_ventas),
+        por_metodo=sumar_por_clave(metodos, list(montos_pagos) + list(montos_ventas)),
+        por_plan=sumar_por_clave(_sin_nulos(planes, PLAN_SIN_ESPECIFICAR), montos_pagos),
+        por_categoria=sumar_por_clave(_sin_nulos(categorias, CATEGORIA_SIN_ESPECIFICAR), montos_ventas),
+        serie_diaria=[(desde + timedelta(days=dia), desde_centavos(membresias[dia]), desde_centavos(productos[dia]))
+                      for dia in range(cantidad_dias)],
+    )
+
+
+def detalle_pagos(desde, hasta):
+    """Tuplas (id, fecha, socio, plan, monto, método) de los pagos del período"""
+    inicio, fin = rango_fechas(desde, hasta)
+    return db.session.query(
+        PagoMensualidad.id, PagoMensualidad.fecha_pago, Usuario.nombre, PagoMensualidad.plan,
+        PagoMensualidad.monto, PagoMensualidad.metodo_pago,
+    ).join(Usuario, PagoMensualidad.usuario_id == Usuario.id).filter(
+        PagoMensualidad.fecha_pago >= inicio, PagoMensualidad.fecha_pago < fin
+    ).order_by(PagoMensualidad.fecha_pago, PagoMensualidad.id).all()
+
+
+def detalle_ventas(desde, hasta):
+    """Tuplas (id, fecha, producto, socio, cantidad, precio unitario, total, método) de las ventas del período"""
+    inicio, fin = rango_fechas(desde, hasta)
+    return [
+        (ident, fecha, producto, socio or CLIENTE_NO_REGISTRADO, cantidad, precio, total, metodo)
+        for ident, fecha, producto, socio, cantidad, precio, total, metodo in db.session.query(
+            VentaProducto.id, VentaProducto.fecha, Producto.nombre, Usuario.nombre, VentaProducto.cantidad,
+            VentaProducto.precio_unitario, VentaProducto.total, VentaProducto.metodo_pago,
+        ).join(Producto, VentaProducto.producto_id == Producto.id).
+        outerjoin(Usuario, VentaProducto.usuario_id == Usuario.id).filter(
+            VentaProducto.fecha >= inicio, VentaProducto.fecha < fin
+        ).order_by(VentaProducto.fecha, VentaProducto.id)
+    ]
@@ -0,0 +1,124 @@
+"""
+Servicio de Respaldos
+=====================
+
+Copias de seguridad en caliente con la API de respaldo de SQLite
+(``sqlite3.Connection.backup``). A diferencia de copiar ``database.db`` con
+``shutil``, la copia es siempre consistente (incluye lo pendiente en el WAL y
+nunca mezcla páginas de dos transacciones) y se hace por pasos: entre paso y
+paso se suelta el bloqueo de lectura y se hace una pausa, así que recepción
+puede seguir registrando asistencias mientras se respalda.
+
+El respaldo se escribe primero en un archivo temporal, se verifica con
+``PRAGMA integrity_check`` y solo entonces se renombra al destino final.
+Desde la configuración se ejecuta como trabajo en segundo plano
+(``services.trabajos``) para no ocupar la petición.
+"""
+
+import os
+import sqlite3
+import time
+
+import config
+
+
+class ErrorRespaldo(Exception):
+    """El respaldo no se pudo completar o no pasó la verificación de integridad"""
+
+
+class _ReinicioRespaldo(Exception):
+    """La copia se reinició demasiadas veces por escrituras concurrentes"""
+
+
+def verificar_integridad(ruta_db):
+    """
+    Ejecuta ``PRAGMA integrity_check`` sobre una base de datos.
+
+    Returns:
+        Lista de problemas encontrados (vacía si la base de datos está bien)
+    """
+    conexion = sqlite3.connect(ruta_db)
+    try:
+        resultado = [fila[0] for fila in conexion.execute('PRAGMA integrity_check')]
+    finally:
+        conexion.close()
+    return [] if resultado == ['ok'] else resultado
+
+
+def _copiar(origen, destino, paginas_por_paso, pausa, max_reinicios, progreso):
+    """Copia por pasos; lanza _ReinicioRespaldo si otra conexión la reinicia demasiado"""
+    estado = {'restantes': None, 'reinicios': 0}
+
+    def avance(status, restantes, total):
+        # SQLite reinicia la copia si otra conexión modifica el origen entre pasos;
+        # un paso que no reduce las páginas restantes es un reinicio
+        if estado['restantes'] is not None and restantes >= estado['restantes']:
+            estado['reinicios'] += 1
+            if estado['reinicios'] > max_reinicios:
+                raise _ReinicioRespaldo()
+        estado['restantes'] = restantes
+        if progreso and total:
+            progreso(total - restantes, total)
+        if pausa and restantes:
+            time.sleep(pausa)
+
+    fuente = sqlite3.connect(origen)
+    copia = sqlite3.connect(destino)
+    try:
+        fuente.backup(copia, pages=paginas_por_paso, progress=avance)
+    finally:
+        copia.close()
+        fuente.close()
+
+
+def respaldar_base_datos(origen, destino, paginas_por_paso=None, pausa=None,
+                         max_reinicios=None, progreso=None):
+    """
+    Crea un respaldo consistente de ``origen`` en ``destino``.
+
+    Args:
+        origen: Ruta de la base de datos en uso
+        destino: Ruta del archivo de respaldo a crear
+        paginas_por_paso: Páginas copiadas en cada paso (por defecto config.RESPALDO_PAGINAS_POR_PASO)
+        pausa: Segundos de espera entre pasos (por defecto config.RESPALDO_PAUSA_SEGUNDOS)
+        max_reinicios: Reinicios tolerados antes de copiar en un solo paso
+        progreso: Función opcional ``progreso(copiadas, total)``
+
+    Returns:
+        Tamaño en bytes del respaldo
+
+    Raises:
+        ErrorRespaldo: Si el origen no existe o la copia no pasa la verificación
+    """
+    paginas_por_paso = paginas_por_paso or config.RESPALDO_PAGINAS_POR_PASO
+    pausa = config.RESPALDO_PAUSA_SEGUNDOS if pausa is None else pausa
+    max_reinicios = config.RESPALDO_MAX_REINICIOS if max_reinicios is None else max_reinicios
+
+    if not os.path.exists(origen):
+        raise ErrorRespaldo(f"No se encontró la base de datos en {origen}")
+
+    carpeta, nombre = os.path.split(os.path.abspath(destino))
+    os.makedirs(carpeta, exist_ok=True)
+    # Archivo oculto para que no aparezca en las listas de respaldos mientras se escribe
+    temporal = os.path.join(carpeta, f'.{nombre}.parcial')
+    if os.path.exists(temporal):
+        os.remove(temporal)
+
+    try:
+        try:
+            _copiar(origen, temporal, paginas_por_paso, pausa, max_reinicios, progreso)
+        except _ReinicioRespaldo:
+            # Con escrituras constantes, copiar todo en un paso (en WAL no bloquea a escritores)
+            os.remove(temporal)
+            _copiar(origen, temporal, -1, 0, 0, progreso)
+
+        problemas = verificar_integridad(temporal)
+        if problemas:
+            raise ErrorRespaldo(f"El respaldo no pasó la verificación de integridad: {problemas[0]}")
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    return os.path.getsize(destino)
+
@@ -0,0 +1,362 @@
+"""
+Servicio de Resumen Diario
+==========================
+
+Mantiene la tabla ``resumen_diario`` (y su desglose por método de pago) con los
+totales de cada día: ingresos por membresías, ingresos por productos y
+cantidad de pagos, ventas y asistencias.
+
+Los totales se actualizan de forma incremental dentro de la misma transacción
+que crea, modifica o elimina un pago, una venta o una asistencia, escuchando
+los eventos de flush de la sesión. Así los reportes leen unas pocas filas por
+día en lugar de recorrer las tablas de transacciones completas.
+
+Los montos se acumulan como centavos enteros (ver ``models.Dinero``), de modo
+que sumar y restar muchos pagos no arrastra errores de redondeo.
+
+Si la tabla se desincroniza (p. ej. por borrados con SQL directo), se puede
+reconstruir con ``reconstruir_resumen_diario`` o desde la línea de comandos:
+
+    python app_launcher.py --rebuild-resumen
+"""
+
+import re
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import event, func, inspect, select, type_coerce
+
+from models import db, PagoMensualidad, VentaProducto, Asistencia
+from models import ResumenDiario, ResumenDiarioMetodo, Dinero, a_centavos, desde_centavos
+from .consultas import dia_de
+
+METODO_SIN_ESPECIFICAR = 'Sin especificar'
+
+_CLAVE_PENDIENTE = '_resumen_diario_pendiente'
+# Días con ingresos modificados en la transacción en curso (ver ``tomar_dias_modificados``)
+_CLAVE_DIAS = '_resumen_diario_dias'
+
+# Columnas de cada modelo que alimentan el resumen: (fecha, monto, método)
+_MODELOS_RESUMIDOS = {
+    PagoMensualidad: ('fecha_pago', 'monto', 'metodo_pago'),
+    VentaProducto: ('fecha', 'total', 'metodo_pago'),
+    Asistencia: ('fecha', None, None),
+}
+
+# Tablas cuya escritura con SQL directo desincroniza el resumen (borrar un socio
+# borra en cascada sus pagos y asistencias)
+_TABLAS_AFECTADAS = re.compile(
+    r'\b(pago_mensualidad|venta_producto|asistencia|usuario|resumen_diario|resumen_diario_metodo)\b',
+    re.IGNORECASE,
+)
+
+
+def sql_afecta_resumen(sql):
+    """True si una sentencia SQL escrita a mano puede haber cambiado los datos del resumen"""
+    return bool(_TABLAS_AFECTADAS.search(sql or ''))
+
+
+def _como_fecha(valor):
+    """Convierte un datetime o una cadena ISO de SQLite en un date"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+
+class _Deltas:
+    """Acumula los cambios pendientes por día y por método de pago"""
+
+    def __init__(self):
+        # fecha -> [membresias, productos, pagos, ventas, asistencias] (montos en centavos)
+        self.dias = defaultdict(lambda: [0, 0, 0, 0, 0])
+        # (fecha, metodo) -> [membresias, productos, cantidad]
+        self.metodos = defaultdict(lambda: [0, 0, 0])
+        # Días con pagos o ventas creados, modificados o eliminados (aunque el total no cambie)
+        self.dias_ingresos = set()
+
+    def registrar(self, modelo, fecha, monto, metodo, cantidad=1):
+        """Suma ``cantidad`` transacciones por ``monto`` total en pesos (negativos para restar)"""
+        self._sumar(modelo, fecha, a_centavos(monto or 0), metodo, cantidad)
+
+    def restar(self, modelo, fecha, monto, metodo):
+        self._sumar(modelo, fecha, -a_centavos(monto or 0), metodo, -1)
+
+    def _sumar(self, modelo, fecha, centavos, metodo, cantidad):
+        fecha = _como_fecha(fecha)
+        if fecha is None:
+            return
+        dia = self.dias[fecha]
+        if modelo is Asistencia:
+            dia[4] += cantidad
+            return
+
+        self.dias_ingresos.add(fecha)
+        metodo = metodo or METODO_SIN_ESPECIFICAR
+        if modelo is PagoMensualidad:
+            dia[0] += centavos
+            dia[2] += cantidad
+            self.metodos[(fecha, metodo)][0] += centavos
+        else:
+            dia[1] += centavos
+            dia[3] += cantidad
+            self.metodos[(fecha, metodo)][1] += centavos
+        self.metodos[(fecha, metodo)][2] += cantidad
+
+    def __bool__(self):
+        return bool(self.dias)
+
+
+def _valores(obj, anteriores, session=None):
+    """
+    Devuelve (fecha, monto, método) de un objeto resumido.
+
+    Con ``anteriores=True`` se usan los valores previos a la modificación
+    pendiente: los del historial de atributos de la sesión o, si el atributo
+    no estaba cargado (p. ej. expirado tras un commit), los guardados en la
+    base de datos.
+    """
+    estado = inspect(obj)
+    atributos = _MODELOS_RESUMIDOS[type(obj)]
+    valores = {}
+    sin_cargar = []
+    for atributo in atributos:
+        if atributo is None:
+            continue
+        if not anteriores:
+            valores[atributo] = getattr(obj, atributo)
+            continue
+        historial = estado.attrs[atributo].history
+        if historial.deleted:
+            valores[atributo] = historial.deleted[0]
+        elif historial.unchanged:
+            valores[atributo] = historial.unchanged[0]
+        elif estado.persistent or estado.deleted:
+            sin_cargar.append(atributo)
+        else:
+            valores[atributo] = getattr(obj, atributo)
+
+    if sin_cargar:
+        tabla = type(obj).__table__
+        fila = session.connection().execute(
+            select(*[tabla.c[atributo] for atributo in sin_cargar]).
+            where(tabla.c.id == estado.identity[0])
+        ).first()
+        for atributo in sin_cargar:
+            valores[atributo] = fila._mapping[tabla.c[atributo]] if fila is not None else None
+
+    return [valores.get(atributo) if atributo else None for atributo in atributos]
+
+
+def _es_resumido(obj):
+    return type(obj) in _MODELOS_RESUMIDOS
+
+
+def _antes_de_flush(session, flush_context, instances):
+    """Resta los valores anteriores de las filas modificadas o eliminadas"""
+    # Cada flush empieza de cero: si un flush anterior falló, sus deltas se descartan
+    deltas = session.info[_CLAVE_PENDIENTE] = _Deltas()
+    pendientes = session.info[_CLAVE_PENDIENTE + '_dirty'] = []
+
+    for obj in session.deleted:
+        if _es_resumido(obj):
+            deltas.restar(type(obj), *_valores(obj, anteriores=True, session=session))
+
+    for obj in session.dirty:
+        if _es_resumido(obj) and session.is_modified(obj, include_collections=False):
+            deltas.restar(type(obj), *_valores(obj, anteriores=True, session=session))
+            pendientes.append(obj)
+
+
+def _despues_de_flush(session, flush_context):
+    """Suma los valores nuevos y aplica los cambios acumulados a la tabla"""
+    deltas = session.info.pop(_CLAVE_PENDIENTE, None) or _Deltas()
+    pendientes = session.info.pop(_CLAVE_PENDIENTE + '_dirty', [])
+
+    # En after_flush los valores por defecto (p. ej. la fecha) ya están asignados
+    for obj in list(session.new) + pendientes:
+        if _es_resumido(obj):
+            deltas.registrar(type(obj), *_valores(obj, anteriores=False))
+
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+        session.info.setdefault(_CLAVE_DIAS, set()).update(deltas.dias_ingresos)
+
+
+def tomar_dias_modificados(session):
+    """
+    Días cuyos pagos o ventas cambiaron desde la última llamada, y los olvida.
+
+    Se consulta al confirmar la transacción (p. ej. para invalidar cachés) y al
+    revertirla, para que un cambio descartado no quede pendiente.
+    """
+    return session.info.pop(_CLAVE_DIAS, set())
+
+
+def aplicar_deltas(conexion, deltas):
+    """Suma los deltas a las filas de resumen, creándolas si no existen"""
+    tabla = ResumenDiario.__table__
+    for fecha, (membresias, productos, pagos, ventas, asistencias) in deltas.dias.items():
+        membresias, productos = desde_centavos(membresias), desde_centavos(productos)
+        resultado = conexion.execute(
+            tabla.update().where(tabla.c.fecha == fecha).values(
+                total_membresias=tabla.c.total_membresias + membresias,
+                total_productos=tabla.c.total_productos + productos,
+                cantidad_pagos=tabla.c.cantidad_pagos + pagos,
+                cantidad_ventas=tabla.c.cantidad_ventas + ventas,
+                cantidad_asistencias=tabla.c.cantidad_asistencias + asistencias,
+            )
+        )
+        if resultado.rowcount == 0:
+            conexion.execute(tabla.insert().values(
+                fecha=fecha, total_membresias=membresias, total_productos=productos,
+                cantidad_pagos=pagos, cantidad_ventas=ventas,
+                cantidad_asistencias=asistencias
+            ))
+
+    tabla = ResumenDiarioMetodo.__table__
+    for (fecha, metodo), (membresias, productos, cantidad) in deltas.metodos.items():
+        membresias, productos = desde_centavos(membresias), desde_centavos(productos)
+        condicion = (tabla.c.fecha == fecha) & (tabla.c.metodo_pago == metodo)
+        resultado = conexion.execute(
+            tabla.update().where(condicion).values(
+                total_membresias=tabla.c.total_membresias + membresias,
+                total_productos=tabla.c.total_productos + productos,
+                cantidad=tabla.c.cantidad + cantidad,
+            )
+        )
+        if resultado.rowcount == 0:
+            conexion.execute(tabla.insert().values(
+                fecha=fecha, metodo_pago=metodo, total_membresias=membresias,
+                total_productos=productos, cantidad=cantidad
+            ))
+
+
+def sumar_asistencias(conexion, conteos):
+    """
+    Suma asistencias insertadas sin la sesión ORM (p. ej. con ``INSERT ... SELECT``).
+
+    Args:
+        conteos: Diccionario fecha -> cantidad de asistencias nuevas
+    """
+    deltas = _Deltas()
+    for fecha, cantidad in conteos.items():
+        if cantidad:
+            deltas.registrar(Asistencia, fecha, None, None, cantidad=cantidad)
+    if deltas:
+        aplicar_deltas(conexion, deltas)
+
+
+def registrar_eventos():
+    """Conecta el mantenimiento incremental del resumen a la sesión de la aplicación"""
+    if not event.contains(db.session, 'before_flush', _antes_de_flush):
+        event.listen(db.session, 'before_flush', _antes_de_flush)
+        event.listen(db.session, 'after_flush', _despues_de_flush)
+
+
+def reconstruir_resumen_diario(desde=None, hasta=None):
+    """
+    Recalcula el resumen a partir de las tablas de transacciones.
+
+    Args:
+        desde: Primer día a reconstruir (incluido). None para todo el historial.
+        hasta: Último día a reconstruir (incluido). None para no acotar.
+
+    Returns:
+        Número de días reconstruidos
+    """
+    dias = reconstruir_en_conexion(db.session.connection(), desde, hasta)
+    db.session.commit()
+    # Otra vez tras confirmar: un indicador calculado antes del commit leyó el resumen anterior
+    _invalidar_cache_kpi()
+    return dias
+
+
+def reconstruir_en_conexion(conexion, desde=None, hasta=None):
+    """Reconstruye el resumen usando una conexión ya abierta, sin confirmar la transacción"""
+    deltas = _Deltas()
+
+    for modelo, (col_fecha, col_monto, col_metodo) in _MODELOS_RESUMIDOS.items():
+        columna_fecha = getattr(modelo, col_fecha)
+        dia = dia_de(columna_fecha)
+        columnas = [dia, func.count()]
+        agrupar = [dia]
+        if col_monto:
+            columnas.append(func.coalesce(func.sum(getattr(modelo, col_monto)), 0))
+            columnas.append(getattr(modelo, col_metodo))
+            agrupar.append(getattr(modelo, col_metodo))
+
+        consulta = select(*columnas)
+        if desde is not None:
+            consulta = consulta.where(columna_fecha >= datetime.combine(desde, datetime.min.time()))
+        if hasta is not None:
+            consulta = consulta.where(columna_fecha <= datetime.combine(hasta, datetime.max.time()))
+
+        for fila in conexion.execute(consulta.group_by(*agrupar)):
+            if col_monto:
+                fecha, cantidad, monto, metodo = fila
+            else:
+                (fecha, cantidad), monto, metodo = fila, 0, None
+            deltas.registrar(modelo, fecha, monto, metodo, cantidad=cantidad)
+
+    for modelo in (ResumenDiario, ResumenDiarioMetodo):
+        tabla = modelo.__table__
+        borrado = tabla.delete()
+        if desde is not None:
+            borrado = borrado.where(tabla.c.fecha >= desde)
+        if hasta is not None:
+            borrado = borrado.where(tabla.c.fecha <= hasta)
+        conexion.execute(borrado)
+
+    aplicar_deltas(conexion, deltas)
+    _invalidar_cache_kpi()
+    return len(deltas.dias)
+
+
+def _invalidar_cache_kpi():
+    # Importación diferida: cache_kpi importa este módulo
+    from .cache_kpi import invalidar_cache_kpi
+    invalidar_cache_kpi()
+
+
+def totales_rango(desde, hasta=None):
+    """
+    Totales acumulados entre dos días (ambos incluidos).
+
+    Returns:
+        Diccionario con total_membresias, total_productos, cantidad_pagos,
+        cantidad_ventas y cantidad_asistencias
+    """
+    consulta = db.session.query(
+        func.coalesce(func.sum(ResumenDiario.total_membresias), 0),
+        func.coalesce(func.sum(ResumenDiario.total_productos), 0),
+        func.coalesce(func.sum(ResumenDiario.cantidad_pagos), 0),
+        func.coalesce(func.sum(ResumenDiario.cantidad_ventas), 0),
+        func.coalesce(func.sum(ResumenDiario.cantidad_asistencias), 0),
+    ).filter(ResumenDiario.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.filter(ResumenDiario.fecha <= hasta)
+    fila = consulta.one()
+    return {
+        'total_membresias': fila[0],
+        'total_productos': fila[1],
+        'cantidad_pagos': int(fila[2]),
+        'cantidad_ventas': int(fila[3]),
+        'cantidad_asistencias': int(fila[4]),
+    }
+
+
+def totales_por_metodo(desde, hasta=None):
+    """Ingresos (membresías + productos) por método de pago entre dos días"""
+    consulta = db.session.query(
+        ResumenDiarioMetodo.metodo_pago,
+        # La suma de dos columnas Dinero es un entero de centavos sin tipo: convertirla a pesos
+        type_coerce(func.sum(ResumenDiarioMetodo.total_membresias + ResumenDiarioMetodo.total_productos), Dinero)
+    ).filter(ResumenDiarioMetodo.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.filter(ResumenDiarioMetodo.fecha <= hasta)
+    return {metodo: total for metodo, total in
+            consulta.group_by(ResumenDiarioMetodo.metodo_pago).all() if total}
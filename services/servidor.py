@@ -0,0 +1,121 @@
+"""
+Servicio de Servidor WSGI
+=========================
+
+Sirve la aplicación con waitress en lugar del servidor de desarrollo de
+Werkzeug. Waitress atiende las conexiones en un bucle de E/S y ejecuta las
+peticiones en un grupo fijo de hilos (``config.SERVIDOR_HILOS``), de modo que
+varias terminales de recepción y la pantalla de registro del celular pueden
+trabajar a la vez sin que una petición lenta bloquee a las demás.
+
+``detener_servidor`` hace un cierre ordenado: deja de aceptar conexiones,
+espera a que terminen las peticiones en curso y solo entonces cierra el bucle.
+Lo usa ``/cerrar-aplicacion``.
+"""
+
+import time
+
+import config
+
+# waitress es una dependencia opcional (no hace falta con el servidor de desarrollo)
+try:
+    import waitress
+    from waitress import trigger as _trigger
+    from waitress.server import BaseWSGIServer
+except ImportError:
+    waitress = None
+
+
+class ErrorServidor(Exception):
+    """No se pudo iniciar el servidor de producción"""
+
+
+def opciones_servidor(app, hilos=None, backlog=None, timeout=None):
+    """Opciones de waitress a partir de los argumentos o de la configuración"""
+    def valor(argumento, clave):
+        return argumento if argumento is not None else app.config.get(clave, getattr(config, clave))
+
+    return {
+        'threads': valor(hilos, 'SERVIDOR_HILOS'),
+        'backlog': valor(backlog, 'SERVIDOR_BACKLOG'),
+        'connection_limit': valor(None, 'SERVIDOR_MAX_CONEXIONES'),
+        # Conexiones inactivas (keep-alive o clientes que no terminan de enviar)
+        'channel_timeout': valor(timeout, 'SERVIDOR_TIMEOUT_SEGUNDOS'),
+        'cleanup_interval': max(1, min(30, valor(timeout, 'SERVIDOR_TIMEOUT_SEGUNDOS') // 2)),
+        'ident': 'GimnasioDB',
+    }
+
+
+def crear_servidor(app, host='127.0.0.1', port=5000, hilos=None, backlog=None, timeout=None):
+    """
+    Crea el servidor waitress de la aplicación sin empezar a atender peticiones.
+
+    Raises:
+        ErrorServidor: Si waitress no está instalado
+    """
+    if waitress is None:
+        raise ErrorServidor("Para usar --server instale waitress: pip install waitress")
+
+    mapa = {}
+    servidor = waitress.create_server(app, map=mapa, host=host, port=port,
+                                      **opciones_servidor(app, hilos, backlog, timeout))
+    app.extensions['servidor'] = {
+        'servidor': servidor,
+        'mapa': mapa,
+        # Permite ejecutar el cierre dentro del hilo del bucle de E/S
+        'disparador': _trigger.trigger(mapa),
+    }
+    return servidor
+
+
+def servir(app, host='127.0.0.1', port=5000, hilos=None, backlog=None, timeout=None):
+    """Atiende peticiones hasta que se llame a ``detener_servidor``"""
+    servidor = crear_servidor(app, host, port, hilos, backlog, timeout)
+    try:
+        servidor.run()
+    finally:
+        app.extensions.pop('servidor', None)
+
+
+def _pendientes(despachador, mapa):
+    """Peticiones sin terminar y respuestas que aún no se enviaron completas"""
+    sin_enviar = sum(1 for canal in list(mapa.values()) if getattr(canal, 'total_outbufs_len', 0))
+    return despachador.active_count + len(despachador.queue) + sin_enviar
+
+
+def detener_servidor(app, espera_maxima=10):
+    """
+    Cierre ordenado del servidor iniciado con ``servir``.
+
+    Debe llamarse desde un hilo propio, no desde una petición: espera a que
+    terminen todas las peticiones en curso.
+
+    Returns:
+        False si la aplicación no se está sirviendo con waitress
+    """
+    estado = app.extensions.pop('servidor', None)
+    if estado is None:
+        return False
+    servidor, mapa, disparador = estado['servidor'], estado['mapa'], estado['disparador']
+
+    # 1. Dejar de aceptar conexiones nuevas (los sockets se cierran al final:
+    #    cerrarlos ahora cerraría también el disparador que usan las respuestas)
+    def dejar_de_aceptar():
+        for canal in list(mapa.values()):
+            if isinstance(canal, BaseWSGIServer):
+                canal.accepting = False
+    disparador.pull_trigger(dejar_de_aceptar)
+
+    # 2. Esperar a que terminen las peticiones en curso y se envíen sus respuestas
+    despachador = servidor.task_dispatcher
+    limite = time.time() + espera_maxima
+    while _pendientes(despachador, mapa) and time.time() < limite:
+        time.sleep(0.05)
+    despachador.shutdown(cancel_pending=True, timeout=max(0, limite - time.time()))
+
+    # 3. Cerrar sockets y canales: el bucle de E/S termina cuando el mapa queda vacío
+    def cerrar():
+        for canal in list(mapa.values()):
+            canal.close()
+    disparador.pull_trigger(cerrar)
+    return True
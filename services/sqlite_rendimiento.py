@@ -0,0 +1,122 @@
+"""
+Servicio de Rendimiento SQLite
+==============================
+
+Aplica un perfil de PRAGMA (definido en ``config.SQLITE_PERFILES``) a cada
+conexión nueva con la base de datos SQLite y mantiene un grupo de conexiones
+reutilizables para que la caché de páginas sobreviva entre peticiones.
+
+Con el perfil ``rendimiento`` la base de datos trabaja en modo WAL: los
+reportes largos leen una instantánea mientras recepción sigue registrando
+asistencias y pagos. Un hilo en segundo plano vuelca periódicamente el WAL
+al archivo principal (``wal_checkpoint``) para que no crezca sin límite.
+"""
+
+import sqlite3
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+import config
+from models import db
+
+# Hilo del checkpoint periódico y evento para detenerlo
+_checkpoint = {'hilo': None, 'detener': threading.Event()}
+
+
+def es_sqlite_en_archivo(uri):
+    return uri.startswith('sqlite') and uri not in ('sqlite://', 'sqlite:///:memory:')
+
+
+def obtener_perfil(nombre=None):
+    """Devuelve los PRAGMA del perfil indicado (o del configurado por defecto)"""
+    nombre = nombre or config.SQLITE_PERFIL
+    if nombre not in config.SQLITE_PERFILES:
+        print(f"Perfil SQLite '{nombre}' desconocido, usando 'rendimiento'")
+        nombre = 'rendimiento'
+    return config.SQLITE_PERFILES[nombre]
+
+
+def preparar_opciones_motor(app):
+    """
+    Ajusta ``SQLALCHEMY_ENGINE_OPTIONS`` antes de crear el motor.
+
+    Flask-SQLAlchemy usa NullPool con SQLite (una conexión nueva por
+    petición), lo que descarta la caché de páginas y repite los PRAGMA en cada
+    petición. Con un pool las conexiones se reutilizan entre hilos, por eso se
+    desactiva ``check_same_thread``.
+    """
+    if not es_sqlite_en_archivo(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    opciones = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    opciones.setdefault('poolclass', QueuePool)
+    opciones.setdefault('pool_size', app.config.get('SQLITE_POOL_SIZE', config.SQLITE_POOL_SIZE))
+    opciones.setdefault('connect_args', {}).setdefault('check_same_thread', False)
+
+
+def registrar_pragmas(engine, pragmas):
+    """Ejecuta los PRAGMA del perfil en cada conexión nueva del motor"""
+
+    def aplicar(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        try:
+            for nombre, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nombre}={valor}')
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', aplicar)
+
+
+def configurar_sqlite(app):
+    """Aplica el perfil de PRAGMA configurado al motor de la aplicación"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    pragmas = obtener_perfil(app.config.get('SQLITE_PERFIL'))
+    with app.app_context():
+        registrar_pragmas(db.engine, pragmas)
+
+
+def volcar_wal(ruta_db, modo='TRUNCATE'):
+    """
+    Vuelca el contenido del WAL al archivo de base de datos.
+
+    Debe llamarse antes de copiar ``database.db`` a mano: en modo WAL los
+    últimos cambios pueden estar todavía en ``database.db-wal``.
+    """
+    conexion = sqlite3.connect(ruta_db)
+    try:
+        return conexion.execute(f'PRAGMA wal_checkpoint({modo})').fetchone()
+    finally:
+        conexion.close()
+
+
+def iniciar_checkpoint_periodico(app, segundos=None):
+    """Inicia un hilo que ejecuta ``wal_checkpoint(PASSIVE)`` cada ``segundos``"""
+    segundos = segundos if segundos is not None else app.config.get(
+        'SQLITE_CHECKPOINT_SEGUNDOS', config.SQLITE_CHECKPOINT_SEGUNDOS)
+    if segundos <= 0 or not es_sqlite_en_archivo(app.config['SQLALCHEMY_DATABASE_URI']):
+        return None
+    if _checkpoint['hilo'] and _checkpoint['hilo'].is_alive():
+        return _checkpoint['hilo']
+
+    def ejecutar():
+        # PASSIVE no espera a lectores ni escritores: nunca bloquea a la recepción
+        while not _checkpoint['detener'].wait(segundos):
+            try:
+                with app.app_context():
+                    with db.engine.connect() as conexion:
+                        conexion.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)')
+            except Exception as e:
+                print(f"Error en checkpoint del WAL: {str(e)}")
+
+    _checkpoint['detener'].clear()
+    hilo = threading.Thread(target=ejecutar, name='wal-checkpoint', daemon=True)
+    hilo.start()
+    _checkpoint['hilo'] = hilo
+    return hilo
+
+
+def detener_checkpoint_periodico():
+    _checkpoint['detener'].set()
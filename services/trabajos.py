@@ -0,0 +1,163 @@
+"""
+Servicio de Trabajos en Segundo Plano
+=====================================
+
+Ejecuta reportes y exportaciones pesadas fuera del hilo de la petición. Cada
+trabajo se guarda en la tabla ``trabajo`` (tipo, parámetros, estado, progreso
+y archivo generado) y lo procesa un grupo acotado de hilos
+(``config.TRABAJOS_MAX_HILOS``); los trabajos que llegan cuando todos los
+hilos están ocupados esperan en cola.
+
+Para añadir un tipo de trabajo basta con decorar una función con
+``@tarea('nombre')``. La función recibe ``progreso`` (para informar el avance)
+y los parámetros del trabajo, y devuelve un diccionario con ``archivo``,
+``nombre_archivo`` y/o ``mensaje``.
+"""
+
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+import config
+from models import db, Trabajo, datetime_colombia
+
+# Tipo de trabajo -> función que lo ejecuta
+TAREAS = {}
+
+
+class ErrorTrabajo(Exception):
+    """Error previsto durante un trabajo; su mensaje se muestra tal cual al usuario"""
+
+
+def tarea(tipo):
+    """Registra la función decorada como ejecutora de los trabajos de ``tipo``"""
+    def registrar(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def iniciar_trabajos(app, max_hilos=None):
+    """
+    Crea el grupo de hilos de la aplicación y retoma la cola guardada.
+
+    Los trabajos que quedaron en proceso al cerrar la aplicación se marcan
+    como error; los pendientes se vuelven a encolar. Solo debe llamarse en el
+    proceso que atiende las peticiones (no en el vigilante del recargador de
+    Werkzeug ni en los comandos de un solo uso): marcaría como interrumpidos
+    los trabajos que el servidor tiene en curso.
+    """
+    max_hilos = max_hilos or app.config.get('TRABAJOS_MAX_HILOS', config.TRABAJOS_MAX_HILOS)
+    app.extensions['trabajos'] = ThreadPoolExecutor(max_workers=max_hilos,
+                                                    thread_name_prefix='trabajo')
+    with app.app_context():
+        Trabajo.query.filter_by(estado='en_proceso').update({
+            'estado': 'error',
+            'mensaje': 'Interrumpido al cerrar la aplicación',
+            'fecha_fin': datetime_colombia()
+        }, synchronize_session=False)
+        pendientes = [t.id for t in Trabajo.query.filter_by(estado='pendiente').order_by(Trabajo.id)]
+        db.session.commit()
+
+    for trabajo_id in pendientes:
+        app.extensions['trabajos'].submit(_ejecutar, app, trabajo_id)
+    return app.extensions['trabajos']
+
+
+def detener_trabajos(app, esperar=False):
+    ejecutor = app.extensions.pop('trabajos', None)
+    if ejecutor is not None:
+        ejecutor.shutdown(wait=esperar, cancel_futures=not esperar)
+
+
+def encolar(tipo, admin_id=None, **parametros):
+    """
+    Guarda un trabajo nuevo y lo envía al grupo de hilos.
+
+    Args:
+        tipo: Tipo de trabajo registrado con ``@tarea``
+        admin_id: Administrador que lo solicita (solo él podrá verlo)
+        **parametros: Argumentos de la tarea (deben poder serializarse a JSON)
+
+    Returns:
+        El Trabajo creado
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+
+    trabajo = Trabajo(tipo=tipo, parametros=json.dumps(parametros), admin_id=admin_id)
+    db.session.add(trabajo)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    app.extensions['trabajos'].submit(_ejecutar, app, trabajo.id)
+    return trabajo
+
+
+def _actualizar(trabajo_id, **valores):
+    Trabajo.query.filter_by(id=trabajo_id).update(valores, synchronize_session=False)
+    db.session.commit()
+
+
+def _reclamar(trabajo_id):
+    """
+    Pasa el trabajo de pendiente a en proceso en una sola sentencia.
+
+    Returns:
+        True si este hilo lo reclamó; False si no existe o ya lo tomó otro
+        hilo u otro proceso
+    """
+    reclamados = Trabajo.query.filter_by(id=trabajo_id, estado='pendiente').update(
+        {'estado': 'en_proceso', 'fecha_inicio': datetime_colombia()}, synchronize_session=False)
+    db.session.commit()
+    return reclamados == 1
+
+
+def _ejecutar(app, trabajo_id):
+    """Procesa un trabajo en un hilo del grupo, con su propio contexto y sesión"""
+    with app.app_context():
+        try:
+            if not _reclamar(trabajo_id):
+                return
+            trabajo = Trabajo.query.get(trabajo_id)
+            tipo, parametros = trabajo.tipo, json.loads(trabajo.parametros or '{}')
+
+            def progreso(porcentaje, mensaje=None):
+                valores = {'progreso': max(0, min(int(porcentaje), 99))}
+                if mensaje:
+                    valores['mensaje'] = mensaje
+                _actualizar(trabajo_id, **valores)
+
+            resultado = TAREAS[tipo](progreso, **parametros) or {}
+            _actualizar(trabajo_id, estado='completado', progreso=100,
+                        archivo=resultado.get('archivo'),
+                        nombre_archivo=resultado.get('nombre_archivo'),
+                        mensaje=resultado.get('mensaje', 'Completado'),
+                        fecha_fin=datetime_colombia())
+        except Exception as e:
+            db.session.rollback()
+            if not isinstance(e, ErrorTrabajo):
+                traceback.print_exc()
+            try:
+                _actualizar(trabajo_id, estado='error', mensaje=str(e)[:500],
+                            fecha_fin=datetime_colombia())
+            except Exception as error_guardado:
+                print(f"Error al guardar el estado del trabajo {trabajo_id}: {str(error_guardado)}")
+        finally:
+            db.session.remove()
+
+
+def describir_trabajo(trabajo):
+    """Estado del trabajo como diccionario (para las respuestas JSON)"""
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'descargable': trabajo.estado == 'completado' and bool(trabajo.archivo),
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
@@ -118,61 +118,6 @@ function formatoCOP(valor) {
   }).format(valor);
 }
 
-// Función para parsear JSON de manera segura y sanitizar los datos
-function parseJsonSafe(jsonString, defaultValue = []) {
-  try {
-    // Si la cadena JSON está vacía o no es válida, usar valor predeterminado
-    if (
-      !jsonString ||
-      jsonString === "null" ||
-      jsonString === "undefined" ||
-      jsonString === "[]"
-    ) {
-      console.warn("JSON string vacío o no válido:", jsonString);
-      return defaultValue;
-    }
-
-    // Reemplazar valores problemáticos
-    const cleanedString = jsonString
-      .replace(/NaN/g, "null")
-      .replace(/Infinity/g, "null")
-      .replace(/-Infinity/g, "null")
-      .replace(/None/g, "null");
-
-    // Intentar parsear JSON
-    try {
-      const parsedData = JSON.parse(cleanedString);
-
-      // Verificar si es array y sanitizar valores
-      if (Array.isArray(parsedData)) {
-        return parsedData.map((item) => {
-          // Convertir null, undefined o NaN a 0
-          if (
-            item === null ||
-            item === undefined ||
-            (typeof item === "number" && (isNaN(item) || !isFinite(item)))
-          ) {
-            return 0;
-          }
-          return item;
-        });
-      }
-      return parsedData;
-    } catch (parseError) {
-      console.error(
-        "Error al parsear JSON:",
-        parseError,
-        "String original:",
-        jsonString
-      );
-      return defaultValue;
-    }
-  } catch (error) {
-    console.error("Error general al procesar JSON:", error);
-    return defaultValue;
-  }
-}
-
 // Almacenar referencias a los gráficos para poder destruirlos antes de recrearlos
 const chartInstances = {};
 
@@ -269,540 +214,430 @@ const COLORES = {
   ],
 };
 
-// Función principal para inicializar todos los gráficos
-function inicializarGraficos() {
-  try {
-    console.log("Inicializando gráficos financieros profesionales...");
-
-    // Verificar que Chart.js esté disponible
-    if (typeof Chart === "undefined") {
-      console.error("Chart.js no está disponible. Intentando cargar...");
-      inicializarFinanzasCharts();
-      return;
-    }
-
-    // Registrar el plugin de datalabels si está disponible
-    if (typeof ChartDataLabels !== "undefined") {
-      Chart.register(ChartDataLabels);
-    }
-
-    // Verificar que todos los elementos necesarios existen antes de continuar
-    const elementosRequeridos = [
-      "datos-meses",
-      "datos-ingresos-membresias",
-      "datos-ingresos-productos",
-      "datos-margenes",
-      "datos-ingresos-netos",
-      "datos-planes-nombres",
-      "datos-planes",
-      "datos-ingresos-potenciales-plan",
-      "datos-productos-nombres",
-      "datos-productos-cantidades",
-      "datos-productos-ingresos",
-      "datos-productos-margenes",
-    ];
-
-    let elementosFaltantes = elementosRequeridos.filter(
-      (id) => !document.getElementById(id)
-    );
-    if (elementosFaltantes.length > 0) {
-      console.error(
-        "Faltan elementos necesarios para las gráficas:",
-        elementosFaltantes
-      );
-      // Intentamos una vez más
-      setTimeout(() => {
-        elementosFaltantes = elementosRequeridos.filter(
-          (id) => !document.getElementById(id)
-        );
-        if (elementosFaltantes.length > 0) {
-          console.error(
-            "No se pudieron cargar datos necesarios:",
-            elementosFaltantes
-          );
-          mostrarErrorGraficos();
-        } else {
-          inicializarGraficos();
-        }
-      }, 1000);
-      return;
-    }
-
-    // Obtener datos con validación y valores por defecto
-    try {
-      var meses = parseJsonSafe(document.getElementById("datos-meses").value, [
-        "Ene",
-        "Feb",
-        "Mar",
-        "Abr",
-        "May",
-        "Jun",
-      ]);
-      var datosIngresosMembresias = parseJsonSafe(
-        document.getElementById("datos-ingresos-membresias").value,
-        [0, 0, 0, 0, 0, 0]
-      );
-      var datosIngresosProductos = parseJsonSafe(
-        document.getElementById("datos-ingresos-productos").value,
-        [0, 0, 0, 0, 0, 0]
-      );
-      var datosMargenes = parseJsonSafe(
-        document.getElementById("datos-margenes").value,
-        [0, 0, 0, 0, 0, 0]
-      );
-      var datosIngresosNetos = parseJsonSafe(
-        document.getElementById("datos-ingresos-netos").value,
-        [0, 0, 0, 0, 0, 0]
-      );
-      var planesNombres = parseJsonSafe(
-        document.getElementById("datos-planes-nombres").value,
-        ["Sin datos"]
-      );
-      var datosPlanes = parseJsonSafe(
-        document.getElementById("datos-planes").value,
-        [1]
-      );
-      var ingresosPotencialesPlanes = parseJsonSafe(
-        document.getElementById("datos-ingresos-potenciales-plan").value,
-        [0]
-      );
-      var productosNombres = parseJsonSafe(
-        document.getElementById("datos-productos-nombres").value,
-        ["Sin ventas"]
-      );
-      var productosCantidades = parseJsonSafe(
-        document.getElementById("datos-productos-cantidades").value,
-        [0]
-      );
-      var productosIngresos = parseJsonSafe(
-        document.getElementById("datos-productos-ingresos").value,
-        [0]
-      );
-      var productosMargenes = parseJsonSafe(
-        document.getElementById("datos-productos-margenes").value,
-        [0]
-      );
-
-      // Registrar la carga exitosa de los datos en la consola para diagnóstico
-      console.log("✅ Datos para gráficos cargados correctamente");
-      console.log("Meses:", meses);
-      console.log("Ingresos membresías:", datosIngresosMembresias);
-      console.log("Ingresos productos:", datosIngresosProductos);
-
-      // Verificar que los datos no estén vacíos
-      const hayDatos =
-        (meses.length > 0 && datosIngresosMembresias.some((v) => v > 0)) ||
-        datosIngresosProductos.some((v) => v > 0);
-
-      if (!hayDatos) {
-        console.warn(
-          "⚠️ No hay datos significativos para mostrar en los gráficos"
-        );
-      }
-    } catch (e) {
-      console.error("Error al obtener datos JSON:", e);
-      var meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun"];
-      var datosIngresosMembresias = [0, 0, 0, 0, 0, 0];
-      var datosIngresosProductos = [0, 0, 0, 0, 0, 0];
-      var datosMargenes = [0, 0, 0, 0, 0, 0];
-      var datosIngresosNetos = [0, 0, 0, 0, 0, 0];
-      var planesNombres = ["Sin datos"];
-      var datosPlanes = [1];
-      var ingresosPotencialesPlanes = [0];
-      var productosNombres = ["Sin ventas"];
-      var productosCantidades = [0];
-      var productosIngresos = [0];
-      var productosMargenes = [0];
-
-      // Registrar el error en la consola
-      console.error(
-        "❌ Error al cargar datos para gráficos. Usando valores predeterminados."
-      );
+// Ruta de las series de datos de cada gráfico (JSON con ETag)
+const URL_SERIES = "/finanzas/api/series/";
+
+// Pedir los datos de una serie. El navegador guarda la respuesta y la
+// revalida con If-None-Match: si no cambió, el servidor responde 304 sin cuerpo.
+function cargarSerie(nombre) {
+  return fetch(URL_SERIES + nombre, {
+    credentials: "same-origin",
+    headers: { Accept: "application/json" },
+  }).then((respuesta) => {
+    if (!respuesta.ok) {
+      throw new Error(`La serie ${nombre} respondió ${respuesta.status}`);
     }
+    return respuesta.json();
+  });
+}
 
-    // Calcular totales para proporciones
-    const totalIngresos =
-      datosIngresosMembresias.reduce((a, b) => a + b, 0) +
-      datosIngresosProductos.reduce((a, b) => a + b, 0);
-
-    // Verificar que Chart.js está disponible
-    if (typeof Chart === "undefined") {
-      console.error(
-        "Chart.js no está disponible. No se pueden crear gráficos."
-      );
-      mostrarErrorGraficos();
-      return;
-    }
+// Mostrar el error de una serie en lugar de sus gráficos
+function mostrarErrorSerie(ids, error) {
+  console.error(`Error al cargar datos de ${ids.join(", ")}:`, error);
+  ids.forEach((id) => {
+    const canvas = document.getElementById(id);
+    if (!canvas) return;
+    const container = canvas.parentElement;
+    container.querySelectorAll(".alert").forEach((el) => el.remove());
+    canvas.style.display = "none";
 
-    // Verificar que los elementos canvas existen
-    const canvasElementos = [
-      "graficoIngresos",
-      "graficoPlan",
-      "graficoProductos",
-      "graficoIngresosProductos",
-    ];
-    const canvasFaltantes = canvasElementos.filter(
-      (id) => !document.getElementById(id)
-    );
-
-    if (canvasFaltantes.length > 0) {
-      console.error(
-        "Faltan elementos canvas para las gráficas:",
-        canvasFaltantes
-      );
-      setTimeout(inicializarGraficos, 1000);
-      return;
-    }
+    const errorMsg = document.createElement("div");
+    errorMsg.className = "alert alert-warning my-2";
+    errorMsg.innerHTML =
+      "<strong>No se pudieron cargar los datos del gráfico.</strong> Use «Actualizar Gráficos» para reintentar.";
+    container.appendChild(errorMsg);
+  });
+}
 
-    // Gráfico de ingresos y márgenes (financiero histórico)
-    try {
-      crearGraficoSeguro("graficoIngresos", "bar", {
-        type: "bar",
-        data: {
-          labels: meses,
-          datasets: [
-            {
-              label: "Ingresos por Membresías",
-              data: datosIngresosMembresias,
-              backgroundColor: COLORES.membresias.bg,
-              borderColor: COLORES.membresias.border,
-              borderWidth: 1,
-              order: 1,
-            },
-            {
-              label: "Ingresos por Productos",
-              data: datosIngresosProductos,
-              backgroundColor: COLORES.productos.bg,
-              borderColor: COLORES.productos.border,
-              borderWidth: 1,
-              order: 1,
+// Gráfico de ingresos y márgenes (financiero histórico)
+function graficoIngresos(datos) {
+    crearGraficoSeguro("graficoIngresos", "bar", {
+      type: "bar",
+      data: {
+        labels: datos.meses,
+        datasets: [
+          {
+            label: "Ingresos por Membresías",
+            data: datos.membresias,
+            backgroundColor: COLORES.membresias.bg,
+            borderColor: COLORES.membresias.border,
+            borderWidth: 1,
+            order: 1,
+          },
+          {
+            label: "Ingresos por Productos",
+            data: datos.productos,
+            backgroundColor: COLORES.productos.bg,
+            borderColor: COLORES.productos.border,
+            borderWidth: 1,
+            order: 1,
+          },
+          {
+            label: "Ingresos Netos",
+            data: datos.ingresos_netos,
+            type: "line",
+            backgroundColor: COLORES.neto.bg,
+            borderColor: COLORES.neto.border,
+            borderWidth: 2,
+            tension: 0.4,
+            pointRadius: 4,
+            pointBackgroundColor: COLORES.neto.border,
+            fill: false,
+            order: 0,
+          },
+          {
+            label: "Margen de Ganancia",
+            data: datos.margenes,
+            type: "line",
+            backgroundColor: COLORES.margenes.bg,
+            borderColor: COLORES.margenes.border,
+            borderWidth: 2,
+            borderDash: [5, 5],
+            tension: 0.1,
+            pointRadius: 3,
+            pointBackgroundColor: COLORES.margenes.border,
+            fill: false,
+            order: 0,
+          },
+        ],
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        plugins: {
+          legend: {
+            position: "top",
+            align: "center",
+            labels: {
+              boxWidth: 12,
+              usePointStyle: true,
             },
-            {
-              label: "Ingresos Netos",
-              data: datosIngresosNetos,
-              type: "line",
-              backgroundColor: COLORES.neto.bg,
-              borderColor: COLORES.neto.border,
-              borderWidth: 2,
-              tension: 0.4,
-              pointRadius: 4,
-              pointBackgroundColor: COLORES.neto.border,
-              fill: false,
-              order: 0,
+          },
+          tooltip: {
+            mode: "index",
+            intersect: false,
+            callbacks: {
+              label: function (context) {
+                let value = context.parsed.y;
+                if (isNaN(value)) value = 0;
+                return context.dataset.label + ": " + formatoCOP(value);
+              },
             },
-            {
-              label: "Margen de Ganancia",
-              data: datosMargenes,
-              type: "line",
-              backgroundColor: COLORES.margenes.bg,
-              borderColor: COLORES.margenes.border,
-              borderWidth: 2,
-              borderDash: [5, 5],
-              tension: 0.1,
-              pointRadius: 3,
-              pointBackgroundColor: COLORES.margenes.border,
-              fill: false,
-              order: 0,
+          },
+          datalabels: {
+            // Siempre mostrar las etiquetas de datos para todos los valores
+            display: true,
+            color: function (context) {
+              return context.dataset.borderColor;
             },
-          ],
-        },
-        options: {
-          responsive: true,
-          maintainAspectRatio: false,
-          plugins: {
-            legend: {
-              position: "top",
-              align: "center",
-              labels: {
-                boxWidth: 12,
-                usePointStyle: true,
-              },
+            font: {
+              weight: "bold",
+              size: 10,
             },
-            tooltip: {
-              mode: "index",
-              intersect: false,
-              callbacks: {
-                label: function (context) {
-                  let value = context.parsed.y;
-                  if (isNaN(value)) value = 0;
-                  return context.dataset.label + ": " + formatoCOP(value);
-                },
-              },
+            formatter: function (value) {
+              return formatoCOP(value).replace("COP", "").trim();
             },
-            datalabels: {
-              // Siempre mostrar las etiquetas de datos para todos los valores
-              display: true,
-              color: function (context) {
-                return context.dataset.borderColor;
-              },
-              font: {
-                weight: "bold",
-                size: 10,
-              },
-              formatter: function (value) {
-                return formatoCOP(value).replace("COP", "").trim();
-              },
-              anchor: "end",
-              align: "top",
-              offset: 0,
+            anchor: "end",
+            align: "top",
+            offset: 0,
+          },
+        },
+        scales: {
+          x: {
+            grid: {
+              display: false,
             },
           },
-          scales: {
-            x: {
-              grid: {
-                display: false,
+          y: {
+            beginAtZero: true,
+            ticks: {
+              callback: function (value) {
+                return formatoCOP(value);
               },
             },
-            y: {
-              beginAtZero: true,
-              ticks: {
-                callback: function (value) {
-                  return formatoCOP(value);
-                },
-              },
-              grid: {
-                borderDash: [2, 2],
-              },
+            grid: {
+              borderDash: [2, 2],
             },
           },
-          interaction: {
-            mode: "index",
-            intersect: false,
-          },
         },
-      });
-      console.log("✅ Gráfico de ingresos creado correctamente");
-    } catch (e) {
-      console.error("Error en gráfico de ingresos:", e);
-    }
-
-    // Gráfico distribución por plan (gráfico de pastel)
-    try {
-      crearGraficoSeguro("graficoPlan", "pie", {
-        type: "doughnut",
-        data: {
-          labels: planesNombres,
-          datasets: [
-            {
-              label: "Usuarios por plan",
-              data: datosPlanes,
-              backgroundColor: COLORES.planes,
-              borderColor: "white",
-              borderWidth: 2,
-              hoverOffset: 15,
-            },
-          ],
+        interaction: {
+          mode: "index",
+          intersect: false,
         },
-        options: {
-          responsive: true,
-          maintainAspectRatio: false,
-          cutout: "50%",
-          plugins: {
-            legend: {
-              position: "right",
-              labels: {
-                boxWidth: 12,
-                font: {
-                  size: 11,
-                },
-              },
-            },
-            tooltip: {
-              callbacks: {
-                label: function (context) {
-                  const value = context.parsed;
-                  const index = context.dataIndex;
-                  const total = context.dataset.data.reduce(
-                    (acc, val) => acc + val,
-                    0
-                  );
-                  const percentage = Math.round((value / total) * 100);
-                  const potentialIncome = ingresosPotencialesPlanes[index];
-
-                  return [
-                    `${context.label}: ${value} usuarios (${percentage}%)`,
-                    `Ingreso potencial: ${formatoCOP(potentialIncome)}`,
-                  ];
-                },
-              },
-            },
-            datalabels: {
-              color: "white",
+      },
+    });
+  console.log("✅ Gráfico de ingresos creado correctamente");
+}
+
+// Gráfico distribución por plan (gráfico de pastel)
+function graficoPlanes(datos) {
+    crearGraficoSeguro("graficoPlan", "pie", {
+      type: "doughnut",
+      data: {
+        labels: datos.nombres,
+        datasets: [
+          {
+            label: "Usuarios por plan",
+            data: datos.usuarios,
+            backgroundColor: COLORES.planes,
+            borderColor: "white",
+            borderWidth: 2,
+            hoverOffset: 15,
+          },
+        ],
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        cutout: "50%",
+        plugins: {
+          legend: {
+            position: "right",
+            labels: {
+              boxWidth: 12,
               font: {
-                weight: "bold",
+                size: 11,
               },
-              formatter: function (value, context) {
+            },
+          },
+          tooltip: {
+            callbacks: {
+              label: function (context) {
+                const value = context.parsed;
+                const index = context.dataIndex;
                 const total = context.dataset.data.reduce(
                   (acc, val) => acc + val,
                   0
                 );
                 const percentage = Math.round((value / total) * 100);
-                return percentage + "%";
+                const potentialIncome = datos.ingresos_potenciales[index];
+
+                return [
+                  `${context.label}: ${value} usuarios (${percentage}%)`,
+                  `Ingreso potencial: ${formatoCOP(potentialIncome)}`,
+                ];
               },
             },
           },
+          datalabels: {
+            color: "white",
+            font: {
+              weight: "bold",
+            },
+            formatter: function (value, context) {
+              const total = context.dataset.data.reduce(
+                (acc, val) => acc + val,
+                0
+              );
+              const percentage = Math.round((value / total) * 100);
+              return percentage + "%";
+            },
+          },
         },
-      });
-    } catch (e) {
-      console.error("Error en gráfico de planes:", e);
-    }
+      },
+    });
+}
 
-    // Gráfico de productos más vendidos (gráfico de barras horizontales)
-    try {
-      crearGraficoSeguro("graficoProductos", "bar", {
-        type: "bar",
-        data: {
-          labels: productosNombres,
-          datasets: [
-            {
-              label: "Unidades Vendidas",
-              data: productosCantidades,
-              backgroundColor: COLORES.productos.bg,
-              borderColor: COLORES.productos.border,
-              borderWidth: 1,
-              borderRadius: 4,
+// Gráfico de productos más vendidos (gráfico de barras horizontales)
+function graficoProductos(datos) {
+    crearGraficoSeguro("graficoProductos", "bar", {
+      type: "bar",
+      data: {
+        labels: datos.nombres,
+        datasets: [
+          {
+            label: "Unidades Vendidas",
+            data: datos.cantidades,
+            backgroundColor: COLORES.productos.bg,
+            borderColor: COLORES.productos.border,
+            borderWidth: 1,
+            borderRadius: 4,
+          },
+        ],
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        indexAxis: "y",
+        plugins: {
+          legend: {
+            display: false,
+          },
+          tooltip: {
+            callbacks: {
+              label: function (context) {
+                return `${context.dataset.label}: ${context.parsed.x} unidades`;
+              },
+            },
+          },
+          datalabels: {
+            align: "end",
+            anchor: "end",
+            display: true,
+            color: COLORES.productos.border,
+            font: {
+              weight: "bold",
+            },
+            formatter: function (value) {
+              return value + " uds.";
             },
-          ],
+          },
         },
-        options: {
-          responsive: true,
-          maintainAspectRatio: false,
-          indexAxis: "y",
-          plugins: {
-            legend: {
+        scales: {
+          x: {
+            beginAtZero: true,
+            grid: {
               display: false,
             },
-            tooltip: {
-              callbacks: {
-                label: function (context) {
-                  return `${context.dataset.label}: ${context.parsed.x} unidades`;
-                },
-              },
+          },
+          y: {
+            grid: {
+              display: false,
             },
-            datalabels: {
-              align: "end",
-              anchor: "end",
-              display: true,
-              color: COLORES.productos.border,
-              font: {
-                weight: "bold",
-              },
-              formatter: function (value) {
-                return value + " uds.";
-              },
+          },
+        },
+      },
+    });
+}
+
+// Gráfico de ingresos por producto (barras apiladas con margen)
+function graficoIngresosProductos(datos) {
+    // Calcular costos para productos
+    const productosCostos = datos.ingresos.map((ingreso) => ingreso * 0.6);
+
+    crearGraficoSeguro("graficoIngresosProductos", "bar", {
+      type: "bar",
+      data: {
+        labels: datos.nombres,
+        datasets: [
+          {
+            label: "Margen",
+            data: datos.margenes,
+            backgroundColor: COLORES.margenes.border,
+            stack: "Stack 0",
+          },
+          {
+            label: "Costo",
+            data: productosCostos,
+            backgroundColor: "#e5e7eb",
+            stack: "Stack 0",
+          },
+        ],
+      },
+      options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        indexAxis: "y",
+        plugins: {
+          legend: {
+            position: "top",
+            labels: {
+              boxWidth: 12,
+              usePointStyle: true,
             },
           },
-          scales: {
-            x: {
-              beginAtZero: true,
-              grid: {
-                display: false,
+          tooltip: {
+            callbacks: {
+              label: function (context) {
+                const datasetLabel = context.dataset.label;
+                const value = context.parsed.x;
+                return `${datasetLabel}: ${formatoCOP(value)}`;
               },
-            },
-            y: {
-              grid: {
-                display: false,
+              footer: function (tooltipItems) {
+                const index = tooltipItems[0].dataIndex;
+                return `Total: ${formatoCOP(datos.ingresos[index])}`;
               },
             },
           },
-        },
-      });
-    } catch (e) {
-      console.error("Error en gráfico de productos vendidos:", e);
-    }
-
-    // Gráfico de ingresos por producto (barras apiladas con margen)
-    try {
-      // Calcular costos para productos
-      const productosCostos = productosIngresos.map((ingreso) => ingreso * 0.6);
-
-      crearGraficoSeguro("graficoIngresosProductos", "bar", {
-        type: "bar",
-        data: {
-          labels: productosNombres,
-          datasets: [
-            {
-              label: "Margen",
-              data: productosMargenes,
-              backgroundColor: COLORES.margenes.border,
-              stack: "Stack 0",
+          datalabels: {
+            display: true,
+            color: "white",
+            font: {
+              weight: "bold",
+              size: 10,
             },
-            {
-              label: "Costo",
-              data: productosCostos,
-              backgroundColor: "#e5e7eb",
-              stack: "Stack 0",
+            formatter: function (value, context) {
+              const index = context.dataIndex;
+              const total = datos.ingresos[index];
+              if (total === 0) return "0%";
+              const percentage = Math.round((value / total) * 100);
+              return percentage + "%";
             },
-          ],
+          },
         },
-        options: {
-          responsive: true,
-          maintainAspectRatio: false,
-          indexAxis: "y",
-          plugins: {
-            legend: {
-              position: "top",
-              labels: {
-                boxWidth: 12,
-                usePointStyle: true,
-              },
+        scales: {
+          x: {
+            stacked: true,
+            beginAtZero: true,
+            grid: {
+              display: false,
             },
-            tooltip: {
-              callbacks: {
-                label: function (context) {
-                  const datasetLabel = context.dataset.label;
-                  const value = context.parsed.x;
-                  return `${datasetLabel}: ${formatoCOP(value)}`;
-                },
-                footer: function (tooltipItems) {
-                  const index = tooltipItems[0].dataIndex;
-                  return `Total: ${formatoCOP(productosIngresos[index])}`;
-                },
-              },
-            },
-            datalabels: {
-              display: true,
-              color: "white",
-              font: {
-                weight: "bold",
-                size: 10,
-              },
-              formatter: function (value, context) {
-                const index = context.dataIndex;
-                const total = productosIngresos[index];
-                if (total === 0) return "0%";
-                const percentage = Math.round((value / total) * 100);
-                return percentage + "%";
+            ticks: {
+              callback: function (value) {
+                return formatoCOP(value);
               },
             },
           },
-          scales: {
-            x: {
-              stacked: true,
-              beginAtZero: true,
-              grid: {
-                display: false,
-              },
-              ticks: {
-                callback: function (value) {
-                  return formatoCOP(value);
-                },
-              },
-            },
-            y: {
-              stacked: true,
-              grid: {
-                display: false,
-              },
+          y: {
+            stacked: true,
+            grid: {
+              display: false,
             },
           },
         },
-      });
-    } catch (e) {
-      console.error("Error en gráfico de ingresos por producto:", e);
+      },
+    });
+}
+
+// Series y los gráficos que se dibujan con cada una
+const GRAFICOS_POR_SERIE = {
+  ingresos: { canvas: ["graficoIngresos"], dibujar: [graficoIngresos] },
+  planes: { canvas: ["graficoPlan"], dibujar: [graficoPlanes] },
+  productos: {
+    canvas: ["graficoProductos", "graficoIngresosProductos"],
+    dibujar: [graficoProductos, graficoIngresosProductos],
+  },
+};
+
+// Función principal para inicializar todos los gráficos
+function inicializarGraficos() {
+  try {
+    console.log("Inicializando gráficos financieros profesionales...");
+
+    // Verificar que Chart.js esté disponible
+    if (typeof Chart === "undefined") {
+      console.error("Chart.js no está disponible. Intentando cargar...");
+      inicializarFinanzasCharts();
+      return;
     }
 
-    console.log("Gráficos financieros inicializados correctamente");
+    // Registrar el plugin de datalabels si está disponible
+    if (typeof ChartDataLabels !== "undefined") {
+      Chart.register(ChartDataLabels);
+    }
+
+    // Cada serie se pide por separado: un gráfico se dibuja en cuanto llegan
+    // sus datos, sin esperar al agregado más lento
+    Object.entries(GRAFICOS_POR_SERIE).forEach(([nombre, grafico]) => {
+      const presentes = grafico.canvas.filter((id) => document.getElementById(id));
+      if (presentes.length === 0) return;
+
+      cargarSerie(nombre)
+        .then((datos) => {
+          grafico.canvas.forEach((id, i) => {
+            const canvas = document.getElementById(id);
+            if (!canvas) return;
+            canvas.parentElement.querySelectorAll(".alert").forEach((el) => el.remove());
+            canvas.style.display = "block";
+            try {
+              grafico.dibujar[i](datos);
+            } catch (e) {
+              console.error(`Error en gráfico ${id}:`, e);
+            }
+          });
+        })
+        .catch((error) => mostrarErrorSerie(grafico.canvas, error));
+    });
   } catch (error) {
     console.error("Error al inicializar gráficos:", error);
     mostrarErrorGraficos();
@@ -843,12 +678,6 @@ function inicializarFinanzasCharts() {
 // Ejecutar cuando el DOM esté cargado
 document.addEventListener("DOMContentLoaded", function () {
   inicializarFinanzasCharts();
-
-  // Forzar una recarga de gráficos después de un breve retraso para asegurar que los datos estén disponibles
-  setTimeout(function () {
-    console.log("Forzando recarga de gráficos para asegurar visualización...");
-    recargarGraficos();
-  }, 1000);
 });
 
 // Función para reiniciar todos los gráficos (útil para actualización dinámica)
@@ -0,0 +1,140 @@
+"""
+Benchmark de índices
+====================
+
+Mide las consultas de reportes más frecuentes sobre una base de datos SQLite
+temporal, primero sin los índices secundarios y luego después de que
+``actualizar_estructura_db`` los cree, como ocurre al actualizar una
+instalación existente.
+
+Uso:
+    python tests/benchmark_indices.py [--usuarios 5000] [--dias 730] [--repeticiones 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, inspect
+
+from app_launcher import create_app, actualizar_estructura_db
+from models import db, Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto
+
+
+def poblar(usuarios, dias):
+    """Inserta datos sintéticos con inserciones masivas"""
+    random.seed(42)
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    inicio = hoy - timedelta(days=dias)
+
+    db.session.execute(Producto.__table__.insert(), [
+        {'nombre': f'Producto {i}', 'precio': 1000 * (i + 1), 'stock': 100, 'categoria': 'General'}
+        for i in range(20)
+    ])
+    db.session.execute(Usuario.__table__.insert(), [
+        {'nombre': f'Usuario {i}', 'telefono': f'3{i:09d}', 'plan': 'Mensual',
+         'fecha_vencimiento_plan': (hoy + timedelta(days=random.randint(-60, 30))).date()}
+        for i in range(usuarios)
+    ])
+
+    asistencias, pagos, ventas = [], [], []
+    for usuario_id in range(1, usuarios + 1):
+        for _ in range(dias // 7):
+            asistencias.append({'usuario_id': usuario_id,
+                                'fecha': inicio + timedelta(minutes=random.randint(0, dias * 1440))})
+        for _ in range(dias // 30):
+            fecha = inicio + timedelta(minutes=random.randint(0, dias * 1440))
+            pagos.append({'usuario_id': usuario_id, 'fecha_pago': fecha, 'monto': 70000,
+                          'metodo_pago': 'Efectivo', 'plan': 'Mensual',
+                          'fecha_inicio': fecha.date(), 'fecha_fin': fecha.date() + timedelta(days=30)})
+            ventas.append({'producto_id': random.randint(1, 20), 'usuario_id': usuario_id,
+                           'cantidad': 1, 'precio_unitario': 2000, 'total': 2000,
+                           'metodo_pago': 'Efectivo', 'fecha': fecha})
+
+    db.session.execute(Asistencia.__table__.insert(), asistencias)
+    db.session.execute(PagoMensualidad.__table__.insert(), pagos)
+    db.session.execute(VentaProducto.__table__.insert(), ventas)
+    db.session.commit()
+    return len(asistencias), len(pagos), len(ventas)
+
+
+def escenarios():
+    """Consultas representativas de los reportes y del registro de asistencia"""
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    inicio_mes = hoy.replace(day=1)
+    fin_hoy = hoy + timedelta(days=1)
+    return {
+        'asistencias_hoy': lambda: Asistencia.query.filter(
+            Asistencia.fecha >= hoy, Asistencia.fecha < fin_hoy).count(),
+        'asistencia_usuario_hoy': lambda: Asistencia.query.filter(
+            Asistencia.usuario_id == 17, Asistencia.fecha >= hoy, Asistencia.fecha < fin_hoy).first(),
+        'asistencias_usuario': lambda: Asistencia.query.filter(
+            Asistencia.usuario_id == 17).order_by(Asistencia.fecha.desc()).limit(20).all(),
+        'pagos_mes': lambda: db.session.query(func.sum(PagoMensualidad.monto)).filter(
+            PagoMensualidad.fecha_pago >= inicio_mes).scalar(),
+        'ventas_mes': lambda: db.session.query(func.sum(VentaProducto.total)).filter(
+            VentaProducto.fecha >= inicio_mes).scalar(),
+        'ventas_producto': lambda: db.session.query(func.count(VentaProducto.id)).filter(
+            VentaProducto.producto_id == 3).scalar(),
+        'vencimientos_proximos': lambda: Usuario.query.filter(
+            Usuario.fecha_vencimiento_plan >= hoy.date(),
+            Usuario.fecha_vencimiento_plan <= (hoy + timedelta(days=7)).date()).all(),
+    }
+
+
+def medir(repeticiones):
+    """Devuelve el tiempo medio en milisegundos de cada escenario"""
+    resultados = {}
+    for nombre, consulta in escenarios().items():
+        consulta()  # Calentar la caché de páginas
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            consulta()
+        resultados[nombre] = (time.perf_counter() - inicio) * 1000 / repeticiones
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de índices secundarios')
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--dias', type=int, default=730)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta_db = os.path.join(directorio, 'benchmark.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta_db}', 'MIGRAR_AL_INICIAR': False})
+
+    with app.app_context():
+        # Simular una base de datos anterior a los índices
+        for tabla in db.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.drop(bind=db.engine)
+        filas = poblar(args.usuarios, args.dias)
+        print(f"Datos: {args.usuarios} usuarios, {filas[0]} asistencias, "
+              f"{filas[1]} pagos, {filas[2]} ventas")
+        antes = medir(args.repeticiones)
+
+    actualizar_estructura_db(app)
+
+    with app.app_context():
+        indices = sum(len(inspect(db.engine).get_indexes(t.name)) for t in db.metadata.sorted_tables)
+        print(f"Índices presentes: {indices}")
+        despues = medir(args.repeticiones)
+        db.session.remove()
+
+    print(f"\n{'Escenario':<26}{'Sin índices (ms)':>18}{'Con índices (ms)':>18}{'Mejora':>10}")
+    for nombre in antes:
+        mejora = antes[nombre] / despues[nombre] if despues[nombre] else float('inf')
+        print(f"{nombre:<26}{antes[nombre]:>18.3f}{despues[nombre]:>18.3f}{mejora:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
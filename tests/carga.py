@@ -0,0 +1,410 @@
+"""
+Pruebas de Carga
+================
+
+Genera tráfico parecido al de producción contra la aplicación, por su
+interfaz WSGI (en el mismo proceso) o por un socket local (con el servidor
+waitress de ``services.servidor``), y reporta por escenario el rendimiento
+(peticiones por segundo), las latencias p50/p95/p99 y la tasa de errores.
+
+La mezcla de tráfico se indica con pesos por escenario
+(``asistencia=60,busqueda=20,...``), con un archivo JSON, o se toma de lo
+registrado en producción: el texto de ``/metrics`` (``services.metricas``)
+trae las peticiones por ruta, y cada ruta se asigna a su escenario.
+
+Se ejecuta desde ``tests/run_integration_tests.py --carga``.
+"""
+import http.client
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from sqlalchemy import func
+
+from models import db, Admin, Usuario, Producto
+
+
+@dataclass
+class Peticion:
+    metodo: str
+    ruta: str
+    formulario: dict = None
+    json: dict = None
+
+
+@dataclass
+class Escenario:
+    """Tipo de tráfico: peso por defecto, rutas que lo componen y generador de peticiones"""
+    peso: float
+    endpoints: tuple
+    generar: object = field(repr=False)
+
+
+def _asistencia(azar, datos):
+    # La mitad de los socios llega identificándose por teléfono en el kiosco
+    if azar.random() < 0.5:
+        return Peticion('POST', '/usuarios/api/asistencia', json={'usuario_id': azar.choice(datos['socios'])})
+    return Peticion('POST', '/usuarios/api/asistencia', json={'telefono': azar.choice(datos['telefonos'])})
+
+
+def _busqueda(azar, datos):
+    if azar.random() < 0.5:
+        return Peticion('GET', f"/usuarios/?q={azar.choice(datos['apellidos'])}")
+    return Peticion('GET', f"/usuarios/ver_usuario/{azar.choice(datos['socios'])}")
+
+
+def _venta(azar, datos):
+    return Peticion('POST', '/productos/registrar_venta', formulario={
+        'producto_id': azar.choice(datos['productos']), 'cantidad': 1,
+        'usuario_id': azar.choice(datos['socios']) if azar.random() < 0.7 else '',
+        'metodo_pago': azar.choice(('Efectivo', 'Nequi', 'Transferencia'))})
+
+
+def _tablero(azar, datos):
+    return Peticion('GET', azar.choice(('/finanzas/', '/finanzas/api/series/ingresos', '/finanzas/api/series/planes',
+                                        '/finanzas/api/series/productos', '/finanzas/diarias', '/usuarios/asistencia')))
+
+
+def _exportacion(azar, datos):
+    return Peticion('POST', '/admin/config', formulario={
+        'accion': 'export_csv', 'tabla_exportar': azar.choice(('pagos', 'ventas', 'usuarios'))})
+
+
+ESCENARIOS = {
+    'asistencia': Escenario(55, ('main.usuarios.api_marcar_asistencia', 'main.usuarios.api_asistencia_lote',
+                                 'main.usuarios.marcar_asistencia'), _asistencia),
+    'busqueda': Escenario(25, ('main.usuarios.index', 'main.usuarios.ver_usuario', 'main.ver_usuario_directo',
+                               'main.usuario_directo'), _busqueda),
+    'venta': Escenario(10, ('main.productos.registrar_venta', 'main.registrar_venta_directo'), _venta),
+    'tablero': Escenario(8, ('main.finanzas.index', 'main.finanzas.api_series', 'main.finanzas.finanzas_diarias', 'main.usuarios.asistencia',
+                             'main.asistencia_directo'), _tablero),
+    'exportacion': Escenario(2, ('main.admin.configuracion', 'main.admin.export_data',
+                                 'main.finanzas.exportar_finanzas'), _exportacion),
+}
+
+
+class ErrorCarga(ValueError):
+    """Mezcla de tráfico no válida"""
+
+
+def mezcla_por_defecto():
+    return {nombre: escenario.peso for nombre, escenario in ESCENARIOS.items()}
+
+
+def leer_mezcla(texto):
+    """
+    Pesos por escenario desde ``nombre=peso,...`` o desde un archivo JSON con el mismo contenido.
+
+    Raises:
+        ErrorCarga: Si un escenario no existe o ningún peso es positivo
+    """
+    if texto.endswith('.json'):
+        with open(texto, encoding='utf-8') as archivo:
+            mezcla = {nombre: float(peso) for nombre, peso in json.load(archivo).items()}
+    else:
+        mezcla = {}
+        for parte in filter(None, (p.strip() for p in texto.split(','))):
+            nombre, _, peso = parte.partition('=')
+            try:
+                mezcla[nombre.strip()] = float(peso)
+            except ValueError:
+                raise ErrorCarga(f"Peso no válido en '{parte}'")
+    return _validar_mezcla(mezcla)
+
+
+def mezcla_desde_metricas(texto):
+    """
+    Pesos según las peticiones registradas en ``/metrics``.
+
+    Args:
+        texto: Contenido de ``/metrics``, o una URL o ruta de archivo donde leerlo
+    """
+    if texto.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(texto, timeout=10) as respuesta:
+            texto = respuesta.read().decode('utf-8')
+    elif '\n' not in texto:
+        with open(texto, encoding='utf-8') as archivo:
+            texto = archivo.read()
+
+    por_endpoint = {}
+    for etiquetas, valor in re.findall(r'^gimnasio_peticiones_total\{([^}]*)\} (\S+)$', texto, re.MULTILINE):
+        endpoint = re.search(r'endpoint="([^"]*)"', etiquetas)
+        if endpoint:
+            por_endpoint[endpoint.group(1)] = por_endpoint.get(endpoint.group(1), 0) + float(valor)
+
+    mezcla = {nombre: sum(por_endpoint.get(endpoint, 0) for endpoint in escenario.endpoints)
+              for nombre, escenario in ESCENARIOS.items()}
+    return _validar_mezcla({nombre: peso for nombre, peso in mezcla.items() if peso})
+
+
+def _validar_mezcla(mezcla):
+    desconocidos = set(mezcla) - set(ESCENARIOS)
+    if desconocidos:
+        raise ErrorCarga(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}. "
+                         f"Disponibles: {', '.join(ESCENARIOS)}")
+    mezcla = {nombre: peso for nombre, peso in mezcla.items() if peso > 0}
+    if not mezcla:
+        raise ErrorCarga("La mezcla de tráfico no tiene ningún peso positivo")
+    return mezcla
+
+
+def datos_de_prueba(muestra=2000):
+    """Socios, teléfonos, apellidos y productos reales con los que armar las peticiones"""
+    socios = db.session.query(Usuario.id, Usuario.telefono, Usuario.nombre).order_by(
+        func.random()).limit(muestra).all()
+    productos = [producto_id for (producto_id,) in db.session.query(Producto.id)]
+    if not socios or not productos:
+        raise ErrorCarga("La base de datos necesita socios y productos (use --generar-datos)")
+    apellidos = sorted({nombre.split()[-1] for _, _, nombre in socios if nombre})
+    return {'socios': [s[0] for s in socios], 'telefonos': [s[1] for s in socios if s[1]],
+            'apellidos': apellidos or ['a'], 'productos': productos}
+
+
+def admin_de_carga():
+    """Administrador con el que se firman las sesiones de la prueba (se crea si no existe)"""
+    admin = Admin.query.filter_by(usuario='prueba_carga').first()
+    if admin is None:
+        admin = Admin(nombre='Prueba de carga', usuario='prueba_carga', rol='administrador')
+        admin.set_password(str(random.SystemRandom().random()))
+        db.session.add(admin)
+        db.session.commit()
+    return admin.id
+
+
+def cookie_de_sesion(app, admin_id):
+    """Cookie de sesión firmada como la que crea ``/auth/login``"""
+    serializador = app.session_interface.get_signing_serializer(app)
+    return serializador.dumps({'admin_id': admin_id, 'admin_rol': 'administrador', 'admin_nombre': 'Prueba de carga'})
+
+
+def _codigo(estado, destino):
+    """Una redirección al inicio de sesión significa que la sesión no es válida: se cuenta como 401"""
+    if 300 <= estado < 400 and '/auth/login' in (destino or ''):
+        return 401
+    return estado
+
+
+class ClienteWSGI:
+    """Llama a la aplicación en el mismo proceso, sin red"""
+
+    def __init__(self, app, cookie):
+        self.cliente = app.test_client()
+        self.cliente.set_cookie('localhost', app.config.get('SESSION_COOKIE_NAME', 'session'), cookie)
+
+    def pedir(self, peticion):
+        respuesta = self.cliente.open(peticion.ruta, method=peticion.metodo, data=peticion.formulario,
+                                      json=peticion.json)
+        respuesta.get_data()
+        respuesta.close()
+        return _codigo(respuesta.status_code, respuesta.headers.get('Location'))
+
+    def cerrar(self):
+        pass
+
+
+class ClienteSocket:
+    """Conexión HTTP persistente (keep-alive) con el servidor local"""
+
+    def __init__(self, host, puerto, cookie, nombre_cookie='session'):
+        self.host, self.puerto = host, puerto
+        self.cabeceras = {'Cookie': f'{nombre_cookie}={cookie}'}
+        self.conexion = None
+
+    def pedir(self, peticion):
+        cabeceras = dict(self.cabeceras)
+        cuerpo = None
+        if peticion.json is not None:
+            cuerpo = json.dumps(peticion.json).encode()
+            cabeceras['Content-Type'] = 'application/json'
+        elif peticion.formulario is not None:
+            cuerpo = urlencode(peticion.formulario).encode()
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.conexion is None:
+            self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=60)
+        try:
+            self.conexion.request(peticion.metodo, peticion.ruta.replace(' ', '%20'), body=cuerpo, headers=cabeceras)
+            respuesta = self.conexion.getresponse()
+            respuesta.read()
+            if respuesta.will_close:
+                self.cerrar()
+            return _codigo(respuesta.status, respuesta.getheader('Location'))
+        except (OSError, http.client.HTTPException):
+            self.cerrar()
+            raise
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            self.conexion = None
+
+
+def _percentil(ordenados, porcentaje):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordenados:
+        return 0.0
+    posicion = max(0, min(len(ordenados) - 1, math.ceil(porcentaje / 100 * len(ordenados)) - 1))
+    return ordenados[posicion]
+
+
+def resumir(registros, segundos):
+    """Rendimiento, latencias y errores por escenario a partir de ``(escenario, segundos, correcta)``"""
+    por_escenario = {}
+    for nombre, duracion, correcta in registros:
+        tiempos, errores = por_escenario.setdefault(nombre, ([], [0]))
+        tiempos.append(duracion * 1000)
+        if not correcta:
+            errores[0] += 1
+
+    resultado = {}
+    for nombre, (tiempos, errores) in sorted(por_escenario.items()):
+        tiempos.sort()
+        resultado[nombre] = {
+            'peticiones': len(tiempos),
+            'errores': errores[0],
+            'tasa_error': round(errores[0] / len(tiempos), 4),
+            'por_segundo': round(len(tiempos) / segundos, 2),
+            'p50_ms': round(_percentil(tiempos, 50), 2),
+            'p95_ms': round(_percentil(tiempos, 95), 2),
+            'p99_ms': round(_percentil(tiempos, 99), 2),
+            'max_ms': round(tiempos[-1], 2),
+        }
+    total = len(registros)
+    errores = sum(datos['errores'] for datos in resultado.values())
+    return {'segundos': round(segundos, 2), 'peticiones': total, 'errores': errores,
+            'por_segundo': round(total / segundos, 2) if segundos else 0.0, 'escenarios': resultado}
+
+
+def ejecutar_carga(app, mezcla=None, usuarios=8, duracion=30, peticiones=None, transporte='wsgi', semilla=1):
+    """
+    Lanza ``usuarios`` hilos que piden escenarios al azar según ``mezcla``.
+
+    Args:
+        app: Aplicación creada con ``create_app``
+        mezcla: Pesos por escenario (por defecto ``mezcla_por_defecto()``)
+        usuarios: Clientes simultáneos
+        duracion: Segundos de prueba (si no se indica ``peticiones``)
+        peticiones: Total de peticiones a enviar; tiene prioridad sobre ``duracion``
+        transporte: ``wsgi`` (en el proceso) o ``socket`` (servidor waitress local)
+        semilla: Semilla de la secuencia de peticiones
+
+    Returns:
+        El resumen de ``resumir``
+    """
+    mezcla = _validar_mezcla(mezcla or mezcla_por_defecto())
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    with app.app_context():
+        datos = datos_de_prueba()
+        cookie = cookie_de_sesion(app, admin_de_carga())
+        db.session.remove()
+
+    servidor = hilo_servidor = None
+    if transporte == 'socket':
+        from services.servidor import crear_servidor, detener_servidor
+        servidor = crear_servidor(app, port=0, hilos=max(4, usuarios))
+        hilo_servidor = threading.Thread(target=servidor.run, name='servidor-carga', daemon=True)
+        hilo_servidor.start()
+        nombre_cookie = app.config.get('SESSION_COOKIE_NAME', 'session')
+        nuevo_cliente = lambda: ClienteSocket('127.0.0.1', servidor.effective_port, cookie, nombre_cookie)
+    elif transporte == 'wsgi':
+        nuevo_cliente = lambda: ClienteWSGI(app, cookie)
+    else:
+        raise ErrorCarga(f"Transporte desconocido: {transporte}")
+
+    restantes = [peticiones] if peticiones else None
+    cerrojo = threading.Lock()
+    registros_por_hilo = [[] for _ in range(usuarios)]
+    fin = time.perf_counter() + duracion
+
+    def trabajar(indice):
+        azar = random.Random(semilla * 1000 + indice)
+        cliente = nuevo_cliente()
+        registros = registros_por_hilo[indice]
+        try:
+            while True:
+                if restantes is not None:
+                    with cerrojo:
+                        if restantes[0] <= 0:
+                            break
+                        restantes[0] -= 1
+                elif time.perf_counter() >= fin:
+                    break
+                nombre = azar.choices(nombres, weights=pesos)[0]
+                peticion = ESCENARIOS[nombre].generar(azar, datos)
+                inicio = time.perf_counter()
+                try:
+                    correcta = cliente.pedir(peticion) < 400
+                except Exception:
+                    correcta = False
+                registros.append((nombre, time.perf_counter() - inicio, correcta))
+        finally:
+            cliente.cerrar()
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=trabajar, args=(i,), name=f'carga-{i}') for i in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    if servidor is not None:
+        detener_servidor(app)
+        hilo_servidor.join(10)
+    return resumir([registro for registros in registros_por_hilo for registro in registros], segundos)
+
+
+def imprimir_resumen(resumen):
+    print(f"\n{resumen['peticiones']} peticiones en {resumen['segundos']} s "
+          f"({resumen['por_segundo']} por segundo), {resumen['errores']} con error")
+    print(f"{'Escenario':<14}{'Peticiones':>11}{'Por seg.':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'Máx. ms':>10}{'Errores':>9}")
+    for nombre, datos in resumen['escenarios'].items():
+        print(f"{nombre:<14}{datos['peticiones']:>11}{datos['por_segundo']:>10.1f}{datos['p50_ms']:>10.1f}"
+              f"{datos['p95_ms']:>10.1f}{datos['p99_ms']:>10.1f}{datos['max_ms']:>10.1f}"
+              f"{datos['tasa_error']:>8.1%}")
+
+
+def prueba_de_carga(ruta_db=None, socios=2000, semilla=42, salida=None, **opciones):
+    """
+    Prepara la aplicación sobre ``ruta_db`` y ejecuta ``ejecutar_carga``.
+
+    Sin ``ruta_db`` se genera una base de datos sintética de ``socios`` en una
+    carpeta temporal; con ella se usa una copia, ya que la prueba registra
+    asistencias y ventas.
+    """
+    import os
+    import shutil
+    import tempfile
+    from app_launcher import create_app
+    from services.datos_sinteticos import generar_archivo
+    from services.trabajos import detener_trabajos
+
+    directorio = tempfile.mkdtemp()
+    copia = os.path.join(directorio, 'carga.db')
+    try:
+        if ruta_db:
+            shutil.copyfile(ruta_db, copia)
+        else:
+            generar_archivo(copia, socios=socios, años=1, semilla=semilla, progreso=None)
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{copia}',
+                          'SQL_UMBRAL_LENTA_MS': float('inf'), 'SQLITE_CHECKPOINT_SEGUNDOS': 0})
+        try:
+            resumen = ejecutar_carga(app, semilla=semilla, **opciones)
+        finally:
+            detener_trabajos(app, esperar=True)
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resumen, archivo, indent=2, ensure_ascii=False)
+    return resumen
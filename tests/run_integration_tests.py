@@ -1,7 +1,15 @@
 #!/usr/bin/env python
 """
 Script para ejecutar pruebas de integración de la aplicación GimnasioDB
+
+Con ``--carga`` ejecuta en su lugar la prueba de carga de ``tests/carga.py``:
+
+    python tests/run_integration_tests.py --carga [--db database.db] [--transporte wsgi|socket]
+                                          [--usuarios 8] [--duracion 30] [--mezcla asistencia=60,venta=10]
+                                          [--mezcla-metricas http://localhost:5000/metrics] [--salida carga.json]
 """
+import argparse
+import json
 import os
 import sys
 import time
@@ -105,7 +113,52 @@ Estado general: {}
     
     return success
 
+def run_load_test(args):
+    """Ejecuta la prueba de carga y muestra el resumen por escenario"""
+    from carga import ErrorCarga, leer_mezcla, mezcla_desde_metricas, prueba_de_carga, imprimir_resumen
+
+    try:
+        mezcla = None
+        if args.mezcla_metricas:
+            mezcla = mezcla_desde_metricas(args.mezcla_metricas)
+        elif args.mezcla:
+            mezcla = leer_mezcla(args.mezcla)
+        if mezcla:
+            logger.info(f"Mezcla de tráfico: {json.dumps(mezcla)}")
+        resumen = prueba_de_carga(args.db, socios=args.socios, salida=args.salida, mezcla=mezcla,
+                                  usuarios=args.usuarios, duracion=args.duracion, peticiones=args.peticiones,
+                                  transporte=args.transporte)
+    except ErrorCarga as e:
+        logger.error(f"Error en la prueba de carga: {e}")
+        return False
+
+    imprimir_resumen(resumen)
+    if args.salida:
+        logger.info(f"Resultados guardados en {args.salida}")
+    return resumen['errores'] == 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Pruebas de integración y de carga de GimnasioDB')
+    parser.add_argument('--carga', action='store_true', help='Ejecutar la prueba de carga en lugar de las pruebas')
+    parser.add_argument('--db', help='Base de datos sobre la que probar (se usa una copia); '
+                                     'por defecto se genera una sintética')
+    parser.add_argument('--socios', type=int, default=2000, help='Socios de la base de datos generada')
+    parser.add_argument('--transporte', choices=('wsgi', 'socket'), default='wsgi',
+                        help='wsgi: en el mismo proceso; socket: servidor waitress local')
+    parser.add_argument('--usuarios', type=int, default=8, help='Clientes simultáneos')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de prueba')
+    parser.add_argument('--peticiones', type=int, help='Total de peticiones (en lugar de --duracion)')
+    parser.add_argument('--mezcla', help='Pesos por escenario (asistencia=60,venta=10) o archivo JSON')
+    parser.add_argument('--mezcla-metricas', help='Tomar la mezcla del texto de /metrics (URL o archivo)')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.carga:
+        sys.path.insert(0, parent_dir)
+        sys.exit(0 if run_load_test(args) else 1)
+
     # Verificar entorno
     if not check_test_environment():
         logger.error("El entorno de pruebas no está configurado correctamente")
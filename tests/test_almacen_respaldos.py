@@ -0,0 +1,219 @@
+"""
+Pruebas para el almacén de respaldos deduplicados
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from sqlalchemy import inspect
+
+from models import db, Admin, Producto, PagoMensualidad
+from services.almacen_respaldos import AlmacenRespaldos, almacen_de, importar_copias_completas
+from services.respaldos import ErrorRespaldo
+from services.resumen_diario import totales_rango
+
+
+class TestAlmacenRespaldos(unittest.TestCase):
+    """Pruebas para las instantáneas, su restauración y la limpieza de trozos"""
+
+    def setUp(self):
+        """Crear una base de datos con unas 2 MB de asistencias"""
+        self.directorio = tempfile.mkdtemp()
+        self.ruta_db = os.path.join(self.directorio, 'database.db')
+        self.almacen = AlmacenRespaldos(os.path.join(self.directorio, 'backups', 'almacen'))
+        conexion = sqlite3.connect(self.ruta_db)
+        conexion.execute('CREATE TABLE asistencia (id INTEGER PRIMARY KEY, dato TEXT)')
+        conexion.executemany('INSERT INTO asistencia (dato) VALUES (?)',
+                             [(f'usuario {i} ' * 20,) for i in range(10000)])
+        conexion.commit()
+        conexion.close()
+
+    def tearDown(self):
+        """Eliminar los archivos temporales"""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _escribir(self, sql):
+        conexion = sqlite3.connect(self.ruta_db)
+        conexion.execute(sql)
+        conexion.commit()
+        conexion.close()
+
+    def _contar(self, ruta):
+        conexion = sqlite3.connect(ruta)
+        try:
+            return conexion.execute('SELECT COUNT(*) FROM asistencia').fetchone()[0]
+        finally:
+            conexion.close()
+
+    def test_solo_guarda_trozos_modificados(self):
+        """La segunda instantánea solo añade los trozos que cambiaron"""
+        primera = self.almacen.crear_instantanea(self.ruta_db)
+        self._escribir("INSERT INTO asistencia (dato) VALUES ('nueva')")
+        segunda = self.almacen.crear_instantanea(self.ruta_db)
+
+        self.assertEqual(primera['trozos_nuevos'], len(primera['trozos']))
+        self.assertLessEqual(segunda['trozos_nuevos'], 3)
+        self.assertNotEqual(primera['nombre'], segunda['nombre'])
+
+        uso = self.almacen.uso()
+        self.assertEqual(uso['instantaneas'], 2)
+        # Dos copias completas ocuparían el doble; comprimidas y deduplicadas, mucho menos
+        self.assertLess(uso['bytes_en_disco'], uso['bytes_sin_deduplicar'] / 4)
+
+    def test_instantaneas_simultaneas(self):
+        """Dos instantáneas a la vez usan copias temporales distintas y no dejan restos"""
+        manifiestos = []
+        hilos = [threading.Thread(target=lambda: manifiestos.append(self.almacen.crear_instantanea(self.ruta_db)))
+                 for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(manifiestos), 2)
+        for manifiesto in manifiestos:
+            destino = os.path.join(self.directorio, f"{manifiesto['nombre']}.db")
+            self.almacen.restaurar(manifiesto['nombre'], destino)
+            self.assertEqual(self._contar(destino), 10000)
+        self.assertEqual([a for a in os.listdir(self.almacen.carpeta) if a.endswith('.db')], [])
+
+    def test_restaurar_instantanea(self):
+        """Cada instantánea se reconstruye tal como era"""
+        primera = self.almacen.crear_instantanea(self.ruta_db)
+        self._escribir('DELETE FROM asistencia WHERE id > 100')
+        self.almacen.crear_instantanea(self.ruta_db)
+
+        destino = os.path.join(self.directorio, 'restaurada.db')
+        self.almacen.restaurar(primera['nombre'], destino)
+        self.assertEqual(self._contar(destino), 10000)
+        self.assertEqual([m['nombre'] for m in self.almacen.listar()][-1], primera['nombre'])
+
+    def test_trozo_dañado(self):
+        """Un trozo alterado se detecta y no se escribe el destino"""
+        manifiesto = self.almacen.crear_instantanea(self.ruta_db)
+        formato, ruta = self.almacen._buscar_objeto(manifiesto['trozos'][-1])
+        os.remove(ruta)
+
+        destino = os.path.join(self.directorio, 'restaurada.db')
+        with self.assertRaises(ErrorRespaldo):
+            self.almacen.restaurar(manifiesto['nombre'], destino)
+        self.assertFalse(os.path.exists(destino))
+
+    def test_podar_libera_trozos(self):
+        """Al podar solo se borran los trozos que ninguna instantánea usa"""
+        self.almacen.crear_instantanea(self.ruta_db, origen='automatico')
+        self._escribir('UPDATE asistencia SET dato = dato || id')
+        ultima = self.almacen.crear_instantanea(self.ruta_db, origen='automatico')
+        manual = self.almacen.crear_instantanea(self.ruta_db, origen='manual')
+
+        self.assertGreater(self.almacen.podar(1, origen='automatico'), 0)
+        self.assertEqual({m['nombre'] for m in self.almacen.listar()},
+                         {ultima['nombre'], manual['nombre']})
+        self.almacen.restaurar(ultima['nombre'], os.path.join(self.directorio, 'restaurada.db'))
+
+    def test_importar_copias_completas(self):
+        """Las copias completas antiguas pasan al almacén y se eliminan"""
+        carpeta = os.path.join(self.directorio, 'backups')
+        os.makedirs(carpeta, exist_ok=True)
+        copia = os.path.join(carpeta, 'backup_db_20240105_080000.db')
+        shutil.copy2(self.ruta_db, copia)
+        os.utime(copia, (datetime(2024, 1, 5, 8).timestamp(),) * 2)
+        with open(os.path.join(carpeta, 'database_20240106_080000.db'), 'wb') as archivo:
+            archivo.write(b'no es sqlite')
+
+        resultados = dict(importar_copias_completas(self.almacen, [carpeta]))
+        manifiesto = resultados['backup_db_20240105_080000.db']
+        self.assertEqual(manifiesto['origen'], 'importado')
+        self.assertTrue(manifiesto['fecha'].startswith('2024-01-05T08:00'))
+        self.assertFalse(os.path.exists(copia))
+        self.assertIn('No se importó', resultados['database_20240106_080000.db'])
+
+
+class TestRutasInstantaneas(unittest.TestCase):
+    """Pruebas para listar y restaurar instantáneas desde la configuración"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.ruta_db = os.path.join(self.directorio, 'database.db')
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.ruta_db}', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add(admin)
+        db.session.commit()
+        self.cliente = self.app.test_client()
+        with self.cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_listar_y_restaurar(self):
+        """La configuración lista las instantáneas y restaura cualquiera de ellas"""
+        almacen = almacen_de(self.ruta_db)
+        manifiesto = almacen.crear_instantanea(self.ruta_db)
+        db.session.add(Producto(nombre='Proteína', precio=100, stock=5))
+        db.session.commit()
+
+        pagina = self.cliente.get('/admin/config').get_data(as_text=True)
+        self.assertIn(f"/admin/restaurar_instantanea/{manifiesto['nombre']}", pagina)
+
+        respuesta = self.cliente.post(f"/admin/restaurar_instantanea/{manifiesto['nombre']}")
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(Producto.query.count(), 0)
+        # El estado anterior a la restauración queda guardado
+        self.assertEqual([m['origen'] for m in almacen.listar()], ['antes_de_restaurar', 'manual'])
+
+        descarga = self.cliente.get(f"/admin/descargar_instantanea/{manifiesto['nombre']}")
+        self.assertEqual(descarga.status_code, 200)
+        self.assertEqual(descarga.data[:16], b'SQLite format 3\x00')
+        descarga.close()
+        # La copia reconstruida para la descarga no queda en la carpeta
+        self.assertEqual([a for a in os.listdir(almacen.carpeta) if a.endswith('.db')], [])
+
+        # Tampoco si la reconstrucción falla con un error inesperado
+        with mock.patch.object(AlmacenRespaldos, 'restaurar', side_effect=OSError('Disco lleno')):
+            with self.assertRaises(OSError):
+                self.cliente.get(f"/admin/descargar_instantanea/{manifiesto['nombre']}")
+        self.assertEqual([a for a in os.listdir(almacen.carpeta) if a.endswith('.db')], [])
+
+    def test_restaurar_copia_anterior_a_las_migraciones(self):
+        """Una copia sin las tablas del resumen queda migrada y admite pagos nuevos"""
+        antigua = os.path.join(self.directorio, 'antigua.db')
+        conexion = sqlite3.connect(antigua)
+        sqlite3.connect(self.ruta_db).backup(conexion)
+        conexion.executescript('DROP TABLE resumen_diario; DROP TABLE resumen_diario_metodo; '
+                               'DELETE FROM schema_version;')
+        conexion.close()
+        manifiesto = almacen_de(self.ruta_db).crear_instantanea(antigua)
+
+        respuesta = self.cliente.post(f"/admin/restaurar_instantanea/{manifiesto['nombre']}")
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(inspect(db.engine).has_table('resumen_diario'))
+
+        hoy = date.today()
+        db.session.add(PagoMensualidad(monto=70000, metodo_pago='Efectivo', plan='Mensual',
+                                       fecha_pago=datetime.combine(hoy, datetime.min.time()),
+                                       fecha_inicio=hoy, fecha_fin=hoy))
+        db.session.commit()
+        self.assertEqual(totales_rango(hoy, hoy)['total_membresias'], 70000)
+
+
+if __name__ == '__main__':
+    unittest.main()
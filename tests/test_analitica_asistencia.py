@@ -0,0 +1,105 @@
+"""
+Pruebas para la analítica de asistencia (página de control de asistencia)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, Asistencia, date_colombia
+from services.analitica_asistencia import calendario_mes, contar_asistencias, proximos_vencimientos
+from services.trabajos import detener_trabajos
+
+
+class TestAnaliticaAsistencia(unittest.TestCase):
+    """Pruebas para los datos de la página de asistencia"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.cliente = self.app.test_client()
+        self.hoy = date_colombia()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _socios(self, cantidad, asistencias_por_socio=3):
+        """Socios con vencimientos escalonados y asistencias en el mes pasado y el actual"""
+        inicio = len(Usuario.query.all())
+        inicio_mes = datetime.combine(self.hoy.replace(day=1), datetime.min.time())
+        for i in range(inicio, inicio + cantidad):
+            socio = Usuario(nombre=f'Socio {i:04d}', telefono=f'310{i:07d}', plan='Mensual',
+                            fecha_vencimiento_plan=self.hoy + timedelta(days=i % 10 - 2))
+            db.session.add(socio)
+            db.session.flush()
+            db.session.add_all([Asistencia(usuario_id=socio.id, fecha=inicio_mes + timedelta(hours=9, minutes=i + k))
+                                for k in range(asistencias_por_socio)])
+            db.session.add(Asistencia(usuario_id=socio.id, fecha=inicio_mes - timedelta(days=1)))
+        db.session.commit()
+
+    def test_consultas_constantes(self):
+        """La página hace las mismas consultas con 10 o con 200 socios"""
+        self._socios(10)
+        pocos = self.cliente.get('/usuarios/asistencia')
+        self._socios(190)
+        muchos = self.cliente.get('/usuarios/asistencia')
+        self.assertEqual((pocos.status_code, muchos.status_code), (200, 200))
+        self.assertEqual(pocos.headers['X-SQL-Consultas'], muchos.headers['X-SQL-Consultas'])
+        # El selector ya no incluye a todos los socios
+        self.assertNotIn('Socio 0150', muchos.get_data(as_text=True))
+
+    def test_indicadores(self):
+        """Conteo por día, de hoy y del mes, y vencimientos de los próximos días"""
+        self._socios(20)
+        dias = {fila['dia']: fila['asistencias'] for fila in calendario_mes(self.hoy.year, self.hoy.month)}
+        self.assertEqual(dias[1], 60)
+        self.assertEqual(sum(dias.values()), 60)
+        self.assertEqual(contar_asistencias(self.hoy), (60 if self.hoy.day == 1 else 0, 60))
+
+        vencimientos = proximos_vencimientos(self.hoy)
+        self.assertEqual(sorted({v['dias'] for v in vencimientos}), [0, 1, 2, 3])
+        self.assertEqual(len(vencimientos), 8)
+
+    def test_buscar_y_detalle(self):
+        """El buscador devuelve solo coincidencias y el detalle se recorre por páginas"""
+        self._socios(30)
+        datos = self.cliente.get('/usuarios/api/asistencia/buscar?q=Socio 001').get_json()
+        self.assertEqual(datos['cantidad'], 10)
+        self.assertIn('Socio 0012', datos['html'])
+        self.assertNotIn('Socio 0021', datos['html'])
+
+        pagina = self.cliente.get('/usuarios/asistencia').get_data(as_text=True)
+        self.assertIn('Cargar más', pagina)
+        filas, cursor = 0, ''
+        while True:
+            datos = self.cliente.get(f'/usuarios/api/asistencia/detalle?por_pagina=40&cursor={cursor}').get_json()
+            filas += datos['html'].count('<tr>')
+            cursor = datos['siguiente']
+            if not cursor:
+                break
+        self.assertEqual(filas, 90)
+
+        desde = min(self.hoy.replace(day=1), self.hoy - timedelta(days=2))
+        eventos = self.cliente.get(f'/usuarios/api/asistencia/calendario?start={desde}'
+                                   f'&end={self.hoy + timedelta(days=40)}').get_json()
+        self.assertIn({'title': '90 asistencia(s)', 'start': self.hoy.replace(day=1).isoformat(),
+                       'backgroundColor': '#28a745', 'borderColor': '#28a745'}, eventos)
+        self.assertEqual(sum(int(e['title'].split()[1]) for e in eventos if e['title'].startswith('Vencen')), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Pruebas para la caché de indicadores de finanzas
+"""
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, text
+
+from app_launcher import create_app
+from models import db, Admin, Usuario, PagoMensualidad, date_colombia
+from routes.finanzas.agregados import calcular_resumen_dashboard
+from services.cache_kpi import CacheLRU
+from services.resumen_diario import reconstruir_resumen_diario
+
+
+class TestCacheKPI(unittest.TestCase):
+    """Pruebas para el guardado y la invalidación de los indicadores por período"""
+
+    def setUp(self):
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.hoy = datetime.combine(date_colombia(), datetime.min.time()) + timedelta(hours=10)
+        self.usuario = Usuario(nombre='Socio', telefono='3000000001', plan='Mensual',
+                               fecha_vencimiento_plan=self.hoy.date() + timedelta(days=10))
+        db.session.add(self.usuario)
+        db.session.flush()
+        self.pago_antiguo = self._pagar(self.hoy - timedelta(days=95), 50000)
+        self._pagar(self.hoy, 70000)
+        db.session.commit()
+
+        self.consultas = 0
+        event.listen(db.engine, 'before_cursor_execute', self._contar)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self._contar)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _contar(self, *args):
+        self.consultas += 1
+
+    def _pagar(self, fecha, monto):
+        pago = PagoMensualidad(usuario_id=self.usuario.id, fecha_pago=fecha, monto=monto,
+                               metodo_pago='Efectivo', plan='Mensual',
+                               fecha_inicio=fecha.date(), fecha_fin=fecha.date())
+        db.session.add(pago)
+        return pago
+
+    def test_recargas_sin_consultas(self):
+        """La segunda carga del dashboard no consulta la base de datos"""
+        primero = calcular_resumen_dashboard(6)
+        self.assertGreater(self.consultas, 0)
+        self.consultas = 0
+        segundo = calcular_resumen_dashboard(6)
+        self.assertEqual(self.consultas, 0)
+        self.assertEqual(segundo.mes.total, primero.mes.total)
+        self.assertEqual(sum(t.total for _, t in segundo.historico), Decimal('120000.00'))
+
+    def test_invalidacion_por_pagos(self):
+        """Un pago nuevo invalida el período en curso; uno corregido, también su mes cerrado"""
+        calcular_resumen_dashboard(6)
+        self._pagar(self.hoy, 30000)
+        db.session.commit()
+        resumen = calcular_resumen_dashboard(6)
+        self.assertEqual(resumen.dia.membresias, Decimal('100000.00'))
+        self.assertEqual(len(resumen.transacciones), 3)
+
+        self.pago_antiguo.monto = 40000
+        db.session.commit()
+        resumen = calcular_resumen_dashboard(6)
+        self.assertEqual(sum(t.total for _, t in resumen.historico), Decimal('140000.00'))
+
+        # Un cambio revertido no invalida nada
+        self._pagar(self.hoy, 1000)
+        db.session.flush()
+        db.session.rollback()
+        self.consultas = 0
+        calcular_resumen_dashboard(6)
+        self.assertEqual(self.consultas, 0)
+
+    def test_invalidacion_por_reconstruccion(self):
+        """Un borrado con SQL directo seguido de la reconstrucción del resumen descarta los meses cerrados"""
+        antes = calcular_resumen_dashboard(6)
+        self.assertEqual(sum(t.total for _, t in antes.historico), Decimal('120000.00'))
+
+        db.session.execute(text('DELETE FROM pago_mensualidad WHERE id = :id'), {'id': self.pago_antiguo.id})
+        db.session.commit()
+        reconstruir_resumen_diario()
+
+        despues = calcular_resumen_dashboard(6)
+        self.assertEqual(sum(t.total for _, t in despues.historico), Decimal('70000.00'))
+
+    def _cliente_admin(self):
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add(admin)
+        db.session.commit()
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+        return cliente
+
+    def test_invalidacion_por_borrado_total(self):
+        """Borrar todos los datos desde la configuración descarta los indicadores guardados"""
+        cliente = self._cliente_admin()
+        calcular_resumen_dashboard(6)
+
+        respuesta = cliente.post('/admin/config', data={'accion': 'reset_all_data', 'confirmacion': 'BORRAR TODO'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(PagoMensualidad.query.count(), 0)
+
+        resumen = calcular_resumen_dashboard(6)
+        self.assertEqual(sum(t.total for _, t in resumen.historico), Decimal('0.00'))
+        self.assertEqual(resumen.dia.membresias, Decimal('0.00'))
+
+    def test_lru_y_vencimiento(self):
+        cache = CacheLRU(max_entradas=2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obtener('a')
+        cache.guardar('c', 3)
+        self.assertIsNone(cache.obtener('b'))
+        self.assertEqual(cache.obtener('a'), 1)
+        cache.guardar('d', 4, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.obtener('d'))
+        self.assertEqual(len(cache), 1)
+        cache.borrar_prefijo('a')
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Pruebas para la prueba de carga (tests/carga.py)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app_launcher import create_app
+from models import db, Asistencia
+from services.datos_sinteticos import generar_gimnasio
+from services.trabajos import detener_trabajos
+from carga import (ClienteWSGI, ErrorCarga, Peticion, ejecutar_carga, leer_mezcla, mezcla_desde_metricas,
+                   resumir)
+
+
+class TestCarga(unittest.TestCase):
+    """Pruebas para las mezclas de tráfico y el resumen de resultados"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_carga_wsgi(self):
+        """Todas las peticiones de la mezcla responden sin error y quedan registradas"""
+        with self.app.app_context():
+            generar_gimnasio(socios=40, años=0.2, semilla=1, hasta=date(2024, 3, 1))
+            antes = Asistencia.query.count()
+            db.session.remove()
+        resumen = ejecutar_carga(self.app, usuarios=3, peticiones=60)
+        self.assertEqual(resumen['peticiones'], 60)
+        self.assertEqual(resumen['errores'], 0, resumen)
+        self.assertEqual(set(resumen['escenarios']), {'asistencia', 'busqueda', 'venta', 'tablero', 'exportacion'})
+        with self.app.app_context():
+            self.assertGreater(Asistencia.query.count(), antes)
+
+        # Sin sesión la aplicación redirige al inicio de sesión: cuenta como error
+        with self.app.app_context():
+            self.assertEqual(ClienteWSGI(self.app, 'invalida').pedir(Peticion('GET', '/admin/config')), 401)
+
+    def test_mezclas(self):
+        """Pesos desde texto y desde las métricas registradas"""
+        self.assertEqual(leer_mezcla('asistencia=3, venta=1,tablero=0'), {'asistencia': 3, 'venta': 1})
+        with self.assertRaises(ErrorCarga):
+            leer_mezcla('socios=1')
+        metricas = (
+            '# TYPE gimnasio_peticiones_total counter\n'
+            'gimnasio_peticiones_total{blueprint="usuarios",endpoint="main.usuarios.api_marcar_asistencia",'
+            'metodo="POST",codigo="200"} 90\n'
+            'gimnasio_peticiones_total{blueprint="usuarios",endpoint="main.usuarios.api_marcar_asistencia",'
+            'metodo="POST",codigo="201"} 10\n'
+            'gimnasio_peticiones_total{blueprint="finanzas",endpoint="main.finanzas.index",'
+            'metodo="GET",codigo="200"} 5\n'
+            'gimnasio_peticiones_total{blueprint="app",endpoint="metricas",metodo="GET",codigo="200"} 50\n')
+        self.assertEqual(mezcla_desde_metricas(metricas), {'asistencia': 100, 'tablero': 5})
+
+    def test_percentiles(self):
+        resumen = resumir([('venta', i / 1000, i != 100) for i in range(1, 101)], 10)
+        venta = resumen['escenarios']['venta']
+        self.assertEqual((venta['p50_ms'], venta['p95_ms'], venta['p99_ms']), (50, 95, 99))
+        self.assertEqual(venta['tasa_error'], 0.01)
+        self.assertEqual(resumen['por_segundo'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
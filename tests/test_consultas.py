@@ -0,0 +1,91 @@
+"""
+Pruebas para las consultas portables entre SQLite y PostgreSQL
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app_launcher import create_app
+from models import db, Usuario, Asistencia
+from services.consultas import (dia_de, semana_de, mes_de, dias_hasta, rango_semana, rango_fechas,
+                                tablas, columnas, reiniciar_secuencias)
+from services.trabajos import detener_trabajos
+
+
+def compilar(expresion, dialecto):
+    return str(select(expresion).compile(dialect=dialecto))
+
+
+class TestConsultas(unittest.TestCase):
+    """Pruebas para la agrupación por período, los rangos de fechas y la inspección de tablas"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_sql_nativo(self):
+        """Cada motor recibe sus propias funciones de fecha"""
+        columna = Asistencia.fecha
+        self.assertIn("date(asistencia.fecha, 'start of month')", compilar(mes_de(columna), sqlite.dialect()))
+        self.assertIn("CAST(date_trunc('month', asistencia.fecha) AS DATE)",
+                      compilar(mes_de(columna), postgresql.dialect()))
+        self.assertIn("CAST(date_trunc('week', asistencia.fecha) AS DATE)",
+                      compilar(semana_de(columna), postgresql.dialect()))
+        self.assertIn('CAST(asistencia.fecha AS DATE)', compilar(dia_de(columna), postgresql.dialect()))
+        self.assertIn('julianday', compilar(dias_hasta(Usuario.fecha_vencimiento_plan, date.today()), sqlite.dialect()))
+        self.assertNotIn('julianday', compilar(dias_hasta(Usuario.fecha_vencimiento_plan, date.today()),
+                                               postgresql.dialect()))
+
+    def test_agrupacion_en_sqlite(self):
+        """Las expresiones devuelven date y la semana empieza el lunes"""
+        socio = Usuario(nombre='Ana', telefono='3001112233', fecha_vencimiento_plan=date(2024, 3, 20))
+        db.session.add(socio)
+        db.session.flush()
+        # Domingo 17 y lunes 18 de marzo de 2024
+        for fecha in (datetime(2024, 3, 17, 20, 30), datetime(2024, 3, 18, 6, 0), datetime(2024, 3, 18, 7, 0)):
+            db.session.add(Asistencia(usuario_id=socio.id, fecha=fecha))
+        db.session.commit()
+
+        semanas = db.session.query(semana_de(Asistencia.fecha), db.func.count()).\
+            group_by(semana_de(Asistencia.fecha)).order_by(semana_de(Asistencia.fecha)).all()
+        self.assertEqual(semanas, [(date(2024, 3, 11), 1), (date(2024, 3, 18), 2)])
+        self.assertEqual(db.session.query(mes_de(Asistencia.fecha)).distinct().all(), [(date(2024, 3, 1),)])
+        self.assertEqual(db.session.query(dia_de(Asistencia.fecha)).distinct().count(), 2)
+        self.assertEqual(db.session.query(dias_hasta(Usuario.fecha_vencimiento_plan, date(2024, 3, 17))).scalar(), 3)
+
+        self.assertEqual(rango_semana(date(2024, 3, 17)), (datetime(2024, 3, 11), datetime(2024, 3, 18)))
+        self.assertEqual(rango_fechas(date(2024, 3, 1), date(2024, 3, 31)), (datetime(2024, 3, 1), datetime(2024, 4, 1)))
+
+    def test_inspeccion(self):
+        """Tablas y columnas sin consultar sqlite_master directamente"""
+        self.assertIn('usuario', tablas())
+        self.assertNotIn('sqlite_sequence', tablas())
+        estructura = {columna['nombre']: columna for columna in columnas('usuario')}
+        self.assertTrue(estructura['id']['pk'])
+        self.assertTrue(estructura['fecha_vencimiento_plan']['nullable'])
+        # Sin tablas AUTOINCREMENT no hay sqlite_sequence: no debe fallar
+        reiniciar_secuencias(['usuario'])
+
+
+if __name__ == '__main__':
+    unittest.main()
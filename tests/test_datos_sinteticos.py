@@ -0,0 +1,96 @@
+"""
+Pruebas para el generador de datos sintéticos
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import func
+
+from app_launcher import create_app
+from models import db, Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto, ResumenDiario
+from routes.usuarios.listado import PLANES
+from services.datos_sinteticos import generar_gimnasio, generar_archivo, ErrorDatosSinteticos
+from services.trabajos import detener_trabajos
+
+
+class TestDatosSinteticos(unittest.TestCase):
+    """Pruebas para la coherencia y el determinismo de los datos generados"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_datos_coherentes(self):
+        """Todos los planes, un pago por socio como mínimo y el resumen cuadra con las tablas"""
+        filas = generar_gimnasio(socios=300, años=1, semilla=3, hasta=date(2024, 6, 30))
+        self.assertEqual(Usuario.query.count(), 300)
+        self.assertEqual(Asistencia.query.count(), filas['asistencias'])
+        self.assertEqual({plan for (plan,) in db.session.query(Usuario.plan).distinct()}, set(PLANES))
+
+        # Cada socio pagó al inscribirse y su vencimiento es el de su último pago
+        self.assertEqual(db.session.query(func.count(func.distinct(PagoMensualidad.usuario_id))).scalar(), 300)
+        socio = Usuario.query.get(150)
+        ultimo = db.session.query(func.max(PagoMensualidad.fecha_fin)).filter_by(usuario_id=150).scalar()
+        self.assertEqual(socio.fecha_vencimiento_plan, ultimo)
+
+        # Los ID siguen el orden cronológico
+        fechas = [fecha for (fecha,) in db.session.query(Asistencia.fecha).order_by(Asistencia.id)]
+        self.assertEqual(fechas, sorted(fechas))
+        self.assertLessEqual(fechas[-1].date(), date(2024, 6, 30))
+
+        self.assertGreaterEqual(db.session.query(func.min(Producto.stock)).scalar(), 0)
+        self.assertEqual(db.session.query(func.sum(ResumenDiario.cantidad_asistencias)).scalar(),
+                         filas['asistencias'])
+        self.assertEqual(db.session.query(func.sum(ResumenDiario.total_productos)).scalar(),
+                         db.session.query(func.sum(VentaProducto.total)).scalar())
+        # Los índices eliminados durante la carga se vuelven a crear
+        indices = {indice['name'] for indice in db.inspect(db.engine).get_indexes('asistencia')}
+        self.assertIn('ix_asistencia_fecha', indices)
+
+    def test_misma_semilla_mismos_datos(self):
+        """La misma semilla genera exactamente los mismos datos"""
+        generar_gimnasio(socios=50, años=0.5, semilla=7, hasta=date(2024, 6, 1))
+        primera = db.session.query(func.count(Asistencia.id), func.sum(PagoMensualidad.monto)).select_from(
+            Asistencia).join(PagoMensualidad, PagoMensualidad.usuario_id == Asistencia.usuario_id).one()
+
+        ruta = os.path.join(self.directorio, 'otra.db')
+        generar_archivo(ruta, socios=50, años=0.5, semilla=7, hasta=date(2024, 6, 1), progreso=None)
+        otra = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta}', 'TESTING': True})
+        with otra.app_context():
+            segunda = db.session.query(func.count(Asistencia.id), func.sum(PagoMensualidad.monto)).select_from(
+                Asistencia).join(PagoMensualidad, PagoMensualidad.usuario_id == Asistencia.usuario_id).one()
+            db.session.remove()
+            db.engine.dispose()
+        detener_trabajos(otra, esperar=True)
+        self.assertEqual(tuple(primera), tuple(segunda))
+
+    def test_no_sobrescribe(self):
+        """No se generan datos sobre una base de datos con socios ni sobre un archivo existente"""
+        db.session.add(Usuario(nombre='Ana', telefono='3001234567', plan='Mensual'))
+        db.session.commit()
+        with self.assertRaises(ErrorDatosSinteticos):
+            generar_gimnasio(socios=10, años=0.1)
+        with self.assertRaises(ErrorDatosSinteticos):
+            generar_archivo(os.path.join(self.directorio, 'database.db'), socios=10, años=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
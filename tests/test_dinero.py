@@ -0,0 +1,137 @@
+"""
+Pruebas para los montos guardados como centavos enteros
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app_launcher import create_app
+from models import db, Admin, Usuario, PagoMensualidad, VersionEsquema, a_centavos, desde_centavos
+from services.almacen_respaldos import almacen_de
+from services.migraciones import aplicar_migraciones
+from services.resumen_diario import totales_rango, totales_por_metodo
+from services.trabajos import detener_trabajos
+
+
+class TestDinero(unittest.TestCase):
+    """Pruebas para el tipo Dinero, las sumas en SQL y la migración de montos"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        aplicar_migraciones()
+        self.dia = date(2024, 3, 15)
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _pago(self, monto, metodo='Efectivo'):
+        return PagoMensualidad(monto=monto, metodo_pago=metodo, plan='Mensual',
+                               fecha_pago=datetime(2024, 3, 15, 10, 0),
+                               fecha_inicio=self.dia, fecha_fin=self.dia)
+
+    def test_conversion(self):
+        """Los pesos se redondean al centavo sin arrastrar el error del float"""
+        self.assertEqual(a_centavos(70000), 7000000)
+        self.assertEqual(a_centavos(0.1), 10)
+        self.assertEqual(a_centavos(1.005), 101)
+        self.assertEqual(a_centavos(Decimal('-2.50')), -250)
+        self.assertEqual(desde_centavos(7000010), Decimal('70000.10'))
+
+        db.session.add(self._pago(0.1))
+        db.session.commit()
+        self.assertEqual(db.session.execute(text('SELECT monto FROM pago_mensualidad')).scalar(), 10)
+        db.session.expire_all()
+        self.assertEqual(PagoMensualidad.query.one().monto, Decimal('0.10'))
+
+    def test_sumas_exactas(self):
+        """Mil pagos de 0,10 suman exactamente 100 en el resumen y en SQL"""
+        db.session.add_all([self._pago(0.1, 'Efectivo' if i % 2 else 'Nequi') for i in range(1000)])
+        db.session.commit()
+
+        self.assertEqual(totales_rango(self.dia, self.dia)['total_membresias'], Decimal('100.00'))
+        self.assertEqual(totales_por_metodo(self.dia, self.dia),
+                         {'Efectivo': Decimal('50.00'), 'Nequi': Decimal('50.00')})
+
+        pago = PagoMensualidad.query.first()
+        db.session.delete(pago)
+        db.session.commit()
+        self.assertEqual(totales_rango(self.dia, self.dia)['total_membresias'], Decimal('99.90'))
+
+    def test_migracion_convierte_pesos(self):
+        """Una base de datos con montos en pesos los pasa a centavos y recalcula el resumen"""
+        db.session.execute(text(
+            "INSERT INTO pago_mensualidad (monto, metodo_pago, plan, fecha_pago, fecha_inicio, fecha_fin) "
+            "VALUES (70000.5, 'Efectivo', 'Mensual', '2024-03-15 10:00:00.000000', '2024-03-15', '2024-04-14')"
+        ))
+        db.session.execute(text(
+            "INSERT INTO producto (nombre, precio, stock) VALUES ('Agua', 2000.0, 10)"
+        ))
+        db.session.query(VersionEsquema).filter(VersionEsquema.version == 7).delete()
+        db.session.commit()
+
+        self.assertEqual([version for version, _ in aplicar_migraciones()], [7])
+        self.assertEqual(db.session.execute(text('SELECT monto FROM pago_mensualidad')).scalar(), 7000050)
+        self.assertEqual(db.session.execute(text('SELECT precio FROM producto')).scalar(), 200000)
+        self.assertEqual(PagoMensualidad.query.one().monto, Decimal('70000.50'))
+        self.assertEqual(totales_rango(self.dia, self.dia)['total_membresias'], Decimal('70000.50'))
+
+    def test_restaurar_copia_en_pesos(self):
+        """Una copia anterior a los centavos se convierte al restaurarla desde la configuración"""
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add_all([admin, Usuario(nombre='Ana', telefono='3000000001', plan='Mensual',
+                                           precio_plan=70000)])
+        db.session.commit()
+
+        ruta_db = db.engine.url.database
+        antigua = os.path.join(self.directorio, 'antigua.db')
+        conexion = sqlite3.connect(antigua)
+        sqlite3.connect(ruta_db).backup(conexion)
+        conexion.executescript('UPDATE usuario SET precio_plan = 70000; DELETE FROM schema_version WHERE version = 7;')
+        conexion.close()
+        manifiesto = almacen_de(ruta_db).crear_instantanea(antigua)
+
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+        self.assertEqual(cliente.post(f"/admin/restaurar_instantanea/{manifiesto['nombre']}").status_code, 302)
+
+        self.assertEqual(Usuario.query.one().precio_plan, Decimal('70000.00'))
+        self.assertEqual(db.session.execute(text('SELECT precio_plan FROM usuario')).scalar(), 7000000)
+
+
+    def test_paquete_modelos_al_dia(self):
+        """El paquete ``modelos`` declara las mismas columnas e índices que ``models``"""
+        import models
+        import modelos
+
+        def esquema(metadata):
+            return {tabla.name: ({c.name: (repr(c.type), c.nullable) for c in tabla.columns},
+                                 sorted((i.name, tuple(c.name for c in i.columns)) for i in tabla.indexes))
+                    for tabla in metadata.sorted_tables}
+
+        self.assertEqual(esquema(modelos.db.Model.metadata), esquema(models.db.Model.metadata))
+
+if __name__ == '__main__':
+    unittest.main()
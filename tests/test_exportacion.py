@@ -0,0 +1,97 @@
+"""
+Pruebas para la exportación en streaming a CSV y Excel
+"""
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Admin, Usuario, Producto, VentaProducto, date_colombia
+from services.exportacion import generar_csv, escribir_excel, filas_exportacion
+
+
+class TestExportacion(unittest.TestCase):
+    """Pruebas para la exportación por lotes"""
+
+    def setUp(self):
+        """Configurar una base de datos en memoria con datos de ejemplo"""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for i in range(25):
+            db.session.add(Usuario(nombre=f'Socio {i}', telefono=f'300{i:07d}', plan='Mensual',
+                                   fecha_vencimiento_plan=date_colombia()))
+        producto = Producto(nombre='Agua', precio=2000, stock=50, categoria='Bebidas')
+        db.session.add(producto)
+        db.session.flush()
+        db.session.add(VentaProducto(producto_id=producto.id, usuario_id=None, cantidad=2,
+                                     precio_unitario=2000, total=4000, metodo_pago='Efectivo',
+                                     fecha=datetime(2024, 5, 1, 10, 30)))
+        db.session.commit()
+        self.directorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Limpiar después de las pruebas"""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_csv_por_trozos(self):
+        """El CSV sale en varios trozos y contiene todas las filas"""
+        trozos = list(generar_csv('usuarios', filas_por_trozo=10))
+        self.assertEqual(len(trozos), 3)
+        filas = list(csv.reader(io.StringIO(''.join(trozos))))
+        self.assertEqual(filas[0][:2], ['ID', 'Nombre'])
+        self.assertEqual(len(filas), 26)
+        self.assertEqual(filas[1][1], 'Socio 0')
+
+    def test_venta_sin_usuario(self):
+        """Las ventas sin usuario se exportan como 'Sin usuario'"""
+        fila = next(filas_exportacion('ventas'))
+        self.assertEqual(fila[1:3], ('Agua', 'Sin usuario'))
+
+    def test_excel_memoria_constante(self):
+        """El Excel conserva encabezados, fechas y ancho de columnas"""
+        from openpyxl import load_workbook
+
+        destino = os.path.join(self.directorio, 'ventas.xlsx')
+        self.assertEqual(escribir_excel('ventas', destino), 1)
+        hoja = load_workbook(destino).active
+        self.assertEqual(hoja.title, 'Registro de Ventas')
+        self.assertEqual(hoja.cell(1, 2).value, 'Producto')
+        self.assertEqual(hoja.cell(2, 8).value, datetime(2024, 5, 1, 10, 30))
+        self.assertGreater(hoja.column_dimensions['H'].width, len('Fecha'))
+
+    def test_ruta_export_csv(self):
+        """La configuración responde el CSV en streaming"""
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add(admin)
+        db.session.commit()
+
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+        respuesta = cliente.post('/admin/config',
+                                 data={'accion': 'export_csv', 'tabla_exportar': 'usuarios'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.is_streamed)
+        self.assertIn('attachment', respuesta.headers['Content-Disposition'])
+        self.assertEqual(respuesta.get_data(as_text=True).count('Socio'), 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Pruebas para el motor de agregados del dashboard de finanzas
+"""
+import sys
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, PagoMensualidad, VentaProducto, Producto, date_colombia
+from routes.finanzas.agregados import calcular_resumen_dashboard, sumas_por_periodo
+
+
+class TestAgregadosFinanzas(unittest.TestCase):
+    """Pruebas para los totales por período del dashboard"""
+
+    def setUp(self):
+        """Configurar una base de datos en memoria con datos conocidos"""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.hoy = datetime.combine(date_colombia(), datetime.min.time()) + timedelta(hours=10)
+        usuario = Usuario(nombre='Socio', telefono='3000000001', plan='Mensual',
+                          fecha_vencimiento_plan=self.hoy.date() + timedelta(days=10))
+        producto = Producto(nombre='Agua', precio=2000, stock=50, categoria='Bebidas')
+        db.session.add_all([usuario, producto])
+        db.session.flush()
+
+        # Un pago hoy y otro hace tres meses
+        for fecha, monto in [(self.hoy, 70000), (self.hoy - timedelta(days=95), 50000)]:
+            db.session.add(PagoMensualidad(usuario_id=usuario.id, fecha_pago=fecha, monto=monto,
+                                           metodo_pago='Efectivo', plan='Mensual',
+                                           fecha_inicio=fecha.date(), fecha_fin=fecha.date()))
+        db.session.add(VentaProducto(producto_id=producto.id, usuario_id=usuario.id, cantidad=2,
+                                     precio_unitario=2000, total=4000, metodo_pago='Nequi',
+                                     fecha=self.hoy))
+        db.session.commit()
+
+    def tearDown(self):
+        """Limpiar después de las pruebas"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_sumas_por_periodo(self):
+        """Cada período suma solo las filas de su rango"""
+        inicio_dia = datetime.combine(self.hoy.date(), datetime.min.time())
+        sumas = sumas_por_periodo(PagoMensualidad.fecha_pago, PagoMensualidad.monto, {
+            'hoy': (inicio_dia, None),
+            'antes': (inicio_dia - timedelta(days=200), inicio_dia),
+        })
+        self.assertEqual(sumas['hoy'], Decimal('70000.00'))
+        self.assertEqual(sumas['antes'], Decimal('50000.00'))
+
+    def test_resumen_dashboard(self):
+        """El resumen combina membresías, productos y contadores"""
+        resumen = calcular_resumen_dashboard(6)
+
+        self.assertEqual(resumen.dia.membresias, Decimal('70000.00'))
+        self.assertEqual(resumen.dia.productos, Decimal('4000.00'))
+        self.assertEqual(resumen.mes.total, Decimal('74000.00'))
+        self.assertEqual(len(resumen.historico), 6)
+        self.assertEqual(sum(t.total for _, t in resumen.historico), Decimal('124000.00'))
+        self.assertEqual(resumen.usuarios_activos, 1)
+        self.assertEqual(resumen.usuarios_con_plan_vigente, 1)
+        self.assertEqual(resumen.planes, {'Mensual': 1})
+        self.assertEqual(len(resumen.transacciones), 3)
+        self.assertEqual(resumen.productos_top[0].cantidad, 2)
+
+    def test_api_series(self):
+        """Cada gráfico tiene su serie en JSON con ETag; la página ya no las incluye"""
+        cliente = self.app.test_client()
+        respuesta = cliente.get('/finanzas/api/series/ingresos')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.get_json()
+        self.assertEqual(len(datos['meses']), 6)
+        self.assertEqual(sum(datos['membresias']) + sum(datos['productos']), 124000)
+
+        etag = respuesta.headers['ETag']
+        respuesta = cliente.get('/finanzas/api/series/ingresos', headers={'If-None-Match': etag})
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.get_data(), b'')
+
+        self.assertEqual(cliente.get('/finanzas/api/series/planes').get_json()['usuarios'], [0, 0, 1, 0, 0, 0])
+        self.assertEqual(cliente.get('/finanzas/api/series/productos').get_json()['nombres'], ['Agua'])
+        self.assertEqual(cliente.get('/finanzas/api/series/otra').status_code, 404)
+
+        pagina = cliente.get('/finanzas/').get_data(as_text=True)
+        self.assertNotIn('datos-ingresos-membresias', pagina)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Pruebas para el contador de consultas SQL y el log de consultas lentas
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Admin, Usuario
+from services.trabajos import detener_trabajos
+
+
+class TestInstrumentacion(unittest.TestCase):
+    """Pruebas para las cabeceras, la barra de depuración y el log rotativo"""
+
+    def _crear(self, **opciones):
+        self.directorio = tempfile.mkdtemp()
+        self.ruta_log = os.path.join(self.directorio, 'logs', 'consultas_lentas.log')
+        self.app = create_app(dict({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                                    'TESTING': True}, **opciones))
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        socio = Usuario(nombre='Ana Pérez', telefono='3001234567', plan='Mensual')
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add_all([socio, admin])
+        db.session.commit()
+        self.usuario_id = socio.id
+        self.cliente = self.app.test_client()
+        with self.cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_cabeceras_por_peticion(self):
+        """Cada respuesta informa solo las consultas de su propia petición"""
+        self._crear()
+        respuesta = self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertGreater(int(respuesta.headers['X-SQL-Consultas']), 1)
+        self.assertIn('db;dur=', respuesta.headers['Server-Timing'])
+
+        # La repetición solo busca al socio (el registro del día está en memoria)
+        repetida = self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+        self.assertEqual(repetida.headers['X-SQL-Consultas'], '1')
+        self.assertFalse(os.path.exists(self.ruta_log))
+
+    def test_barra_de_depuracion(self):
+        """En modo debug la página muestra el total de consultas"""
+        self._crear()
+        pagina = self.cliente.get('/usuarios/asistencia')
+        self.assertEqual(pagina.status_code, 200)
+        self.assertIn(f"{pagina.headers['X-SQL-Consultas']} consultas", pagina.get_data(as_text=True))
+
+        self.app.debug = False
+        self.assertNotIn(' consultas ·', self.cliente.get('/usuarios/asistencia').get_data(as_text=True))
+
+    def test_log_de_consultas_lentas(self):
+        """Las sentencias sobre el umbral se escriben en el log con la ruta de la petición"""
+        self._crear(SQL_UMBRAL_LENTA_MS=0)
+        self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+        with open(self.ruta_log, encoding='utf-8') as archivo:
+            lineas = archivo.read().splitlines()
+        self.assertTrue(any('[POST /usuarios/api/asistencia] SELECT' in linea for linea in lineas))
+        self.assertTrue(any('[segundo plano]' in linea for linea in lineas))
+        # Nunca se escriben los parámetros de la sentencia
+        self.assertFalse(any('3001234567' in linea for linea in lineas))
+
+    def test_desactivada(self):
+        """Con la instrumentación desactivada no se añaden cabeceras"""
+        self._crear(SQL_INSTRUMENTACION=False)
+        respuesta = self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+        self.assertNotIn('X-SQL-Consultas', respuesta.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
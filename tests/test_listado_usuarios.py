@@ -0,0 +1,110 @@
+"""
+Pruebas para el listado paginado de usuarios
+"""
+import sys
+import unittest
+from datetime import timedelta
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, date_colombia
+from routes.usuarios.listado import listar_usuarios
+
+
+class TestListadoUsuarios(unittest.TestCase):
+    """Pruebas para filtros, estado calculado en SQL y paginación por clave"""
+
+    def setUp(self):
+        """Configurar una base de datos en memoria con usuarios en cada estado"""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        hoy = date_colombia()
+        # (desplazamiento de días del vencimiento o None) por usuario
+        vencimientos = [-5, -1, 0, 2, 3, 4, 30, None, None, 10, -20, 1]
+        for i, dias in enumerate(vencimientos):
+            db.session.add(Usuario(
+                nombre=f'Usuario {i:02d}' if i != 7 else None,
+                telefono=f'300{i:07d}',
+                plan='Mensual' if i % 2 else 'Diario',
+                fecha_vencimiento_plan=hoy + timedelta(days=dias) if dias is not None else None
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        """Limpiar después de las pruebas"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _recorrer(self, **kwargs):
+        """Recorre todas las páginas hacia adelante y devuelve los ids en orden"""
+        ids, cursor, paginas = [], None, []
+        while True:
+            pagina = listar_usuarios(despues=cursor, **kwargs)
+            paginas.append(pagina)
+            ids += [fila['usuario'].id for fila in pagina.filas]
+            if not pagina.siguiente:
+                return ids, paginas
+            cursor = pagina.siguiente
+
+    def test_estado_y_dias_en_sql(self):
+        """Días restantes y estado salen de la consulta"""
+        pagina = listar_usuarios(orden='recientes', por_pagina=50)
+        por_telefono = {f['usuario'].telefono: f for f in pagina.filas}
+        self.assertEqual(por_telefono['3000000000']['dias_restantes'], -5)
+        self.assertEqual(por_telefono['3000000000']['estado'], 'vencido')
+        self.assertEqual(por_telefono['3000000002']['estado'], 'proximo')
+        self.assertEqual(por_telefono['3000000004']['estado'], 'proximo')
+        self.assertEqual(por_telefono['3000000005']['estado'], 'activo')
+        self.assertEqual(por_telefono['3000000007']['estado'], 'sin_fecha')
+        self.assertIsNone(por_telefono['3000000007']['dias_restantes'])
+        self.assertEqual(pagina.conteo_estados,
+                         {'vencido': 3, 'proximo': 4, 'activo': 3, 'sin_fecha': 2})
+        self.assertEqual(pagina.total, 12)
+
+    def test_filtros(self):
+        """Filtrar por estado, plan y búsqueda"""
+        vencidos = listar_usuarios(estado='vencido').filas
+        self.assertEqual({f['estado'] for f in vencidos}, {'vencido'})
+        self.assertEqual(len(vencidos), 3)
+
+        diarios = listar_usuarios(plan='Diario').filas
+        self.assertEqual({f['usuario'].plan for f in diarios}, {'Diario'})
+
+        self.assertEqual(len(listar_usuarios(busqueda='usuario 1').filas), 2)
+        self.assertEqual(len(listar_usuarios(busqueda='0000011').filas), 1)
+
+    def test_paginacion_por_clave(self):
+        """Recorrer por páginas devuelve todas las filas, en orden y sin repetir"""
+        for orden in ('nombre', 'vencimiento', 'recientes'):
+            completo = [f['usuario'].id for f in listar_usuarios(orden=orden, por_pagina=100).filas]
+            ids, paginas = self._recorrer(orden=orden, por_pagina=5)
+            self.assertEqual(ids, completo, orden)
+            self.assertEqual(len(paginas), 3)
+            self.assertIsNone(paginas[0].anterior)
+
+            # Volver desde la última página a la anterior
+            anterior = listar_usuarios(orden=orden, por_pagina=5, antes=paginas[-1].anterior)
+            self.assertEqual([f['usuario'].id for f in anterior.filas], completo[5:10], orden)
+            self.assertIsNotNone(anterior.siguiente)
+
+        # Sin fecha al final cuando se ordena por vencimiento
+        por_vencimiento = listar_usuarios(orden='vencimiento').filas
+        self.assertEqual([f['estado'] for f in por_vencimiento[-2:]], ['sin_fecha', 'sin_fecha'])
+
+    def test_vista_listado(self):
+        """La página de usuarios responde con filtros y cursor"""
+        cliente = self.app.test_client()
+        respuesta = cliente.get('/usuarios/?estado=vencido&orden=vencimiento&por_pagina=2')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Siguiente', respuesta.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
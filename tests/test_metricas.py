@@ -0,0 +1,112 @@
+"""
+Pruebas para las métricas en formato Prometheus
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario
+from services.trabajos import detener_trabajos
+
+
+class TestMetricas(unittest.TestCase):
+    """Pruebas para los contadores por ruta y la ruta /metrics"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+
+        @self.app.route('/prueba-error')
+        def prueba_error():
+            raise RuntimeError('fallo de prueba')
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        socio = Usuario(nombre='Ana Pérez', telefono='3001234567', plan='Mensual')
+        db.session.add(socio)
+        db.session.commit()
+        self.usuario_id = socio.id
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _metricas(self):
+        respuesta = self.cliente.get('/metrics')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.get_data(as_text=True)
+
+    def _valor(self, texto, linea):
+        coincidencia = re.search('^' + re.escape(linea) + r' (\S+)$', texto, re.MULTILINE)
+        self.assertIsNotNone(coincidencia, linea)
+        return float(coincidencia.group(1))
+
+    def test_peticiones_latencia_y_db(self):
+        """Cada ruta suma peticiones, histograma y tiempo en la base de datos"""
+        for _ in range(3):
+            self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+        texto = self._metricas()
+
+        ruta = 'blueprint="usuarios",endpoint="main.usuarios.api_marcar_asistencia"'
+        self.assertEqual(self._valor(texto, 'gimnasio_peticiones_total{' + ruta + ',metodo="POST",codigo="201"}'), 1)
+        self.assertEqual(self._valor(texto, 'gimnasio_peticiones_total{' + ruta + ',metodo="POST",codigo="200"}'), 2)
+        self.assertEqual(self._valor(texto, 'gimnasio_peticion_duracion_segundos_bucket{' + ruta + ',le="+Inf"}'), 3)
+        self.assertEqual(self._valor(texto, 'gimnasio_peticion_duracion_segundos_count{' + ruta + '}'), 3)
+        self.assertGreaterEqual(self._valor(texto, 'gimnasio_db_consultas_total{' + ruta + '}'), 3)
+        # Solo la petición a /metrics está en curso
+        self.assertEqual(self._valor(texto, 'gimnasio_peticiones_activas{blueprint="app"}'), 1)
+        self.assertEqual(self._valor(texto, 'gimnasio_peticiones_activas{blueprint="usuarios"}'), 0)
+
+    def test_errores_y_rutas_inexistentes(self):
+        """Las excepciones cuentan como error 500 y las rutas inexistentes no se mezclan"""
+        self.app.config['PROPAGATE_EXCEPTIONS'] = False
+        self.assertEqual(self.cliente.get('/prueba-error').status_code, 500)
+        self.assertEqual(self.cliente.get('/no-existe').status_code, 404)
+        texto = self._metricas()
+        self.assertEqual(self._valor(texto, 'gimnasio_peticiones_error_total{blueprint="app",endpoint="prueba_error"}'), 1)
+        self.assertEqual(self._valor(
+            texto, 'gimnasio_peticiones_total{blueprint="app",endpoint="sin_ruta",metodo="GET",codigo="404"}'), 1)
+
+    def test_hilos_terminados(self):
+        """Lo anotado por hilos que ya terminaron se conserva"""
+        def pedir():
+            with self.app.test_client() as cliente:
+                cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.usuario_id})
+
+        for _ in range(2):
+            hilos = [threading.Thread(target=pedir) for _ in range(5)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            texto = self._metricas()
+        self.assertEqual(self._valor(texto, 'gimnasio_peticion_duracion_segundos_count{blueprint="usuarios",'
+                                            'endpoint="main.usuarios.api_marcar_asistencia"}'), 10)
+        self.assertLessEqual(len(self.app.extensions['metricas']._hilos), 2)
+
+    def test_acceso(self):
+        """Con token se exige la cabecera; sin token solo desde el propio equipo"""
+        self.assertEqual(self.cliente.get('/metrics', environ_base={'REMOTE_ADDR': '192.168.1.20'}).status_code, 403)
+        self.app.config['METRICAS_TOKEN'] = 'secreto'
+        self.assertEqual(self.cliente.get('/metrics').status_code, 403)
+        respuesta = self.cliente.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.content_type.startswith('text/plain; version=0.0.4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Pruebas para el sistema de migraciones de esquema
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect
+
+from app_launcher import create_app
+from models import db, Asistencia, VersionEsquema
+from services import migraciones
+from services.migraciones import aplicar_migraciones, version_esquema, VERSION_ACTUAL
+from services.trabajos import detener_trabajos
+
+
+class TestMigraciones(unittest.TestCase):
+    """Pruebas para la aplicación de migraciones numeradas"""
+
+    def setUp(self):
+        """Configurar una base de datos en memoria"""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Limpiar después de las pruebas"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _indices_asistencia(self):
+        return {indice['name'] for indice in inspect(db.engine).get_indexes('asistencia')}
+
+    def test_aplica_pendientes_una_sola_vez(self):
+        """La primera ejecución aplica todo; las siguientes no hacen nada"""
+        aplicadas = aplicar_migraciones()
+        self.assertEqual([v for v, _ in aplicadas], list(range(1, VERSION_ACTUAL + 1)))
+        self.assertEqual(aplicar_migraciones(), [])
+        with db.engine.connect() as conexion:
+            self.assertEqual(version_esquema(conexion), VERSION_ACTUAL)
+
+    def test_crea_indices_faltantes(self):
+        """Una base de datos anterior a los índices los recibe al migrar"""
+        for indice in Asistencia.__table__.indexes:
+            indice.drop(bind=db.engine)
+        self.assertEqual(self._indices_asistencia(), set())
+
+        aplicar_migraciones()
+        self.assertEqual(self._indices_asistencia(),
+                         {indice.name for indice in Asistencia.__table__.indexes})
+
+    def test_fallo_revierte_todo(self):
+        """Si una migración falla no se aplica ninguna de las pendientes"""
+        for indice in Asistencia.__table__.indexes:
+            indice.drop(bind=db.engine)
+
+        def fallar(conexion):
+            raise RuntimeError('fallo simulado')
+
+        con_fallo = migraciones.MIGRACIONES + [(VERSION_ACTUAL + 1, 'Fallo', fallar)]
+        with mock.patch.object(migraciones, 'MIGRACIONES', con_fallo):
+            with self.assertRaises(RuntimeError):
+                aplicar_migraciones()
+
+        self.assertEqual(self._indices_asistencia(), set())
+        self.assertEqual(VersionEsquema.query.count(), 0)
+
+    def test_create_app_migra_al_iniciar(self):
+        """Fuera de las pruebas, create_app migra la base de datos antes de retomar los trabajos"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ruta = os.path.join(directorio, 'database.db')
+        conexion = sqlite3.connect(ruta)
+        conexion.execute('CREATE TABLE objetivo_personal (id INTEGER PRIMARY KEY, usuario_id INTEGER, '
+                         'descripcion TEXT, fecha_inicio DATE, fecha_objetivo DATE)')
+        conexion.close()
+
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta}', 'SQLITE_CHECKPOINT_SEGUNDOS': 0})
+        try:
+            with app.app_context():
+                self.assertIn('estado', {c['name'] for c in inspect(db.engine).get_columns('objetivo_personal')})
+                with db.engine.connect() as conexion:
+                    self.assertEqual(version_esquema(conexion), VERSION_ACTUAL)
+        finally:
+            detener_trabajos(app, esperar=True)
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
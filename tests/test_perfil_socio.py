@@ -0,0 +1,109 @@
+"""
+Pruebas para la ficha del socio (contadores, historiales por páginas y calendario)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto
+from routes.usuarios.perfil import estadisticas_socio
+from services.trabajos import detener_trabajos
+
+
+class TestPerfilSocio(unittest.TestCase):
+    """Pruebas para la carga acotada de la ficha de un socio con mucho historial"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _socio(self, asistencias, pagos, compras):
+        numero = Usuario.query.count() + 1
+        socio = Usuario(nombre=f'Socio {numero}', telefono=f'300123456{numero}', plan='Mensual')
+        producto = Producto(nombre=f'Agua {numero}', precio=2000, stock=1000, categoria='Bebidas')
+        db.session.add_all([socio, producto])
+        db.session.flush()
+        ahora = datetime.now().replace(microsecond=0)
+        db.session.add_all([Asistencia(usuario_id=socio.id, fecha=ahora - timedelta(days=i))
+                            for i in range(asistencias)])
+        # Dos pagos con la misma fecha para comprobar el desempate por id
+        db.session.add_all([PagoMensualidad(usuario_id=socio.id, fecha_pago=ahora - timedelta(days=30 * (i // 2)),
+                                            monto=70000, metodo_pago='Efectivo', plan='Mensual',
+                                            fecha_inicio=ahora.date(), fecha_fin=ahora.date())
+                            for i in range(pagos)])
+        db.session.add_all([VentaProducto(producto_id=producto.id, usuario_id=socio.id, cantidad=1,
+                                          precio_unitario=2000, total=2000, metodo_pago='Nequi',
+                                          fecha=ahora - timedelta(hours=i))
+                            for i in range(compras)])
+        db.session.commit()
+        return socio.id
+
+    def _consultas_ficha(self, socio_id):
+        respuesta = self.cliente.get(f'/usuarios/ver_usuario/{socio_id}')
+        self.assertEqual(respuesta.status_code, 200)
+        return int(respuesta.headers['X-SQL-Consultas'])
+
+    def test_consultas_constantes(self):
+        """La ficha hace las mismas consultas con 5 o con 300 asistencias"""
+        pocas = self._consultas_ficha(self._socio(5, 2, 2))
+        muchas = self._consultas_ficha(self._socio(300, 45, 60))
+        self.assertEqual(pocas, muchas)
+
+        estadisticas = estadisticas_socio(2)
+        self.assertEqual(estadisticas.total_asistencias, 300)
+        self.assertEqual(estadisticas.cantidad_pagos, 45)
+        self.assertEqual(estadisticas.total_gastado, 45 * 70000 + 60 * 2000)
+        self.assertEqual(estadisticas.ultima_asistencia.date(), datetime.now().date())
+
+    def test_cargar_mas(self):
+        """Recorrer el historial por páginas devuelve cada fila una sola vez"""
+        socio_id = self._socio(3, 45, 0)
+        pagina = self.cliente.get(f'/usuarios/ver_usuario/{socio_id}').get_data(as_text=True)
+        self.assertEqual(pagina.count('Del '), 20)
+        self.assertIn('Cargar más', pagina)
+
+        filas, cursor, paginas = 0, None, 0
+        while True:
+            url = f'/usuarios/api/{socio_id}/historial/pagos?por_pagina=7'
+            datos = self.cliente.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+            filas += datos['html'].count('<tr>')
+            paginas += 1
+            cursor = datos['siguiente']
+            if not cursor:
+                break
+        self.assertEqual((filas, paginas), (45, 7))
+        self.assertEqual(self.cliente.get(f'/usuarios/api/{socio_id}/historial/pagos?cursor=x').status_code, 400)
+        self.assertEqual(self.cliente.get(f'/usuarios/api/{socio_id}/historial/otro').status_code, 400)
+
+    def test_calendario(self):
+        """El calendario recibe solo los días del rango pedido"""
+        socio_id = self._socio(60, 1, 0)
+        hoy = datetime.now().date()
+        desde = hoy - timedelta(days=9)
+        eventos = self.cliente.get(f'/usuarios/api/{socio_id}/calendario?start={desde}T00:00:00-05:00'
+                                   f'&end={hoy + timedelta(days=1)}').get_json()
+        self.assertEqual([evento['start'] for evento in eventos],
+                         [(desde + timedelta(days=i)).isoformat() for i in range(10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
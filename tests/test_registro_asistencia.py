@@ -0,0 +1,253 @@
+"""
+Pruebas para el registro rápido de asistencia
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import event
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, Asistencia, ResumenDiario, EventoKiosco, datetime_colombia
+from services.trabajos import detener_trabajos
+
+
+class TestRegistroAsistencia(unittest.TestCase):
+    """Pruebas para la API de asistencia y la regla de una asistencia por día"""
+
+    def setUp(self):
+        """Crear la aplicación con una base de datos en un archivo temporal"""
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        socio = Usuario(nombre='Ana Pérez', telefono='3001234567', plan='Mensual',
+                        fecha_vencimiento_plan=date.today() + timedelta(days=10))
+        db.session.add(socio)
+        db.session.commit()
+        self.usuario_id = socio.id
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _marcar(self, **datos):
+        return self.cliente.post('/usuarios/api/asistencia', json=datos)
+
+    def test_registro_y_repeticion(self):
+        """El primer registro crea la asistencia; el segundo no toca la base de datos"""
+        respuesta = self._marcar(usuario_id=self.usuario_id)
+        self.assertEqual(respuesta.status_code, 201)
+        datos = respuesta.get_json()
+        self.assertTrue(datos['registrada'])
+        self.assertEqual(datos['usuario']['nombre'], 'Ana Pérez')
+        self.assertFalse(datos['usuario']['vencido'])
+
+        sentencias = []
+        escuchar = lambda *args: sentencias.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', escuchar)
+        try:
+            repetida = self._marcar(usuario_id=self.usuario_id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', escuchar)
+        self.assertEqual(repetida.status_code, 200)
+        self.assertFalse(repetida.get_json()['registrada'])
+        self.assertEqual(repetida.get_json()['fecha'], datos['fecha'])
+        # Solo la búsqueda del socio: ni comprobación de la asistencia ni inserción
+        self.assertEqual(len(sentencias), 1)
+
+        self.assertEqual(Asistencia.query.count(), 1)
+        resumen = ResumenDiario.query.get(datetime_colombia().date())
+        self.assertEqual(resumen.cantidad_asistencias, 1)
+
+    def test_por_telefono_y_socio_inexistente(self):
+        """Se puede registrar por teléfono; un socio inexistente responde 404"""
+        self.assertEqual(self._marcar(telefono=' 3001234567 ').status_code, 201)
+        self.assertEqual(self._marcar(telefono='3999999999').status_code, 404)
+        self.assertEqual(self._marcar(usuario_id='abc').status_code, 400)
+        self.assertEqual(self._marcar().status_code, 404)
+
+    def test_registro_existente_en_otro_proceso(self):
+        """Si otro proceso ya lo registró, la inserción condicionada no duplica la fila"""
+        otro = Usuario(nombre='Luis Gómez', telefono='3007654321', plan='Mensual')
+        db.session.add(otro)
+        db.session.commit()
+        # Carga el registro del día en memoria (sin Ana)
+        self.assertEqual(self._marcar(usuario_id=otro.id).status_code, 201)
+
+        conexion = sqlite3.connect(db.engine.url.database)
+        conexion.execute('INSERT INTO asistencia (usuario_id, fecha) VALUES (?, ?)',
+                         (self.usuario_id, datetime_colombia().strftime('%Y-%m-%d %H:%M:%S.%f')))
+        conexion.commit()
+        conexion.close()
+
+        respuesta = self._marcar(usuario_id=self.usuario_id)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Asistencia.query.filter_by(usuario_id=self.usuario_id).count(), 1)
+
+    def test_terminales_simultaneas(self):
+        """Varias terminales registrando al mismo socio crean una sola asistencia"""
+        codigos = []
+
+        def marcar():
+            with self.app.test_client() as cliente:
+                codigos.append(cliente.post('/usuarios/api/asistencia',
+                                            json={'usuario_id': self.usuario_id}).status_code)
+
+        hilos = [threading.Thread(target=marcar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(sorted(codigos), [200] * 7 + [201])
+        self.assertEqual(Asistencia.query.count(), 1)
+
+    def test_bloqueo_por_socio_en_postgresql(self):
+        """En PostgreSQL cada socio se bloquea antes de insertar, siempre en el mismo orden"""
+        from sqlalchemy.dialects import postgresql
+        from services import registro_asistencia
+
+        sql = str(registro_asistencia._sentencia_bloqueo().compile(dialect=postgresql.dialect()))
+        self.assertIn('pg_advisory_xact_lock', sql)
+
+        conexion = mock.Mock()
+        with mock.patch.object(db.session, 'connection', return_value=conexion), \
+                mock.patch('services.registro_asistencia.dialecto', return_value='postgresql'):
+            registro_asistencia.bloquear_socios([7, 3, 7])
+        self.assertEqual([llamada.args[1]['usuario_id'] for llamada in conexion.execute.call_args_list], [3, 7])
+
+        # En SQLite no se ejecuta nada
+        conexion = mock.Mock()
+        with mock.patch.object(db.session, 'connection', return_value=conexion):
+            registro_asistencia.bloquear_socios([self.usuario_id])
+        conexion.execute.assert_not_called()
+
+    def test_cambio_de_dia(self):
+        """Al cambiar el día el registro en memoria se reconstruye"""
+        self.assertEqual(self._marcar(usuario_id=self.usuario_id).status_code, 201)
+        manana = datetime_colombia() + timedelta(days=1)
+        with mock.patch('services.registro_asistencia.datetime_colombia', return_value=manana):
+            self.assertEqual(self._marcar(usuario_id=self.usuario_id).status_code, 201)
+            self.assertEqual(self._marcar(usuario_id=self.usuario_id).status_code, 200)
+        self.assertEqual(Asistencia.query.count(), 2)
+
+    def test_marcar_asistencia_desde_la_pagina(self):
+        """El enlace de la página de asistencia usa la misma regla"""
+        respuesta = self.cliente.get(f'/usuarios/marcar_asistencia/{self.usuario_id}')
+        self.assertEqual(respuesta.status_code, 302)
+        self.cliente.get(f'/usuarios/marcar_asistencia/{self.usuario_id}')
+        self.assertEqual(Asistencia.query.count(), 1)
+        self.assertEqual(self.cliente.get('/usuarios/marcar_asistencia/9999').status_code, 404)
+
+
+class TestLoteAsistencia(unittest.TestCase):
+    """Pruebas para los envíos en lote de los kioscos"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True, 'ASISTENCIA_LOTE_MAX_EVENTOS': 50})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        socios = [Usuario(nombre=f'Socio {i}', telefono=f'30000000{i:02d}', plan='Mensual') for i in range(10)]
+        db.session.add_all(socios)
+        db.session.commit()
+        self.ids = [socio.id for socio in socios]
+        self.cliente = self.app.test_client()
+        self.hoy = datetime_colombia().replace(hour=6, minute=0, second=0, microsecond=0)
+        if self.hoy > datetime_colombia():
+            self.hoy -= timedelta(days=1)
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _enviar(self, eventos):
+        return self.cliente.post('/usuarios/api/asistencia/lote', json={'terminal': 'kiosco-1', 'eventos': eventos})
+
+    def _evento(self, clave, usuario_id, fecha, **extra):
+        return dict(clave=clave, usuario_id=usuario_id, fecha=fecha.isoformat(), **extra)
+
+    def test_lote_con_duplicados_y_rechazos(self):
+        """El lote aplica la regla de un día y reporta cada evento"""
+        ayer = self.hoy - timedelta(days=1)
+        eventos = [
+            self._evento('k1', self.ids[0], self.hoy),
+            self._evento('k2', self.ids[0], self.hoy + timedelta(hours=2)),   # Mismo día: duplicada
+            self._evento('k3', self.ids[0], ayer),                           # Otro día: registrada
+            {'clave': 'k4', 'telefono': '3000000005', 'fecha': self.hoy.isoformat()},
+            self._evento('k5', 9999, self.hoy),                              # Socio inexistente
+            self._evento('k6', self.ids[1], self.hoy + timedelta(days=2)),   # En el futuro
+            {'usuario_id': self.ids[2]},                                     # Sin clave
+            self._evento('k1', self.ids[0], self.hoy),                       # Clave repetida en el envío
+        ]
+        datos = self._enviar(eventos).get_json()
+        self.assertEqual((datos['registradas'], datos['duplicadas'], datos['rechazadas']), (3, 1, 3))
+        estados = [r['estado'] for r in datos['resultados']]
+        self.assertEqual(estados, ['registrada', 'duplicada', 'registrada', 'registrada',
+                                   'rechazada', 'rechazada', 'rechazada', 'registrada'])
+        self.assertEqual(datos['resultados'][3]['usuario_id'], self.ids[5])
+
+        self.assertEqual(Asistencia.query.count(), 3)
+        self.assertEqual(EventoKiosco.query.count(), 4)
+        self.assertEqual(ResumenDiario.query.get(ayer.date()).cantidad_asistencias, 1)
+        self.assertEqual(ResumenDiario.query.get(self.hoy.date()).cantidad_asistencias, 2)
+
+    def test_reenvio_idempotente(self):
+        """Reenviar el mismo lote no registra nada nuevo y devuelve los mismos resultados"""
+        eventos = [self._evento(f'k{i}', socio_id, self.hoy) for i, socio_id in enumerate(self.ids)]
+        primero = self._enviar(eventos).get_json()
+        self.assertEqual(primero['registradas'], 10)
+
+        segundo = self._enviar(eventos).get_json()
+        self.assertEqual(segundo['registradas'], 10)
+        self.assertTrue(all(r['repetido'] for r in segundo['resultados']))
+        self.assertEqual(Asistencia.query.count(), 10)
+
+        # El registro rápido ya sabe que estos socios vinieron hoy
+        respuesta = self.cliente.post('/usuarios/api/asistencia', json={'usuario_id': self.ids[0]})
+        if self.hoy.date() == datetime_colombia().date():
+            self.assertEqual(respuesta.status_code, 200)
+
+    def test_lote_respeta_asistencias_existentes(self):
+        """Un escaneo del kiosco no duplica una asistencia registrada en recepción"""
+        db.session.add(Asistencia(usuario_id=self.ids[3], fecha=self.hoy + timedelta(minutes=30)))
+        db.session.commit()
+        datos = self._enviar([self._evento('k1', self.ids[3], self.hoy)]).get_json()
+        self.assertEqual(datos['duplicadas'], 1)
+        self.assertEqual(Asistencia.query.count(), 1)
+
+    def test_envios_invalidos(self):
+        """Envíos mal formados o demasiado grandes se rechazan completos"""
+        self.assertEqual(self.cliente.post('/usuarios/api/asistencia/lote', data='x').status_code, 400)
+        self.assertEqual(self._enviar('no es una lista').status_code, 400)
+        eventos = [self._evento(f'k{i}', self.ids[0], self.hoy) for i in range(51)]
+        self.assertEqual(self._enviar(eventos).status_code, 400)
+        evento = [self._evento('k1', self.ids[0], self.hoy)]
+        for terminal in ('k' * 51, 7, ['kiosco']):
+            respuesta = self.cliente.post('/usuarios/api/asistencia/lote', json={'terminal': terminal, 'eventos': evento})
+            self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Asistencia.query.count(), 0)
+        self.assertEqual(EventoKiosco.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
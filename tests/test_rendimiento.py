@@ -1,257 +1,229 @@
 #!/usr/bin/env python
 """
-Script de prueba para evaluar el rendimiento de la aplicación GymTrack
+Benchmark de rendimiento de GymTrack
+====================================
+
+Genera una base de datos sintética y determinista con
+``services.datos_sinteticos`` (socios, años de asistencias, renovaciones y
+ventas) en una carpeta temporal y mide las rutas más
+pesadas a través de ``create_app`` y el cliente de pruebas de Flask:
+finanzas, finanzas diarias, listado de usuarios, ficha de un socio,
+asistencia y las exportaciones.
+
+Los resultados se guardan en JSON (con el commit y los datos usados) para
+comparar ejecuciones entre commits.
+
+Uso:
+    python tests/test_rendimiento.py [--socios 2000] [--dias 730] [--repeticiones 10]
+                                     [--semilla 42] [--salida resultados.json]
+                                     [--comparar resultados_anteriores.json]
+
+Con pytest solo se ejecuta una versión reducida que comprueba que todos los
+escenarios responden correctamente.
 """
-import sys
+import argparse
+import json
 import os
-import time
-import datetime
+import platform
+import shutil
 import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
 from pathlib import Path
 
-# Añadir el directorio raíz al path para poder importar las dependencias del proyecto
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flask import Flask
-from app.database.models import db, Usuario, PagoMensualidad, Asistencia
-
-def crear_app_test():
-    """Crea una instancia de la aplicación Flask para pruebas de rendimiento"""
-    app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test_database.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ECHO'] = False  # Desactivar logs de SQL para pruebas de rendimiento
-    db.init_app(app)
-    return app
-
-def medir_tiempo(func):
-    """Decorador para medir el tiempo de ejecución de una función"""
-    def wrapper(*args, **kwargs):
-        inicio = time.time()
-        resultado = func(*args, **kwargs)
-        fin = time.time()
-        tiempo_ms = (fin - inicio) * 1000
-        return resultado, tiempo_ms
-    return wrapper
-
-def formatear_tiempo(tiempo_ms):
-    """Formatea el tiempo en milisegundos a una cadena legible"""
-    if tiempo_ms < 1:
-        return f"{tiempo_ms * 1000:.2f} µs"
-    elif tiempo_ms < 1000:
-        return f"{tiempo_ms:.2f} ms"
-    else:
-        return f"{tiempo_ms/1000:.2f} s"
-
-@medir_tiempo
-def consultar_todos_usuarios(app):
-    """Consulta todos los usuarios"""
-    with app.app_context():
-        return Usuario.query.all()
-
-@medir_tiempo
-def consultar_usuario_por_id(app, usuario_id):
-    """Consulta un usuario por su ID"""
-    with app.app_context():
-        return Usuario.query.get(usuario_id)
-
-@medir_tiempo
-def consultar_usuario_por_telefono(app, telefono):
-    """Consulta un usuario por su teléfono"""
-    with app.app_context():
-        return Usuario.query.filter_by(telefono=telefono).first()
-
-@medir_tiempo
-def consultar_pagos_usuario(app, usuario_id):
-    """Consulta los pagos de un usuario"""
-    with app.app_context():
-        return PagoMensualidad.query.filter_by(usuario_id=usuario_id).all()
-
-@medir_tiempo
-def consultar_asistencias_usuario(app, usuario_id):
-    """Consulta las asistencias de un usuario"""
-    with app.app_context():
-        return Asistencia.query.filter_by(usuario_id=usuario_id).all()
-
-@medir_tiempo
-def consultar_usuarios_plan(app, plan):
-    """Consulta usuarios por plan"""
-    with app.app_context():
-        return Usuario.query.filter_by(plan=plan).all()
-
-@medir_tiempo
-def consultar_usuarios_vencidos(app):
-    """Consulta usuarios con planes vencidos"""
-    with app.app_context():
-        hoy = datetime.date.today()
-        return Usuario.query.filter(Usuario.fecha_vencimiento_plan < hoy).all()
-
-@medir_tiempo
-def consultar_pagos_periodo(app, inicio, fin):
-    """Consulta pagos en un periodo de tiempo"""
-    with app.app_context():
-        return PagoMensualidad.query.filter(
-            PagoMensualidad.fecha_pago >= inicio,
-            PagoMensualidad.fecha_pago <= fin
-        ).all()
-
-def prueba_rendimiento_consultas(app, repeticiones=10):
-    """Realiza pruebas de rendimiento en consultas comunes"""
-    print("=" * 50)
-    print(" PRUEBAS DE RENDIMIENTO - CONSULTAS ")
-    print("=" * 50)
-    
-    # Preparar datos para pruebas
-    with app.app_context():
-        # Verificar que haya datos
-        count_usuarios = Usuario.query.count()
-        if count_usuarios == 0:
-            print("❌ No hay usuarios en la base de datos para pruebas.")
-            print("   Ejecute primero test_usuarios.py para generar datos.")
-            return False
-        
-        print(f"Base de datos con {count_usuarios} usuarios para pruebas.")
-        
-        # Obtener algunos IDs y teléfonos para pruebas
-        primer_usuario = Usuario.query.first()
-        ultimo_usuario = Usuario.query.order_by(Usuario.id.desc()).first()
-        usuario_aleatorio = Usuario.query.offset(count_usuarios // 2).first()
-        
-        # Planes para pruebas
-        planes = ['Diario', 'Mensual', 'Quincenal', 'Personalizado']
-        
-        # Fechas para pruebas
-        hoy = datetime.datetime.now()
-        inicio_mes = datetime.datetime(hoy.year, hoy.month, 1)
-        fin_mes = datetime.datetime(hoy.year, hoy.month + 1, 1) - datetime.timedelta(days=1)
-    
+from app_launcher import create_app
+from models import db, Admin, Asistencia, date_colombia
+from services.datos_sinteticos import generar_gimnasio
+from services.exportacion import escribir_excel
+from services.trabajos import TAREAS, detener_trabajos
+
+RAIZ = Path(__file__).parent.parent
+
+def escenarios(socio_id, carpeta):
+    """
+    Escenarios a medir: nombre -> función que recibe el cliente y devuelve
+    ``(código HTTP, consultas SQL, bytes)``.
+    """
+    def pagina(ruta, metodo='GET', **datos):
+        def pedir(cliente):
+            respuesta = cliente.open(ruta, method=metodo, **datos)
+            # En las respuestas por trozos las consultas ocurren después de las cabeceras
+            consultas = None if respuesta.is_streamed else int(respuesta.headers.get('X-SQL-Consultas', 0))
+            cuerpo = respuesta.get_data()
+            respuesta.close()
+            return respuesta.status_code, consultas, len(cuerpo)
+        return pedir
+
+    def excel(tabla):
+        def exportar(cliente):
+            destino = os.path.join(carpeta, f'{tabla}.xlsx')
+            escribir_excel(tabla, destino)
+            return 200, None, os.path.getsize(destino)
+        return exportar
+
+    def reporte_finanzas(cliente):
+        resultado = TAREAS['reporte_finanzas'](lambda *args: None, formato='csv', periodo='anual',
+                                               incluir_resumen=True, incluir_detalles=True)
+        tamaño = os.path.getsize(resultado['archivo'])
+        os.remove(resultado['archivo'])
+        return 200, None, tamaño
+
+    hoy = date_colombia()
+    return {
+        'finanzas_index': pagina('/finanzas/'),
+        'finanzas_diarias': pagina('/finanzas/diarias'),
+        'finanzas_diarias_hace_un_mes': pagina(f'/finanzas/diarias?fecha={hoy - timedelta(days=30):%Y-%m-%d}'),
+        'usuarios_index': pagina('/usuarios/'),
+        'usuarios_busqueda': pagina('/usuarios/?q=Socio 0001'),
+        'usuarios_vencidos': pagina('/usuarios/?estado=vencido'),
+        'ver_usuario': pagina(f'/usuarios/ver_usuario/{socio_id}'),
+        'asistencia': pagina('/usuarios/asistencia'),
+        'exportar_csv_asistencias': pagina('/admin/config', 'POST',
+                                           data={'accion': 'export_csv', 'tabla_exportar': 'asistencias'}),
+        'exportar_csv_pagos': pagina('/admin/config', 'POST',
+                                     data={'accion': 'export_csv', 'tabla_exportar': 'pagos'}),
+        'exportar_excel_ventas': excel('ventas'),
+        'reporte_finanzas_anual': reporte_finanzas,
+    }
+
+
+def medir(cliente, funciones, repeticiones):
+    """Tiempos en milisegundos de cada escenario (tras una ejecución de calentamiento)"""
     resultados = {}
-    
-    # Prueba 1: Consultar todos los usuarios
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_todos_usuarios(app)
-        tiempos.append(tiempo)
-    resultados["Consultar todos los usuarios"] = tiempos
-    
-    # Prueba 2: Consultar usuario por ID
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_usuario_por_id(app, primer_usuario.id)
-        tiempos.append(tiempo)
-    resultados["Consultar usuario por ID (primero)"] = tiempos
-    
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_usuario_por_id(app, ultimo_usuario.id)
-        tiempos.append(tiempo)
-    resultados["Consultar usuario por ID (último)"] = tiempos
-    
-    # Prueba 3: Consultar usuario por teléfono
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_usuario_por_telefono(app, usuario_aleatorio.telefono)
-        tiempos.append(tiempo)
-    resultados["Consultar usuario por teléfono"] = tiempos
-    
-    # Prueba 4: Consultar pagos de usuario
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_pagos_usuario(app, usuario_aleatorio.id)
-        tiempos.append(tiempo)
-    resultados["Consultar pagos de usuario"] = tiempos
-    
-    # Prueba 5: Consultar asistencias de usuario
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_asistencias_usuario(app, usuario_aleatorio.id)
-        tiempos.append(tiempo)
-    resultados["Consultar asistencias de usuario"] = tiempos
-    
-    # Prueba 6: Consultar usuarios por plan
-    for plan in planes:
+    for nombre, funcion in funciones.items():
+        codigo, consultas, tamaño = funcion(cliente)
         tiempos = []
         for _ in range(repeticiones):
-            _, tiempo = consultar_usuarios_plan(app, plan)
-            tiempos.append(tiempo)
-        resultados[f"Consultar usuarios con plan {plan}"] = tiempos
-    
-    # Prueba 7: Consultar usuarios con planes vencidos
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_usuarios_vencidos(app)
-        tiempos.append(tiempo)
-    resultados["Consultar usuarios con planes vencidos"] = tiempos
-    
-    # Prueba 8: Consultar pagos del mes actual
-    tiempos = []
-    for _ in range(repeticiones):
-        _, tiempo = consultar_pagos_periodo(app, inicio_mes, fin_mes)
-        tiempos.append(tiempo)
-    resultados["Consultar pagos del mes actual"] = tiempos
-    
-    # Mostrar resultados
-    print("\n" + "=" * 50)
-    print(" RESULTADOS DE PRUEBAS DE RENDIMIENTO ")
-    print("=" * 50)
-    
-    rendimiento_general = []
-    
-    for prueba, tiempos in resultados.items():
-        media = statistics.mean(tiempos)
-        mediana = statistics.median(tiempos)
-        desviacion = statistics.stdev(tiempos) if len(tiempos) > 1 else 0
-        minimo = min(tiempos)
-        maximo = max(tiempos)
-        
-        rendimiento_general.append(media)
-        
-        print(f"\n{prueba}:")
-        print(f"  Media: {formatear_tiempo(media)}")
-        print(f"  Mediana: {formatear_tiempo(mediana)}")
-        print(f"  Desviación estándar: {formatear_tiempo(desviacion)}")
-        print(f"  Mínimo: {formatear_tiempo(minimo)}")
-        print(f"  Máximo: {formatear_tiempo(maximo)}")
-    
-    # Calcular rendimiento general
-    rendimiento_medio = statistics.mean(rendimiento_general)
-    
-    print("\n" + "=" * 50)
-    print(" RENDIMIENTO GENERAL ")
-    print("=" * 50)
-    print(f"Tiempo medio por consulta: {formatear_tiempo(rendimiento_medio)}")
-    
-    # Evaluar rendimiento
-    if rendimiento_medio < 50:  # Menos de 50ms por consulta se considera bueno
-        print("✅ Rendimiento EXCELENTE")
-        return True
-    elif rendimiento_medio < 100:  # Menos de 100ms por consulta se considera aceptable
-        print("✅ Rendimiento BUENO")
-        return True
-    elif rendimiento_medio < 500:  # Menos de 500ms por consulta se considera regular
-        print("⚠️ Rendimiento REGULAR")
-        return True
-    else:  # Más de 500ms por consulta se considera deficiente
-        print("❌ Rendimiento DEFICIENTE")
-        return False
-
-if __name__ == "__main__":
-    # Determinar la cantidad de repeticiones para las pruebas
-    repeticiones = 10
-    if len(sys.argv) > 1:
-        try:
-            repeticiones = int(sys.argv[1])
-        except ValueError:
-            print(f"Error: El argumento debe ser un número entero. Usando valor por defecto: {repeticiones}")
-    
-    # Crear aplicación de prueba
-    app = crear_app_test()
-    
-    # Ejecutar pruebas de rendimiento
-    exito = prueba_rendimiento_consultas(app, repeticiones)
-    
-    # Reportar resultado
-    if exito:
-        sys.exit(0)
-    else:
-        sys.exit(1) 
\ No newline at end of file
+            inicio = time.perf_counter()
+            codigo, consultas, tamaño = funcion(cliente)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        resultados[nombre] = {
+            'codigo': codigo,
+            'consultas': consultas,
+            'bytes': tamaño,
+            'media_ms': round(statistics.mean(tiempos), 3),
+            'mediana_ms': round(statistics.median(tiempos), 3),
+            'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+            'min_ms': round(tiempos[0], 3),
+            'max_ms': round(tiempos[-1], 3),
+        }
+    return resultados
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def ejecutar_benchmark(socios=2000, dias=730, repeticiones=10, semilla=42, hasta=None):
+    """Crea la base de datos temporal, la llena y mide todos los escenarios"""
+    directorio = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directorio, 'benchmark.db')}",
+                      'TESTING': True, 'SQL_UMBRAL_LENTA_MS': float('inf')})
+    contexto = app.app_context()
+    contexto.push()
+    try:
+        filas = generar_gimnasio(socios, dias / 365, semilla, hasta)
+
+        admin = Admin(nombre='Benchmark', usuario='benchmark', rol='administrador')
+        admin.set_password('benchmark')
+        db.session.add(admin)
+        db.session.commit()
+        # El socio con más asistencias: la ficha más pesada
+        socio_id = db.session.query(Asistencia.usuario_id).group_by(Asistencia.usuario_id).order_by(
+            db.func.count().desc()).limit(1).scalar()
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+        resultados = medir(cliente, escenarios(socio_id, directorio), repeticiones)
+        db.session.remove()
+    finally:
+        detener_trabajos(app, esperar=True)
+        db.engine.dispose()
+        contexto.pop()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {'socios': socios, 'dias': dias, 'repeticiones': repeticiones, 'semilla': semilla,
+                       'hasta': (hasta or date_colombia()).isoformat()},
+        'datos': filas,
+        'escenarios': resultados,
+    }
+
+
+def imprimir(resultado, anterior=None):
+    """Tabla de resultados; con ``anterior`` añade la variación de la mediana"""
+    print(f"Commit {resultado['commit']} · {resultado['datos']}")
+    encabezado = f"{'Escenario':<30}{'Mediana (ms)':>14}{'p95 (ms)':>12}{'Consultas':>11}"
+    if anterior:
+        encabezado += f"{'Antes (ms)':>12}{'Cambio':>9}"
+        print(f"Comparado con {anterior.get('commit')} ({anterior.get('fecha')})")
+    print(encabezado)
+    for nombre, datos in resultado['escenarios'].items():
+        consultas = '' if datos['consultas'] is None else datos['consultas']
+        linea = f"{nombre:<30}{datos['mediana_ms']:>14.2f}{datos['p95_ms']:>12.2f}{consultas:>11}"
+        previo = (anterior or {}).get('escenarios', {}).get(nombre)
+        if previo:
+            cambio = (datos['mediana_ms'] - previo['mediana_ms']) / previo['mediana_ms'] * 100 if previo['mediana_ms'] else 0
+            linea += f"{previo['mediana_ms']:>12.2f}{cambio:>+8.0f}%"
+        print(linea)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Versión reducida del benchmark: todos los escenarios deben responder"""
+
+    def test_escenarios_responden(self):
+        resultado = ejecutar_benchmark(socios=40, dias=90, repeticiones=1)
+        self.assertEqual(resultado['datos']['usuarios'], 40)
+        for nombre, datos in resultado['escenarios'].items():
+            self.assertEqual(datos['codigo'], 200, nombre)
+            self.assertGreater(datos['bytes'], 0, nombre)
+        json.dumps(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas pesadas de GymTrack')
+    parser.add_argument('--socios', type=int, default=2000)
+    parser.add_argument('--dias', type=int, default=730)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--hasta', type=lambda valor: datetime.strptime(valor, '%Y-%m-%d').date(),
+                        help='Último día de los datos (AAAA-MM-DD); por defecto hoy')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto benchmarks/<fecha>_<commit>.json)')
+    parser.add_argument('--comparar', help='Resultados JSON anteriores con los que comparar')
+    args = parser.parse_args()
+
+    resultado = ejecutar_benchmark(args.socios, args.dias, args.repeticiones, args.semilla, args.hasta)
+
+    salida = args.salida or str(RAIZ / 'benchmarks' / f"{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit'] or 'sin_commit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+    imprimir(resultado, anterior)
+    print(f"\nResultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
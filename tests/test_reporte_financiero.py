@@ -0,0 +1,129 @@
+"""
+Pruebas para el cálculo columnar del informe financiero
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario, PagoMensualidad, VentaProducto, Producto, date_colombia
+from routes.finanzas.reportes_controller import generar_reporte_finanzas
+from services import reporte_financiero
+from services.reporte_financiero import calcular_reporte
+from services.trabajos import detener_trabajos
+
+
+class TestReporteFinanciero(unittest.TestCase):
+    """Pruebas para los totales, desgloses y serie diaria del informe"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.inicio = date(date_colombia().year, 1, 1)
+        self._datos()
+
+    def tearDown(self):
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _momento(self, dia, hora=10):
+        return datetime.combine(self.inicio + timedelta(days=dia), datetime.min.time()) + timedelta(hours=hora)
+
+    def _datos(self):
+        socio = Usuario(nombre='Ana Gómez', telefono='3000000001', plan='Mensual')
+        agua = Producto(nombre='Agua', precio=2000, stock=100, categoria='Bebidas')
+        guantes = Producto(nombre='Guantes', precio=45000.5, stock=10, categoria=None)
+        db.session.add_all([socio, agua, guantes])
+        db.session.flush()
+        for dia, monto, metodo, plan in ((0, 70000, 'Efectivo', 'Mensual'), (0, 5000, 'Nequi', 'Diario'),
+                                         (2, 70000, None, 'Mensual'), (2, 0.1, 'Nequi', 'Diario')):
+            db.session.add(PagoMensualidad(usuario_id=socio.id, monto=monto, metodo_pago=metodo, plan=plan,
+                                           fecha_pago=self._momento(dia), fecha_inicio=self.inicio,
+                                           fecha_fin=self.inicio))
+        db.session.add_all([
+            VentaProducto(producto_id=agua.id, usuario_id=socio.id, cantidad=2, precio_unitario=2000,
+                          total=4000, metodo_pago='Efectivo', fecha=self._momento(1, 23)),
+            VentaProducto(producto_id=guantes.id, usuario_id=None, cantidad=1, precio_unitario=45000.5,
+                          total=45000.5, metodo_pago='Nequi', fecha=self._momento(2, 0)),
+        ])
+        db.session.commit()
+
+    def _comprobar_reporte(self):
+        """Totales, desgloses y serie diaria (con días sin movimientos) del conjunto de prueba"""
+        reporte = calcular_reporte(self.inicio, self.inicio + timedelta(days=3))
+        self.assertEqual(reporte.total_membresias, Decimal('145000.10'))
+        self.assertEqual(reporte.total_productos, Decimal('49000.50'))
+        self.assertEqual((reporte.cantidad_pagos, reporte.cantidad_ventas), (4, 2))
+        self.assertEqual(reporte.por_metodo, {'Efectivo': Decimal('74000.00'), 'Sin especificar': Decimal('70000.00'),
+                                              'Nequi': Decimal('50000.60')})
+        self.assertEqual(list(reporte.por_metodo), ['Efectivo', 'Sin especificar', 'Nequi'])
+        self.assertEqual(reporte.por_plan, {'Mensual': Decimal('140000.00'), 'Diario': Decimal('5000.10')})
+        self.assertEqual(reporte.por_categoria, {'General': Decimal('45000.50'), 'Bebidas': Decimal('4000.00')})
+        self.assertEqual(reporte.serie_diaria, [
+            (self.inicio, Decimal('75000.00'), Decimal('0.00')),
+            (self.inicio + timedelta(days=1), Decimal('0.00'), Decimal('4000.00')),
+            (self.inicio + timedelta(days=2), Decimal('70000.10'), Decimal('45000.50')),
+            (self.inicio + timedelta(days=3), Decimal('0.00'), Decimal('0.00')),
+        ])
+
+        # Un período sin movimientos no falla
+        vacio = calcular_reporte(self.inicio - timedelta(days=10), self.inicio - timedelta(days=1))
+        self.assertEqual((vacio.total_ingresos, vacio.por_metodo), (Decimal('0.00'), {}))
+        self.assertEqual(vacio.serie_diaria[0], (self.inicio - timedelta(days=10), Decimal('0.00'), Decimal('0.00')))
+        self.assertEqual(len(vacio.serie_diaria), 10)
+
+    def _comprobar_sumas(self):
+        """Agrupación por clave y por día con centavos conocidos"""
+        self.assertEqual(reporte_financiero.sumar_por_clave(['b', 'a', 'b', 'c'], [150, 200, 75, 1]),
+                         {'b': Decimal('2.25'), 'a': Decimal('2.00'), 'c': Decimal('0.01')})
+        self.assertEqual(reporte_financiero.sumar_por_clave([], []), {})
+        self.assertEqual(reporte_financiero.sumar_por_dia([0, 3, 3, 5], [10, 20, 30, 40], 6), [10, 0, 0, 50, 0, 40])
+        self.assertEqual(reporte_financiero.sumar_por_dia([], [], 3), [0, 0, 0])
+
+    def test_sin_numpy(self):
+        """Sin NumPy el cálculo en Python puro da los totales esperados"""
+        with mock.patch.object(reporte_financiero, 'np', None):
+            self._comprobar_reporte()
+            self._comprobar_sumas()
+
+    @unittest.skipUnless(reporte_financiero.np, 'NumPy no está instalado')
+    def test_con_numpy(self):
+        """Con NumPy la agrupación vectorizada da los mismos totales que la de Python puro"""
+        self._comprobar_reporte()
+        self._comprobar_sumas()
+        hasta = self.inicio + timedelta(days=30)
+        con_numpy = calcular_reporte(self.inicio, hasta)
+        with mock.patch.object(reporte_financiero, 'np', None):
+            self.assertEqual(calcular_reporte(self.inicio, hasta), con_numpy)
+
+    def test_exportacion_csv(self):
+        """El CSV anual incluye los desgloses y el detalle leído como tuplas"""
+        resultado = generar_reporte_finanzas(lambda *args: None, formato='csv', periodo='anual',
+                                             incluir_resumen=True, incluir_detalles=True)
+        self.addCleanup(os.remove, resultado['archivo'])
+        with open(resultado['archivo'], encoding='utf-8') as archivo:
+            contenido = archivo.read()
+        self.assertIn('Total Ingresos:,"194,000.60"', contenido)
+        self.assertIn('INGRESOS POR MÉTODO DE PAGO', contenido)
+        self.assertIn('Nequi,"50,000.60"', contenido)
+        self.assertIn('Ana Gómez,Mensual,"70,000.00",Efectivo', contenido)
+        self.assertIn('Guantes,Cliente no registrado,1,"45,000.50","45,000.50",Nequi', contenido)
+
+
+if __name__ == '__main__':
+    unittest.main()
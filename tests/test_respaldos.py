@@ -0,0 +1,107 @@
+"""
+Pruebas para los respaldos en caliente con la API de respaldo de SQLite
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Trabajo
+from services.almacen_respaldos import almacen_de
+from services.respaldos import respaldar_base_datos, verificar_integridad, ErrorRespaldo
+from services.trabajos import encolar, detener_trabajos
+
+
+class TestRespaldos(unittest.TestCase):
+    """Pruebas para la copia por pasos y su verificación"""
+
+    def setUp(self):
+        """Crear una base de datos en modo WAL con datos que aún no se volcaron"""
+        self.directorio = tempfile.mkdtemp()
+        self.origen = os.path.join(self.directorio, 'database.db')
+        self.destino = os.path.join(self.directorio, 'backups', 'respaldo.db')
+        self.conexion = sqlite3.connect(self.origen)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute('CREATE TABLE asistencia (id INTEGER PRIMARY KEY, dato TEXT)')
+        self.conexion.executemany('INSERT INTO asistencia (dato) VALUES (?)',
+                                  [('x' * 200,) for _ in range(2000)])
+        self.conexion.commit()
+
+    def tearDown(self):
+        """Eliminar los archivos temporales"""
+        self.conexion.close()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _contar(self, ruta):
+        conexion = sqlite3.connect(ruta)
+        try:
+            return conexion.execute('SELECT COUNT(*) FROM asistencia').fetchone()[0]
+        finally:
+            conexion.close()
+
+    def test_respaldo_por_pasos(self):
+        """La copia incluye lo que está en el WAL y se hace en varios pasos"""
+        self.assertGreater(os.path.getsize(self.origen + '-wal'), 0)
+        avances = []
+        tamaño = respaldar_base_datos(self.origen, self.destino, paginas_por_paso=10, pausa=0,
+                                      progreso=lambda copiadas, total: avances.append(copiadas))
+        self.assertEqual(tamaño, os.path.getsize(self.destino))
+        self.assertEqual(self._contar(self.destino), 2000)
+        self.assertEqual(verificar_integridad(self.destino), [])
+        self.assertGreater(len(avances), 5)
+        # No quedan archivos temporales junto al respaldo
+        self.assertEqual(os.listdir(os.path.dirname(self.destino)), ['respaldo.db'])
+
+    def test_escrituras_durante_el_respaldo(self):
+        """Si otra conexión escribe entre pasos, el respaldo termina con todos los datos"""
+        def escribir(copiadas, total):
+            if copiadas == total:
+                return  # La copia ya terminó
+            self.conexion.execute("INSERT INTO asistencia (dato) VALUES ('nuevo')")
+            self.conexion.commit()
+
+        respaldar_base_datos(self.origen, self.destino, paginas_por_paso=10, pausa=0,
+                             max_reinicios=2, progreso=escribir)
+        self.assertEqual(self._contar(self.destino), self._contar(self.origen))
+        self.assertEqual(verificar_integridad(self.destino), [])
+
+    def test_respaldo_corrupto(self):
+        """Un respaldo que no pasa la verificación no reemplaza al destino"""
+        with mock.patch('services.respaldos.verificar_integridad', return_value=['página 3 dañada']):
+            with self.assertRaises(ErrorRespaldo):
+                respaldar_base_datos(self.origen, self.destino)
+        self.assertEqual(os.listdir(os.path.dirname(self.destino)), [])
+
+    def test_respaldo_como_trabajo(self):
+        """El respaldo desde la configuración se ejecuta como trabajo en segundo plano"""
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        with app.app_context():
+            db.create_all()
+            trabajo_id = encolar('instantanea_db', origen=self.origen).id
+            limite = time.time() + 5
+            while time.time() < limite:
+                db.session.expire_all()
+                trabajo = Trabajo.query.get(trabajo_id)
+                if trabajo.estado in ('completado', 'error'):
+                    break
+                time.sleep(0.02)
+            self.assertEqual(trabajo.estado, 'completado', trabajo.mensaje)
+            self.assertIn('integridad verificada', trabajo.mensaje)
+            detener_trabajos(app, esperar=True)
+
+        almacen = almacen_de(self.origen)
+        manifiesto, = almacen.listar()
+        almacen.restaurar(manifiesto['nombre'], self.destino)
+        self.assertEqual(self._contar(self.destino), 2000)
+
+if __name__ == '__main__':
+    unittest.main()
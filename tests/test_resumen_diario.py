@@ -0,0 +1,133 @@
+"""
+Pruebas para el resumen diario de ingresos y asistencias
+"""
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Admin, Usuario, Asistencia, PagoMensualidad, VentaProducto, Producto
+from models import ResumenDiario, date_colombia
+from services.resumen_diario import (reconstruir_resumen_diario, totales_rango,
+                                     totales_por_metodo, sql_afecta_resumen)
+
+
+class TestResumenDiario(unittest.TestCase):
+    """Pruebas para el mantenimiento incremental y la reconstrucción del resumen"""
+
+    def setUp(self):
+        """Configurar una base de datos en memoria con un usuario y un producto"""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.hoy = date_colombia()
+        self.ayer = self.hoy - timedelta(days=1)
+        self.usuario = Usuario(nombre='Socio', telefono='3000000001', plan='Mensual')
+        self.producto = Producto(nombre='Agua', precio=2000, stock=50, categoria='Bebidas')
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+
+    def tearDown(self):
+        """Limpiar después de las pruebas"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _pago(self, dia, monto, metodo='Efectivo'):
+        fecha = datetime.combine(dia, datetime.min.time()) + timedelta(hours=9)
+        pago = PagoMensualidad(usuario_id=self.usuario.id, fecha_pago=fecha, monto=monto,
+                               metodo_pago=metodo, plan='Mensual',
+                               fecha_inicio=dia, fecha_fin=dia + timedelta(days=30))
+        db.session.add(pago)
+        return pago
+
+    def _venta(self, dia, total, metodo='Nequi'):
+        venta = VentaProducto(producto_id=self.producto.id, usuario_id=self.usuario.id,
+                              cantidad=1, precio_unitario=total, total=total, metodo_pago=metodo,
+                              fecha=datetime.combine(dia, datetime.min.time()) + timedelta(hours=18))
+        db.session.add(venta)
+        return venta
+
+    def _filas(self):
+        return {r.fecha: (r.total_membresias, r.total_productos, r.cantidad_pagos,
+                          r.cantidad_ventas, r.cantidad_asistencias)
+                for r in ResumenDiario.query.order_by(ResumenDiario.fecha)}
+
+    def test_altas_actualizan_resumen(self):
+        """Pagos, ventas y asistencias nuevas se suman al día correspondiente"""
+        self._pago(self.hoy, 70000)
+        self._pago(self.ayer, 50000, metodo=None)
+        self._venta(self.hoy, 4000)
+        db.session.add(Asistencia(usuario_id=self.usuario.id))
+        db.session.commit()
+
+        filas = self._filas()
+        self.assertEqual(filas[self.hoy], (70000, 4000, 1, 1, 1))
+        self.assertEqual(filas[self.ayer], (50000, 0, 1, 0, 0))
+        self.assertEqual(totales_por_metodo(self.ayer, self.hoy),
+                         {'Efectivo': 70000, 'Nequi': 4000, 'Sin especificar': 50000})
+
+    def test_ediciones_y_borrados(self):
+        """Modificar o eliminar una transacción mueve los totales entre días"""
+        pago = self._pago(self.hoy, 70000)
+        venta = self._venta(self.hoy, 4000)
+        db.session.commit()
+
+        pago.monto = 35000
+        venta.fecha = datetime.combine(self.ayer, datetime.min.time())
+        db.session.commit()
+        self.assertEqual(self._filas()[self.hoy], (35000, 0, 1, 0, 0))
+        self.assertEqual(self._filas()[self.ayer], (0, 4000, 0, 1, 0))
+
+        db.session.delete(venta)
+        db.session.commit()
+        self.assertEqual(self._filas()[self.ayer], (0, 0, 0, 0, 0))
+        self.assertEqual(totales_rango(self.ayer, self.hoy)['total_membresias'], 35000)
+
+    def test_reconstruccion_coincide(self):
+        """Reconstruir desde las transacciones da el mismo resultado que el incremental"""
+        for i in range(5):
+            self._pago(self.hoy - timedelta(days=i), 10000 * (i + 1))
+            self._venta(self.hoy - timedelta(days=i % 2), 2000)
+        db.session.commit()
+        incremental = self._filas()
+
+        ResumenDiario.query.delete()
+        db.session.commit()
+        self.assertEqual(self._filas(), {})
+
+        self.assertEqual(reconstruir_resumen_diario(), 5)
+        self.assertEqual(self._filas(), incremental)
+
+
+    def test_consola_sql_reconstruye(self):
+        """Una escritura con la consola SQL de la configuración deja el resumen al día"""
+        self._pago(self.hoy, 70000)
+        self._pago(self.ayer, 50000)
+        db.session.commit()
+        admin = Admin(nombre='Admin', usuario='admin', rol='administrador')
+        admin.set_password('clave')
+        db.session.add(admin)
+        db.session.commit()
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['admin_id'] = admin.id
+            sesion['admin_rol'] = 'administrador'
+
+        cliente.post('/admin/config', data={'accion': 'run_sql', 'allow_write': 'on',
+                                            'sql_query': 'DELETE FROM pago_mensualidad WHERE monto = 5000000'})
+        self.assertEqual(PagoMensualidad.query.count(), 1)
+        self.assertEqual(totales_rango(self.ayer, self.hoy)['total_membresias'], 70000)
+
+        self.assertTrue(sql_afecta_resumen('update ASISTENCIA set fecha = fecha'))
+        self.assertFalse(sql_afecta_resumen('UPDATE producto SET stock = 0'))
+        self.assertFalse(sql_afecta_resumen('UPDATE objetivo_personal SET estado = 1'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Pruebas para el servidor de producción con waitress
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db
+from services.servidor import waitress, crear_servidor, detener_servidor, opciones_servidor
+from services.trabajos import detener_trabajos
+
+
+@unittest.skipIf(waitress is None, 'waitress no está instalado')
+class TestServidor(unittest.TestCase):
+    """Pruebas para el grupo de hilos y el cierre ordenado"""
+
+    def setUp(self):
+        """Iniciar el servidor en un puerto libre con una ruta lenta"""
+        self.directorio = tempfile.mkdtemp()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directorio, 'database.db')}",
+                               'TESTING': True})
+
+        @self.app.route('/prueba-lenta')
+        def prueba_lenta():
+            time.sleep(0.5)
+            return 'listo'
+
+        self.servidor = crear_servidor(self.app, port=0, hilos=4)
+        self.url = f'http://127.0.0.1:{self.servidor.effective_port}'
+        self.hilo = threading.Thread(target=self.servidor.run)
+        self.hilo.start()
+
+    def tearDown(self):
+        detener_servidor(self.app)
+        self.hilo.join(5)
+        detener_trabajos(self.app, esperar=True)
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _pedir(self, ruta, resultados):
+        with urllib.request.urlopen(self.url + ruta, timeout=5) as respuesta:
+            resultados.append(respuesta.read().decode())
+
+    def test_opciones_desde_configuracion(self):
+        """Los argumentos tienen prioridad sobre la configuración"""
+        self.app.config['SERVIDOR_BACKLOG'] = 64
+        opciones = opciones_servidor(self.app, hilos=3, timeout=20)
+        self.assertEqual((opciones['threads'], opciones['backlog'], opciones['channel_timeout']), (3, 64, 20))
+
+    def test_peticiones_concurrentes(self):
+        """Las peticiones lentas se atienden en paralelo"""
+        resultados = []
+        inicio = time.time()
+        hilos = [threading.Thread(target=self._pedir, args=('/prueba-lenta', resultados)) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(resultados, ['listo'] * 4)
+        self.assertLess(time.time() - inicio, 1.5)
+
+    def test_cierre_ordenado(self):
+        """El cierre espera a las peticiones en curso y luego detiene el servidor"""
+        resultados = []
+        en_curso = threading.Thread(target=self._pedir, args=('/prueba-lenta', resultados))
+        en_curso.start()
+        time.sleep(0.1)
+
+        self.assertTrue(detener_servidor(self.app))
+        en_curso.join()
+        self.hilo.join(5)
+        self.assertEqual(resultados, ['listo'])
+        self.assertFalse(self.hilo.is_alive())
+        with self.assertRaises(OSError):
+            urllib.request.urlopen(self.url + '/prueba-lenta', timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
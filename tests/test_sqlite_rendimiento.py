@@ -0,0 +1,116 @@
+"""
+Pruebas para el perfil de rendimiento de SQLite
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Usuario
+from services.sqlite_rendimiento import (volcar_wal, iniciar_checkpoint_periodico,
+                                         detener_checkpoint_periodico)
+
+
+class TestSqliteRendimiento(unittest.TestCase):
+    """Pruebas para los PRAGMA aplicados a cada conexión"""
+
+    def setUp(self):
+        """Crear una base de datos en un archivo temporal"""
+        self.directorio = tempfile.mkdtemp()
+        self.ruta_db = os.path.join(self.directorio, 'database.db')
+
+    def tearDown(self):
+        """Eliminar la base de datos temporal"""
+        detener_checkpoint_periodico()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _crear_app(self, **config):
+        config.update({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.ruta_db}', 'TESTING': True})
+        app = create_app(config)
+        self.addCleanup(lambda: app.app_context().push() or db.engine.dispose())
+        return app
+
+    def _pragma(self, conexion, nombre):
+        return conexion.exec_driver_sql(f'PRAGMA {nombre}').scalar()
+
+    def test_perfil_rendimiento(self):
+        """El perfil por defecto activa WAL y reutiliza conexiones"""
+        app = self._crear_app(SQLITE_PERFIL='rendimiento')
+        with app.app_context():
+            with db.engine.connect() as conexion:
+                self.assertEqual(self._pragma(conexion, 'journal_mode'), 'wal')
+                self.assertEqual(self._pragma(conexion, 'synchronous'), 1)  # NORMAL
+                self.assertEqual(self._pragma(conexion, 'temp_store'), 2)  # MEMORY
+                self.assertEqual(self._pragma(conexion, 'busy_timeout'), 5000)
+            self.assertEqual(type(db.engine.pool).__name__, 'QueuePool')
+
+    def test_perfil_compatible(self):
+        """El perfil compatible mantiene el journal clásico"""
+        app = self._crear_app(SQLITE_PERFIL='compatible')
+        with app.app_context():
+            with db.engine.connect() as conexion:
+                self.assertEqual(self._pragma(conexion, 'journal_mode'), 'delete')
+                self.assertEqual(self._pragma(conexion, 'synchronous'), 2)  # FULL
+
+    def test_lectura_no_bloquea_escritura(self):
+        """Con WAL se puede escribir mientras otra conexión mantiene una lectura abierta"""
+        app = self._crear_app(SQLITE_PERFIL='rendimiento')
+        with app.app_context():
+            # Un reporte largo: transacción de lectura abierta en otra conexión
+            lector = sqlite3.connect(self.ruta_db)
+            lector.execute('BEGIN')
+            self.assertEqual(lector.execute('SELECT COUNT(*) FROM usuario').fetchone()[0], 0)
+
+            db.session.add(Usuario(nombre='Socio', telefono='3000000001'))
+            db.session.commit()
+
+            # El lector sigue viendo su instantánea hasta terminar la transacción
+            self.assertEqual(lector.execute('SELECT COUNT(*) FROM usuario').fetchone()[0], 0)
+            lector.rollback()
+            self.assertEqual(lector.execute('SELECT COUNT(*) FROM usuario').fetchone()[0], 1)
+            lector.close()
+
+            db.session.remove()
+            self.assertEqual(volcar_wal(self.ruta_db)[0], 0)
+            self.assertEqual(os.path.getsize(self.ruta_db + '-wal'), 0)
+
+    def _usuarios_en_archivo_principal(self):
+        """Cuenta usuarios leyendo solo database.db, sin el WAL"""
+        copia = os.path.join(self.directorio, 'copia.db')
+        shutil.copyfile(self.ruta_db, copia)
+        conexion = sqlite3.connect(copia)
+        try:
+            return conexion.execute('SELECT COUNT(*) FROM usuario').fetchone()[0]
+        finally:
+            conexion.close()
+            os.remove(copia)
+
+    def test_checkpoint_periodico(self):
+        """El hilo de checkpoint vuelca el WAL al archivo principal"""
+        app = self._crear_app(SQLITE_PERFIL='rendimiento')
+        volcar_wal(self.ruta_db)  # Dejar las tablas ya creadas en el archivo principal
+        with app.app_context():
+            db.session.add(Usuario(nombre='Socio', telefono='3000000001'))
+            db.session.commit()
+            db.session.remove()
+        self.assertEqual(self._usuarios_en_archivo_principal(), 0)
+
+        hilo = iniciar_checkpoint_periodico(app, segundos=0.05)
+        self.assertTrue(hilo.is_alive())
+        time.sleep(0.3)
+        self.assertEqual(self._usuarios_en_archivo_principal(), 1)
+        detener_checkpoint_periodico()
+        hilo.join(1)
+        self.assertFalse(hilo.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""
+Pruebas para los trabajos en segundo plano
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Añadir el directorio raíz al path para que se puedan encontrar los módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_launcher import create_app
+from models import db, Trabajo
+from services.trabajos import tarea, encolar, iniciar_trabajos, detener_trabajos, ErrorTrabajo, _ejecutar
+
+# Evento que controla cuándo terminan los trabajos de prueba 'bloqueado'
+liberar = threading.Event()
+# Hilos que ejecutaron un trabajo 'prueba_contador'
+ejecuciones = []
+
+
+@tarea('prueba_archivo')
+def _tarea_archivo(progreso, ruta, texto):
+    progreso(50, 'Escribiendo')
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write(texto)
+    return {'archivo': ruta, 'nombre_archivo': 'prueba.txt'}
+
+
+@tarea('prueba_error')
+def _tarea_error(progreso):
+    raise ErrorTrabajo('Sin datos para el período')
+
+
+@tarea('prueba_contador')
+def _tarea_contador(progreso):
+    ejecuciones.append(threading.get_ident())
+    return {'mensaje': 'Contado'}
+
+
+@tarea('prueba_bloqueado')
+def _tarea_bloqueada(progreso):
+    liberar.wait(5)
+    return {'mensaje': 'Liberado'}
+
+
+class TestTrabajos(unittest.TestCase):
+    """Pruebas para la cola persistente y el grupo de hilos"""
+
+    def setUp(self):
+        """Crear la aplicación con una base de datos en un archivo temporal"""
+        self.directorio = tempfile.mkdtemp()
+        self.ruta_db = os.path.join(self.directorio, 'database.db')
+        self.app = self._crear_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        liberar.clear()
+
+    def tearDown(self):
+        """Detener los hilos y eliminar la base de datos temporal"""
+        liberar.set()
+        detener_trabajos(self.app, esperar=True)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _crear_app(self, **config):
+        config.update({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.ruta_db}', 'TESTING': True})
+        return create_app(config)
+
+    def _esperar(self, trabajo_id, estados=('completado', 'error'), segundos=5):
+        """Espera a que el trabajo llegue a uno de los estados indicados"""
+        limite = time.time() + segundos
+        while time.time() < limite:
+            db.session.expire_all()
+            trabajo = Trabajo.query.get(trabajo_id)
+            if trabajo.estado in estados:
+                return trabajo
+            time.sleep(0.02)
+        self.fail(f'El trabajo {trabajo_id} sigue en estado {trabajo.estado}')
+
+    def test_trabajo_completado_y_descarga(self):
+        """El trabajo se procesa en otro hilo y su archivo se puede descargar"""
+        ruta = os.path.join(self.directorio, 'salida.txt')
+        trabajo = encolar('prueba_archivo', ruta=ruta, texto='hola')
+        trabajo = self._esperar(trabajo.id)
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.progreso, 100)
+        self.assertIsNotNone(trabajo.fecha_fin)
+
+        cliente = self.app.test_client()
+        estado = cliente.get(f'/trabajos/{trabajo.id}/estado').get_json()
+        self.assertTrue(estado['descargable'])
+        descarga = cliente.get(estado['descarga_url'])
+        self.assertEqual(descarga.get_data(as_text=True), 'hola')
+        self.assertIn('prueba.txt', descarga.headers['Content-Disposition'])
+        descarga.close()
+
+    def test_trabajo_con_error(self):
+        """Los errores quedan guardados con su mensaje"""
+        trabajo = self._esperar(encolar('prueba_error').id)
+        self.assertEqual(trabajo.estado, 'error')
+        self.assertEqual(trabajo.mensaje, 'Sin datos para el período')
+
+    def test_hilos_acotados(self):
+        """Con un solo hilo, el segundo trabajo espera en cola"""
+        detener_trabajos(self.app, esperar=True)
+        iniciar_trabajos(self.app, max_hilos=1)
+        primero = encolar('prueba_bloqueado')
+        segundo = encolar('prueba_bloqueado')
+        self._esperar(primero.id, estados=('en_proceso',))
+        time.sleep(0.1)
+        db.session.expire_all()
+        self.assertEqual(Trabajo.query.get(segundo.id).estado, 'pendiente')
+
+        liberar.set()
+        self.assertEqual(self._esperar(segundo.id).estado, 'completado')
+        self.assertEqual(self._esperar(primero.id).mensaje, 'Liberado')
+
+    def test_retomar_cola_al_iniciar(self):
+        """Al reiniciar, los pendientes se ejecutan y los interrumpidos se marcan con error"""
+        detener_trabajos(self.app, esperar=True)
+        interrumpido = Trabajo(tipo='prueba_bloqueado', estado='en_proceso')
+        pendiente = Trabajo(tipo='prueba_error', estado='pendiente', parametros='{}')
+        db.session.add_all([interrumpido, pendiente])
+        db.session.commit()
+        ids = (interrumpido.id, pendiente.id)
+
+        iniciar_trabajos(self.app)
+        self.assertEqual(self._esperar(ids[1]).mensaje, 'Sin datos para el período')
+        self.assertEqual(Trabajo.query.get(ids[0]).estado, 'error')
+
+    def test_reclamo_atomico(self):
+        """Un trabajo enviado a la vez desde varios hilos (o procesos) se ejecuta una sola vez"""
+        detener_trabajos(self.app, esperar=True)
+        ejecuciones.clear()
+        trabajo = Trabajo(tipo='prueba_contador', estado='pendiente', parametros='{}')
+        db.session.add(trabajo)
+        db.session.commit()
+
+        salida = threading.Barrier(4)
+
+        def ejecutar():
+            salida.wait()
+            _ejecutar(self.app, trabajo.id)
+
+        hilos = [threading.Thread(target=ejecutar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(ejecuciones), 1)
+        self.assertEqual(self._esperar(trabajo.id).mensaje, 'Contado')
+
+    def test_crear_app_sin_trabajos(self):
+        """Sin trabajos, crear la aplicación no toca la cola (p. ej. el vigilante del recargador)"""
+        detener_trabajos(self.app, esperar=True)
+        en_curso = Trabajo(tipo='prueba_bloqueado', estado='en_proceso')
+        db.session.add(en_curso)
+        db.session.commit()
+        en_curso_id = en_curso.id
+
+        otra = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.ruta_db}', 'TESTING': True}, trabajos=False)
+        self.assertNotIn('trabajos', otra.extensions)
+        db.session.expire_all()
+        self.assertEqual(Trabajo.query.get(en_curso_id).estado, 'en_proceso')
+
+    def test_exportar_finanzas_en_segundo_plano(self):
+        """La exportación de finanzas redirige a la página de progreso"""
+        cliente = self.app.test_client()
+        respuesta = cliente.post('/finanzas/exportar', data={'formato': 'csv', 'incluirResumen': 'on'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn('/trabajos/', respuesta.headers['Location'])
+
+        trabajo = Trabajo.query.order_by(Trabajo.id.desc()).first()
+        self.assertEqual(cliente.get(f'/trabajos/{trabajo.id}').status_code, 200)
+        trabajo = self._esperar(trabajo.id)
+        self.addCleanup(lambda ruta=trabajo.archivo: os.path.exists(ruta) and os.remove(ruta))
+        self.assertEqual(trabajo.estado, 'completado')
+        with open(trabajo.archivo, encoding='utf-8') as archivo:
+            self.assertIn('RESUMEN FINANCIERO', archivo.read())
+
+        # Las peticiones AJAX reciben el trabajo en JSON
+        respuesta = cliente.post('/finanzas/exportar', data={'formato': 'csv'},
+                                 headers={'Accept': 'application/json'})
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(self._esperar(respuesta.get_json()['id']).estado, 'completado')
+
+
+if __name__ == '__main__':
+    unittest.main()